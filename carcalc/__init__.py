@@ -0,0 +1,5 @@
+"""Python pricing engine and tools for CarShareCalc.
+
+`carcalc.calc` mirrors `web/lib/calc.js`; `carcalc.engine` compiles the TSV data for bulk pricing.
+Commands run via `python -m carcalc <command>`.
+"""
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import importlib
+import sys
+
+from carcalc import instrument
+
+# command -> module exposing `main(argv) -> int`
+COMMANDS = {
+    "build": "carcalc.build",
+    "bundle": "carcalc.bundle",
+    "fleet": "carcalc.fleet",
+    "history": "carcalc.history",
+    "loadtest": "carcalc.loadtest",
+    "models": "carcalc.models",
+    "pack": "carcalc.pack",
+    "price": "carcalc.daemon",
+    "parity": "carcalc.parity",
+    "reprice": "carcalc.reprice",
+    "scaling": "carcalc.parallel",
+    "serve": "carcalc.server",
+    "store": "carcalc.store",
+    "tracks": "carcalc.tracks",
+    "tsvbench": "carcalc.tsv",
+}
+
+
+def main(argv: list[str]) -> int:
+    if not argv or argv[0] in {"-h", "--help"} or argv[0] not in COMMANDS:
+        print("usage: python -m carcalc <command> [args]", file=sys.stderr)
+        print(f"commands: {', '.join(COMMANDS)}", file=sys.stderr)
+        return 0 if argv and argv[0] in {"-h", "--help"} else 2
+    command = importlib.import_module(COMMANDS[argv[0]])
+    prefix = instrument.env_prefix()
+    if prefix is None:
+        return command.main(argv[1:])
+    with instrument.profile() as stats:
+        code = command.main(argv[1:])
+    stats.write(prefix)
+    print(f"Profile written to {prefix}.json and {prefix}.folded", file=sys.stderr)
+    return code
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,126 @@
+"""Admission control for `carcalc serve`: bounded concurrency, a bounded FIFO queue, fast shedding.
+
+At most `max_concurrent` requests price at once. Further requests wait in a queue of at most
+`max_queue`, each for at most `queue_timeout_s` (its deadline); a request that finds the queue
+full, or whose deadline passes while queued, is shed and answered `503` with `Retry-After` right
+away instead of adding to everyone's latency. A finished request hands its slot straight to the
+oldest waiter, so queued requests are served in arrival order.
+
+While the queue is at least `degrade_at` deep the service is saturated and `/price` switches to a
+degraded mode (top `degraded_limit` totals, no breakdowns; see `carcalc.server`), which drains the
+queue faster. Only pricing work is admitted: cache hits, `/health` and `/metrics` never queue.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from carcalc.metrics import Counter, Histogram
+
+SHED_REASONS = ("queue_full", "deadline")
+
+
+class Shed(Exception):
+    """The request was not admitted; answer 503 with `Retry-After: retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(f"overloaded ({reason.replace('_', ' ')}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("granted", "event")
+
+    def __init__(self) -> None:
+        self.granted = False
+        self.event = threading.Event()
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int = 64,
+        queue_timeout_s: float = 0.5,
+        degrade_at: int = 8,
+        degraded_limit: int = 10,
+    ) -> None:
+        if max_concurrent <= 0:
+            raise ValueError("max_concurrent must be > 0")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_s = queue_timeout_s
+        self.degrade_at = degrade_at
+        self.degraded_limit = degraded_limit
+        self.active = 0
+        self.queue: deque[_Waiter] = deque()
+        self.lock = threading.Lock()
+        self.shed = {reason: Counter() for reason in SHED_REASONS}
+        self.admitted = Counter()
+        self.degraded = Counter()
+        self.queue_wait = Histogram()
+
+    @property
+    def saturated(self) -> bool:
+        """True while requests should be served in degraded mode."""
+        return self.degrade_at > 0 and len(self.queue) >= self.degrade_at
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout_s))
+
+    def acquire(self) -> None:
+        """Take a pricing slot, queueing up to `queue_timeout_s`; raises `Shed` instead."""
+        with self.lock:
+            if self.active < self.max_concurrent and not self.queue:
+                self.active += 1
+                self.admitted.inc()
+                self.queue_wait.observe(0.0)
+                return
+            if len(self.queue) >= self.max_queue:
+                self.shed["queue_full"].inc()
+                raise Shed("queue_full", self.retry_after())
+            waiter = _Waiter()
+            self.queue.append(waiter)
+        started = time.perf_counter()
+        waiter.event.wait(self.queue_timeout_s)
+        with self.lock:
+            if not waiter.granted:  # deadline passed (a grant after this point can't happen: we hold the lock)
+                self.queue.remove(waiter)
+                self.shed["deadline"].inc()
+                raise Shed("deadline", self.retry_after())
+        self.admitted.inc()
+        self.queue_wait.observe(time.perf_counter() - started)
+
+    def release(self) -> None:
+        with self.lock:
+            if self.queue:
+                waiter = self.queue.popleft()  # hand the slot over; `active` stays the same
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self.active -= 1
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.active,
+            "queued": len(self.queue),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": int(self.admitted.value),
+            "degraded": int(self.degraded.value),
+            "shed": {reason: int(c.value) for reason, c in self.shed.items()},
+        }
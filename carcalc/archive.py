@@ -0,0 +1,112 @@
+"""Content-addressed archive of raw fetched payloads (the importers' CityBee HTML, CarGuru JSON).
+
+The importers keep only what their parsers extracted, so a parser fix cannot be applied to
+past data. With an archive (default `build/archive/`) every fetch is kept:
+
+- `objects/<sha256[:2]>/<sha256[2:]>.gz`: the payload bytes, gzip-compressed, stored once per
+  content hash (an unchanged page costs one index line),
+- `index.tsv`: one appended line per fetch: `run` (one id per importer run), `fetched_at`
+  (UTC), `url`, `sha256`, `bytes`, `importer` (which script made the run: the options and
+  vehicles importers fetch the same URLs into one archive). Indexes written before the
+  `importer` column get it (blank) on the next `put`.
+
+`get` verifies the hash of what it decompresses. `scripts/reprocess.py` reruns the current
+parsers over every archived run.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from carcalc.tsv import Table, stream, write_atomic
+
+DEFAULT_ARCHIVE = Path(__file__).resolve().parents[1] / "build" / "archive"
+INDEX_NAME = "index.tsv"
+INDEX_HEADER = ("run", "fetched_at", "url", "sha256", "bytes", "importer")
+
+
+@dataclass(frozen=True)
+class Entry:
+    run: str
+    fetched_at: str
+    url: str
+    sha256: str
+    size: int
+    importer: str = ""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Archive:
+    def __init__(self, root: Path, run: str = "", importer: str = "") -> None:
+        self.root = Path(root)
+        self.run = run or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.importer = importer
+        self._index_checked = False
+
+    def object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest[2:]}.gz"
+
+    def put(self, url: str, data: bytes, fetched_at: str = "") -> str:
+        """Store `data` fetched from `url` (once per content) and index the fetch; returns its hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(path, [gzip.compress(data, mtime=0)], binary=True)
+        index = self.root / INDEX_NAME
+        index.parent.mkdir(parents=True, exist_ok=True)
+        if not self._index_checked:
+            self._upgrade_index(index)
+        line = Table(INDEX_HEADER).format_row((self.run, fetched_at or _now(), url, digest, str(len(data)), self.importer))
+        with index.open("a", encoding="utf-8", newline="") as f:
+            if f.tell() == 0:
+                f.write("\t".join(INDEX_HEADER) + "\n")
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return digest
+
+    def _upgrade_index(self, index: Path) -> None:
+        """Add columns that an older index lacks, so appended lines match its header."""
+        if index.exists() and index.stat().st_size:
+            table = Table.read(index)
+            upgraded = table.with_columns(INDEX_HEADER)
+            if upgraded is not table:
+                upgraded.write(index)
+        self._index_checked = True
+
+    def get(self, digest: str) -> bytes:
+        """The payload with hash `digest` (ValueError if the stored object does not match it)."""
+        data = gzip.decompress(self.object_path(digest).read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"archive object {digest} is corrupt")
+        return data
+
+    def entries(self) -> list[Entry]:
+        """Every indexed fetch, oldest first."""
+        index = self.root / INDEX_NAME
+        if not index.exists():
+            return []
+        return [
+            Entry(
+                r.text("run"), r.text("fetched_at"), r.text("url"), r.text("sha256"), int(r.text("bytes") or 0), r.text("importer")
+            )
+            for r in stream(index)
+        ]
+
+    def snapshots(self, importer: str | None = None) -> dict[str, list[Entry]]:
+        """Fetches grouped by run, in run order (only runs of `importer`, when given)."""
+        runs: dict[str, list[Entry]] = defaultdict(list)
+        for e in self.entries():
+            if importer is None or e.importer == importer:
+                runs[e.run].append(e)
+        return dict(runs)
@@ -0,0 +1,286 @@
+"""`carcalc build`: rebuild generated artifacts only when their inputs change.
+
+Each `Target` names its input files, its output files and the tool that turns one into the other
+(the source files of the generator plus version strings such as the zlib runtime). After a
+successful build the manifest (`.build-manifest.json`, gitignored) records the content hashes
+of all three. A target is rebuilt when any hash differs, when an output is missing or was
+edited by hand, or with `--force`; otherwise it is skipped without running anything.
+
+Targets whose dependencies are done are built together in worker processes (the generators are
+CPU-bound pure Python). A no-op build only hashes files: about 1.5 MB for the current targets.
+
+The TSV importers are not targets: their input is the network, and they already skip writes
+that change nothing (see `carcalc.tsv.diff`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping
+
+from carcalc.tsv import write_atomic
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_FORMAT = 1
+
+
+@dataclass(frozen=True)
+class Target:
+    name: str
+    inputs: tuple[str, ...]  # repo-relative paths
+    outputs: tuple[str, ...]
+    tools: tuple[str, ...]  # generator source files: their content is the tool version
+    run: Callable[[Path], object]  # run(root); must be a module-level function (runs in a worker)
+    deps: tuple[str, ...] = ()  # targets that must be built first (their outputs may be our inputs)
+    versions: tuple[str, ...] = ()  # other tool versions (library/runtime)
+
+
+def file_hash(path: Path) -> str | None:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def fingerprint(target: Target, root: Path) -> dict[str, Any]:
+    """Hashes of everything that decides `target`'s outputs."""
+    tool = hashlib.sha256("\0".join(target.versions).encode())
+    for name in target.tools:
+        tool.update(f"\0{name}\0{file_hash(root / name)}".encode())
+    return {"tool": tool.hexdigest(), "inputs": {name: file_hash(root / name) for name in target.inputs}}
+
+
+def stale_reason(target: Target, root: Path, record: Mapping[str, Any] | None, current: Mapping[str, Any]) -> str | None:
+    """Why `target` must be rebuilt, or None when its recorded build is still valid."""
+    if record is None:
+        return "never built"
+    if record.get("tool") != current["tool"]:
+        return "tool changed"
+    changed = [name for name, h in current["inputs"].items() if record.get("inputs", {}).get(name) != h]
+    if changed:
+        return f"input changed: {', '.join(changed)}"
+    outputs = record.get("outputs", {})
+    for name in target.outputs:
+        h = file_hash(root / name)
+        if h is None:
+            return f"output missing: {name}"
+        if outputs.get(name) != h:
+            return f"output modified: {name}"
+    return None
+
+
+def load_manifest(path: Path) -> dict[str, Any]:
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return {}
+    return dict(manifest.get("targets", {}))
+
+
+def _run_target(target: Target, root: Path) -> float:
+    started = time.perf_counter()
+    target.run(root)
+    return time.perf_counter() - started
+
+
+@dataclass(frozen=True)
+class Result:
+    name: str
+    status: str  # "up to date", "built", "failed", "skipped"
+    detail: str = ""
+    seconds: float = 0.0
+
+
+def order(targets: Iterable[Target]) -> list[list[Target]]:
+    """Targets in waves: each wave only depends on earlier ones."""
+    pending = {t.name: t for t in targets}
+    done: set[str] = set()
+    waves = []
+    while pending:
+        wave = [t for t in pending.values() if all(d in done or d not in pending for d in t.deps)]
+        if not wave:
+            raise ValueError(f"dependency cycle among: {', '.join(sorted(pending))}")
+        waves.append(wave)
+        for t in wave:
+            done.add(t.name)
+            del pending[t.name]
+    return waves
+
+
+def build(
+    targets: Iterable[Target],
+    root: Path = REPO_ROOT,
+    manifest_path: Path | None = None,
+    force: bool = False,
+    jobs: int = 0,
+    dry_run: bool = False,
+) -> list[Result]:
+    manifest_path = manifest_path or root / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    jobs = jobs or os.cpu_count() or 1
+    results: list[Result] = []
+    failed: set[str] = set()
+    pool: ProcessPoolExecutor | None = None
+    try:
+        for wave in order(targets):
+            todo = []
+            for t in wave:
+                blocked = [d for d in t.deps if d in failed]
+                if blocked:
+                    failed.add(t.name)
+                    results.append(Result(t.name, "skipped", f"dependency failed: {blocked[0]}"))
+                    continue
+                current = fingerprint(t, root)
+                missing = [name for name, h in current["inputs"].items() if h is None]
+                if missing:
+                    failed.add(t.name)
+                    results.append(Result(t.name, "failed", f"missing input: {missing[0]}"))
+                    continue
+                reason = "forced" if force else stale_reason(t, root, manifest.get(t.name), current)
+                if reason is None:
+                    results.append(Result(t.name, "up to date"))
+                else:
+                    todo.append((t, current, reason))
+            if dry_run:
+                results.extend(Result(t.name, "stale", reason) for t, _, reason in todo)
+                continue
+            if len(todo) > 1 and jobs > 1 and pool is None:
+                pool = ProcessPoolExecutor(max_workers=min(jobs, len(todo)))
+            runs: list[tuple[Target, dict[str, Any], str, Future[float] | None]] = [
+                (t, current, reason, pool.submit(_run_target, t, root) if pool is not None and len(todo) > 1 else None)
+                for t, current, reason in todo
+            ]
+            for t, current, reason, future in runs:
+                try:
+                    seconds = future.result() if future is not None else _run_target(t, root)
+                except Exception as e:  # noqa: BLE001 - report and keep building independent targets
+                    failed.add(t.name)
+                    results.append(Result(t.name, "failed", f"{type(e).__name__}: {e}"))
+                    manifest.pop(t.name, None)
+                    continue
+                manifest[t.name] = {
+                    **current,
+                    "outputs": {name: file_hash(root / name) for name in t.outputs},
+                    "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "seconds": round(seconds, 3),
+                }
+                results.append(Result(t.name, "built", reason, seconds))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if not dry_run and any(r.status in {"built", "failed"} for r in results):
+        text = json.dumps({"format": MANIFEST_FORMAT, "targets": manifest}, indent=2, sort_keys=True) + "\n"
+        write_atomic(manifest_path, [text])
+    return results
+
+
+# --- targets ---
+
+
+def build_icons(root: Path) -> None:
+    spec = importlib.util.spec_from_file_location("generate_favicon", root / "scripts" / "generate_favicon.py")
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.generate(root / "assets" / "branding" / "logo.png", root / "web")
+
+
+def build_bundle(root: Path) -> None:
+    from carcalc import bundle
+
+    out_dir = root / "build" / "bundle"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    bundle.write(out_dir, *bundle.build(root / "web" / "data"))
+    # Earlier builds wrote into web/data, where the dev server kept serving them over edited TSVs.
+    for name in (bundle.BUNDLE_NAME, bundle.NOTES_NAME):
+        (root / "web" / "data" / name).unlink(missing_ok=True)
+
+
+def build_pack(root: Path) -> None:
+    from carcalc import pack
+
+    pack.write(root / "build" / "tariffs.pack", root / "web" / "data")
+
+
+ICON_OUTPUTS = ("favicon.ico", "favicon-32.png", "apple-touch-icon.png", "icon-192.png", "icon-512.png", "assets/logo.png", "assets/logo-64.png")
+DATA_SOURCES = tuple(f"web/data/{name}.tsv" for name in ("providers", "vehicles", "options"))
+ENGINE_SOURCES = ("carcalc/calc.py", "carcalc/data.py", "carcalc/tsv.py")
+
+TARGETS = (
+    Target(
+        "icons",
+        inputs=("assets/branding/logo.png",),
+        outputs=tuple(f"web/{name}" for name in ICON_OUTPUTS),
+        tools=("scripts/generate_favicon.py",),
+        run=build_icons,
+        versions=(f"zlib {zlib.ZLIB_RUNTIME_VERSION}",),
+    ),
+    Target(
+        "bundle",
+        inputs=DATA_SOURCES,
+        outputs=("build/bundle/bundle.json", "build/bundle/bundle-notes.json"),
+        tools=("carcalc/bundle.py", *ENGINE_SOURCES),
+        run=build_bundle,
+    ),
+    Target(
+        "pack",
+        inputs=DATA_SOURCES,
+        outputs=("build/tariffs.pack",),
+        tools=("carcalc/pack.py", "carcalc/engine.py", *ENGINE_SOURCES),
+        run=build_pack,
+    ),
+)
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc build",
+        description="Rebuild generated artifacts (icons, web data bundle, tariff pack) whose inputs changed.",
+    )
+    ap.add_argument("targets", nargs="*", help=f"Targets to build (default: all of {', '.join(t.name for t in TARGETS)}).")
+    ap.add_argument("--force", action="store_true", help="Rebuild even when up to date.")
+    ap.add_argument("--dry-run", action="store_true", help="Only report which targets are stale.")
+    ap.add_argument("-j", "--jobs", type=int, default=0, help="Parallel builds (default: CPU count).")
+    args = ap.parse_args(argv)
+
+    by_name = {t.name: t for t in TARGETS}
+    unknown = [name for name in args.targets if name not in by_name]
+    if unknown:
+        print(f"unknown target {unknown[0]!r}; targets: {', '.join(by_name)}", file=sys.stderr)
+        return 2
+    # Selected targets plus everything they depend on.
+    selected: dict[str, Target] = {}
+    stack = list(args.targets or by_name)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected[name] = by_name[name]
+            stack.extend(by_name[name].deps)
+
+    started = time.perf_counter()
+    results = build(selected.values(), force=args.force, jobs=args.jobs, dry_run=args.dry_run)
+    for r in results:
+        timing = f" in {r.seconds:.2f}s" if r.status == "built" else ""
+        print(f"{r.name}: {r.status}{timing}{f' ({r.detail})' if r.detail else ''}")
+    counts = Counter(r.status for r in results)
+    print(f"{', '.join(f'{n} {status}' for status, n in counts.items())} in {time.perf_counter() - started:.2f}s")
+    return 1 if any(r.status in {"failed", "skipped"} for r in results) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,201 @@
+"""`bundle.json`: the web app's default data, pre-normalized at build time.
+
+At startup the app used to fetch three TSVs, split every line, and let `normalizeData` and
+`toNumberMaybe` re-derive fuel types, snowboard fit and every rate on each recalculation.
+The bundle holds the same rows after `normalize_data`, with:
+
+- numbers parsed (`to_number_maybe`, the port of the app's parser; blanks are `null`),
+- vehicle fuel type, snowboard fit and default consumption resolved,
+- strings dictionary-encoded: one `strings` table, columns hold indices into it,
+- columns the calculator never reads (`notes`, `source_url`, the vehicles' source URLs) moved
+  to `bundle-notes.json`, which nothing loads on first render.
+
+Tables are column-major: `{"count": n, "columns": {name: [values]}, "numeric": [names]}`.
+`version` hashes the source TSVs (and the format), so a stale bundle is easy to spot
+(`--check`) and the side file can be cache-busted with `?v=<version>`. `web/lib/bundle.js`
+decodes it. The TSVs stay the source of truth; the bundle is built on deploy.
+
+It is written to `build/bundle/`, not next to the TSVs: the app prefers a bundle when it finds
+one, so a bundle in `web/data` would shadow later TSV edits in a local `npx serve web`. The
+Pages workflow copies it into the deployed `data/` directory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+from carcalc.calc import to_number_maybe
+from carcalc.data import DEFAULT_DATA_DIR, normalize_data, parse_tsv
+from carcalc.tsv import write_atomic
+
+FORMAT = 1
+SOURCES = ("providers", "vehicles", "options")
+DEFAULT_OUT_DIR = Path(__file__).resolve().parent.parent / "build" / "bundle"
+BUNDLE_NAME = "bundle.json"
+NOTES_NAME = "bundle-notes.json"
+
+# Option columns read through `n()`/`z()` in `computeOptionPrice` (plus the unused over_* rates).
+NUMERIC_OPTION_COLUMNS = ("included_min", "included_km", "daily_included_km")
+VEHICLE_NUMERIC = ("snowboard_fit", "consumption_l_per_100km_default")
+# Kept out of the bundle (the calculator never reads them), keyed by option/vehicle/provider id.
+OPTION_NOTES = ("notes", "source_url")
+VEHICLE_NOTES = ("snowboard_source_url", "consumption_source_url")
+PROVIDER_NOTES = ("notes",)
+
+
+def source_version(data_dir: Path) -> str:
+    h = hashlib.sha256(f"carcalc-bundle-{FORMAT}".encode())
+    for name in SOURCES:
+        h.update(b"\0" + (data_dir / f"{name}.tsv").read_bytes())
+    return h.hexdigest()[:16]
+
+
+def _number(v: object) -> int | float | None:
+    n = to_number_maybe(v)
+    return int(n) if n is not None and n.is_integer() and abs(n) < 2**53 else n
+
+
+def is_numeric_option_column(name: str) -> bool:
+    return name.endswith("_eur") or name in NUMERIC_OPTION_COLUMNS
+
+
+def _encode_tables(tables: Mapping[str, tuple[list[str], list[dict[str, Any]], set[str]]]) -> dict[str, Any]:
+    """Column-major tables with their string columns encoded as indices into one shared,
+    most-frequent-first `strings` list (small indices keep the JSON short)."""
+    counts: Counter[str] = Counter()
+    for columns, rows, numeric in tables.values():
+        for c in columns:
+            if c not in numeric:
+                counts.update(str(r.get(c) or "") for r in rows)
+    strings = [s for s, _ in counts.most_common()]
+    index = {s: i for i, s in enumerate(strings)}
+    out: dict[str, Any] = {"strings": strings}
+    for name, (columns, rows, numeric) in tables.items():
+        encoded = {}
+        for c in columns:
+            if c in numeric:
+                encoded[c] = [r.get(c) for r in rows]
+            else:
+                encoded[c] = [index[str(r.get(c) or "")] for r in rows]
+        out[name] = {"count": len(rows), "columns": encoded, "numeric": [c for c in columns if c in numeric]}
+    return out
+
+
+def _notes(rows: Iterable[Mapping[str, str]], key: str, columns: Iterable[str]) -> dict[str, dict[str, str]]:
+    columns = tuple(columns)
+    out: dict[str, dict[str, str]] = {}
+    for r in rows:
+        kept = {c: v for c in columns if (v := (r.get(c) or "").strip())}
+        if kept and r.get(key):
+            out.setdefault(r[key], {}).update(kept)
+    return out
+
+
+def build(data_dir: Path = DEFAULT_DATA_DIR) -> tuple[dict[str, Any], dict[str, Any]]:
+    """(bundle, notes) for the TSVs in `data_dir`."""
+    parsed = {name: parse_tsv((data_dir / f"{name}.tsv").read_text(encoding="utf-8")) for name in SOURCES}
+    data = normalize_data(*(rows for _, rows in parsed.values()))
+    version = source_version(data_dir)
+
+    provider_columns = ["provider_id", "provider_name", "night_start", "night_end"]
+    vehicles = list(data.vehicles_by_id.values())
+    vehicle_columns = [c for c in (vehicles[0] if vehicles else {}) if c not in VEHICLE_NOTES]
+    option_header = parsed["options"][0]
+    option_columns = [c for c in option_header if c not in OPTION_NOTES]
+    numeric_options = {c for c in option_columns if is_numeric_option_column(c)}
+    options = [{**o, **{c: _number(o.get(c)) for c in numeric_options}} for o in data.options]
+
+    bundle = {
+        "format": FORMAT,
+        "version": version,
+        "notes": f"{NOTES_NAME}?v={version}",
+        **_encode_tables(
+            {
+                "providers": (provider_columns, data.providers, set()),
+                "vehicles": (vehicle_columns, vehicles, set(VEHICLE_NUMERIC)),
+                "options": (option_columns, options, numeric_options),
+            }
+        ),
+    }
+    notes = {
+        "format": FORMAT,
+        "version": version,
+        "providers": _notes(parsed["providers"][1], "provider_id", PROVIDER_NOTES),
+        "vehicles": _notes(vehicles, "vehicle_id", VEHICLE_NOTES),
+        "options": _notes(data.options, "option_id", OPTION_NOTES),
+    }
+    return bundle, notes
+
+
+def decode(bundle: Mapping[str, Any], table: str) -> list[dict[str, Any]]:
+    """Rows of one bundle table as dicts (the values `decodeBundle` in web/lib/bundle.js exposes)."""
+    strings = bundle["strings"]
+    t = bundle[table]
+    numeric = set(t["numeric"])
+    columns = [(c, values, c in numeric) for c, values in t["columns"].items()]
+    return [{c: values[i] if num else strings[values[i]] for c, values, num in columns} for i in range(t["count"])]
+
+
+def _dump(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def write(out_dir: Path, bundle: Mapping[str, Any], notes: Mapping[str, Any]) -> list[Path]:
+    """Write the bundle and its side file; files whose content is unchanged are left alone."""
+    written = []
+    for name, obj in ((BUNDLE_NAME, bundle), (NOTES_NAME, notes)):
+        path = out_dir / name
+        text = _dump(obj)
+        if not path.exists() or path.read_text(encoding="utf-8") != text:
+            write_atomic(path, [text])
+            written.append(path)
+    return written
+
+
+def is_current(out_dir: Path, data_dir: Path) -> bool:
+    try:
+        bundle = json.loads((out_dir / BUNDLE_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return bundle.get("format") == FORMAT and bundle.get("version") == source_version(data_dir)
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc bundle",
+        description=f"Build {BUNDLE_NAME} (pre-normalized default data for the web app) from the TSVs.",
+    )
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    ap.add_argument("--out-dir", default=str(DEFAULT_OUT_DIR), help="Where to write the bundle (default: build/bundle).")
+    ap.add_argument("--check", action="store_true", help="Only check that the bundle matches the TSVs (exit 1 if not).")
+    args = ap.parse_args(argv)
+
+    data_dir = Path(args.data_dir)
+    out_dir = Path(args.out_dir)
+    if args.check:
+        if is_current(out_dir, data_dir):
+            print(f"{out_dir / BUNDLE_NAME} is up to date")
+            return 0
+        print(f"{out_dir / BUNDLE_NAME} is missing or stale; run `python -m carcalc build bundle`", file=sys.stderr)
+        return 1
+
+    bundle, notes = build(data_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = write(out_dir, bundle, notes)
+    tsv_bytes = sum((data_dir / f"{name}.tsv").stat().st_size for name in SOURCES)
+    sizes = ", ".join(f"{name} {(out_dir / name).stat().st_size / 1024:.0f} KiB" for name in (BUNDLE_NAME, NOTES_NAME))
+    print(
+        f"bundle {bundle['version']}: {bundle['options']['count']} options, {len(bundle['strings'])} strings; "
+        f"{sizes} (TSVs {tsv_bytes / 1024:.0f} KiB){'' if written else '; unchanged'}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,93 @@
+"""Size-bounded LRU of serialized responses with request coalescing (used by `carcalc serve`).
+
+Keys are canonical request tuples (the parsed `TripContext`, not the raw query, plus the data
+snapshot version), so `21:30` and `21:30:00`, or 59.2 and 60 km, share an entry and a data
+reload never serves stale prices. Concurrent misses for the same key wait for the first
+request's result instead of pricing the same scenario again.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "body", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.body = b""
+        self.error: BaseException | None = None
+
+    def wait(self) -> bytes:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.body
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = 64 << 20) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = self.coalesced = self.evictions = 0
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._inflight: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, compute: Callable[[], bytes]) -> bytes:
+        """Cached body for `key`, else `compute()` once for all concurrent callers (errors are not cached)."""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            call = self._inflight.get(key)
+            leader = call is None
+            if call is None:
+                call = self._inflight[key] = _Call()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.wait()
+
+        try:
+            body = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            call.error = e
+            call.done.set()
+            raise
+        with self._lock:
+            del self._inflight[key]
+            if len(body) <= self.max_bytes:
+                self._entries[key] = body
+                self.nbytes += len(body)
+                while self.nbytes > self.max_bytes:
+                    _, old = self._entries.popitem(last=False)
+                    self.nbytes -= len(old)
+                    self.evictions += 1
+        call.body = body
+        call.done.set()
+        return body
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,769 @@
+"""Python port of `web/lib/calc.js`.
+
+The formulas (and the order of floating point operations) intentionally mirror the
+JS implementation so both engines produce identical totals and breakdowns.
+
+Dates are naive `datetime`s interpreted as local wall-clock time (no DST jumps).
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+from math import floor
+from typing import Any, Mapping, NamedTuple
+
+RIGA_CONSUMPTION_FACTOR = 1.15
+FUEL_FALLBACK_CONSUMPTION = 8
+
+DAY_MS = 86_400_000
+MINUTE_MS = 60_000
+
+# Compiled option rows are flat tuples of floats (see `compile_option`).
+# NaN encodes "blank" for nullable fields.
+OPTION_FIELDS = (
+    "provider_index",
+    "option_kind",
+    "discount_kind",
+    "unlock_fee_eur",
+    "reservation_fee_eur",
+    "fixed_fee_eur",
+    "trip_fee_eur",
+    "min_total_eur",
+    "cap_24h_eur",
+    "airport_fee_eur",
+    "drive_day_min_rate_eur",
+    "drive_night_min_rate_eur",
+    "park_day_min_rate_eur",
+    "park_night_min_rate_eur",
+    "km_rate_eur",
+    "included_km",
+    "over_km_rate_eur",
+    "fuel_included",
+    "package_price_eur",
+    "included_min",
+    "daily_price_eur",
+    "daily_unlimited_km",
+    "daily_included_km",
+    "daily_over_km_rate_eur",
+    "fuel_type",
+    "consumption_l_per_100km_default",
+    "fees_eur",
+    "fees_c",
+    "trip_c",
+    "airport_c",
+)
+
+KIND_UNKNOWN = -1
+KIND_PAYG = 0
+KIND_PACKAGE = 1
+KIND_DAILY = 2
+OPTION_KINDS = {"PAYG": KIND_PAYG, "PACKAGE": KIND_PACKAGE, "DAILY": KIND_DAILY}
+OPTION_KIND_NAMES = {v: k for k, v in OPTION_KINDS.items()}
+
+DISCOUNT_NONE = 0
+DISCOUNT_CARGURU = 1
+DISCOUNT_CITYBEE = 2
+DISCOUNT_BOLT = 3
+DISCOUNT_KINDS = {"carguru": DISCOUNT_CARGURU, "citybee": DISCOUNT_CITYBEE, "bolt": DISCOUNT_BOLT}
+
+FUEL_PETROL = 0
+FUEL_DIESEL = 1
+FUEL_EV = 2
+FUEL_TYPES = {"petrol": FUEL_PETROL, "diesel": FUEL_DIESEL, "ev": FUEL_EV}
+FUEL_TYPE_NAMES = {v: k for k, v in FUEL_TYPES.items()}
+
+NAN = math.nan
+
+_DURATION_RE = re.compile(r"(\d+):([0-5]\d)")
+_HHMM_RE = re.compile(r"([01]\d|2[0-3]):([0-5]\d)")
+# toNumberMaybe
+_EUR_RE = re.compile(r"EUR", re.IGNORECASE)
+_GROUPING_RE = re.compile(r"[ .]")
+_SPACE_RE = re.compile(r"\s+")
+_DOT_THOUSANDS_RE = re.compile(r"-?\d{1,3}(?:\.\d{3})+")
+_ZERO_POINT_RE = re.compile(r"-?0\.\d{3}")
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_POW10 = [10**i for i in range(21)]
+
+
+def parse_duration_to_minutes(text: object) -> int:
+    s = str(text or "").strip()
+    if not s:
+        return 0
+    m = _DURATION_RE.fullmatch(s)
+    if not m:
+        raise ValueError(f"Invalid duration: {s} (use HH:MM, minutes 00-59)")
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+
+def js_round(x: float) -> int:
+    # Math.round: nearest integer, ties towards +Infinity.
+    f = math.floor(x)
+    return f + 1 if x - f >= 0.5 else f
+
+
+def round_to_cents(x: object) -> float:
+    v = js_number(x)
+    if v != v:
+        v = 0.0
+    return js_round((v + 1e-9) * 100) / 100
+
+
+def _cents(v: float) -> float:
+    # round_to_cents() for plain floats (hot path).
+    x = (v + 1e-9) * 100
+    f = floor(x)
+    return (f + 1 if x - f >= 0.5 else f) / 100
+
+
+def js_number(v: object) -> float:
+    # Number(v || 0)
+    if v is None or v == "" or v is False:
+        return 0.0
+    if v is True:
+        return 1.0
+    if isinstance(v, (int, float)):
+        return float(v)
+    s = str(v).strip()
+    if not s:
+        return 0.0
+    try:
+        return float(s)
+    except ValueError:
+        return NAN
+
+
+def js_str(x: object) -> str:
+    """String(x) for numbers interpolated into tooltips."""
+    if x is None:
+        return "null"
+    if type(x) is int:
+        return str(x)
+    if isinstance(x, bool):
+        return "true" if x else "false"
+    v = float(x)  # type: ignore[arg-type]
+    if v != v:
+        return "NaN"
+    if math.isinf(v):
+        return "Infinity" if v > 0 else "-Infinity"
+    if v == int(v) and abs(v) < 1e21:
+        return str(int(v))
+    r = repr(v)
+    if "e" in r:
+        if abs(v) >= 1e-6:
+            return format(Decimal(r), "f")
+        return r.replace("e-0", "e-")
+    return r
+
+
+@lru_cache(maxsize=1 << 16)
+def to_fixed(x: float, digits: int) -> str:
+    """Number.prototype.toFixed (round half away from zero on the exact binary value)."""
+    if x != x:
+        return "NaN"
+    if x < 0:
+        return "-" + to_fixed(-x, digits)
+    if x >= 1e21:
+        return js_str(x)
+    x += 0.0  # -0.0 -> 0.0
+    # `format` rounds the exact binary value correctly but ties to even; only exact ties
+    # (x * 10**digits ending in .5) need the half-up path.
+    n, d = float(x).as_integer_ratio()
+    scaled = n * _POW10[digits]
+    if d > 1 and (scaled * 2) % d == 0 and scaled % d:
+        q = Decimal(x).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP)
+        return f"{q:f}"
+    return f"{x:.{digits}f}"
+
+
+def to_number_maybe(v: object) -> float | None:
+    if v is None:
+        return None
+    s = str(v).strip()
+    if not s:
+        return None
+    cleaned = s.replace("\xa0", " ").replace("€", "")
+    cleaned = _EUR_RE.sub("", cleaned).strip()
+
+    # Support common European formatting:
+    # - "1 010" (space thousands)
+    # - "1.010" (dot thousands)
+    # - "1,50" (comma decimal)
+    if "," in cleaned:
+        cleaned = _GROUPING_RE.sub("", cleaned).replace(",", ".", 1)
+    else:
+        cleaned = _SPACE_RE.sub("", cleaned)
+        # Only treat dot-grouping as thousands if the integer part isn't 0
+        # (avoids mis-parsing values like 0.280).
+        if _DOT_THOUSANDS_RE.fullmatch(cleaned) and not _ZERO_POINT_RE.fullmatch(cleaned):
+            cleaned = cleaned.replace(".", "")
+
+    m = _NUMBER_RE.search(cleaned)
+    return float(m.group(0)) if m else None
+
+
+def parse_hhmm(s: object) -> int | None:
+    m = _HHMM_RE.fullmatch(str(s or "").strip())
+    if not m:
+        return None
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+
+def night_minutes_ms(t0: float, t1: float, ns: int, ne: int) -> int:
+    """Night minutes between two instants given as ms offsets from local midnight of the start day."""
+    if not (t1 > t0):
+        return 0
+    crosses = ne <= ns
+    seg_len = ((1440 + ne) if crosses else ne) * MINUTE_MS
+    ns_ms = ns * MINUTE_MS
+    total = 0.0
+
+    # Iterate local dates spanning the interval; include previous day for cross-midnight windows.
+    for k in range(-1, int(t1 // DAY_MS) + 2):
+        day = k * DAY_MS
+        overlap = min(t1, day + seg_len) - max(t0, day + ns_ms)
+        total += max(0, overlap) / MINUTE_MS
+
+    return max(0, js_round(total))
+
+
+def ms_since_midnight(dt: datetime) -> int:
+    return (dt - datetime.combine(dt.date(), time())) // timedelta(milliseconds=1)
+
+
+def compute_night_minutes(start: datetime, end: datetime, night_start: object, night_end: object) -> int:
+    ns = parse_hhmm(night_start)
+    ne = parse_hhmm(night_end)
+    if ns is None or ne is None:
+        return 0
+    t0 = ms_since_midnight(start)
+    t1 = t0 + (end - start) // timedelta(milliseconds=1)
+    return night_minutes_ms(t0, t1, ns, ne)
+
+
+class Allocation(NamedTuple):
+    park_night: float
+    park_day: float
+    drive_night: float
+    drive_day: float
+    day_min: float
+
+
+def allocate_parking_night(total_min: float, parking_min: float, night_min: float) -> Allocation:
+    if total_min <= 0:
+        return Allocation(0, 0, 0, 0, 0)
+    day_min = max(0, total_min - night_min)
+    raw = (parking_min * night_min) / total_min
+    park_night = min(parking_min, min(night_min, math.ceil(raw)))
+    park_day = parking_min - park_night
+    drive_night = night_min - park_night
+    drive_day = day_min - park_day
+    return Allocation(park_night, park_day, drive_night, drive_day, day_min)
+
+
+@dataclass(frozen=True, slots=True)
+class TripContext:
+    start: datetime
+    end: datetime
+    total_min: float
+    parking_min: float
+    dist_km: float
+    airport: bool = False
+    fuel_price_e95: float = 0.0
+    fuel_price_diesel: float = 0.0
+    consumption_override: float = 0.0
+    consumption_override_enabled: bool = False
+    discount_carguru: float = 0.0
+    discount_citybee_percent: float = 0.0
+    discount_citybee_minutes: float = 0.0
+    discount_bolt: float = 0.0
+    days: int = 1
+    # Per-option minute split (`computeAll` fills these from the provider night window).
+    drive_day_min: float = 0
+    drive_night_min: float = 0
+    park_day_min: float = 0
+    park_night_min: float = 0
+
+    @property
+    def total_km(self) -> float:
+        return self.dist_km
+
+    @property
+    def allocation(self) -> Allocation:
+        day_min = self.drive_day_min + self.park_day_min
+        return Allocation(self.park_night_min, self.park_day_min, self.drive_night_min, self.drive_day_min, day_min)
+
+
+def create_base_context(
+    start: datetime,
+    total_min: float,
+    parking_min: float,
+    dist_km: float,
+    airport: object = False,
+    fuel_price_e95: object = 0,
+    fuel_price_diesel: object = 0,
+    consumption_override: object = 0,
+    consumption_override_enabled: object = False,
+    discount_carguru: object = 0,
+    discount_citybee_percent: object = 0,
+    discount_citybee_minutes: object = 0,
+    discount_bolt: object = 0,
+) -> TripContext:
+    return TripContext(
+        start=start,
+        end=start + timedelta(minutes=total_min),
+        total_min=total_min,
+        parking_min=parking_min,
+        dist_km=dist_km,
+        airport=bool(airport),
+        fuel_price_e95=js_number(fuel_price_e95),
+        fuel_price_diesel=js_number(fuel_price_diesel),
+        consumption_override=js_number(consumption_override),
+        consumption_override_enabled=bool(consumption_override_enabled),
+        discount_carguru=js_number(discount_carguru),
+        discount_citybee_percent=js_number(discount_citybee_percent),
+        discount_citybee_minutes=js_number(discount_citybee_minutes),
+        discount_bolt=js_number(discount_bolt),
+        days=max(1, math.ceil(total_min / 1440)),
+    )
+
+
+def _nan_if_none(v: float | None) -> float:
+    return NAN if v is None else v
+
+
+def compile_option(option: Mapping[str, Any], vehicle: Mapping[str, Any] | None = None, provider_index: int = 0) -> tuple[float, ...]:
+    """Parse one options.tsv row (plus its vehicle) into a flat numeric row (see OPTION_FIELDS)."""
+
+    def n(k: str) -> float | None:
+        return to_number_maybe(option.get(k))
+
+    def z(k: str) -> float:
+        v = n(k)
+        return 0.0 if v is None else v
+
+    option_type = str(option.get("option_type") or "").strip().upper()
+    provider_id = str(option.get("provider_id") or "").strip().lower()
+
+    raw_fuel = str((vehicle or {}).get("fuel_type") or "").strip().lower()
+    fuel_type = FUEL_TYPES.get(raw_fuel, FUEL_PETROL)
+    consumption_default = js_number((vehicle or {}).get("consumption_l_per_100km_default"))
+    if not (consumption_default > 0):
+        consumption_default = 0.0
+
+    unlock = z("unlock_fee_eur")
+    reservation = z("reservation_fee_eur")
+    fixed_raw = n("fixed_fee_eur")
+    fixed = 0.0 if fixed_raw is None else fixed_raw
+    min_total = n("min_total_eur")
+
+    drive_day = z("drive_day_min_rate_eur")
+    drive_night = z("drive_night_min_rate_eur") or drive_day
+    park_day = n("park_day_min_rate_eur")
+    park_night = n("park_night_min_rate_eur")
+    km_rate = z("km_rate_eur")
+    over_km = n("over_km_rate_eur")
+    daily_over_km = n("daily_over_km_rate_eur")
+
+    # CarGuru in-app has a per-trip service fee; the public API we import sometimes omits it.
+    if provider_id == "carguru":
+        # Be liberal in what we accept: if the option doesn't carry fixed_fee_eur,
+        # assume a default service fee for all non-daily options.
+        if (fixed_raw is None or fixed_raw == 0) and option_type != "DAILY":
+            fixed = 0.99
+        if option_type == "PAYG" and (min_total is None or min_total <= 0):
+            min_total = 2.0
+
+    fees = unlock + reservation + fixed
+
+    return (
+        float(provider_index),
+        float(OPTION_KINDS.get(option_type, KIND_UNKNOWN)),
+        float(DISCOUNT_KINDS.get(provider_id, DISCOUNT_NONE)),
+        unlock,
+        reservation,
+        fixed,
+        z("trip_fee_eur"),
+        _nan_if_none(min_total),
+        _nan_if_none(n("cap_24h_eur")),
+        z("airport_fee_eur"),
+        drive_day,
+        drive_night,
+        drive_day if park_day is None else park_day,
+        drive_night if park_night is None else park_night,
+        km_rate,
+        z("included_km"),
+        km_rate if over_km is None else over_km,
+        1.0 if str(option.get("fuel_included") or "TRUE").upper() == "TRUE" else 0.0,
+        z("package_price_eur"),
+        z("included_min"),
+        z("daily_price_eur"),
+        1.0 if str(option.get("daily_unlimited_km") or "").upper() == "TRUE" else 0.0,
+        z("daily_included_km"),
+        km_rate if daily_over_km is None else daily_over_km,
+        float(fuel_type),
+        consumption_default,
+        fees,
+        round_to_cents(fees),
+        round_to_cents(z("trip_fee_eur")),
+        round_to_cents(z("airport_fee_eur")),
+    )
+
+
+def discount_for(ctx: TripContext, discount_kind: int) -> tuple[float, float]:
+    """(percent, minutes) discount for a provider family, as positive numbers."""
+    if discount_kind == DISCOUNT_CARGURU:
+        return ctx.discount_carguru, 0.0
+    if discount_kind == DISCOUNT_CITYBEE:
+        return ctx.discount_citybee_percent, ctx.discount_citybee_minutes
+    if discount_kind == DISCOUNT_BOLT:
+        return ctx.discount_bolt, 0.0
+    return 0.0, 0.0
+
+
+def apply_discount(ctx: TripContext, discount_kind: int, subtotal_with_fees: float, time_c: float) -> float:
+    """Percent discount on the whole subtotal, then a minutes discount taken off the time part."""
+    discount_pct, discount_min = discount_for(ctx, discount_kind)
+    total = subtotal_with_fees
+    if discount_pct != 0:
+        discount_amount = subtotal_with_fees * (abs(discount_pct) / 100)
+        total = _cents(subtotal_with_fees - discount_amount)
+    if discount_min != 0 and time_c > 0:
+        proportion = min(1, abs(discount_min) / (ctx.total_min or 1))
+        total = _cents(total - time_c * proportion)
+    return total
+
+
+def lower_bound(r: tuple[float, ...], ctx: TripContext) -> float:
+    """Cheap lower bound on `evaluate(...)`'s total for pruning (may be off by rounding; callers add slack)."""
+    kind = r[1]
+    plan = r[18] if kind == KIND_PACKAGE else (ctx.days * r[20] if kind == KIND_DAILY else 0.0)
+    pct, minutes = discount_for(ctx, int(r[2]))
+    # A minutes discount can take back the time part, so only the percent discount keeps the bound simple.
+    lb = 0.0 if minutes else (r[6] + plan + r[27]) * (1 - abs(pct) / 100)
+    min_total = r[7]
+    if min_total == min_total and min_total + r[27] > lb:
+        lb = min_total + r[27]
+    return lb
+
+
+# Tooltip fragments only depend on a few numbers that repeat across options and requests
+# (shared rates, fees, allocations), so they are memoized.
+
+
+@lru_cache(maxsize=1 << 14)
+def _time_cap_line(time_raw_eur: float, days: int, cap24h: float, time_eur: float) -> str:
+    return f"Time cap: min(€{to_fixed(time_raw_eur, 2)}, {js_str(days)}×€{to_fixed(cap24h, 2)}) = €{to_fixed(time_eur, 2)}"
+
+
+@lru_cache(maxsize=1 << 14)
+def _payg_time_tooltip(
+    drive_day: float,
+    drive_day_rate: float,
+    drive_night: float,
+    drive_night_rate: float,
+    park_day: float,
+    park_day_rate: float,
+    park_night: float,
+    park_night_rate: float,
+    time_raw_eur: float,
+) -> str:
+    return "\n".join(
+        [
+            f"Drive day: {js_str(drive_day)} min × €{to_fixed(drive_day_rate, 2)} = €{to_fixed(drive_day * drive_day_rate, 2)}",
+            f"Drive night: {js_str(drive_night)} min × €{to_fixed(drive_night_rate, 2)} = €{to_fixed(drive_night * drive_night_rate, 2)}",
+            f"Park day: {js_str(park_day)} min × €{to_fixed(park_day_rate, 2)} = €{to_fixed(park_day * park_day_rate, 2)}",
+            f"Park night: {js_str(park_night)} min × €{to_fixed(park_night_rate, 2)} = €{to_fixed(park_night * park_night_rate, 2)}",
+            f"Time subtotal: €{to_fixed(time_raw_eur, 2)}",
+        ]
+    )
+
+
+@lru_cache(maxsize=1 << 14)
+def _km_tooltip(dist_km: float, included_km: float, charged_km: float, over_km_rate: float) -> str:
+    return (
+        f"Km charged: max(0, {js_str(dist_km)} - {js_str(included_km)}) = {js_str(charged_km)} km\n"
+        f"Rate: €{to_fixed(over_km_rate, 2)}/km\n"
+        f"Km cost: {js_str(charged_km)} × €{to_fixed(over_km_rate, 2)} = €{to_fixed(charged_km * over_km_rate, 2)}"
+    )
+
+
+@lru_cache(maxsize=4096)
+def _fees_tooltip(unlock: float, reservation: float, fixed: float, fees_eur: float, carguru: bool) -> str:
+    return "\n".join(
+        [
+            f"Unlock: €{to_fixed(unlock, 2)}",
+            f"Reservation: €{to_fixed(reservation, 2)}",
+            f"{'Service fee' if carguru else 'Service/fixed'}: €{to_fixed(fixed, 2)}",
+            f"Fees total: €{to_fixed(fees_eur, 2)}",
+        ]
+    )
+
+
+def evaluate(r: tuple[float, ...], ctx: TripContext, a: Allocation, detail: bool = False) -> Any:
+    """Price one compiled option row.
+
+    Returns the total (float) or, with `detail`, the same `{ok, total_eur, breakdown}` dict as
+    `computeOptionPrice`. Returns None for unknown option types.
+    """
+    (
+        _,
+        kind,
+        discount_kind,
+        unlock,
+        reservation,
+        fixed,
+        trip_fee,
+        min_total,
+        cap24h,
+        _airport_fee,
+        drive_day_rate,
+        drive_night_rate,
+        park_day_rate,
+        park_night_rate,
+        _km_rate,
+        included_km,
+        over_km_rate,
+        fuel_included,
+        package_price,
+        included_min_raw,
+        daily_price,
+        daily_unlimited,
+        daily_included_km,
+        daily_over_km_rate,
+        fuel_type,
+        consumption_default,
+        fees_eur,
+        fees_c,
+        trip_c,
+        airport_fee_c,
+    ) = r
+    if kind == KIND_UNKNOWN:
+        return None
+
+    park_night, park_day, drive_night, drive_day = a[0], a[1], a[2], a[3]
+    total_min = ctx.total_min
+    dist_km = ctx.dist_km
+    days = ctx.days
+    has_min_total = min_total == min_total
+    has_cap = cap24h == cap24h
+    is_ev = fuel_type == FUEL_EV
+
+    payg_time_eur = (
+        drive_day * drive_day_rate
+        + drive_night * drive_night_rate
+        + park_day * park_day_rate
+        + park_night * park_night_rate
+    )
+
+    charged_km = max(0, dist_km - included_km)
+    payg_km_eur = charged_km * over_km_rate
+
+    if is_ev:
+        consumption_base, consumption_source = 0, "ev"
+    elif ctx.consumption_override_enabled and ctx.consumption_override > 0:
+        consumption_base, consumption_source = ctx.consumption_override, "override"
+    elif consumption_default > 0:
+        consumption_base, consumption_source = consumption_default, "vehicle"
+    else:
+        consumption_base, consumption_source = FUEL_FALLBACK_CONSUMPTION, "fallback"
+    consumption_used = 0 if is_ev else consumption_base * RIGA_CONSUMPTION_FACTOR
+    if fuel_type == FUEL_DIESEL:
+        fuel_price = ctx.fuel_price_diesel
+    elif fuel_type == FUEL_PETROL:
+        fuel_price = ctx.fuel_price_e95
+    else:
+        fuel_price = 0
+    fuel_eur = 0 if fuel_included or is_ev else dist_km * (consumption_used / 100) * fuel_price
+
+    plan_eur = 0  # package/daily price (excludes time/km)
+    time_eur = 0
+    cap_saved_eur = 0
+    min_added_eur = 0
+    included_min = None
+    over_min = 0
+    blended_rate = 0
+    time_raw_eur = 0
+    plan_label = ""
+    cap_applied = False
+    cap_value = None
+
+    if kind == KIND_PAYG:
+        time_raw_eur = payg_time_eur
+        time_eur = time_raw_eur
+        if has_cap:
+            cap_value = days * cap24h
+            time_eur = min(time_raw_eur, cap_value)
+            cap_saved_eur = max(0, time_raw_eur - time_eur)
+            cap_applied = time_eur != time_raw_eur
+        km_eur = payg_km_eur
+    elif kind == KIND_PACKAGE:
+        included_min = included_min_raw
+        over_min = max(0, total_min - included_min)
+
+        # Overage minute rate: blended (MVP approach).
+        blended_rate = (payg_time_eur / total_min) if total_min > 0 else 0
+        time_raw_eur = over_min * blended_rate
+        time_eur = time_raw_eur
+        if has_cap:
+            cap_value = days * cap24h
+            time_eur = min(time_raw_eur, cap_value)
+            cap_saved_eur = max(0, time_raw_eur - time_eur)
+            cap_applied = time_eur != time_raw_eur
+        km_eur = max(0, dist_km - included_km) * over_km_rate
+        plan_eur = package_price
+        plan_label = "Package"
+    else:
+        km_allowance = math.inf if daily_unlimited else daily_included_km * days
+        km_eur = 0 if daily_unlimited else max(0, dist_km - km_allowance) * daily_over_km_rate
+        plan_eur = days * daily_price
+        plan_label = f"Daily ({days}×)"
+
+    subtotal_before_min = trip_fee + plan_eur + time_eur + km_eur
+    if has_min_total and subtotal_before_min < min_total:
+        min_added_eur = min_total - subtotal_before_min
+
+    plan_c = _cents(plan_eur) if plan_eur else 0.0
+    time_c = _cents(time_eur) if time_eur else 0.0
+    km_c = _cents(km_eur) if km_eur else 0.0
+    min_added_c = _cents(min_added_eur) if min_added_eur else 0.0
+    airport_c = airport_fee_c if ctx.airport else 0.0
+    fuel_c = _cents(fuel_eur) if fuel_eur else 0.0
+
+    subtotal_without_fees = _cents(trip_c + plan_c + time_c + km_c + min_added_c + airport_c + fuel_c)
+    subtotal_with_fees = _cents(subtotal_without_fees + fees_c)
+
+    total_after_discount = apply_discount(ctx, int(discount_kind), subtotal_with_fees, time_c)
+
+    min_floor = _cents(min_total + fees_c + airport_c + fuel_c) if has_min_total else 0
+    if total_after_discount < min_floor:
+        total_after_discount = min_floor
+    elif total_after_discount < 0:
+        total_after_discount = 0
+
+    total_eur = _cents(total_after_discount)
+    if not detail:
+        return total_eur
+
+    discount_pct, discount_min = discount_for(ctx, int(discount_kind))
+    discount_eur = subtotal_with_fees - total_after_discount
+    option_type = OPTION_KIND_NAMES[int(kind)]
+    fuel_type_name = FUEL_TYPE_NAMES[int(fuel_type)]
+    time_cap_line = _time_cap_line(time_raw_eur, days, cap24h, time_eur) if has_cap else ""
+
+    if kind == KIND_PAYG:
+        time_tooltip = _payg_time_tooltip(
+            drive_day, drive_day_rate, drive_night, drive_night_rate, park_day, park_day_rate, park_night, park_night_rate, time_raw_eur
+        )
+        if has_cap:
+            time_tooltip += "\n" + time_cap_line
+    elif kind == KIND_PACKAGE:
+        inc = js_str(included_min if included_min is not None else 0)
+        lines = [
+            f"Included: {inc} min",
+            f"Overage: max(0, {js_str(total_min)} - {inc}) = {js_str(over_min)} min",
+            f"Blended minute rate: €{to_fixed(payg_time_eur, 2)} / {js_str(total_min)} min = €{to_fixed(blended_rate, 4)}/min",
+            f"Time overage: {js_str(over_min)} × €{to_fixed(blended_rate, 4)} = €{to_fixed(time_raw_eur, 2)}",
+        ]
+        if has_cap:
+            lines.append(time_cap_line)
+        time_tooltip = "\n".join(lines)
+    else:
+        time_tooltip = f"Time: €{to_fixed(time_eur, 2)}"
+
+    km_tooltip = _km_tooltip(dist_km, included_km, charged_km, over_km_rate)
+    if kind == KIND_PACKAGE:
+        plan_tooltip = f"Package price: €{to_fixed(plan_eur, 2)}"
+    elif kind == KIND_DAILY:
+        plan_tooltip = f"Daily price: {js_str(days)} × €{to_fixed(plan_eur / max(1, days), 2)} = €{to_fixed(plan_eur, 2)}"
+    else:
+        plan_tooltip = ""
+    fees_tooltip = _fees_tooltip(unlock, reservation, fixed, fees_eur, discount_kind == DISCOUNT_CARGURU)
+
+    return {
+        "ok": True,
+        "total_eur": total_eur,
+        "breakdown": {
+            "trip_eur": trip_c,
+            "plan_eur": plan_c,
+            "time_eur": time_c,
+            "km_eur": km_c,
+            "min_added_eur": min_added_c,
+            "fees_eur": fees_c,
+            "airport_eur": airport_c,
+            "fuel_eur": fuel_c,
+            "cap_saved_eur": _cents(cap_saved_eur),
+            # `+ 0.0` turns -0.0 into 0.0 (JSON.stringify(-0) is "0").
+            "discount_eur": -_cents(discount_eur) + 0.0,
+            "total_eur": total_eur,
+            "labels": {
+                "trip": "Trip fee",
+                "plan": plan_label,
+                "time": "Time (capped)" if cap_saved_eur > 0 else "Time",
+                "km": "Km",
+                "fees": "Fees",
+                "discount": "Discount",
+            },
+            "meta": {
+                "option_type": option_type,
+                "total_min": total_min,
+                "total_km": dist_km,
+                "days": days,
+                "fuel_included": bool(fuel_included),
+                "fuel_type": fuel_type_name,
+                "fuel_price_eur_per_l": fuel_price,
+                "fuel_consumption_l_per_100km_base": consumption_base,
+                "fuel_consumption_riga_factor": 0 if is_ev else RIGA_CONSUMPTION_FACTOR,
+                "fuel_consumption_l_per_100km_used": consumption_used,
+                "fuel_consumption_source": consumption_source,
+                "drive_day_min": drive_day,
+                "drive_night_min": drive_night,
+                "park_day_min": park_day,
+                "park_night_min": park_night,
+                "drive_day_rate": drive_day_rate,
+                "drive_night_rate": drive_night_rate,
+                "park_day_rate": park_day_rate,
+                "park_night_rate": park_night_rate,
+                "time_raw_eur": _cents(time_raw_eur),
+                "cap_applied": cap_applied,
+                "cap_value_eur": _cents(cap_value) if cap_value is not None else None,
+                "included_min": included_min,
+                "over_min": over_min,
+                "blended_rate_eur_per_min": blended_rate,
+                "included_km": included_km,
+                "charged_km": charged_km,
+                "km_rate_eur": over_km_rate,
+                "km_raw_eur": _cents(payg_km_eur),
+                "trip_fee_eur": trip_fee,
+                "min_total_eur": _cents(min_total) if has_min_total else None,
+                "plan_label": plan_label,
+                "plan_eur": plan_eur,
+                "fees_unlock_eur": unlock,
+                "fees_reservation_eur": reservation,
+                "fees_fixed_eur": fixed,
+                "fees_fallback_applied": False,
+                "discount_percent": -discount_pct + 0.0,
+                "discount_minutes": -discount_min + 0.0,
+            },
+            "tooltips": {
+                "trip": f"Trip fee: €{to_fixed(trip_fee, 2)}",
+                "plan": plan_tooltip,
+                "time": time_tooltip,
+                "km": km_tooltip,
+                "fees": fees_tooltip,
+            },
+        },
+    }
+
+
+def compute_option_price(ctx: TripContext, option: Mapping[str, Any], vehicle: Mapping[str, Any] | None = None) -> dict[str, Any]:
+    """Price a single options.tsv row; `ctx` must carry the drive/park minute split."""
+    priced = evaluate(compile_option(option, vehicle), ctx, ctx.allocation, detail=True)
+    if priced is None:
+        return {"ok": False, "reason": f"Unknown option_type: {option.get('option_type', 'undefined')}"}
+    return priced
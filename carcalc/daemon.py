@@ -0,0 +1,329 @@
+"""`carcalc price`: instant price lookups from the shell via a warm background daemon.
+
+The first call starts a daemon (`carcalc price --daemon`, detached) that compiles the data once
+and answers over a Unix domain socket; later calls only pay interpreter startup plus a socket
+round trip. The daemon exits after `--idle-timeout` seconds without requests, picks up
+`web/data/*.tsv` edits like `carcalc serve`, and there is one per user and data directory.
+
+Protocol: one JSON request per line, `{"path": "/price" | "/option/<id>/breakdown", "params": {...}}`
+(params as for `carcalc serve`), answered by one line `{"status": 200, "body": ...}` or
+`{"status": 4xx, "error": "..."}`. A connection may carry any number of requests (`--stdin`).
+
+This module is imported on every client call, so it only imports the engine inside the daemon.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "web" / "data"  # = carcalc.data.DEFAULT_DATA_DIR
+# Trip-independent inputs forwarded to the daemon when given (= carcalc.reprice.ContextDefaults fields).
+CONTEXT_FIELDS = (
+    "fuel_price_e95",
+    "fuel_price_diesel",
+    "consumption_override",
+    "discount_carguru",
+    "discount_citybee_percent",
+    "discount_citybee_minutes",
+    "discount_bolt",
+)
+START_TIMEOUT_S = 15.0
+
+
+def default_socket(data_dir: Path) -> Path:
+    """Per user and data directory, in the user's runtime dir when there is one."""
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    key = hashlib.sha1(str(data_dir.resolve()).encode("utf-8")).hexdigest()[:10]
+    return Path(base) / f"carcalc-{os.getuid()}-{key}.sock"
+
+
+class Client:
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.rfile = sock.makefile("rb")
+
+    @classmethod
+    def connect(cls, path: Path) -> Client:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(path))
+        except OSError:
+            sock.close()
+            raise
+        return cls(sock)
+
+    def request(self, path: str, params: dict[str, Any]) -> dict[str, Any]:
+        self.sock.sendall(json.dumps({"path": path, "params": params}).encode("utf-8") + b"\n")
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection")
+        return json.loads(line)
+
+    def close(self) -> None:
+        self.rfile.close()
+        self.sock.close()
+
+
+def private_open(path: Path, flags: int) -> int:
+    """Open (creating, mode 0600) a file next to the socket without following symlinks.
+
+    Without XDG_RUNTIME_DIR the socket lives in a shared, predictable place like /tmp, where
+    someone else may have planted a symlink under the same name.
+    """
+    return os.open(path, flags | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+
+
+def spawn_daemon(sock_path: Path, data_dir: Path, idle_timeout: float) -> None:
+    package_root = str(Path(__file__).resolve().parent.parent)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (package_root, env.get("PYTHONPATH", "")) if p)
+    log = os.fdopen(private_open(sock_path.with_suffix(".log"), os.O_WRONLY | os.O_APPEND), "ab")
+    with log:
+        argv = ["price", "--daemon", "--socket", str(sock_path), "--data-dir", str(data_dir), "--idle-timeout", str(idle_timeout)]
+        subprocess.Popen(
+            [sys.executable, "-m", "carcalc", *argv],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            env=env,
+            start_new_session=True,  # survives the shell that started it
+        )
+
+
+def connect(sock_path: Path, data_dir: Path, idle_timeout: float, start: bool = True) -> Client:
+    """Connect to the daemon, starting it first if nobody is listening."""
+    try:
+        return Client.connect(sock_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not start:
+            raise
+    spawn_daemon(sock_path, data_dir, idle_timeout)
+    deadline = time.monotonic() + START_TIMEOUT_S
+    while True:
+        try:
+            return Client.connect(sock_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"daemon did not start; see {sock_path.with_suffix('.log')}") from None
+            time.sleep(0.02)
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path, service: Any) -> None:
+        self.service = service
+        self.active = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        old_umask = os.umask(0o177)  # socket readable/writable by the owner only
+        try:
+            super().__init__(str(path), DaemonHandler)
+        finally:
+            os.umask(old_umask)
+
+    def track(self, delta: int) -> None:
+        with self.lock:
+            self.active += delta
+            self.last_used = time.monotonic()
+
+    def idle_for(self) -> float:
+        with self.lock:
+            return 0.0 if self.active else time.monotonic() - self.last_used
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    server: DaemonServer
+
+    def handle(self) -> None:
+        from carcalc.server import RequestError
+
+        self.server.track(1)
+        try:
+            for line in self.rfile:
+                try:
+                    req = json.loads(line)
+                    path = str(req.get("path") or "/price")
+                    if path == "/stop":
+                        self.wfile.write(b'{"status":200,"body":{"stopping":true}}\n')
+                        threading.Thread(target=self.server.shutdown).start()
+                        return
+                    body = self.server.service.respond("GET", path, req.get("params") or {})
+                    out = b'{"status":200,"body":' + body + b"}\n"
+                except RequestError as e:
+                    out = json.dumps({"status": int(e.status), "error": str(e)}).encode("utf-8") + b"\n"
+                except (TypeError, ValueError, AttributeError, OverflowError) as e:
+                    out = json.dumps({"status": 400, "error": f"bad request: {e}"}).encode("utf-8") + b"\n"
+                self.wfile.write(out)
+        finally:
+            self.server.track(-1)
+
+
+def run_daemon(sock_path: Path, data_dir: Path, idle_timeout: float, reload_interval: float) -> int:
+    import fcntl
+
+    from carcalc.data import load_data
+    from carcalc.engine import Tariffs
+    from carcalc.server import PricingService
+    from carcalc.snapshot import DataWatcher
+
+    # One daemon per socket: the lock is held for the daemon's lifetime, so a concurrent start
+    # exits here and its client connects to the winner.
+    lock = os.fdopen(private_open(sock_path.with_suffix(".lock"), os.O_WRONLY), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return 0
+    sock_path.unlink(missing_ok=True)  # stale socket of a daemon that died
+
+    service = PricingService(Tariffs.compile(load_data(data_dir)))
+    server = DaemonServer(sock_path, service)
+    watcher = None
+    if reload_interval > 0:
+        watcher = service.watcher = DataWatcher(data_dir, service.swap, reload_interval)
+        watcher.start()
+    stopped = threading.Event()
+
+    def watch_idle() -> None:
+        while not stopped.wait(min(1.0, idle_timeout)):
+            if server.idle_for() > idle_timeout:
+                server.shutdown()
+                return
+
+    threading.Thread(target=watch_idle, daemon=True).start()
+    print(f"{datetime.now().isoformat(timespec='seconds')} carcalc price daemon on {sock_path} (pid {os.getpid()})", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        stopped.set()
+        if watcher is not None:
+            watcher.stop()
+        server.server_close()
+        sock_path.unlink(missing_ok=True)
+        lock.close()
+    return 0
+
+
+def wait_for_exit(sock_path: Path, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while sock_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def context_params(args: argparse.Namespace) -> dict[str, Any]:
+    return {name: getattr(args, name) for name in CONTEXT_FIELDS if getattr(args, name) is not None}
+
+
+def price_stdin(client: Client, args: argparse.Namespace) -> int:
+    code = 0
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError("line must be a JSON object")
+        except ValueError as e:  # reported on its line, like /price/batch does
+            code = 1
+            print(json.dumps({"error": str(e)}, ensure_ascii=False), flush=True)
+            continue
+        resp = client.request("/price", context_params(args) | {"limit": args.limit or "", "breakdown": 0} | item)
+        code = code or int(resp["status"] != 200)
+        print(json.dumps(resp.get("body", resp), ensure_ascii=False), flush=True)
+    return code
+
+
+def print_results(body: dict[str, Any]) -> None:
+    for r in body["results"]:
+        print(f"{r['total_eur']:>9.2f}  {r['provider_id']:<8}  {r['vehicle_name']:<28}  {r['option_name']}")
+    for e in body["errors"]:
+        print(e, file=sys.stderr)
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc price",
+        description="Price a trip via a warm background daemon (started on first use, exits when idle).",
+    )
+    ap.add_argument("--start", default="", help="Trip start, ISO local time (default: now).")
+    ap.add_argument("--total-min", default="60", help="Minutes or H:MM.")
+    ap.add_argument("--parking-min", default="0", help="Minutes or H:MM.")
+    ap.add_argument("--km", default="0")
+    ap.add_argument("--airport", action="store_true")
+    ap.add_argument("--provider", default="")
+    ap.add_argument("-n", "--limit", type=int, default=5, help="Rows to show (0 = all).")
+    ap.add_argument("--option", default="", help="Full breakdown of one option_id instead of a ranking.")
+    ap.add_argument("--json", action="store_true", help="Print the response body as JSON.")
+    ap.add_argument("--stdin", action="store_true", help="Price NDJSON trip objects from stdin, one JSON response per line.")
+    for name in CONTEXT_FIELDS:
+        ap.add_argument(f"--{name.replace('_', '-')}", type=float, default=None)
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    ap.add_argument("--socket", default="", help="Daemon socket (default: per user and data dir).")
+    ap.add_argument("--idle-timeout", type=float, default=600.0, help="Daemon exits after this many idle seconds.")
+    ap.add_argument("--reload-interval", type=float, default=1.0, help="Daemon data/*.tsv change checks (0 = off).")
+    ap.add_argument("--no-start", action="store_true", help="Fail instead of starting a daemon.")
+    ap.add_argument("--stop", action="store_true", help="Stop the running daemon.")
+    ap.add_argument("--daemon", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    data_dir = Path(args.data_dir)
+    sock_path = Path(args.socket) if args.socket else default_socket(data_dir)
+    if args.daemon:
+        return run_daemon(sock_path, data_dir, args.idle_timeout, args.reload_interval)
+
+    start = not (args.no_start or args.stop)
+    try:
+        client = connect(sock_path, data_dir, args.idle_timeout, start)
+        try:
+            if args.stop:
+                client.request("/stop", {})
+                wait_for_exit(sock_path)
+                return 0
+            if args.stdin:
+                return price_stdin(client, args)
+            path = f"/option/{args.option}/breakdown" if args.option else "/price"
+            params = context_params(args) | {
+                "start": args.start or datetime.now().isoformat(timespec="minutes"),
+                "total_min": args.total_min,
+                "parking_min": args.parking_min,
+                "km": args.km,
+                "airport": args.airport,
+                "provider": args.provider,
+                "limit": args.limit or "",
+                "breakdown": 1 if args.json else 0,
+            }
+            try:
+                resp = client.request(path, params)
+            except (BrokenPipeError, ConnectionError):
+                # The daemon hit its idle timeout just as we connected: once more, on a fresh one.
+                client.close()
+                client = connect(sock_path, data_dir, args.idle_timeout, start)
+                resp = client.request(path, params)
+        finally:
+            client.close()
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"no daemon listening on {sock_path}", file=sys.stderr)
+        return 0 if args.stop else 1
+    except (TimeoutError, ConnectionError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    if resp["status"] != 200:
+        print(resp["error"], file=sys.stderr)
+        return 1
+    if args.json or args.option:
+        print(json.dumps(resp["body"], ensure_ascii=False, indent=2))
+    else:
+        print_results(resp["body"])
+    return 0
@@ -0,0 +1,111 @@
+"""Python port of `web/lib/tsv.js` + `web/lib/data.js` (loading the source-of-truth TSVs)."""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parents[1] / "web" / "data"
+
+
+def parse_tsv(tsv: str) -> tuple[list[str], list[dict[str, str]]]:
+    lines = re.split(r"\r\n|\r|\n", str(tsv))
+    rows: list[list[str]] = []
+    for line in lines:
+        if not line.strip():
+            continue
+        if line.strip().startswith("#"):
+            continue
+        rows.append(line.split("\t"))
+    if not rows:
+        return [], []
+    header = [h.strip() for h in rows[0]]
+    data: list[dict[str, str]] = []
+    for r in rows[1:]:
+        data.append({h: (r[i] if i < len(r) else "").strip() for i, h in enumerate(header)})
+    return header, data
+
+
+def normalize_fuel_type(vehicle: dict[str, str]) -> str:
+    raw = str(vehicle.get("fuel_type") or "").strip().lower()
+    if raw in {"petrol", "diesel", "ev"}:
+        return raw
+
+    name = str(vehicle.get("vehicle_name") or "").strip().lower()
+    vid = str(vehicle.get("vehicle_id") or "").strip().lower()
+    hay = f"{name} {vid}"
+
+    if "diesel" in hay:
+        return "diesel"
+    # Treat hybrids as petrol (no special handling yet).
+    if "hybrid" in hay or "e-power" in hay or "epower" in hay or "phev" in hay:
+        return "petrol"
+    if "tesla" in hay or "electric" in hay or " ev" in hay or hay.endswith(" ev"):
+        return "ev"
+    return "petrol"
+
+
+def parse_consumption_default(vehicle: dict[str, str]) -> float | None:
+    raw = str(vehicle.get("consumption_l_per_100km_default") or "").strip()
+    if not raw:
+        return None
+    try:
+        n = float(raw)
+    except ValueError:
+        return None
+    return n if math.isfinite(n) and n > 0 else None
+
+
+def parse_snowboard_fit(vehicle: dict[str, str]) -> int:
+    raw = str(vehicle.get("snowboard_fit") or "").strip()
+    try:
+        n = float(raw) if raw else 0.0
+    except ValueError:
+        return 0
+    return int(n) if math.isfinite(n) and 0 <= n <= 2 else 0
+
+
+@dataclass(frozen=True)
+class Data:
+    providers: list[dict[str, str]]
+    vehicles_by_id: dict[str, dict[str, Any]]
+    options: list[dict[str, str]]
+
+
+def normalize_vehicle(v: dict[str, str]) -> dict[str, Any]:
+    return {
+        "provider_id": v.get("provider_id", ""),
+        "vehicle_id": v.get("vehicle_id", ""),
+        "vehicle_name": v.get("vehicle_name") or v.get("vehicle_id", ""),
+        "vehicle_class": v.get("vehicle_class") or "",
+        "snowboard_fit": parse_snowboard_fit(v),
+        "snowboard_source_url": v.get("snowboard_source_url") or "",
+        "fuel_type": normalize_fuel_type(v),
+        "consumption_l_per_100km_default": parse_consumption_default(v),
+        "consumption_source_url": v.get("consumption_source_url") or "",
+    }
+
+
+def normalize_data(providers: list[dict[str, str]], vehicles: list[dict[str, str]], options: list[dict[str, str]]) -> Data:
+    norm_providers = [
+        {
+            "provider_id": p.get("provider_id", ""),
+            "provider_name": p.get("provider_name") or p.get("provider_id", ""),
+            "night_start": p.get("night_start") or "22:00",
+            "night_end": p.get("night_end") or "06:00",
+        }
+        for p in providers
+    ]
+
+    vehicles_by_id = {v.get("vehicle_id", ""): normalize_vehicle(v) for v in vehicles}
+    norm_options = [o for o in options if (o.get("provider_id") or "").strip() and (o.get("vehicle_id") or "").strip()]
+    return Data(providers=norm_providers, vehicles_by_id=vehicles_by_id, options=norm_options)
+
+
+def load_data(data_dir: Path = DEFAULT_DATA_DIR) -> Data:
+    """Read providers/vehicles/options TSVs from `data_dir` and normalize them like the web app."""
+    tables = [parse_tsv((data_dir / f"{name}.tsv").read_text(encoding="utf-8"))[1] for name in ("providers", "vehicles", "options")]
+    return normalize_data(*tables)
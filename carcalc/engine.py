@@ -0,0 +1,375 @@
+"""Compiled batch pricing engine.
+
+`Tariffs.compile(data)` parses every option once into a flat numeric row (see
+`carcalc.calc.OPTION_FIELDS`), so pricing a context is a tight loop over tuples:
+
+- `Tariffs.compute_all(ctx)` mirrors `computeAll` (ranked results with breakdowns).
+- `Tariffs.totals(ctx)` / `Tariffs.cheapest(ctx)` skip breakdowns for bulk jobs; `cheapest`
+  also prunes options whose lower bound is already above the best total.
+- `price_chunk(tariffs, contexts)` prices many contexts at once (see `carcalc.parallel` for a
+  process-pool version).
+
+Inside `carcalc.instrument.profile()` the same methods run instrumented copies of their loops.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from functools import cached_property
+from time import perf_counter_ns as perf_ns
+from typing import Any, Iterable, Iterator, Mapping, NamedTuple, Sequence
+
+from carcalc import instrument
+from carcalc.calc import (
+    KIND_UNKNOWN,
+    MINUTE_MS,
+    Allocation,
+    TripContext,
+    allocate_parking_night,
+    compile_option,
+    evaluate,
+    lower_bound,
+    ms_since_midnight,
+    night_minutes_ms,
+    parse_hhmm,
+)
+from carcalc.data import Data
+
+# Totals are rounded to cents; lower bounds are computed on unrounded parts.
+PRUNE_SLACK_EUR = 0.05
+
+
+class Quote(NamedTuple):
+    index: int
+    total_eur: float
+
+
+@dataclass(frozen=True)
+class Provider:
+    provider_id: str
+    provider_name: str
+    night_start: str
+    night_end: str
+
+    @property
+    def night_window(self) -> tuple[int, int] | None:
+        ns = parse_hhmm(self.night_start)
+        ne = parse_hhmm(self.night_end)
+        return None if ns is None or ne is None else (ns, ne)
+
+
+OptionEntry = tuple[tuple[float, ...], str, str, str, str, str, str, int]
+
+
+def provider_slot(providers: list[Provider], provider_index: dict[str, int], opt: Mapping[str, Any]) -> int:
+    """Index of the option's provider, appending a default-window provider for unknown ids (like the web app)."""
+    provider_id = (opt.get("provider_id") or "").strip()
+    if provider_id not in provider_index:
+        provider_index[provider_id] = len(providers)
+        providers.append(Provider(provider_id, provider_id, "22:00", "06:00"))
+    return provider_index[provider_id]
+
+
+def option_entry(opt: Mapping[str, Any], veh: Mapping[str, Any] | None, provider: int) -> OptionEntry:
+    """One option's compiled row plus its per-option strings, in `Tariffs` column order."""
+    vehicle_id = opt.get("vehicle_id", "")
+    return (
+        compile_option(opt, veh, provider),
+        (opt.get("provider_id") or "").strip(),
+        vehicle_id,
+        opt.get("option_id", ""),
+        opt.get("option_name") or opt.get("option_id", ""),
+        opt.get("option_type") or "",
+        (veh or {}).get("vehicle_name") or vehicle_id,
+        int((veh or {}).get("snowboard_fit") or 0),
+    )
+
+
+@dataclass(frozen=True)
+class Tariffs:
+    providers: list[Provider]
+    rows: Sequence[Sequence[float]]
+    # Per-option strings (parallel to `rows`); pricing itself only needs `providers` + `rows`.
+    # Columns are only indexed and iterated (per-user views use copy-on-write sequences).
+    provider_ids: Sequence[str] = field(default_factory=list)
+    vehicle_ids: Sequence[str] = field(default_factory=list)
+    option_ids: Sequence[str] = field(default_factory=list)
+    option_names: Sequence[str] = field(default_factory=list)
+    option_types: Sequence[str] = field(default_factory=list)
+    vehicle_names: Sequence[str] = field(default_factory=list)
+    snowboard_fits: Sequence[int] = field(default_factory=list)
+    # The normalized data this was compiled from (None for views and shared-memory copies);
+    # `carcalc.overlay` recompiles single rows of it.
+    source: Data | None = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def compile(cls, data: Data) -> Tariffs:
+        providers = [
+            Provider(p["provider_id"], p["provider_name"] or p["provider_id"], p["night_start"], p["night_end"])
+            for p in data.providers
+        ]
+        provider_index = {p.provider_id: i for i, p in enumerate(providers)}
+
+        columns: tuple[list[Any], ...] = ([], [], [], [], [], [], [], [])
+        for opt in data.options:
+            if not (opt.get("provider_id") or "").strip():
+                continue
+            veh = data.vehicles_by_id.get(opt.get("vehicle_id", ""))
+            for column, value in zip(columns, option_entry(opt, veh, provider_slot(providers, provider_index, opt))):
+                column.append(value)
+
+        return cls(providers, *columns, source=data)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @cached_property
+    def night_windows(self) -> list[tuple[int, int] | None]:
+        return [p.night_window for p in self.providers]
+
+    def provider_index(self, provider_filter: str) -> int | None:
+        """Row `provider_index` to keep for a provider_id filter (None = no filter, -1 = matches nothing)."""
+        if not provider_filter:
+            return None
+        return next((i for i, p in enumerate(self.providers) if p.provider_id == provider_filter), -1)
+
+    def allocations(self, ctx: TripContext) -> list[Allocation]:
+        """Drive/park day/night minute split per provider (providers sharing a night window share the work)."""
+        if instrument.active is not None:
+            return self._allocations_profiled(ctx, instrument.current())
+        t0 = ms_since_midnight(ctx.start)
+        t1 = t0 + ctx.total_min * MINUTE_MS
+        by_window: dict[tuple[int, int] | None, Allocation] = {}
+        out: list[Allocation] = []
+        for window in self.night_windows:
+            alloc = by_window.get(window)
+            if alloc is None:
+                night = 0 if window is None else night_minutes_ms(t0, t1, window[0], window[1])
+                night = min(ctx.total_min, max(0, night))
+                alloc = by_window[window] = allocate_parking_night(ctx.total_min, ctx.parking_min, night)
+            out.append(alloc)
+        return out
+
+    def totals(self, ctx: TripContext, provider_filter: str = "") -> list[float | None]:
+        """Total per option (None for filtered-out or unpriceable options), in data order."""
+        if instrument.active is not None:
+            return self._totals_profiled(ctx, provider_filter, instrument.current())
+        allocs = self.allocations(ctx)
+        only = self.provider_index(provider_filter)
+        out: list[float | None] = []
+        for r in self.rows:
+            if only is not None and r[0] != only:
+                out.append(None)
+                continue
+            out.append(evaluate(r, ctx, allocs[int(r[0])]))
+        return out
+
+    def cheapest(self, ctx: TripContext, provider_filter: str = "") -> Quote | None:
+        """Cheapest option (first in data order on ties, like the stable sort in `computeAll`)."""
+        if instrument.active is not None:
+            return self._cheapest_profiled(ctx, provider_filter, instrument.current())
+        allocs = self.allocations(ctx)
+        only = self.provider_index(provider_filter)
+        best: Quote | None = None
+        best_total = math.inf
+        for i, r in enumerate(self.rows):
+            if only is not None and r[0] != only:
+                continue
+            if lower_bound(r, ctx) - PRUNE_SLACK_EUR > best_total:
+                continue
+            total = evaluate(r, ctx, allocs[int(r[0])])
+            if total is not None and total < best_total:
+                best_total = total
+                best = Quote(i, total)
+        return best
+
+    def breakdown(self, ctx: TripContext, index: int) -> dict[str, Any]:
+        """`computeOptionPrice`-style result for one option."""
+        r = self.rows[index]
+        priced = evaluate(r, ctx, self.allocations(ctx)[int(r[0])], detail=True)
+        if priced is None:
+            return {"ok": False, "reason": f"Unknown option_type: {self.option_types[index]}"}
+        return priced
+
+    def compute_all(self, ctx: TripContext, provider_filter: str = "") -> tuple[list[dict[str, Any]], list[str]]:
+        """Same `{results, errors}` as `computeAll` in `web/lib/calc.js`."""
+        if instrument.active is not None:
+            return self._compute_all_profiled(ctx, provider_filter, instrument.current())
+        allocs = self.allocations(ctx)
+        results: list[dict[str, Any]] = []
+        errors: list[str] = []
+        for i, r in enumerate(self.rows):
+            provider_id = self.provider_ids[i]
+            if provider_filter and provider_id != provider_filter:
+                continue
+            priced = evaluate(r, ctx, allocs[int(r[0])], detail=True)
+            if priced is None:
+                errors.append(f"{provider_id}/{self.vehicle_ids[i]}/{self.option_ids[i]}: Unknown option_type: {self.option_types[i]}")
+                continue
+            results.append(self.result_row(i, priced))
+        results.sort(key=lambda x: x["total_eur"])
+        return results, errors
+
+    def ranked(
+        self, ctx: TripContext, provider_filter: str = "", limit: int | None = None, detail: bool = True
+    ) -> tuple[list[dict[str, Any]], list[str]]:
+        """`compute_all` ranked from fast totals; breakdowns are only built for the `limit` rows returned.
+
+        With `detail=False` rows carry no `breakdown`. Same order as `compute_all` (stable on ties).
+        """
+        totals = self.totals(ctx, provider_filter)
+        only = self.provider_index(provider_filter)
+        errors = [
+            f"{self.provider_ids[i]}/{self.vehicle_ids[i]}/{self.option_ids[i]}: Unknown option_type: {self.option_types[i]}"
+            for i, r in enumerate(self.rows)
+            if totals[i] is None and r[1] == KIND_UNKNOWN and (only is None or r[0] == only)
+        ]
+        order = sorted((i for i, t in enumerate(totals) if t is not None), key=totals.__getitem__)
+        if limit is not None:
+            order = order[:limit]
+        if not detail:
+            return [self.result_row(i, {"total_eur": totals[i]}) for i in order], errors
+        allocs = self.allocations(ctx)
+        return [self.result_row(i, evaluate(self.rows[i], ctx, allocs[int(self.rows[i][0])], detail=True)) for i in order], errors
+
+    # Instrumented copies of the loops above (see `carcalc.instrument`); keep them in sync.
+
+    def _allocations_profiled(self, ctx: TripContext, st: instrument.Stats) -> list[Allocation]:
+        token = st.begin("allocations")
+        night_path = st.path("night_minutes")
+        alloc_path = st.path("parking_allocation")
+        t0 = ms_since_midnight(ctx.start)
+        t1 = t0 + ctx.total_min * MINUTE_MS
+        by_window: dict[tuple[int, int] | None, Allocation] = {}
+        out: list[Allocation] = []
+        for window in self.night_windows:
+            alloc = by_window.get(window)
+            if alloc is None:
+                st.counters["allocation_cache_misses"] += 1
+                started = perf_ns()
+                night = 0 if window is None else night_minutes_ms(t0, t1, window[0], window[1])
+                night = min(ctx.total_min, max(0, night))
+                mid = perf_ns()
+                alloc = by_window[window] = allocate_parking_night(ctx.total_min, ctx.parking_min, night)
+                st.add_time(night_path, mid - started)
+                st.add_time(alloc_path, perf_ns() - mid)
+            else:
+                st.counters["allocation_cache_hits"] += 1
+            out.append(alloc)
+        st.end(token)
+        return out
+
+    def _evaluate_profiled(
+        self, st: instrument.Stats, ctx: TripContext, allocs: list[Allocation], only: int | None, detail: bool
+    ) -> Iterator[tuple[int, Any]]:
+        """(index, evaluate(...)) for every non-filtered option, timing the evaluations."""
+        eval_path = st.path("evaluate")
+        eval_ns = evaluated = 0
+        for i, r in enumerate(self.rows):
+            if only is not None and r[0] != only:
+                st.counters["options_filtered"] += 1
+                continue
+            started = perf_ns()
+            priced = evaluate(r, ctx, allocs[int(r[0])], detail=detail)
+            eval_ns += perf_ns() - started
+            evaluated += 1
+            yield i, priced
+        st.add_time(eval_path, eval_ns, evaluated)
+        st.flush_discount(eval_path + ";discount")
+        st.counters["options_evaluated"] += evaluated
+
+    def _totals_profiled(self, ctx: TripContext, provider_filter: str, st: instrument.Stats) -> list[float | None]:
+        token = st.begin("totals")
+        st.counters["contexts"] += 1
+        out: list[float | None] = [None] * len(self.rows)
+        for i, total in self._evaluate_profiled(st, ctx, self.allocations(ctx), self.provider_index(provider_filter), False):
+            out[i] = total
+        st.end(token)
+        return out
+
+    def _cheapest_profiled(self, ctx: TripContext, provider_filter: str, st: instrument.Stats) -> Quote | None:
+        token = st.begin("cheapest")
+        st.counters["contexts"] += 1
+        allocs = self.allocations(ctx)
+        only = self.provider_index(provider_filter)
+        bound_path = st.path("lower_bound")
+        eval_path = st.path("evaluate")
+        bound_ns = eval_ns = evaluated = pruned = filtered = 0
+        best: Quote | None = None
+        best_total = math.inf
+        for i, r in enumerate(self.rows):
+            if only is not None and r[0] != only:
+                filtered += 1
+                continue
+            started = perf_ns()
+            skip = lower_bound(r, ctx) - PRUNE_SLACK_EUR > best_total
+            mid = perf_ns()
+            bound_ns += mid - started
+            if skip:
+                pruned += 1
+                continue
+            total = evaluate(r, ctx, allocs[int(r[0])])
+            eval_ns += perf_ns() - mid
+            evaluated += 1
+            if total is not None and total < best_total:
+                best_total = total
+                best = Quote(i, total)
+        st.add_time(bound_path, bound_ns, evaluated + pruned)
+        st.add_time(eval_path, eval_ns, evaluated)
+        st.flush_discount(eval_path + ";discount")
+        st.counters["options_evaluated"] += evaluated
+        st.counters["options_pruned"] += pruned
+        st.counters["options_filtered"] += filtered
+        st.end(token)
+        return best
+
+    def _compute_all_profiled(
+        self, ctx: TripContext, provider_filter: str, st: instrument.Stats
+    ) -> tuple[list[dict[str, Any]], list[str]]:
+        token = st.begin("compute_all")
+        st.counters["contexts"] += 1
+        allocs = self.allocations(ctx)
+        only = self.provider_index(provider_filter) if provider_filter else None
+        results: list[dict[str, Any]] = []
+        errors: list[str] = []
+        for i, priced in self._evaluate_profiled(st, ctx, allocs, only, True):
+            if priced is None:
+                errors.append(f"{self.provider_ids[i]}/{self.vehicle_ids[i]}/{self.option_ids[i]}: Unknown option_type: {self.option_types[i]}")
+                continue
+            results.append(self.result_row(i, priced))
+        started = perf_ns()
+        results.sort(key=lambda x: x["total_eur"])
+        st.add_time(st.path("sort"), perf_ns() - started)
+        st.end(token)
+        return results, errors
+
+    def result_row(self, index: int, priced: dict[str, Any]) -> dict[str, Any]:
+        provider = self.providers[int(self.rows[index][0])]
+        row = {
+            "provider_id": self.provider_ids[index],
+            "provider_name": provider.provider_name or self.provider_ids[index],
+            "vehicle_id": self.vehicle_ids[index],
+            "vehicle_name": self.vehicle_names[index],
+            "snowboard_fit": self.snowboard_fits[index],
+            "option_id": self.option_ids[index],
+            "option_name": self.option_names[index],
+            "option_type": self.option_types[index],
+            "total_eur": priced["total_eur"],
+        }
+        if "breakdown" in priced:
+            row["breakdown"] = priced["breakdown"]
+        return row
+
+
+def price_chunk(tariffs: Tariffs, contexts: Iterable[TripContext], provider_filter: str = "") -> list[Quote | None]:
+    """Cheapest option for each context in a chunk."""
+    return [tariffs.cheapest(ctx, provider_filter) for ctx in contexts]
+
+
+def price_chunks(
+    tariffs: Tariffs, chunks: Iterable[list[TripContext]], provider_filter: str = ""
+) -> Iterator[list[Quote | None]]:
+    """In-process counterpart of `ProcessPricer.price_chunks` (results in input order)."""
+    for chunk in chunks:
+        yield price_chunk(tariffs, chunk, provider_filter)
@@ -0,0 +1,206 @@
+"""`carcalc fleet`: monthly totals per employee and provider over a company trip log.
+
+Each trip is priced with its cheapest option (optionally restricted to one provider, i.e. a
+fixed provider policy) and folded into per-(user, month, provider) accumulators. Priced trips are
+never kept: every chunk is reduced to a small `FleetAggregate`, and partial aggregates (from
+chunks or worker processes) are merged. Money is accumulated in integer cents so merge order
+does not change the result.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+
+from carcalc.calc import TripContext
+from carcalc.data import DEFAULT_DATA_DIR
+from carcalc.engine import Tariffs
+from carcalc.pack import load_tariffs
+from carcalc.parallel import ProcessPricer
+from carcalc.reprice import (
+    ContextDefaults,
+    add_context_arguments,
+    chunked,
+    context_defaults,
+    detect_format,
+    read_trips,
+    trip_context,
+)
+
+KEY_FIELDS = ("user", "month", "provider_id")
+
+GroupKey = tuple[str, str, str]
+
+
+@dataclass
+class Totals:
+    trips: int = 0
+    total_cents: int = 0
+    minutes: float = 0.0
+    km: float = 0.0
+
+    def add(self, total_eur: float, minutes: float, km: float) -> None:
+        self.trips += 1
+        self.total_cents += round(total_eur * 100)
+        self.minutes += minutes
+        self.km += km
+
+    def merge(self, other: Totals) -> None:
+        self.trips += other.trips
+        self.total_cents += other.total_cents
+        self.minutes += other.minutes
+        self.km += other.km
+
+    @property
+    def total_eur(self) -> float:
+        return self.total_cents / 100
+
+
+@dataclass
+class FleetAggregate:
+    groups: dict[GroupKey, Totals] = field(default_factory=dict)
+    errors: int = 0
+
+    def add(self, key: GroupKey, total_eur: float, minutes: float, km: float) -> None:
+        totals = self.groups.get(key)
+        if totals is None:
+            totals = self.groups[key] = Totals()
+        totals.add(total_eur, minutes, km)
+
+    def merge(self, other: FleetAggregate) -> FleetAggregate:
+        for key, totals in other.groups.items():
+            mine = self.groups.get(key)
+            if mine is None:
+                mine = self.groups[key] = Totals()
+            mine.merge(totals)
+        self.errors += other.errors
+        return self
+
+    def rollup(self, by: Iterable[str]) -> dict[tuple[str, ...], Totals]:
+        """Re-group on a subset of KEY_FIELDS (e.g. ("user", "month"))."""
+        idx = [KEY_FIELDS.index(k) for k in by]
+        out: dict[tuple[str, ...], Totals] = {}
+        for key, totals in self.groups.items():
+            sub = tuple(key[i] for i in idx)
+            mine = out.get(sub)
+            if mine is None:
+                mine = out[sub] = Totals()
+            mine.merge(totals)
+        return out
+
+
+@dataclass(frozen=True)
+class FleetTrip:
+    user: str
+    month: str
+    ctx: TripContext
+
+
+def aggregate_chunk(tariffs: Tariffs, trips: list[FleetTrip | None], provider_filter: str = "") -> FleetAggregate:
+    """Price a chunk (None = unparseable trip) and reduce it to one partial aggregate."""
+    agg = FleetAggregate()
+    for trip in trips:
+        quote = None if trip is None else tariffs.cheapest(trip.ctx, provider_filter)
+        if trip is None or quote is None:
+            agg.errors += 1
+            continue
+        provider_id = tariffs.providers[int(tariffs.rows[quote.index][0])].provider_id
+        agg.add((trip.user, trip.month, provider_id), quote.total_eur, trip.ctx.total_min, trip.ctx.dist_km)
+    return agg
+
+
+def fleet_trips(
+    trips: Iterable[dict[str, Any]], user_column: str, defaults: ContextDefaults
+) -> Iterator[FleetTrip | None]:
+    for trip in trips:
+        try:
+            ctx = trip_context(trip, defaults)
+        except (TypeError, ValueError):
+            yield None
+            continue
+        yield FleetTrip(user=str(trip.get(user_column) or ""), month=ctx.start.strftime("%Y-%m"), ctx=ctx)
+
+
+def aggregate(
+    trips: Iterable[FleetTrip | None],
+    tariffs: Tariffs,
+    *,
+    chunk_size: int = 10_000,
+    provider_filter: str = "",
+    pricer: ProcessPricer | None = None,
+) -> FleetAggregate:
+    chunks = chunked(trips, chunk_size)
+    if pricer is None:
+        partials: Iterable[FleetAggregate] = (aggregate_chunk(tariffs, c, provider_filter) for c in chunks)
+    else:
+        partials = pricer.map_chunks(aggregate_chunk, chunks, provider_filter)
+    total = FleetAggregate()
+    for partial in partials:
+        total.merge(partial)
+    return total
+
+
+def write_rows(f: IO[str], by: list[str], groups: dict[tuple[str, ...], Totals]) -> None:
+    w = csv.writer(f, lineterminator="\n")
+    w.writerow([*by, "trips", "total_eur", "minutes", "km"])
+    for key in sorted(groups):
+        t = groups[key]
+        w.writerow([*key, t.trips, f"{t.total_eur:.2f}", f"{t.minutes:g}", f"{t.km:g}"])
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc fleet",
+        description="Monthly trip cost totals per user and provider (cheapest option per trip, or one provider's cheapest).",
+    )
+    ap.add_argument("input", help="Trips file (CSV with header or NDJSON); '-' for stdin.")
+    ap.add_argument("-o", "--output", default="-", help="Output CSV (default: stdout).")
+    ap.add_argument("--input-format", choices=["csv", "ndjson"], default="")
+    ap.add_argument("--user-column", default="user", help="Column identifying the employee (default: user).")
+    ap.add_argument("--group-by", default=",".join(KEY_FIELDS), help=f"Comma-separated subset of {','.join(KEY_FIELDS)}.")
+    ap.add_argument("--provider", default="", help="Fixed provider policy: price every trip with this provider only.")
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    ap.add_argument("--pack", default="", help="Map this tariff pack (`carcalc pack`) instead of compiling the TSVs.")
+    ap.add_argument("--chunk-size", type=int, default=10_000)
+    ap.add_argument("--workers", type=int, default=1)
+    add_context_arguments(ap)
+    args = ap.parse_args(argv)
+
+    by = [k.strip() for k in args.group_by.split(",") if k.strip()]
+    unknown = [k for k in by if k not in KEY_FIELDS]
+    if unknown or not by:
+        print(f"--group-by must be a subset of {','.join(KEY_FIELDS)}", file=sys.stderr)
+        return 2
+    if args.chunk_size <= 0 or args.workers <= 0:
+        print("--chunk-size and --workers must be > 0", file=sys.stderr)
+        return 2
+    if args.input != "-" and not Path(args.input).exists():
+        print(f"File not found: {args.input}", file=sys.stderr)
+        return 2
+
+    tariffs = load_tariffs(Path(args.data_dir), Path(args.pack) if args.pack else None, shared=args.workers > 1)
+    fin = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    pricer = ProcessPricer(tariffs, args.workers) if args.workers > 1 else None
+    try:
+        trips = fleet_trips(read_trips(fin, detect_format(args.input, args.input_format)), args.user_column, context_defaults(args))
+        agg = aggregate(trips, tariffs, chunk_size=args.chunk_size, provider_filter=args.provider, pricer=pricer)
+    finally:
+        if pricer is not None:
+            pricer.close()
+        if fin is not sys.stdin:
+            fin.close()
+
+    groups = agg.rollup(by)
+    if args.output == "-":
+        write_rows(sys.stdout, by, groups)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            write_rows(f, by, groups)
+
+    n_trips = sum(t.trips for t in groups.values())
+    print(f"Aggregated {n_trips:,} trips into {len(groups):,} groups ({agg.errors:,} skipped)", file=sys.stderr)
+    return 0
@@ -0,0 +1,300 @@
+"""`carcalc history`: append-only price history of `web/data/*.tsv`, with "as of" queries.
+
+The importers overwrite the TSVs, so earlier rates are lost (except in git). The history store
+(SQLite, default `build/history.sqlite`) records every change instead:
+
+- `imports`: one entry per recorded snapshot (`valid_from`, UTC, strictly increasing) with
+  each table's header at that time,
+- `rows`: row contents (JSON of the non-blank columns), stored once per distinct SHA-256,
+- `versions`: `(name, key, valid_from) -> (position, row hash)`, one entry per row that was
+  added, changed or removed (hash NULL) by an import. The primary key is the
+  `(option_id, valid_from)` index the "as of" query walks.
+
+`as_of(when)` rebuilds all three tables for any instant (the rows whose latest version at or
+before `when` exists, in file order), and `load_data(when)` normalizes them for the engine.
+`checkout` writes them as TSVs, so `reprice --data-dir <dir>` prices old trips at old rates.
+Rows are keyed by `provider_id`, `vehicle_id` and `option_id`; a repeated key gets `#2`, `#3`...
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import sqlite3
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Mapping
+
+from carcalc.data import DEFAULT_DATA_DIR, Data, normalize_data
+from carcalc.tsv import Reader, Table
+
+KEYS = {"providers": "provider_id", "vehicles": "vehicle_id", "options": "option_id"}
+DEFAULT_HISTORY = DEFAULT_DATA_DIR.parents[1] / "build" / "history.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS imports (
+    id INTEGER PRIMARY KEY,
+    valid_from TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    headers TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rows (hash TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    valid_from TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    hash TEXT,
+    PRIMARY KEY (name, key, valid_from)
+) WITHOUT ROWID;
+"""
+
+# Versions of table ?1 that are the latest for their key at time ?2.
+LIVE = (
+    "v.name = ?1 AND v.valid_from <= ?2 AND v.valid_from = "
+    "(SELECT MAX(valid_from) FROM versions WHERE name = ?1 AND key = v.key AND valid_from <= ?2)"
+)
+
+
+def timestamp(value: str | datetime | None = None) -> str:
+    """`value` as a sortable UTC timestamp; a bare date means the end of that day (UTC)."""
+    if value is None:
+        value = datetime.now(timezone.utc)
+    elif isinstance(value, str):
+        if len(value) == 10:  # YYYY-MM-DD
+            value = f"{value}T23:59:59+00:00"
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def keyed_rows(name: str, table: Table) -> dict[str, tuple[int, dict[str, str]]]:
+    """Row key -> (position, non-blank values) for one table."""
+    column = KEYS[name]
+    out: dict[str, tuple[int, dict[str, str]]] = {}
+    for pos, row in enumerate(table.rows):
+        base = key = row.text(column) if column in table.header else ""
+        n = 1
+        while key in out:
+            n += 1
+            key = f"{base}#{n}"
+        out[key] = (pos, {c: v for c, v in zip(table.header.names, row) if v})
+    return out
+
+
+def row_hash(data: Mapping[str, str]) -> tuple[str, str]:
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest(), text
+
+
+class History:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> History:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def latest(self) -> str | None:
+        row = self.conn.execute("SELECT MAX(valid_from) FROM imports").fetchone()
+        return row[0] if row else None
+
+    def _current(self, name: str, when: str) -> dict[str, tuple[int, str]]:
+        """Key -> (position, row hash) of the rows live in table `name` at `when`."""
+        rows = self.conn.execute(f"SELECT v.key, v.pos, v.hash FROM versions AS v WHERE {LIVE}", (name, when))
+        return {key: (pos, h) for key, pos, h in rows if h is not None}
+
+    def record(self, tables: Mapping[str, Table], when: str | datetime | None = None, source: str = "") -> int:
+        """Append the rows of `tables` that differ from the latest snapshot; returns how many.
+
+        Nothing is written when no row and no header changed. `when` must be later than every recorded import.
+        """
+        valid_from = timestamp(when)
+        latest = self.latest()
+        if latest is not None and valid_from <= latest:
+            raise ValueError(f"history is append-only: {valid_from} is not after the latest import ({latest})")
+        versions: list[tuple[str, str, str, int, str | None]] = []
+        contents: dict[str, str] = {}
+        for name, table in tables.items():
+            current = self._current(name, valid_from)
+            seen = set()
+            for key, (pos, data) in keyed_rows(name, table).items():
+                seen.add(key)
+                h, text = row_hash(data)
+                if current.get(key, (None, None))[1] != h:
+                    versions.append((name, key, valid_from, pos, h))
+                    contents[h] = text
+            versions.extend((name, key, valid_from, pos, None) for key, (pos, _) in current.items() if key not in seen)
+        headers = {name: list(table.header.names) for name, table in tables.items()}
+        if not versions and all(self.header(name, valid_from) == columns for name, columns in headers.items()):
+            return 0
+        with self.transaction():
+            self.conn.execute(
+                "INSERT INTO imports (valid_from, source, headers) VALUES (?, ?, ?)",
+                (valid_from, source, json.dumps(headers, ensure_ascii=False)),
+            )
+            self.conn.executemany("INSERT OR IGNORE INTO rows (hash, data) VALUES (?, ?)", contents.items())
+            self.conn.executemany("INSERT INTO versions (name, key, valid_from, pos, hash) VALUES (?, ?, ?, ?, ?)", versions)
+        return len(versions)
+
+    def record_dir(self, data_dir: Path, when: str | datetime | None = None, source: str = "") -> int:
+        return self.record({name: Table.read(data_dir / f"{name}.tsv") for name in KEYS}, when, source or str(data_dir))
+
+    def header(self, name: str, when: str) -> list[str]:
+        """Columns of table `name` at `when` (from the latest import that recorded the table)."""
+        for (headers,) in self.conn.execute("SELECT headers FROM imports WHERE valid_from <= ? ORDER BY valid_from DESC", (when,)):
+            columns = json.loads(headers).get(name)
+            if columns is not None:
+                return list(columns)
+        return []
+
+    def as_of(self, when: str | datetime) -> dict[str, Table]:
+        """All tables as they were at `when` (empty before the first import)."""
+        at = timestamp(when)
+        out = {}
+        for name in KEYS:
+            rows = self.conn.execute(
+                f"SELECT r.data FROM versions AS v JOIN rows AS r ON r.hash = v.hash WHERE {LIVE} ORDER BY v.pos, v.key", (name, at)
+            )
+            header = self.header(name, at)
+            out[name] = Table(header, ({c: r.get(c, "") for c in header} for r in map(json.loads, (d for (d,) in rows))))
+        return out
+
+    def load_data(self, when: str | datetime) -> Data:
+        """`as_of(when)` normalized like `carcalc.data.load_data` (for `Tariffs.compile`)."""
+        tables = self.as_of(when)
+        return normalize_data(*([r.as_dict() for r in tables[name]] for name in KEYS))
+
+    def log(self, key: str, name: str = "options") -> list[tuple[str, dict[str, str] | None]]:
+        """(valid_from, row or None when removed) for every recorded version of one row."""
+        rows = self.conn.execute(
+            "SELECT v.valid_from, r.data FROM versions AS v LEFT JOIN rows AS r ON r.hash = v.hash "
+            "WHERE v.name = ? AND v.key = ? ORDER BY v.valid_from",
+            (name, key),
+        )
+        return [(valid_from, json.loads(data) if data is not None else None) for valid_from, data in rows]
+
+
+def git_snapshots(data_dir: Path) -> Iterator[tuple[str, str, dict[str, Table]]]:
+    """(commit time, commit, tables) for each commit that touched the TSVs, oldest first."""
+    top = subprocess.run(["git", "-C", str(data_dir), "rev-parse", "--show-toplevel"], check=True, capture_output=True, text=True)
+    repo = Path(top.stdout.strip())
+    rel = data_dir.resolve().relative_to(repo.resolve())
+    paths = [f"{rel.as_posix()}/{name}.tsv" for name in KEYS]
+    out = subprocess.run(
+        ["git", "-C", str(repo), "log", "--reverse", "--format=%H %cI", "--", *paths], check=True, capture_output=True, text=True
+    ).stdout
+    for line in out.splitlines():
+        commit, committed = line.split()
+        tables = {}
+        for name, path in zip(KEYS, paths):
+            shown = subprocess.run(["git", "-C", str(repo), "show", f"{commit}:{path}"], capture_output=True, text=True)
+            if shown.returncode == 0:
+                reader = Reader(io.StringIO(shown.stdout, newline=""))
+                rows = list(reader)
+                tables[name] = Table(reader.header, rows, reader.newline, reader.final_newline)
+        yield committed, commit, tables
+
+
+def _changed_columns(old: Mapping[str, str] | None, new: Mapping[str, str] | None) -> str:
+    if old is None:
+        return "added"
+    if new is None:
+        return "removed"
+    return ", ".join(f"{c}: {old.get(c, '')!r} -> {new.get(c, '')!r}" for c in sorted(old.keys() | new.keys()) if old.get(c) != new.get(c))
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc history",
+        description="Append-only price history of the TSVs, with time-travel (as of) queries.",
+    )
+    ap.add_argument("--db", default=str(DEFAULT_HISTORY), help="History file (default: %(default)s).")
+    sub = ap.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="Record the current TSVs (changed rows only).")
+    rec.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    rec.add_argument("--at", default="", help="Valid-from time (ISO 8601; default: now).")
+    back = sub.add_parser("backfill", help="Record every git commit that changed the TSVs (at its commit time).")
+    back.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    co = sub.add_parser("checkout", help="Write the TSVs as of a date/time into a directory.")
+    co.add_argument("--as-of", required=True, help="ISO date or time (a date means the end of that day, UTC).")
+    co.add_argument("--out", required=True)
+    lg = sub.add_parser("log", help="Print every recorded version of one row.")
+    lg.add_argument("key", help="option_id (or vehicle_id/provider_id with --table).")
+    lg.add_argument("--table", choices=list(KEYS), default="options")
+    args = ap.parse_args(argv)
+
+    db = Path(args.db)
+    db.parent.mkdir(parents=True, exist_ok=True)
+    with History(db) as history:
+        if args.command == "record":
+            try:
+                n = history.record_dir(Path(args.data_dir), args.at or None)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 2
+            print(f"{n} row versions recorded" if n else "no changes since the latest import")
+        elif args.command == "backfill":
+            data_dir = Path(args.data_dir)
+            latest = history.latest()
+            total = 0
+            for committed, commit, tables in git_snapshots(data_dir):
+                if latest is not None and timestamp(committed) <= latest:
+                    print(f"{commit[:10]} {committed}: not after the latest import, skipped")
+                    continue
+                n = history.record(tables, committed, f"git {commit}")
+                latest = history.latest()
+                total += n
+                print(f"{commit[:10]} {committed}: {n} row versions")
+            print(f"{total} row versions recorded")
+        elif args.command == "checkout":
+            started = time.perf_counter()
+            tables = history.as_of(args.as_of)
+            elapsed = time.perf_counter() - started
+            if not any(len(t.header) for t in tables.values()):
+                print(f"no history at or before {timestamp(args.as_of)}", file=sys.stderr)
+                return 1
+            out = Path(args.out)
+            out.mkdir(parents=True, exist_ok=True)
+            for name, table in tables.items():
+                table.write(out / f"{name}.tsv")
+            counts = ", ".join(f"{len(t)} {name}" for name, t in tables.items())
+            print(f"{out}: {counts} as of {timestamp(args.as_of)} (rebuilt in {elapsed * 1000:.1f} ms)")
+        else:
+            previous: dict[str, str] | None = None
+            entries = history.log(args.key, args.table)
+            if not entries:
+                print(f"no history for {args.table} {args.key!r}", file=sys.stderr)
+                return 1
+            for valid_from, row in entries:
+                print(f"{valid_from}  {_changed_columns(previous, row)}")
+                previous = row
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
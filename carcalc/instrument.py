@@ -0,0 +1,165 @@
+"""Opt-in per-stage instrumentation for the pricing engine.
+
+The stages follow `computeAll`: night-minute computation and parking allocation (per provider
+night window, cached), pruning bounds, option evaluation (with discounting as a sub-stage) and
+result sorting. Enable it around a block:
+
+    with instrument.profile() as stats:
+        tariffs.cheapest(ctx)
+    stats.write(Path("profile"))  # profile.json + profile.folded
+
+or for a whole command with `CARCALC_PROFILE=<path prefix> python -m carcalc ...`.
+
+When disabled, the engine only checks `instrument.active` once per call and runs its normal
+loops; the instrumented loops are separate copies. Each thread records into its own `Stats`
+(merged when the block ends), so a profiled `carcalc serve` is safe. Only in-process pricing is recorded (worker
+processes of `--workers N` keep their own, discarded, state).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter_ns as perf_ns
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+if TYPE_CHECKING:
+    from carcalc.calc import TripContext
+
+ENV_VAR = "CARCALC_PROFILE"
+
+
+class Stats:
+    """Wall time and call counts per stage path ("cheapest;evaluate;discount"), plus counters."""
+
+    def __init__(self) -> None:
+        self.timers: dict[str, list[int]] = {}  # path -> [total_ns, calls]
+        self.counters: Counter[str] = Counter()
+        self.stack: list[str] = []
+        # Filled by the discount hook while an instrumented loop runs, flushed by that loop.
+        self.discount_ns = 0
+        self.discount_calls = 0
+
+    def path(self, name: str) -> str:
+        return f"{self.stack[-1]};{name}" if self.stack else name
+
+    def begin(self, name: str) -> tuple[str, int]:
+        path = self.path(name)
+        self.stack.append(path)
+        return path, perf_ns()
+
+    def end(self, token: tuple[str, int]) -> None:
+        path, started = token
+        self.stack.pop()
+        self.add_time(path, perf_ns() - started)
+
+    def add_time(self, path: str, ns: int, calls: int = 1) -> None:
+        t = self.timers.get(path)
+        if t is None:
+            t = self.timers[path] = [0, 0]
+        t[0] += ns
+        t[1] += calls
+
+    def flush_discount(self, path: str) -> None:
+        if self.discount_calls:
+            self.add_time(path, self.discount_ns, self.discount_calls)
+            self.discount_ns = self.discount_calls = 0
+
+    def merge(self, other: Stats) -> None:
+        for path, (ns, calls) in other.timers.items():
+            self.add_time(path, ns, calls)
+        self.counters.update(other.counters)
+
+    def self_ns(self, path: str) -> int:
+        """Time in `path` not spent in its direct children."""
+        depth = path.count(";") + 1
+        children = sum(t[0] for p, t in self.timers.items() if p.startswith(path + ";") and p.count(";") == depth)
+        return max(0, self.timers[path][0] - children)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "stages": {
+                path: {"calls": calls, "total_ms": ns / 1e6, "self_ms": self.self_ns(path) / 1e6}
+                for path, (ns, calls) in sorted(self.timers.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def collapsed(self) -> str:
+        """Collapsed-stack lines (`a;b;c <self µs>`) for flamegraph.pl / speedscope."""
+        return "".join(f"{path} {self.self_ns(path) // 1000}\n" for path in sorted(self.timers))
+
+    def write(self, prefix: Path) -> None:
+        """Write `<prefix>.json` and `<prefix>.folded`."""
+        prefix.with_name(prefix.name + ".json").write_text(json.dumps(self.to_json(), indent=2) + "\n", encoding="utf-8")
+        prefix.with_name(prefix.name + ".folded").write_text(self.collapsed(), encoding="utf-8")
+
+
+active: Stats | None = None  # the block's merged result; also the engine's "profiling is on" flag
+_local = threading.local()
+_parts: list[Stats] = []  # per-thread Stats of the active block, merged into `active` when it ends
+_parts_lock = threading.Lock()
+
+
+def current() -> Stats:
+    """This thread's `Stats` for the active block (request threads of `carcalc serve` each get one)."""
+    owner = active
+    st: Stats | None = getattr(_local, "stats", None)
+    if st is None or _local.owner is not owner:
+        st = _local.stats = Stats()
+        _local.owner = owner
+        with _parts_lock:
+            _parts.append(st)
+    return st
+
+
+def _timed_apply_discount(ctx: TripContext, discount_kind: int, subtotal_with_fees: float, time_c: float) -> float:
+    started = perf_ns()
+    assert _apply_discount is not None
+    out = _apply_discount(ctx, discount_kind, subtotal_with_fees, time_c)
+    if active is not None:
+        st = current()
+        st.discount_ns += perf_ns() - started
+        st.discount_calls += 1
+    return out
+
+
+# The unpatched `calc.apply_discount`; calc is imported on first use so that `python -m carcalc`
+# (which checks CARCALC_PROFILE for every command) stays cheap for thin clients like `price`.
+_apply_discount: Callable[[TripContext, int, float, float], float] | None = None
+
+
+@contextmanager
+def profile(stats: Stats | None = None) -> Iterator[Stats]:
+    """Record engine stages into `stats` (a new `Stats` by default) for the duration of the block.
+
+    Each thread records into its own `Stats`; they are merged into `stats` when the block ends.
+    """
+    global active, _apply_discount, _parts
+    from carcalc import calc
+
+    if _apply_discount is None:
+        _apply_discount = calc.apply_discount
+    previous, previous_parts = active, _parts
+    result = active = stats if stats is not None else Stats()
+    _parts = []
+    calc.apply_discount = _timed_apply_discount
+    try:
+        yield result
+    finally:
+        with _parts_lock:
+            parts, _parts = _parts, previous_parts
+            active = previous
+        for part in parts:
+            result.merge(part)
+        if previous is None:
+            calc.apply_discount = _apply_discount
+
+
+def env_prefix() -> Path | None:
+    value = os.environ.get(ENV_VAR, "").strip()
+    return Path(value) if value else None
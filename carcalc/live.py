@@ -0,0 +1,136 @@
+"""Live rankings for `carcalc serve`: input deltas in, top-N updates out over Server-Sent Events.
+
+A client opens `GET /live?<trip params>&limit=N` (an `EventSource`) and gets a `session` event
+with its id, then `ranking` events. While the user drags a slider it POSTs only the changed
+fields to `/live/<id>`. Deltas are merged into the session state; the stream waits until
+inputs have been quiet for `debounce_ms` (capped at 5 s; at most `4 * debounce_ms` while they keep coming),
+prices only the latest state and sends only the rank positions whose row changed:
+
+    event: ranking
+    data: {"seq": 3, "size": 10, "changed": [[0, {...row...}], [4, {...row...}]]}
+
+Clients patch their list by index and truncate it to `size`. If nothing changed, nothing is
+sent. A data reload re-prices every open session.
+"""
+
+from __future__ import annotations
+
+import json
+import secrets
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+HEARTBEAT_S = 15.0
+MAX_WAIT_FACTOR = 4
+MAX_DEBOUNCE_S = 5.0
+
+
+def sse(event: str, data: Any, event_id: int | None = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+def diff_rows(prev: list[dict[str, Any]], cur: list[dict[str, Any]]) -> list[tuple[int, dict[str, Any]]]:
+    return [(i, row) for i, row in enumerate(cur) if i >= len(prev) or prev[i] != row]
+
+
+class LiveSession:
+    def __init__(self, session_id: str, params: dict[str, Any], debounce_s: float) -> None:
+        self.id = session_id
+        self.params = dict(params)
+        self.debounce_s = min(max(0.0, debounce_s), MAX_DEBOUNCE_S)  # keeps cond.wait timeouts finite
+        self.version = 0  # bumped by every delta (and by data reloads)
+        self.last_update = 0.0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def update(self, delta: dict[str, Any]) -> None:
+        with self.cond:
+            self.params.update(delta)
+            self.version += 1
+            self.last_update = time.monotonic()
+            self.cond.notify_all()
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def wait(self, seen_version: int, timeout: float) -> tuple[int, dict[str, Any]] | None:
+        """Latest (version, params) once newer than `seen_version` and debounced; None on timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.version != seen_version or self.closed, timeout):
+                return None
+            first = time.monotonic()
+            while not self.closed:
+                now = time.monotonic()
+                quiet_in = self.last_update + self.debounce_s - now
+                cap_in = first + MAX_WAIT_FACTOR * self.debounce_s - now
+                if quiet_in <= 0 or cap_in <= 0:
+                    break
+                self.cond.wait(min(quiet_in, cap_in))
+            return self.version, dict(self.params)
+
+
+class LiveSessions:
+    def __init__(self, max_sessions: int = 1000) -> None:
+        self.max_sessions = max_sessions
+        self.sessions: dict[str, LiveSession] = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def open(self, params: dict[str, Any], debounce_s: float) -> LiveSession | None:
+        with self.lock:
+            if len(self.sessions) >= self.max_sessions:
+                return None
+            session = LiveSession(secrets.token_urlsafe(12), params, debounce_s)
+            self.sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> LiveSession | None:
+        return self.sessions.get(session_id)
+
+    def close(self, session: LiveSession) -> None:
+        session.close()
+        with self.lock:
+            self.sessions.pop(session.id, None)
+
+    def notify_all(self, user: str | None = None) -> None:
+        """Re-price every session (after a data reload), or only those of `user` (after an overlay change)."""
+        with self.lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            if user is None or str(session.params.get("user") or "") == user:
+                session.update({})
+
+
+def stream(
+    session: LiveSession, rank: Callable[[dict[str, Any]], list[dict[str, Any]]], heartbeat_s: float = HEARTBEAT_S
+) -> Iterator[bytes]:
+    """SSE bytes for one session until it is closed; `rank` raises ValueError on bad inputs."""
+    yield sse("session", {"id": session.id})
+    version, params = session.version, dict(session.params)
+    prev: list[dict[str, Any]] | None = None
+    seq = 0
+    while True:
+        try:
+            rows = rank(params)
+        except ValueError as e:
+            yield sse("error", {"version": version, "error": str(e)})
+        else:
+            changed = diff_rows(prev or [], rows)
+            if prev is None or changed or len(rows) != len(prev):
+                seq += 1
+                yield sse("ranking", {"seq": seq, "size": len(rows), "changed": changed}, seq)
+                prev = rows
+        while True:
+            latest = session.wait(version, heartbeat_s)
+            if session.closed:
+                return
+            if latest is not None:
+                version, params = latest
+                break
+            yield b": ping\n\n"  # also how a dropped client is noticed
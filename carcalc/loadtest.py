@@ -0,0 +1,252 @@
+"""`carcalc loadtest`: drive a running `carcalc serve` and report throughput and latency percentiles.
+
+Closed loop: `--concurrency` keep-alive connections (asyncio streams, no extra dependencies),
+each sending its next request as soon as the previous response has been read, for
+`--duration` seconds or `--requests` requests. Requests come from a generated scenario mix
+(random trips priced with `limit`, plus a share of the web page's default inputs, which is what
+the response cache sees in production) or are replayed round-robin from an NDJSON file.
+
+Replay lines are either a trip object (POSTed to /price) or `{"method", "path", "body"}`.
+The JSON report (`-o`) carries the configuration too, so runs can be compared over time.
+Client and server share the CPU when run on one host; use `--concurrency` <= cores for sizing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import urlsplit
+
+PERCENTILES = (50, 95, 99, 99.9)
+# The page's initial inputs (web/index.html): everyone who opens the page at the same time asks for these.
+DEFAULT_SCENARIO = {"start": "2026-03-01T10:00", "total_min": 60, "parking_min": 0, "km": 10}
+
+
+@dataclass(frozen=True)
+class Request:
+    method: str
+    path: str
+    body: bytes = b""
+
+
+def price_request(trip: dict[str, Any]) -> Request:
+    return Request("POST", "/price", json.dumps(trip, separators=(",", ":")).encode("utf-8"))
+
+
+def scenario_mix(seed: int, limit: int, default_share: float) -> Iterator[Request]:
+    """Endless random trips (city hops to multi-day rentals), with `default_share` of page defaults."""
+    rng = random.Random(seed)
+    default = price_request(DEFAULT_SCENARIO | {"limit": limit})
+    t0 = datetime(2026, 1, 5)
+    while True:
+        if rng.random() < default_share:
+            yield default
+            continue
+        total = rng.choice([rng.randint(5, 60), rng.randint(60, 600), rng.randint(600, 4320)])
+        trip = {
+            "start": (t0 + timedelta(minutes=15 * rng.randrange(4 * 24 * 28))).isoformat(timespec="minutes"),
+            "total_min": total,
+            "parking_min": rng.choice([0, rng.randint(0, total)]),
+            "km": round(rng.lognormvariate(3, 1)),
+            "airport": rng.random() < 0.05,
+            "limit": limit,
+        }
+        yield price_request(trip)
+
+
+def read_replay(path: Path) -> list[Request]:
+    out = []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "path" in item:
+                body = item.get("body")
+                payload = b"" if body is None else body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+                out.append(Request(item.get("method") or ("POST" if payload else "GET"), item["path"], payload))
+            else:
+                out.append(price_request(item))
+    if not out:
+        raise ValueError(f"{path}: no requests")
+    return out
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of an ascending list (None when it is empty)."""
+    if not sorted_values:
+        return None
+    rank = math.ceil(round(q / 100 * len(sorted_values), 9))  # round: 99.9% of 1000 is 999, not 999.0000000000001
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, int, bool]:
+    """(status, body bytes, keep-alive) for one HTTP/1.1 response; the body is read and dropped."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    headers: dict[str, str] = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        size = 0
+        while n := int((await reader.readline()).split(b";", 1)[0], 16):
+            await reader.readexactly(n + 2)
+            size += n
+        await reader.readline()
+    else:
+        size = int(headers.get("content-length") or 0)
+        await reader.readexactly(size)
+    return status, size, headers.get("connection", "").lower() != "close"
+
+
+class LoadTest:
+    def __init__(self, url: str, requests: Iterator[Request], concurrency: int, duration: float, total: int | None) -> None:
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.requests = requests
+        self.concurrency = concurrency
+        self.duration = duration
+        self.remaining = total
+        self.latencies: list[float] = []
+        self.statuses: Counter[str] = Counter()
+        self.bytes = 0
+
+    def next_request(self) -> Request | None:
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+        return next(self.requests)
+
+    def encode(self, req: Request) -> bytes:
+        head = f"{req.method} {self.prefix}{req.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+        if req.body:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(req.body)}\r\n"
+        return (head + "\r\n").encode("latin-1") + req.body
+
+    async def worker(self, deadline: float) -> None:
+        reader: asyncio.StreamReader | None = None
+        writer: asyncio.StreamWriter | None = None
+        while time.perf_counter() < deadline and (req := self.next_request()) is not None:
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                assert reader is not None
+                writer.write(self.encode(req))
+                status, size, keep_alive = await read_response(reader)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+                self.statuses[type(e).__name__] += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                continue
+            self.latencies.append(time.perf_counter() - started)
+            self.statuses[str(status)] += 1
+            self.bytes += size
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    async def run(self) -> float:
+        started = time.perf_counter()
+        deadline = started + self.duration if self.duration > 0 else math.inf
+        await asyncio.gather(*(self.worker(deadline) for _ in range(self.concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict[str, Any]:
+        lat = sorted(self.latencies)
+
+        def ms(v: float | None) -> float | None:  # None (JSON null) when nothing succeeded
+            return None if v is None else round(v * 1000, 3)
+
+        ok = sum(n for status, n in self.statuses.items() if status.startswith("2"))
+        return {
+            "requests": sum(self.statuses.values()),
+            "ok": ok,
+            "errors": sum(self.statuses.values()) - ok,
+            "statuses": dict(sorted(self.statuses.items())),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(lat) / elapsed, 1) if elapsed > 0 else 0.0,
+            "received_bytes": self.bytes,
+            "latency_ms": {
+                **{f"p{q:g}": ms(percentile(lat, q)) for q in PERCENTILES},
+                "mean": ms(sum(lat) / len(lat) if lat else None),
+                "max": ms(lat[-1] if lat else None),
+            },
+        }
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc loadtest",
+        description="Load a running `carcalc serve` and report throughput and p50/p95/p99/p99.9 latency.",
+    )
+    ap.add_argument("--url", default="http://127.0.0.1:8787")
+    ap.add_argument("-c", "--concurrency", type=int, default=8, help="Concurrent keep-alive connections.")
+    ap.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds to run (0 = until --requests).")
+    ap.add_argument("-n", "--requests", type=int, default=0, help="Stop after N requests (0 = no limit).")
+    ap.add_argument("--replay", default="", help="NDJSON requests to replay round-robin instead of the generated mix.")
+    ap.add_argument("--limit", type=int, default=10, help="Rows per generated /price request.")
+    ap.add_argument("--default-share", type=float, default=0.2, help="Share of generated requests using the page defaults.")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--label", default="", help="Free-form run label stored in the report.")
+    ap.add_argument("-o", "--output", default="", help="Write the JSON report here (default: stdout).")
+    args = ap.parse_args(argv)
+
+    if args.concurrency <= 0 or (args.duration <= 0 and args.requests <= 0):
+        print("--concurrency must be > 0, and --duration or --requests must be set", file=sys.stderr)
+        return 2
+    if args.replay:
+        try:
+            requests = itertools.cycle(read_replay(Path(args.replay)))
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 2
+    else:
+        requests = scenario_mix(args.seed, args.limit, args.default_share)
+
+    test = LoadTest(args.url, requests, args.concurrency, args.duration, args.requests or None)
+    elapsed = asyncio.run(test.run())
+    report = {
+        "label": args.label,
+        "timestamp": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "config": {
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "requests": args.requests,
+            "scenarios": args.replay or f"mix(seed={args.seed}, limit={args.limit}, default_share={args.default_share})",
+        },
+        **test.report(elapsed),
+    }
+    lat = report["latency_ms"]
+    print(
+        f"{report['requests']:,} requests ({report['errors']:,} errors) in {elapsed:.1f}s: {report['throughput_rps']:,} req/s, "
+        f"p50 {lat['p50']} / p95 {lat['p95']} / p99 {lat['p99']} / p99.9 {lat['p99.9']} ms",
+        file=sys.stderr,
+    )
+    text = json.dumps(report, indent=2, allow_nan=False) + "\n"
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        sys.stdout.write(text)
+    return 1 if report["errors"] else 0
@@ -0,0 +1,112 @@
+"""Prometheus text-format metrics with low-contention recording (used by `carcalc serve`).
+
+Counters and histograms keep one shard per thread (keyed by thread ident, so the number of
+shards is bounded by the number of threads alive at once, even with a thread per connection):
+recording is a dict lookup plus a few list increments, with no lock; the lock is only taken
+when a new thread creates its shard and when `/metrics` sums the shards.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Iterable, Sequence
+
+# Seconds; request latencies from sub-millisecond cache hits to multi-second batches.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Sharded:
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._shards: dict[int, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> list[float]:
+        ident = threading.get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            # A reused ident continues a dead thread's shard, which is exactly right for sums.
+            with self._lock:
+                shard = self._shards.setdefault(ident, [0.0] * self._size)
+        return shard
+
+    def _totals(self) -> list[float]:
+        with self._lock:
+            shards = list(self._shards.values())
+        return [sum(column) for column in zip(*shards)] if shards else [0.0] * self._size
+
+
+class Counter(_Sharded):
+    def __init__(self) -> None:
+        super().__init__(1)
+
+    def inc(self, n: float = 1) -> None:
+        self._shard()[0] += n
+
+    @property
+    def value(self) -> float:
+        return self._totals()[0]
+
+
+class Histogram(_Sharded):
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        super().__init__(len(self.buckets) + 2)  # bucket counts, +Inf, sum
+
+    def observe(self, value: float) -> None:
+        shard = self._shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def samples(self, name: str, labels: str = "") -> list[str]:
+        totals = self._totals()
+        sep = "," if labels else ""
+        out = []
+        cumulative = 0.0
+        for bound, n in zip((*self.buckets, "+Inf"), totals):
+            cumulative += n
+            le = bound if isinstance(bound, str) else fmt(bound)
+            out.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {fmt(cumulative)}')
+        braces = f"{{{labels}}}" if labels else ""
+        out.append(f"{name}_sum{braces} {fmt(totals[-1])}")
+        out.append(f"{name}_count{braces} {fmt(cumulative)}")
+        return out
+
+
+def fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def label_str(labels: dict[str, str]) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped))
+
+
+def family(name: str, kind: str, help: str, samples: Iterable[str]) -> list[str]:
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}", *samples]
+
+
+def metric(name: str, kind: str, help: str, value: float, labels: dict[str, str] | None = None) -> list[str]:
+    braces = f"{{{label_str(labels)}}}" if labels else ""
+    return family(name, kind, help, [f"{name}{braces} {fmt(value)}"])
+
+
+def rss_bytes() -> int | None:
+    """Current resident set size (Linux `/proc`; None elsewhere)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_metrics(started: float) -> list[str]:
+    lines = metric("process_cpu_seconds_total", "counter", "User and system CPU time.", time.process_time())
+    lines += metric("process_start_time_seconds", "gauge", "Start time since the epoch.", started)
+    rss = rss_bytes()
+    if rss is not None:
+        lines += metric("process_resident_memory_bytes", "gauge", "Resident memory size.", rss)
+    return lines
@@ -0,0 +1,187 @@
+"""Cross-provider model index: "what is the cheapest way to get a Golf?".
+
+Free-form `vehicle_name`s are canonicalized into model keys (accents folded, lowercased,
+tokenized, brand aliases resolved, fuel/body/trim tokens dropped), so "VW Golf (Diesel)" and
+"Volkswagen Golf" share the key `volkswagen golf`. Names the rules get wrong are fixed in
+`model_overrides.tsv` (`vehicle_id` -> `model_key`) next to the other TSVs.
+
+`ModelIndex.groups(tariffs)` maps every option row to its group once; `cheapest_per_model`
+then prices each option and keeps a bounded heap per group instead of sorting all results.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import re
+import sys
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from carcalc.calc import TripContext
+from carcalc.data import DEFAULT_DATA_DIR, Data, load_data, parse_tsv
+from carcalc.engine import Quote, Tariffs
+from carcalc.reprice import add_context_arguments, context_defaults, trip_context
+
+OVERRIDES_FILE = "model_overrides.tsv"
+
+BRAND_ALIASES = {
+    "vw": "volkswagen",
+    "merc": "mercedes",
+    "mercedes-benz": "mercedes",
+}
+
+# Variants of one model that do not change what car you get.
+NOISE_TOKENS = frozenset(
+    {
+        "diesel", "petrol", "gasoline", "hybrid", "electric", "ev", "phev", "hev",
+        "hb", "hatchback", "sedan", "saloon", "wagon", "touring", "estate", "sw", "kombi",
+        "lr", "sr", "performance",
+    }
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def tokenize(name: str) -> list[str]:
+    """Accent-folded lowercase words; hyphenated words stay whole (e.g. "mercedes-benz", "c-hr")."""
+    folded = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    return _TOKEN_RE.findall(folded)
+
+
+def canonical_model(name: str) -> str:
+    """Model key for a vehicle name, e.g. "VW Golf (Diesel)" -> "volkswagen golf"."""
+    tokens: list[str] = []
+    for i, tok in enumerate(tokenize(name)):
+        if i == 0 and tok in BRAND_ALIASES:
+            tokens.append(BRAND_ALIASES[tok])
+            continue
+        tokens.extend(part for part in tok.split("-") if part not in NOISE_TOKENS)
+    return " ".join(tokens)
+
+
+def load_overrides(data_dir: Path = DEFAULT_DATA_DIR) -> dict[str, str]:
+    """`vehicle_id` -> model key from `model_overrides.tsv` (optional file)."""
+    path = data_dir / OVERRIDES_FILE
+    if not path.exists():
+        return {}
+    _, rows = parse_tsv(path.read_text(encoding="utf-8"))
+    return {r["vehicle_id"]: r["model_key"].strip() for r in rows if r.get("vehicle_id") and (r.get("model_key") or "").strip()}
+
+
+@dataclass(frozen=True)
+class ModelIndex:
+    by_vehicle: dict[str, str]
+    vehicles: dict[str, list[str]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, data: Data, overrides: dict[str, str] | None = None) -> ModelIndex:
+        overrides = overrides or {}
+        by_vehicle: dict[str, str] = {}
+        vehicles: dict[str, list[str]] = {}
+        for vehicle_id, veh in data.vehicles_by_id.items():
+            key = overrides.get(vehicle_id) or canonical_model(veh["vehicle_name"])
+            by_vehicle[vehicle_id] = key
+            vehicles.setdefault(key, []).append(vehicle_id)
+        return cls(by_vehicle=by_vehicle, vehicles=vehicles)
+
+    def find(self, query: str) -> list[str]:
+        """Model keys containing every token of `query` (canonicalized like vehicle names)."""
+        want = canonical_model(query).split()
+        return sorted(k for k in self.vehicles if all(t in k.split() for t in want))
+
+    def groups(self, tariffs: Tariffs, per_provider: bool = False) -> list[tuple[str, str]]:
+        """Group key per option row: (model, "") or (model, provider_id)."""
+        return [
+            (self.by_vehicle.get(vehicle_id, canonical_model(tariffs.vehicle_names[i])), tariffs.provider_ids[i] if per_provider else "")
+            for i, vehicle_id in enumerate(tariffs.vehicle_ids)
+        ]
+
+
+def cheapest_per_group(
+    tariffs: Tariffs,
+    groups: list[tuple[str, str]],
+    ctx: TripContext,
+    *,
+    k: int = 1,
+    models: Iterable[str] | None = None,
+) -> dict[tuple[str, str], list[Quote]]:
+    """`k` cheapest options per group (ties: first in data order), each list ascending."""
+    wanted = None if models is None else set(models)
+    heaps: dict[tuple[str, str], list[tuple[float, int]]] = {}
+    for i, total in enumerate(tariffs.totals(ctx)):
+        if total is None:
+            continue
+        key = groups[i]
+        if wanted is not None and key[0] not in wanted:
+            continue
+        heap = heaps.setdefault(key, [])
+        # Max-heap on (total, index) via negation: the root is the worst kept entry.
+        item = (-total, -i)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+    return {key: [Quote(-i, -t) for t, i in sorted(heap, reverse=True)] for key, heap in heaps.items()}
+
+
+def cheapest_per_model(
+    tariffs: Tariffs,
+    index: ModelIndex,
+    ctx: TripContext,
+    *,
+    per_provider: bool = False,
+    k: int = 1,
+    models: Iterable[str] | None = None,
+) -> dict[tuple[str, str], list[Quote]]:
+    return cheapest_per_group(tariffs, index.groups(tariffs, per_provider), ctx, k=k, models=models)
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc models",
+        description="Show the cross-provider model index, or the cheapest option per model for one trip.",
+    )
+    ap.add_argument("query", nargs="?", default="", help="Model filter, e.g. 'golf' (default: all models).")
+    ap.add_argument("--start", default="", help="Trip start (ISO local time); without it the index is printed.")
+    ap.add_argument("--total-min", default="60")
+    ap.add_argument("--parking-min", default="0")
+    ap.add_argument("--km", default="0")
+    ap.add_argument("--airport", action="store_true")
+    ap.add_argument("--per-provider", action="store_true", help="Cheapest per model and provider.")
+    ap.add_argument("-k", type=int, default=1, help="Options per group (default: 1).")
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    add_context_arguments(ap)
+    args = ap.parse_args(argv)
+
+    data_dir = Path(args.data_dir)
+    data = load_data(data_dir)
+    index = ModelIndex.build(data, load_overrides(data_dir))
+    models = index.find(args.query) if args.query else sorted(index.vehicles)
+    if not models:
+        print(f"No model matches {args.query!r}", file=sys.stderr)
+        return 1
+
+    if not args.start:
+        for model in models:
+            print(f"{model}\t{','.join(index.vehicles[model])}")
+        return 0
+
+    trip = {"start": args.start, "total_min": args.total_min, "parking_min": args.parking_min, "km": args.km, "airport": args.airport}
+    try:
+        ctx = trip_context(trip, context_defaults(args))
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    if args.k <= 0:
+        print("-k must be > 0", file=sys.stderr)
+        return 2
+
+    tariffs = Tariffs.compile(data)
+    best = cheapest_per_model(tariffs, index, ctx, per_provider=args.per_provider, k=args.k, models=models)
+    for key in sorted(best, key=lambda g: (best[g][0].total_eur, g)):
+        for q in best[key]:
+            print(f"{key[0]}\t{tariffs.provider_ids[q.index]}\t{tariffs.option_ids[q.index]}\t{q.total_eur:.2f}")
+    return 0
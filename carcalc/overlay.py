@@ -0,0 +1,263 @@
+"""Per-user tariff overlays for `carcalc serve`: a user's own option/vehicle rows over the shared data.
+
+An `Overlay` holds only what a user changed or added, as raw TSV-style rows: option rows keyed by
+`option_id`, vehicle rows by `vehicle_id`. Fields given for an existing row are merged over it;
+new options need `provider_id` and `vehicle_id`. Rows can be changed or added, not deleted.
+
+`apply_overlay` turns a base `Snapshot` plus an overlay into a per-user view, copy-on-write: each
+`Tariffs` column of the view is a `PatchedList` over the shared base list holding only the patched
+indexes and appended rows (or the base list itself when the overlay doesn't touch that column), and
+`option_index` chains the added option ids in front of the base index. A view therefore costs about
+the size of the user's diff. Changing a vehicle recompiles that vehicle's options in the view.
+
+`OverlayStore` keeps the overlays (in memory only) and one cached view per user, rebuilt when the
+base snapshot is swapped or the overlay changes. Its revisions come from one store-wide counter, so
+a user's overlay recreated after a delete never reuses the deleted one's label (which keys the
+service's response cache).
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+from collections import ChainMap, Counter
+from dataclasses import dataclass, field, replace
+from itertools import chain, islice
+from typing import Any, Iterable, Iterator, Sequence, TypeVar, overload
+
+from carcalc.data import normalize_vehicle
+from carcalc.engine import OptionEntry, Tariffs, option_entry, provider_slot
+from carcalc.snapshot import Snapshot
+
+T = TypeVar("T")
+
+MAX_USERS = 10_000
+MAX_ROWS = 1_000  # per user, options + vehicles
+
+
+class PatchedList(Sequence[T]):
+    """Read-only list: `base` with some indexes replaced (`patches`) and `extra` appended; `base` is not copied."""
+
+    __slots__ = ("base", "patches", "extra", "order")
+
+    def __init__(self, base: Sequence[T], patches: dict[int, T], extra: list[T]) -> None:
+        self.base = base
+        self.patches = patches
+        self.extra = extra
+        self.order = sorted(patches)
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.extra)
+
+    @overload
+    def __getitem__(self, i: int) -> T: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[T]: ...
+
+    def __getitem__(self, i: int | slice) -> T | list[T]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self.base)
+        if i < 0:
+            i += n + len(self.extra)
+        if 0 <= i < n:
+            hit = self.patches.get(i, self)
+            return self.base[i] if hit is self else hit
+        if n <= i < n + len(self.extra):
+            return self.extra[i - n]
+        raise IndexError("PatchedList index out of range")
+
+    def __iter__(self) -> Iterator[T]:
+        # The engine's loops iterate whole columns: walk the base list in runs between patches.
+        if not self.patches:
+            return chain(self.base, self.extra)
+        return chain.from_iterable(self._runs())
+
+    def _runs(self) -> Iterator[Iterable[T]]:
+        it = iter(self.base)
+        pos = 0
+        for i in self.order:
+            yield islice(it, i - pos)
+            next(it, None)  # runs after the previous run has been consumed
+            yield (self.patches[i],)
+            pos = i + 1
+        yield it
+        yield self.extra
+
+
+def patched(base: Sequence[T], patches: dict[int, T], extra: list[T]) -> Sequence[T]:
+    """`PatchedList` without no-op patches, or `base` itself if nothing changes."""
+    patches = {i: v for i, v in patches.items() if base[i] != v}
+    return PatchedList(base, patches, extra) if patches or extra else base
+
+
+def clean_rows(rows: object, key: str) -> dict[str, dict[str, str]]:
+    """Validated request rows (a list of objects with a non-empty `key`) as TSV-style string rows by key."""
+    if rows is None:
+        return {}
+    if not isinstance(rows, list):
+        raise ValueError(f"{key.split('_')[0]}s must be a list of row objects")
+    out: dict[str, dict[str, str]] = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            raise ValueError(f"{key.split('_')[0]}s must be a list of row objects")
+        clean = {str(k).strip(): "" if v is None else str(v).strip() for k, v in row.items()}
+        if not clean.get(key):
+            raise ValueError(f"every row needs a {key}")
+        out[clean[key]] = out.get(clean[key], {}) | clean
+    return out
+
+
+@dataclass(frozen=True)
+class Overlay:
+    user: str
+    revision: int = 0
+    options: dict[str, dict[str, str]] = field(default_factory=dict)
+    vehicles: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    @property
+    def label(self) -> str:
+        return f"{self.user}@{self.revision}"
+
+    def __len__(self) -> int:
+        return len(self.options) + len(self.vehicles)
+
+    def merged(self, options: object = None, vehicles: object = None, revision: int | None = None) -> Overlay:
+        """Next revision (`revision`, default this one + 1) with `options`/`vehicles` request rows merged in.
+
+        Raises ValueError on bad rows.
+        """
+        new_options = clean_rows(options, "option_id")
+        new_vehicles = clean_rows(vehicles, "vehicle_id")
+        return Overlay(
+            self.user,
+            self.revision + 1 if revision is None else revision,
+            {**self.options, **{k: self.options.get(k, {}) | row for k, row in new_options.items()}},
+            {**self.vehicles, **{k: self.vehicles.get(k, {}) | row for k, row in new_vehicles.items()}},
+        )
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "user": self.user,
+            "revision": self.revision,
+            "options": list(self.options.values()),
+            "vehicles": list(self.vehicles.values()),
+        }
+
+
+def apply_overlay(base: Snapshot, overlay: Overlay) -> Snapshot:
+    """Per-user view of `base` (ValueError if an overlay row can't be compiled against it)."""
+    tariffs = base.tariffs
+    source = tariffs.source
+    if source is None:
+        raise ValueError("snapshot has no source data to overlay")
+
+    vehicles = {vid: normalize_vehicle(source.vehicles_by_id.get(vid, {}) | row) for vid, row in overlay.vehicles.items()}
+
+    def vehicle(vehicle_id: str) -> dict[str, Any] | None:
+        return vehicles[vehicle_id] if vehicle_id in vehicles else source.vehicles_by_id.get(vehicle_id)
+
+    providers = list(tariffs.providers)
+    provider_index = {p.provider_id: i for i, p in enumerate(providers)}
+    # A compiled base snapshot is row-aligned with `source.options` (both skip the same rows).
+    patches: dict[int, OptionEntry] = {}
+    for vehicle_id in vehicles:
+        for i in base.vehicle_options.get(vehicle_id, ()):
+            opt = source.options[i]
+            patches[i] = option_entry(opt, vehicles[vehicle_id], provider_slot(providers, provider_index, opt))
+    additions: list[OptionEntry] = []
+    added_index: dict[str, int] = {}
+    for option_id, row in overlay.options.items():
+        i = base.option_index.get(option_id)
+        opt = (source.options[i] if i is not None else {}) | row
+        if not opt.get("provider_id") or not opt.get("vehicle_id"):
+            raise ValueError(f"option {option_id}: provider_id and vehicle_id are required for new options")
+        entry = option_entry(opt, vehicle(opt["vehicle_id"]), provider_slot(providers, provider_index, opt))
+        if i is None:
+            added_index[option_id] = len(tariffs) + len(additions)
+            additions.append(entry)
+        else:
+            patches[i] = entry
+
+    base_columns: tuple[Sequence[Any], ...] = (
+        tariffs.rows,
+        tariffs.provider_ids,
+        tariffs.vehicle_ids,
+        tariffs.option_ids,
+        tariffs.option_names,
+        tariffs.option_types,
+        tariffs.vehicle_names,
+        tariffs.snowboard_fits,
+    )
+    columns = [
+        patched(column, {i: entry[c] for i, entry in patches.items()}, [entry[c] for entry in additions])
+        for c, column in enumerate(base_columns)
+    ]
+    provider_options = Counter(base.provider_options)
+    for i, entry in patches.items():
+        provider_options[tariffs.provider_ids[i]] -= 1
+        provider_options[entry[1]] += 1
+    provider_options.update(entry[1] for entry in additions)
+
+    view = Tariffs(providers if len(providers) > len(tariffs.providers) else tariffs.providers, *columns)
+    return replace(
+        base,
+        tariffs=view,
+        option_index=ChainMap(added_index, base.option_index) if added_index else base.option_index,
+        provider_options=provider_options,
+        overlay=overlay.label,
+    )
+
+
+class OverlayStore:
+    """Overlays by user, plus each user's view of the latest base snapshot it was asked for."""
+
+    def __init__(self, max_users: int = MAX_USERS, max_rows: int = MAX_ROWS) -> None:
+        self.max_users = max_users
+        self.max_rows = max_rows
+        self.overlays: dict[str, Overlay] = {}
+        self.views: dict[str, Snapshot] = {}
+        self.lock = threading.Lock()
+        self.revisions = itertools.count(1)  # never reset: labels stay unique across deletes
+
+    def __len__(self) -> int:
+        return len(self.overlays)
+
+    def rows(self) -> int:
+        return sum(len(o) for o in list(self.overlays.values()))
+
+    def get(self, user: str) -> Overlay | None:
+        return self.overlays.get(user)
+
+    def put(self, base: Snapshot, user: str, options: object = None, vehicles: object = None) -> Overlay | None:
+        """Merge rows into `user`'s overlay; None when the store is full (ValueError on bad rows)."""
+        with self.lock:
+            current = self.overlays.get(user)
+            if current is None and len(self.overlays) >= self.max_users:
+                return None
+            overlay = (current or Overlay(user)).merged(options, vehicles, next(self.revisions))
+            if len(overlay) > self.max_rows:
+                raise ValueError(f"overlay too large: {len(overlay)} rows (max {self.max_rows})")
+            view = apply_overlay(base, overlay)  # rejects rows that don't compile before storing them
+            self.overlays[user] = overlay
+            self.views[user] = view
+        return overlay
+
+    def clear(self, user: str) -> bool:
+        with self.lock:
+            self.views.pop(user, None)
+            return self.overlays.pop(user, None) is not None
+
+    def view(self, base: Snapshot, user: str) -> Snapshot:
+        """`user`'s view of `base` (`base` itself for users without an overlay)."""
+        overlay = self.overlays.get(user)
+        if overlay is None:
+            return base
+        view = self.views.get(user)
+        if view is None or view.version != base.version or view.overlay != overlay.label:
+            view = apply_overlay(base, overlay)
+            with self.lock:
+                if self.overlays.get(user) is overlay:
+                    self.views[user] = view
+        return view
@@ -0,0 +1,322 @@
+"""`carcalc pack`: compiled tariffs as a memory-mappable binary file.
+
+`Tariffs.compile(load_data(...))` parses the three TSVs and compiles every option on each
+process start, and each process keeps its own copy of the result. A pack holds the compiled
+table in the layout the engine reads, so `Pack` maps the file read-only and wraps it in
+`memoryview`s without parsing anything; processes mapping the same pack share its pages.
+
+Layout (little-endian, sections 8-byte aligned, in this order after the header):
+
+- header (`HEADER`): magic, format, row width, row/provider/string counts, string bytes,
+  `source_version` of the inputs, SHA-256 of the file with the checksum field zeroed,
+- rows: `n_rows * row_width` float64 (the `OPTION_FIELDS` columns),
+- columns: one int32 column per entry of `COLUMNS` (string columns hold string-table indices),
+- providers: `n_providers * 4` int32 string indices (id, name, night start, night end),
+- strings: `n_strings + 1` uint32 offsets into a UTF-8 blob.
+
+The checksum is verified on open, and `source_version` (the TSVs plus the compiler sources)
+tells a stale pack apart. Packs carry no `source` data, so the server, whose overlays recompile
+rows from it, keeps compiling; the batch commands take `--pack`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mmap
+import struct
+import sys
+import time
+from array import array
+from collections.abc import Sequence
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, overload
+
+from carcalc.calc import OPTION_FIELDS
+from carcalc.data import DEFAULT_DATA_DIR, load_data
+from carcalc.engine import Provider, Tariffs
+from carcalc.tsv import write_atomic
+
+FORMAT = 1
+MAGIC = b"CCTARIFF"
+HEADER = struct.Struct("<8sHHIIIII16s32s")
+CHECKSUM_OFFSET = HEADER.size - 32
+SOURCES = ("providers", "vehicles", "options")
+COMPILER_SOURCES = ("calc.py", "data.py", "engine.py")
+COLUMNS = ("provider_ids", "vehicle_ids", "option_ids", "option_names", "option_types", "vehicle_names", "snowboard_fits")
+STRING_COLUMNS = COLUMNS[:-1]
+DEFAULT_PACK = Path(__file__).resolve().parents[1] / "build" / "tariffs.pack"
+
+
+def source_version(data_dir: Path) -> bytes:
+    """Digest of the TSVs and the code that compiles them: a pack built from other inputs is stale."""
+    h = hashlib.sha256(f"carcalc-pack-{FORMAT}\0{','.join(OPTION_FIELDS)}".encode())
+    here = Path(__file__).resolve().parent
+    for name in COMPILER_SOURCES:
+        h.update(b"\0" + (here / name).read_bytes())
+    for name in SOURCES:
+        h.update(b"\0" + (data_dir / f"{name}.tsv").read_bytes())
+    return h.digest()[:16]
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _layout(row_width: int, n_rows: int, n_providers: int, n_strings: int, string_bytes: int) -> tuple[int, int, int, int, int, int]:
+    """Offsets of rows, columns, providers, string offsets and string blob, plus the file size."""
+    rows = _align(HEADER.size)
+    columns = rows + 8 * row_width * n_rows
+    providers = _align(columns + 4 * len(COLUMNS) * n_rows)
+    offsets = _align(providers + 16 * n_providers)
+    blob = offsets + 4 * (n_strings + 1)
+    return rows, columns, providers, offsets, blob, blob + string_bytes
+
+
+def _le(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def encode(tariffs: Tariffs, source: bytes = b"\0" * 16) -> bytes:
+    """The pack file for `tariffs` (`source` is recorded for staleness checks)."""
+    width = len(OPTION_FIELDS)
+    strings: dict[str, int] = {}
+
+    def intern(s: str) -> int:
+        return strings.setdefault(s, len(strings))
+
+    flat = array("d")
+    for row in tariffs.rows:
+        if len(row) != width:
+            raise ValueError(f"row has {len(row)} values, expected {width}")
+        flat.extend(row)
+    n = len(tariffs.rows)
+    columns = array("i")
+    for name in STRING_COLUMNS:
+        values = getattr(tariffs, name)
+        if len(values) != n:
+            raise ValueError(f"{name} has {len(values)} entries for {n} rows")
+        columns.extend(intern(s) for s in values)
+    columns.extend(int(v) for v in tariffs.snowboard_fits)
+    providers = array("i", (intern(s) for p in tariffs.providers for s in (p.provider_id, p.provider_name, p.night_start, p.night_end)))
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+
+    rows_at, columns_at, providers_at, offsets_at, blob_at, size = _layout(width, n, len(tariffs.providers), len(encoded), offsets[-1])
+    out = bytearray(size)
+    out[: HEADER.size] = HEADER.pack(MAGIC, FORMAT, HEADER.size, width, n, len(tariffs.providers), len(encoded), offsets[-1], source, b"")
+    out[rows_at:columns_at] = _le(flat)
+    out[columns_at : columns_at + 4 * len(columns)] = _le(columns)
+    out[providers_at : providers_at + 4 * len(providers)] = _le(providers)
+    out[offsets_at:blob_at] = _le(offsets)
+    out[blob_at:] = b"".join(encoded)
+    out[CHECKSUM_OFFSET : HEADER.size] = hashlib.sha256(out).digest()
+    return bytes(out)
+
+
+class StringTable(Sequence[str]):
+    """Strings of a mapped pack, decoded on access."""
+
+    def __init__(self, offsets: Sequence[int], blob: memoryview, origin: tuple[Path, bytes]) -> None:
+        self.offsets = offsets
+        self.blob = blob
+        self.origin = origin  # (pack path, source version)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @overload
+    def __getitem__(self, i: int) -> str: ...
+    @overload
+    def __getitem__(self, i: slice) -> list[str]: ...
+    def __getitem__(self, i: int | slice) -> str | list[str]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return str(self.blob[self.offsets[i] : self.offsets[i + 1]], "utf-8")
+
+
+class StringColumn(Sequence[str]):
+    """A per-option string column: string-table indices, resolved on access."""
+
+    def __init__(self, indices: Sequence[int], strings: StringTable) -> None:
+        self.indices = indices
+        self.strings = strings
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @overload
+    def __getitem__(self, i: int) -> str: ...
+    @overload
+    def __getitem__(self, i: slice) -> list[str]: ...
+    def __getitem__(self, i: int | slice) -> str | list[str]:
+        if isinstance(i, slice):
+            return [self.strings[j] for j in self.indices[i]]
+        return self.strings[self.indices[i]]
+
+
+class Pack:
+    """A pack file mapped read-only, exposed as `self.tariffs` (without `source` data)."""
+
+    def __init__(self, path: Path, verify: bool = True) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise ValueError(f"{self.path}: not a tariff pack") from None
+        self._views: list[memoryview] = []
+        try:
+            self._open(verify)
+        except BaseException:
+            self.close()
+            raise
+
+    def _view(self, start: int, end: int, fmt: str) -> Any:
+        raw = memoryview(self.map)[start:end]
+        self._views.append(raw)
+        if sys.byteorder != "little":  # copy and swap instead of mapping
+            values = array(fmt, raw.tobytes())
+            values.byteswap()
+            return values
+        view = raw.cast(fmt)
+        self._views.append(view)
+        return view
+
+    def _open(self, verify: bool) -> None:
+        if len(self.map) < HEADER.size:
+            raise ValueError(f"{self.path}: not a tariff pack")
+        magic, fmt, header_size, width, n, n_providers, n_strings, string_bytes, source, checksum = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: not a tariff pack")
+        if fmt != FORMAT or header_size != HEADER.size:
+            raise ValueError(f"{self.path}: pack format {fmt}, expected {FORMAT}; rebuild it with `python -m carcalc pack`")
+        if width != len(OPTION_FIELDS):
+            raise ValueError(f"{self.path}: rows have {width} fields, the engine expects {len(OPTION_FIELDS)}")
+        rows_at, columns_at, providers_at, offsets_at, blob_at, size = _layout(width, n, n_providers, n_strings, string_bytes)
+        if len(self.map) != size:
+            raise ValueError(f"{self.path}: truncated or padded pack ({len(self.map)} bytes, expected {size})")
+        if verify:
+            h = hashlib.sha256(memoryview(self.map)[:CHECKSUM_OFFSET])
+            h.update(bytes(32))
+            with memoryview(self.map)[HEADER.size :] as rest:
+                h.update(rest)
+            if h.digest() != checksum:
+                raise ValueError(f"{self.path}: checksum mismatch (corrupt pack)")
+        self.source: bytes = source
+
+        values = self._view(rows_at, columns_at, "d")
+        rows = [values[i * width : (i + 1) * width] for i in range(n)]
+        self._views.extend(rows)
+        columns = self._view(columns_at, columns_at + 4 * len(COLUMNS) * n, "i")
+        strings = StringTable(self._view(offsets_at, blob_at, "I"), self._view(blob_at, size, "B"), (self.path, source))
+        ids = self._view(providers_at, providers_at + 16 * n_providers, "i")
+        providers = [Provider(*(strings[ids[4 * i + k]] for k in range(4))) for i in range(n_providers)]
+        per_option = [columns[k * n : (k + 1) * n] for k in range(len(COLUMNS))]
+        self._views.extend(c for c in per_option if isinstance(c, memoryview))
+        self.tariffs = Tariffs(
+            providers,
+            rows,
+            *(StringColumn(c, strings) for c in per_option[:-1]),
+            snowboard_fits=per_option[-1],
+        )
+
+    def close(self) -> None:
+        # Views into the mapping must be released before it can be closed (latest first).
+        for v in reversed(self._views):
+            if isinstance(v, memoryview):
+                v.release()
+        self._views.clear()
+        self.map.close()
+
+    def __enter__(self) -> Pack:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def mapped_pack(tariffs: Tariffs) -> tuple[Path, bytes] | None:
+    """(path, source version) of the pack `tariffs` is mapped from, None if it was not."""
+    column = tariffs.option_ids
+    return column.strings.origin if isinstance(column, StringColumn) else None
+
+
+def write(path: Path, data_dir: Path = DEFAULT_DATA_DIR) -> bool:
+    """Compile `data_dir` into the pack at `path`; False (and no write) when it is already identical."""
+    blob = encode(Tariffs.compile(load_data(data_dir)), source_version(data_dir))
+    try:
+        if path.read_bytes() == blob:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(path, [blob], binary=True)
+    return True
+
+
+def is_current(path: Path, data_dir: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+    except OSError:
+        return False
+    if len(head) != HEADER.size:
+        return False
+    magic, fmt, *_, source, _checksum = HEADER.unpack(head)
+    return magic == MAGIC and fmt == FORMAT and source == source_version(data_dir)
+
+
+def load_tariffs(data_dir: Path, pack_path: Path | None = None, shared: bool = True) -> Tariffs:
+    """Tariffs for `data_dir`: mapped from `pack_path` when it is current, compiled otherwise.
+
+    With `shared=False` (pricing in this process only) the mapped rows are copied into tuples,
+    which the engine reads ~15% faster than `memoryview` slices; the copy takes well under 1 ms.
+    """
+    if pack_path is not None:
+        if is_current(pack_path, data_dir):
+            tariffs = Pack(pack_path).tariffs  # the mapping lives as long as the tariffs reference it
+            return tariffs if shared else replace(tariffs, rows=[tuple(r) for r in tariffs.rows])
+        print(f"{pack_path} is missing or stale; compiling {data_dir} (run `python -m carcalc pack`)", file=sys.stderr)
+    return Tariffs.compile(load_data(data_dir))
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc pack",
+        description="Compile the TSVs into a memory-mappable tariff pack for fast process startup.",
+    )
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    ap.add_argument("--out", default=str(DEFAULT_PACK), help="Pack file (default: %(default)s).")
+    ap.add_argument("--check", action="store_true", help="Only check that the pack matches the TSVs (exit 1 if not).")
+    args = ap.parse_args(argv)
+
+    data_dir = Path(args.data_dir)
+    out = Path(args.out)
+    if args.check:
+        if is_current(out, data_dir):
+            print(f"{out} is up to date")
+            return 0
+        print(f"{out} is missing or stale; run `python -m carcalc pack`", file=sys.stderr)
+        return 1
+
+    written = write(out, data_dir)
+    started = time.perf_counter()
+    with Pack(out) as pack:
+        n = len(pack.tariffs)
+        opened = time.perf_counter() - started
+    print(
+        f"pack {pack.source.hex()}: {n} options, {out.stat().st_size / 1024:.0f} KiB; "
+        f"opens in {opened * 1000:.2f} ms{'' if written else '; unchanged'}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,203 @@
+"""Process-pool pricing with the compiled tariff rows in shared memory.
+
+The parent flattens `Tariffs.rows` into one float64 block in `multiprocessing.shared_memory`;
+workers attach by name and price straight from zero-copy `memoryview` row slices (no TSV
+parsing, no per-worker copy of the tariff table). Tariffs mapped from a pack (`carcalc.pack`)
+are already shared: workers map the same file instead. Context chunks are submitted with a bounded
+look-ahead, so idle workers pick up the next chunk while results are yielded in input order.
+
+`python -m carcalc scaling` reports throughput and scaling efficiency for 1..N workers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+from carcalc.calc import OPTION_FIELDS, TripContext, create_base_context
+from carcalc.data import DEFAULT_DATA_DIR
+from carcalc.engine import Provider, Quote, Tariffs, price_chunk
+from carcalc.pack import Pack, load_tariffs, mapped_pack
+
+ROW_WIDTH = len(OPTION_FIELDS)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class SharedSpec:
+    """Everything a worker needs to attach (small; pickled once per worker)."""
+
+    name: str
+    n_rows: int
+    providers: list[Provider]
+
+
+class SharedTariffs:
+    """Owner of the shared memory block; use as a context manager (unlinks on exit)."""
+
+    def __init__(self, tariffs: Tariffs) -> None:
+        flat = array("d")
+        for r in tariffs.rows:
+            flat.extend(r)
+        self.shm = SharedMemory(create=True, size=max(1, len(flat) * flat.itemsize))
+        self.shm.buf[: len(flat) * flat.itemsize] = flat.tobytes()
+        self.spec = SharedSpec(name=self.shm.name, n_rows=len(tariffs.rows), providers=list(tariffs.providers))
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> SharedTariffs:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class AttachedTariffs:
+    """A worker-side view of `SharedTariffs` as a (string-less) `Tariffs` for pricing."""
+
+    def __init__(self, spec: SharedSpec) -> None:
+        self.shm = SharedMemory(name=spec.name)
+        self.values = self.shm.buf.cast("d")
+        rows = [self.values[i * ROW_WIDTH : (i + 1) * ROW_WIDTH] for i in range(spec.n_rows)]
+        self.tariffs = Tariffs(providers=spec.providers, rows=rows)
+
+    def close(self) -> None:
+        # Views into the mapping must be released before it can be closed.
+        for r in self.tariffs.rows:
+            r.release()  # type: ignore[attr-defined]
+        self.values.release()
+        self.shm.close()
+
+
+_attached: AttachedTariffs | Pack | None = None
+
+
+def _init_worker(spec: SharedSpec) -> None:
+    global _attached
+    _attached = AttachedTariffs(spec)
+
+
+def _init_pack_worker(path: Path, source: bytes) -> None:
+    global _attached
+    _attached = Pack(path)
+    if _attached.source != source:
+        raise RuntimeError(f"{path} was rebuilt after the parent mapped it")
+
+
+def _run_in_worker(fn: Callable[..., T], chunk: list[Any], args: tuple[Any, ...]) -> T:
+    assert _attached is not None, "worker not initialized"
+    return fn(_attached.tariffs, chunk, *args)
+
+
+class ProcessPricer:
+    """Run chunk functions on `workers` processes sharing one tariff table."""
+
+    def __init__(self, tariffs: Tariffs, workers: int, prefetch: int = 2) -> None:
+        self.workers = workers
+        self.max_in_flight = max(1, workers * prefetch)
+        mapped = mapped_pack(tariffs)
+        self.shared = SharedTariffs(tariffs) if mapped is None else None
+        if self.shared is not None:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.shared.spec,))
+        else:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_pack_worker, initargs=mapped)
+
+    def map_chunks(self, fn: Callable[..., T], chunks: Iterable[list[Any]], *args: Any) -> Iterator[T]:
+        """Yield `fn(tariffs, chunk, *args)` per chunk in input order (at most `max_in_flight` chunks queued).
+
+        `fn` must be a module-level function so it can be sent to the workers.
+        """
+        in_flight: deque[Future[T]] = deque()
+        for chunk in chunks:
+            in_flight.append(self.pool.submit(_run_in_worker, fn, chunk, args))
+            if len(in_flight) >= self.max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def price_chunks(self, chunks: Iterable[list[TripContext]], provider_filter: str = "") -> Iterator[list[Quote | None]]:
+        """Cheapest option per context, chunk by chunk (see `carcalc.engine.price_chunks`)."""
+        return self.map_chunks(price_chunk, chunks, provider_filter)
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.shared is not None:
+            self.shared.close()
+
+    def __enter__(self) -> ProcessPricer:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def random_contexts(n: int, seed: int = 0) -> list[TripContext]:
+    """Scenario mix for benchmarks (short city hops through multi-day rentals)."""
+    rng = random.Random(seed)
+    base = datetime(2026, 1, 1)
+    out: list[TripContext] = []
+    for _ in range(n):
+        total = rng.choice([rng.randint(5, 120), rng.randint(60, 720), rng.randint(720, 4320)])
+        out.append(
+            create_base_context(
+                start=base + timedelta(minutes=rng.randrange(0, 365 * 1440, 15)),
+                total_min=total,
+                parking_min=rng.randint(0, total // 2),
+                dist_km=rng.randint(0, max(1, total // 2)),
+                airport=rng.random() < 0.1,
+                fuel_price_e95=1.70,
+                fuel_price_diesel=1.70,
+            )
+        )
+    return out
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc scaling",
+        description="Measure process-pool pricing throughput and scaling efficiency for 1..N workers.",
+    )
+    ap.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--scenarios", type=int, default=20_000)
+    ap.add_argument("--chunk-size", type=int, default=250)
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    ap.add_argument("--pack", default="", help="Map this tariff pack (`carcalc pack`) instead of compiling the TSVs.")
+    args = ap.parse_args(argv)
+
+    tariffs = load_tariffs(Path(args.data_dir), Path(args.pack) if args.pack else None)
+    contexts = random_contexts(args.scenarios)
+    chunks = [contexts[i : i + args.chunk_size] for i in range(0, len(contexts), args.chunk_size)]
+
+    print(f"{len(contexts):,} scenarios x {len(tariffs)} options, chunk size {args.chunk_size}")
+    print(f"{'workers':>7}  {'scenarios/s':>12}  {'speedup':>7}  {'efficiency':>10}")
+    base_rate = 0.0
+    for workers in range(1, args.max_workers + 1):
+        with ProcessPricer(tariffs, workers) as pricer:
+            # Warm the pool (fork + attach) outside the timed region.
+            list(pricer.price_chunks([[c] for c in contexts[:workers]]))
+            started = time.perf_counter()
+            for _ in pricer.price_chunks(chunks):
+                pass
+            rate = len(contexts) / (time.perf_counter() - started)
+        base_rate = base_rate or rate
+        speedup = rate / base_rate
+        print(f"{workers:>7}  {rate:>12,.0f}  {speedup:>6.2f}x  {speedup / workers:>9.0%}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,334 @@
+"""`carcalc parity`: differential fuzzing of the Python engine against `web/lib/calc.js`.
+
+One long-lived Node process (`parity_worker.mjs`, TZ=UTC so `Date` wall clock matches the naive
+datetimes here) prices batches of random cases sent as NDJSON over stdin; the same cases are
+priced with `compute_option_price` and every field of the result (totals, breakdown parts,
+tooltips) is compared. Cases are real options.tsv rows with randomly mutated fields, random
+vehicles/night windows and random trip contexts (discounts include negative and >100% inputs).
+
+After the option cases, a small fixed number of rank cases (`--rank-cases`) each rank the whole data
+set for a random context: `Tariffs.ranked` and `Tariffs.cheapest` (with its pruning bounds) against
+`computeAll`. They take ~40 ms each, so they run outside the timed cases/min stream.
+
+Exits with 1 on any mismatch, so it can gate engine changes:
+
+    python -m carcalc parity --cases 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Iterator, NamedTuple
+
+from carcalc.calc import TripContext, allocate_parking_night, compute_night_minutes, compute_option_price, create_base_context
+from carcalc.data import DEFAULT_DATA_DIR, load_data
+from carcalc.engine import Tariffs
+
+WORKER = Path(__file__).with_name("parity_worker.mjs")
+
+NUMERIC_FIELDS = [
+    "unlock_fee_eur", "reservation_fee_eur", "fixed_fee_eur", "trip_fee_eur", "min_total_eur", "cap_24h_eur",
+    "airport_fee_eur", "drive_day_min_rate_eur", "drive_night_min_rate_eur", "park_day_min_rate_eur",
+    "park_night_min_rate_eur", "km_rate_eur", "package_price_eur", "included_min", "included_km",
+    "over_km_rate_eur", "daily_price_eur", "daily_included_km", "daily_over_km_rate_eur",
+]
+FLAG_FIELDS = ["fuel_included", "daily_unlimited_km"]
+RANK_CASES = 50
+NIGHT_WINDOWS = [("22:00", "06:00"), ("23:00", "07:00"), ("00:00", "06:00"), ("06:00", "06:00"), ("", ""), ("25:00", "6")]
+
+
+def _fuzz_number(rng: random.Random) -> str:
+    return rng.choice(
+        [
+            "",
+            "0",
+            f"{rng.uniform(0, 5):.2f}",
+            f"{rng.uniform(0, 300):.2f}",
+            str(rng.randint(0, 3000)),
+            f"{rng.uniform(0, 5):.3f}".replace(".", ","),
+            "1 010",
+            "1.010",
+            "€ 2.49",
+            f"-{rng.uniform(0, 2):.2f}",
+            "n/a",
+        ]
+    )
+
+
+class CaseGenerator:
+    """Random pricing cases built from the real data (so most cases look like production ones)."""
+
+    def __init__(self, data_dir: Path, seed: int) -> None:
+        data = load_data(data_dir)
+        self.options = data.options
+        self.vehicles = data.vehicles_by_id
+        self.windows = {p["provider_id"]: (p["night_start"], p["night_end"]) for p in data.providers}
+        self.providers = [""] + list(self.windows)
+        self.rng = random.Random(seed)
+
+    def context(self) -> dict[str, Any]:
+        rng = self.rng
+        total = rng.choice([0, 1, 15, 59, 61, 240, 1439, 1440, 1441, 2880, 4321, rng.randint(0, 20_000), round(rng.uniform(0, 600), 1)])
+        start = datetime(2026, 1, 1) + timedelta(minutes=rng.randrange(0, 366 * 1440))
+        return {
+            "start": start.isoformat(),
+            "totalMin": total,
+            "parkingMin": rng.choice([0, total, rng.randint(0, int(total))]),
+            "distKm": rng.choice([0, 1, rng.randint(0, 80), rng.randint(0, 1500)]),
+            "airport": rng.random() < 0.2,
+            "fuelPriceE95": round(rng.uniform(0, 2.5), 3),
+            "fuelPriceDiesel": round(rng.uniform(0, 2.5), 3),
+            "consumptionOverride": rng.choice([0, 0, 7.5, round(rng.uniform(0, 15), 1)]),
+            "consumptionOverrideEnabled": rng.random() < 0.3,
+            # Negative and >100% inputs too: the engine must treat them exactly like calc.js does.
+            "discountCarguru": rng.choice([0, 0, 10, 25, 99, -10, -90, 150]),
+            "discountCitybeePercent": rng.choice([0, 0, 15, 50, -50, 120]),
+            "discountCitybeeMinutes": rng.choice([0, 0, 30, 1440, -30, 5000]),
+            "discountBolt": rng.choice([0, 0, 5, 20, -20, 200]),
+        }
+
+    def rank_case(self) -> dict[str, Any]:
+        return {"kind": "rank", "ctx": self.context(), "provider": self.rng.choice(self.providers)}
+
+    def case(self) -> dict[str, Any]:
+        rng = self.rng
+        option = dict(rng.choice(self.options))
+        if rng.random() < 0.6:
+            for k in rng.sample(NUMERIC_FIELDS, rng.randint(1, 5)):
+                option[k] = _fuzz_number(rng)
+        if rng.random() < 0.2:
+            option[rng.choice(FLAG_FIELDS)] = rng.choice(["", "0", "1", "true", "TRUE", "yes", "no"])
+        if rng.random() < 0.05:
+            option["option_type"] = rng.choice(["", "payg", " Package ", "daily", "HOURLY"])
+
+        vehicle: dict[str, Any] | None = self.vehicles.get(option.get("vehicle_id", ""))
+        r = rng.random()
+        if r < 0.1:
+            vehicle = None
+        elif r < 0.3:
+            vehicle = {
+                "fuel_type": rng.choice(["petrol", "diesel", "ev", "", "hydrogen"]),
+                "consumption_l_per_100km_default": rng.choice([None, 0, 5.5, round(rng.uniform(0, 20), 1)]),
+            }
+
+        window = self.windows.get(option.get("provider_id", ""), NIGHT_WINDOWS[0])
+        if rng.random() < 0.2:
+            window = rng.choice(NIGHT_WINDOWS)
+        return {"kind": "option", "ctx": self.context(), "option": option, "vehicle": vehicle, "night_start": window[0], "night_end": window[1]}
+
+    def batches(self, n: int, batch_size: int, make: Callable[[], dict[str, Any]] | None = None) -> Iterator[list[dict[str, Any]]]:
+        make = make or self.case
+        while n > 0:
+            size = min(n, batch_size)
+            n -= size
+            yield [make() for _ in range(size)]
+
+
+def base_context(c: dict[str, Any]) -> TripContext:
+    return create_base_context(
+        start=datetime.fromisoformat(c["start"]),
+        total_min=c["totalMin"],
+        parking_min=c["parkingMin"],
+        dist_km=c["distKm"],
+        airport=c["airport"],
+        fuel_price_e95=c["fuelPriceE95"],
+        fuel_price_diesel=c["fuelPriceDiesel"],
+        consumption_override=c["consumptionOverride"],
+        consumption_override_enabled=c["consumptionOverrideEnabled"],
+        discount_carguru=c["discountCarguru"],
+        discount_citybee_percent=c["discountCitybeePercent"],
+        discount_citybee_minutes=c["discountCitybeeMinutes"],
+        discount_bolt=c["discountBolt"],
+    )
+
+
+def price_case(case: dict[str, Any], tariffs: Tariffs) -> dict[str, Any]:
+    """Python side of one case (mirrors `priceCase` in parity_worker.mjs)."""
+    if case["kind"] == "rank":
+        return rank_case(case, tariffs)
+    ctx = base_context(case["ctx"])
+    night = compute_night_minutes(ctx.start, ctx.end, case["night_start"], case["night_end"])
+    a = allocate_parking_night(ctx.total_min, ctx.parking_min, min(ctx.total_min, max(0, night)))
+    ctx = replace(ctx, drive_day_min=a.drive_day, drive_night_min=a.drive_night, park_day_min=a.park_day, park_night_min=a.park_night)
+    try:
+        return compute_option_price(ctx, case["option"], case["vehicle"])
+    except Exception as e:  # reported as a mismatch, like an exception on the JS side
+        return {"ok": False, "exception": repr(e)}
+
+
+def rank_case(case: dict[str, Any], tariffs: Tariffs) -> dict[str, Any]:
+    """`computeAll`'s `{results, errors}` via `ranked`, plus the pruned `cheapest` (JS: first result)."""
+    try:
+        ctx = base_context(case["ctx"])
+        results, errors = tariffs.ranked(ctx, case["provider"])
+        quote = tariffs.cheapest(ctx, case["provider"])
+    except Exception as e:
+        return {"ok": False, "exception": repr(e)}
+    cheapest = None if quote is None else {"option_id": tariffs.option_ids[quote.index], "total_eur": quote.total_eur}
+    return {"results": results, "errors": errors, "cheapest": cheapest}
+
+
+def diff(py: Any, js: Any, path: str = "") -> list[str]:
+    """Field-level differences; JSON cannot carry NaN/Infinity, so those equal JS `null`."""
+    if isinstance(py, dict) and isinstance(js, dict):
+        out: list[str] = []
+        for k in sorted(set(py) | set(js)):
+            sub = f"{path}.{k}" if path else k
+            if k not in js or k not in py:
+                out.append(f"{sub}: {'missing in JS' if k not in js else 'missing in Python'}")
+            else:
+                out.extend(diff(py[k], js[k], sub))
+        return out
+    if isinstance(py, list) and isinstance(js, list):
+        if len(py) != len(js):
+            return [f"{path}: {len(py)} items in Python, {len(js)} in JS"]
+        return [d for i, (p, j) in enumerate(zip(py, js)) for d in diff(p, j, f"{path}[{i}]")]
+    if isinstance(py, float) and js is None and not math.isfinite(py):
+        return []
+    if isinstance(py, bool) or isinstance(js, bool):
+        same = py is js
+    else:
+        same = py == js  # int/float compare by value (JSON has one number type)
+    return [] if same else [f"{path}: py={py!r} js={js!r}"]
+
+
+class NodeWorker:
+    def __init__(self, node: str, data_dir: Path = DEFAULT_DATA_DIR) -> None:
+        self.proc = subprocess.Popen(
+            [node, str(WORKER), str(data_dir)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env={**os.environ, "TZ": "UTC"},
+            text=True,
+            encoding="utf-8",
+        )
+
+    def send(self, cases: list[dict[str, Any]]) -> None:
+        assert self.proc.stdin is not None
+        self.proc.stdin.write(json.dumps(cases, ensure_ascii=False) + "\n")
+        self.proc.stdin.flush()
+
+    def receive(self) -> list[dict[str, Any]]:
+        assert self.proc.stdout is not None
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"node worker exited with {self.proc.wait()}")
+        return json.loads(line)
+
+    def close(self) -> None:
+        if self.proc.stdin is not None:
+            self.proc.stdin.close()
+        self.proc.wait()
+        if self.proc.stdout is not None:
+            self.proc.stdout.close()
+
+
+class Result(NamedTuple):
+    cases: int
+    mismatches: int
+    seconds: float  # option cases only
+    rank_cases: int = 0
+    rank_mismatches: int = 0
+
+
+def compare(worker: NodeWorker, tariffs: Tariffs, batches: Iterable[list[dict[str, Any]]], report: IO[str] | None) -> tuple[int, int]:
+    """Price `batches` on both sides; returns (cases, mismatching cases)."""
+    n = bad = 0
+    for cases in batches:
+        # Lock-step: Node prices the batch while Python prices its side.
+        worker.send(cases)
+        ours = [price_case(c, tariffs) for c in cases]
+        theirs = worker.receive()
+        for case, py, js in zip(cases, ours, theirs):
+            problems = diff(py, js)
+            if problems:
+                bad += 1
+                if report is not None:
+                    report.write(json.dumps({"case": case, "diff": problems}, ensure_ascii=False) + "\n")
+        n += len(cases)
+    return n, bad
+
+
+def run(
+    n_cases: int,
+    *,
+    seed: int = 0,
+    batch_size: int = 500,
+    data_dir: Path = DEFAULT_DATA_DIR,
+    node: str = "node",
+    report: IO[str] | None = None,
+    rank_cases: int = RANK_CASES,
+) -> Result:
+    """Compare `n_cases` random option cases, then `rank_cases` rankings of all options."""
+    gen = CaseGenerator(data_dir, seed)
+    tariffs = Tariffs.compile(load_data(data_dir))
+    worker = NodeWorker(node, data_dir)
+    try:
+        started = time.monotonic()
+        n, bad = compare(worker, tariffs, gen.batches(n_cases, batch_size), report)
+        seconds = time.monotonic() - started
+        rank_n, rank_bad = compare(worker, tariffs, gen.batches(rank_cases, batch_size, gen.rank_case), report)
+    finally:
+        worker.close()
+    return Result(n, bad, seconds, rank_n, rank_bad)
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc parity",
+        description="Fuzz the Python engine against web/lib/calc.js (one long-lived node process) and report mismatches.",
+    )
+    ap.add_argument("--cases", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--batch-size", type=int, default=500)
+    ap.add_argument("--node", default="node", help="Node.js executable.")
+    ap.add_argument("--report", default="", help="Write mismatching cases (NDJSON: case + diff) here.")
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    ap.add_argument(
+        "--rank-cases",
+        type=int,
+        default=RANK_CASES,
+        help=f"Rankings of all options (computeAll) to compare after the option cases (default {RANK_CASES}; not in cases/min).",
+    )
+    args = ap.parse_args(argv)
+
+    if shutil.which(args.node) is None:
+        print(f"Node.js not found: {args.node}", file=sys.stderr)
+        return 2
+    if args.cases <= 0 or args.batch_size <= 0:
+        print("--cases and --batch-size must be > 0", file=sys.stderr)
+        return 2
+    if args.rank_cases < 0:
+        print("--rank-cases must be >= 0", file=sys.stderr)
+        return 2
+
+    report = open(args.report, "w", encoding="utf-8") if args.report else sys.stderr
+    try:
+        r = run(
+            args.cases,
+            seed=args.seed,
+            batch_size=args.batch_size,
+            data_dir=Path(args.data_dir),
+            node=args.node,
+            report=report,
+            rank_cases=args.rank_cases,
+        )
+    finally:
+        if report is not sys.stderr:
+            report.close()
+    rate = r.cases / r.seconds * 60 if r.seconds else 0
+    print(f"{r.cases:,} cases, {r.mismatches:,} mismatches in {r.seconds:.1f}s ({rate:,.0f} cases/min)", file=sys.stderr)
+    if r.rank_cases:
+        print(f"{r.rank_cases:,} rank cases, {r.rank_mismatches:,} mismatches", file=sys.stderr)
+    return 1 if r.mismatches or r.rank_mismatches else 0
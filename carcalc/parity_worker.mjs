@@ -0,0 +1,47 @@
+// Long-lived calc.js worker for `python -m carcalc parity`.
+// Reads one JSON array of cases per stdin line and writes one JSON array of
+// `computeOptionPrice` results (or, for `rank` cases, `computeAll` over the TSVs in
+// the data dir given as the first argument) per stdout line (same order). Run with TZ=UTC.
+import { readFileSync } from 'node:fs';
+import { join } from 'node:path';
+import readline from 'node:readline';
+
+import { allocateParkingNight, computeAll, computeNightMinutes, computeOptionPrice, createBaseContext } from '../web/lib/calc.js';
+import { normalizeData } from '../web/lib/data.js';
+import { parseTsv } from '../web/lib/tsv.js';
+
+const dataDir = process.argv[2];
+const read = (name) => parseTsv(readFileSync(join(dataDir, `${name}.tsv`), 'utf8')).data;
+const data = normalizeData({ providers: read('providers'), vehicles: read('vehicles'), options: read('options') });
+
+function rankCase(c) {
+  const ctx = createBaseContext({ ...c.ctx, start: new Date(c.ctx.start) });
+  const { results, errors } = computeAll(data, ctx, c.provider);
+  const cheapest = results.length ? { option_id: results[0].option_id, total_eur: results[0].total_eur } : null;
+  return { results, errors, cheapest };
+}
+
+function priceCase(c) {
+  try {
+    if (c.kind === 'rank') return rankCase(c);
+    const ctx = createBaseContext({ ...c.ctx, start: new Date(c.ctx.start) });
+    const nightMin = computeNightMinutes(ctx.start, ctx.end, c.night_start, c.night_end);
+    const alloc = allocateParkingNight(ctx.totalMin, ctx.parkingMin, Math.min(ctx.totalMin, Math.max(0, nightMin)));
+    const perCtx = {
+      ...ctx,
+      driveDayMin: alloc.driveDay,
+      driveNightMin: alloc.driveNight,
+      parkDayMin: alloc.parkDay,
+      parkNightMin: alloc.parkNight,
+    };
+    return computeOptionPrice(perCtx, c.option, c.vehicle);
+  } catch (e) {
+    return { ok: false, exception: String(e) };
+  }
+}
+
+const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+for await (const line of rl) {
+  if (!line) continue;
+  process.stdout.write(JSON.stringify(JSON.parse(line).map(priceCase)) + '\n');
+}
@@ -0,0 +1,340 @@
+"""`carcalc reprice`: stream a trip log through the batch engine and emit the cheapest option per trip.
+
+Input is CSV (with header) or NDJSON with at least `start`, `total_min`, `parking_min`, `km` and
+optionally `airport`. Extra columns are passed through unchanged. Rows are read, priced and written
+one chunk at a time, so memory stays flat regardless of input size.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import sys
+import time
+from collections import deque
+from dataclasses import astuple, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, NamedTuple
+
+from carcalc.calc import TripContext, create_base_context, parse_duration_to_minutes
+from carcalc.data import DEFAULT_DATA_DIR
+from carcalc.engine import Quote, Tariffs, price_chunks
+from carcalc.pack import load_tariffs
+from carcalc.parallel import ProcessPricer
+
+OUTPUT_FIELDS = ["option_id", "provider_id", "vehicle_id", "option_name", "total_eur", "error"]
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+# Longer trips are input errors; the night-window walk is per day and `end` must stay a valid datetime.
+MAX_TRIP_MIN = 366 * 1440
+
+
+@dataclass(frozen=True)
+class ContextDefaults:
+    """Trip-independent calculator inputs (same defaults as the web app)."""
+
+    fuel_price_e95: float = 1.70
+    fuel_price_diesel: float = 1.70
+    consumption_override: float = 0.0
+    discount_carguru: float = 0.0
+    discount_citybee_percent: float = 0.0
+    discount_citybee_minutes: float = 0.0
+    discount_bolt: float = 0.0
+
+
+class BadLine(NamedTuple):
+    """An input line that did not parse; `trip_context` raises its error."""
+
+    error: str
+
+
+def add_context_arguments(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--fuel-price-e95", type=float, default=1.70)
+    ap.add_argument("--fuel-price-diesel", type=float, default=1.70)
+    ap.add_argument("--consumption-override", type=float, default=0.0, help="L/100km for all fuel cars (0 = vehicle default).")
+    ap.add_argument("--discount-carguru", type=float, default=0.0)
+    ap.add_argument("--discount-citybee-percent", type=float, default=0.0)
+    ap.add_argument("--discount-citybee-minutes", type=float, default=0.0)
+    ap.add_argument("--discount-bolt", type=float, default=0.0)
+
+
+def context_defaults(args: argparse.Namespace) -> ContextDefaults:
+    return ContextDefaults(
+        fuel_price_e95=args.fuel_price_e95,
+        fuel_price_diesel=args.fuel_price_diesel,
+        consumption_override=args.consumption_override,
+        discount_carguru=args.discount_carguru,
+        discount_citybee_percent=args.discount_citybee_percent,
+        discount_citybee_minutes=args.discount_citybee_minutes,
+        discount_bolt=args.discount_bolt,
+    )
+
+
+def finite(name: str, v: float) -> float:
+    if not math.isfinite(v):
+        raise ValueError(f"{name} must be a finite number")
+    return v
+
+
+def parse_minutes(v: object) -> float:
+    s = str(v if v is not None else "").strip()
+    if ":" in s:
+        return parse_duration_to_minutes(s)
+    return float(s) if s else 0.0
+
+
+def parse_start(v: object) -> datetime:
+    dt = datetime.fromisoformat(str(v).strip())
+    # Night windows are wall-clock based; drop any offset instead of converting.
+    return dt.replace(tzinfo=None)
+
+
+def trip_context(trip: Any, defaults: ContextDefaults = ContextDefaults()) -> TripContext:
+    """Build a context from one trip row; raises ValueError on bad input."""
+    if isinstance(trip, BadLine):
+        raise ValueError(trip.error)
+    if not isinstance(trip, dict):
+        raise ValueError("trip must be a JSON object")
+    total_min = max(0.0, finite("total_min", parse_minutes(trip.get("total_min"))))
+    parking_min = max(0.0, finite("parking_min", parse_minutes(trip.get("parking_min"))))
+    if total_min > MAX_TRIP_MIN:
+        raise ValueError(f"total_min must be <= {MAX_TRIP_MIN}")
+    if parking_min > total_min:
+        raise ValueError("parking_min must be <= total_min")
+    km = finite("km", float(trip.get("km") or 0))
+    if not all(math.isfinite(v) for v in astuple(defaults)):
+        raise ValueError("fuel prices, consumption and discounts must be finite numbers")
+    start = parse_start(trip.get("start"))
+    if start.year >= datetime.max.year:
+        raise ValueError("start is out of range")
+    airport = trip.get("airport")
+    return create_base_context(
+        start=start,
+        total_min=total_min,
+        parking_min=parking_min,
+        # The web app rounds distance up to whole km.
+        dist_km=math.ceil(km),
+        airport=airport is True or str(airport or "").strip().lower() in TRUE_VALUES,
+        fuel_price_e95=defaults.fuel_price_e95,
+        fuel_price_diesel=defaults.fuel_price_diesel,
+        consumption_override=defaults.consumption_override,
+        consumption_override_enabled=defaults.consumption_override > 0,
+        discount_carguru=defaults.discount_carguru,
+        discount_citybee_percent=defaults.discount_citybee_percent,
+        discount_citybee_minutes=defaults.discount_citybee_minutes,
+        discount_bolt=defaults.discount_bolt,
+    )
+
+
+def read_trips(f: IO[str], fmt: str) -> Iterator[Any]:
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+        return
+    for line in f:
+        if not line.strip():
+            continue
+        # A bad line is passed on (and rejected by `trip_context`) so it costs one row, not the run.
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield BadLine(f"invalid JSON: {e}")
+
+
+def chunked(it: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    it = iter(it)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+
+def reprice(
+    trips: Iterable[dict[str, Any]],
+    tariffs: Tariffs,
+    *,
+    chunk_size: int = 10_000,
+    provider_filter: str = "",
+    defaults: ContextDefaults = ContextDefaults(),
+    pricer: ProcessPricer | None = None,
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield output rows chunk by chunk (input fields + OUTPUT_FIELDS).
+
+    With a `pricer`, chunks are priced on its worker processes (still in input order).
+    """
+    pending: deque[tuple[list[dict[str, Any]], list[dict[str, Any]]]] = deque()
+
+    def contexts() -> Iterator[list[TripContext]]:
+        for chunk in chunked(trips, chunk_size):
+            ctxs: list[TripContext] = []
+            priced_rows: list[dict[str, Any]] = []
+            out: list[dict[str, Any]] = []
+            for trip in chunk:
+                row = dict(trip) if isinstance(trip, dict) else {}
+                try:
+                    ctxs.append(trip_context(trip, defaults))
+                except (TypeError, ValueError) as e:
+                    row.update({k: "" for k in OUTPUT_FIELDS})
+                    row["error"] = str(e)
+                else:
+                    priced_rows.append(row)
+                out.append(row)
+            pending.append((out, priced_rows))
+            yield ctxs
+
+    if pricer is None:
+        results = price_chunks(tariffs, contexts(), provider_filter)
+    else:
+        results = pricer.price_chunks(contexts(), provider_filter)
+    for quotes in results:
+        out, priced_rows = pending.popleft()
+        for row, quote in zip(priced_rows, quotes):
+            row.update(quote_fields(tariffs, quote))
+        yield out
+
+
+def quote_fields(tariffs: Tariffs, quote: Quote | None) -> dict[str, Any]:
+    if quote is None:
+        return {k: "" for k in OUTPUT_FIELDS} | {"error": "no priceable options"}
+    i = quote.index
+    return {
+        "option_id": tariffs.option_ids[i],
+        "provider_id": tariffs.provider_ids[i],
+        "vehicle_id": tariffs.vehicle_ids[i],
+        "option_name": tariffs.option_names[i],
+        "total_eur": quote.total_eur,
+        "error": "",
+    }
+
+
+class Progress:
+    def __init__(self, out: IO[str], interval_s: float) -> None:
+        self.out = out
+        self.interval_s = interval_s
+        self.rows = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self.last_report = self.started
+
+    def add(self, rows: list[dict[str, Any]]) -> None:
+        self.rows += len(rows)
+        self.errors += sum(1 for r in rows if r.get("error"))
+        now = time.monotonic()
+        if self.interval_s > 0 and now - self.last_report >= self.interval_s:
+            self.last_report = now
+            print(f"reprice: {self.rows:,} rows ({self.rate():,.0f} rows/s)", file=self.out, flush=True)
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started
+        return f"Repriced {self.rows:,} trips ({self.errors:,} errors) in {elapsed:.1f}s ({self.rate():,.0f} rows/s)"
+
+
+def detect_format(path: str, explicit: str) -> str:
+    if explicit:
+        return explicit
+    return "ndjson" if Path(path).suffix.lower() in {".ndjson", ".jsonl", ".json"} else "csv"
+
+
+class RowWriter:
+    """CSV or NDJSON writer.
+
+    The CSV header is every input field seen in the first chunk (in order of first appearance),
+    then OUTPUT_FIELDS. Fields first seen in later chunks (NDJSON input) are dropped with a warning
+    on `warn`, once per field.
+    """
+
+    def __init__(self, f: IO[str], fmt: str, warn: IO[str] | None = None) -> None:
+        self.f = f
+        self.fmt = fmt
+        self.warn = warn
+        self.csv: csv.DictWriter[str] | None = None
+        self.dropped: set[str] = set()
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        if self.fmt == "ndjson":
+            self.f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+        else:
+            if self.csv is None and rows:
+                keys = dict.fromkeys(k for r in rows for k in r if k not in OUTPUT_FIELDS)
+                self.csv = csv.DictWriter(self.f, fieldnames=[*keys, *OUTPUT_FIELDS], lineterminator="\n", extrasaction="ignore")
+                self.csv.writeheader()
+            if self.csv is not None:
+                header = set(self.csv.fieldnames)
+                new = sorted({k for r in rows for k in r} - header - self.dropped)
+                if new and self.warn is not None:
+                    print(f"CSV output: dropping fields not in the header: {', '.join(new)}", file=self.warn)
+                self.dropped.update(new)
+                self.csv.writerows(rows)
+        self.f.flush()
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc reprice",
+        description="Reprice a trip log (CSV/NDJSON) against the current TSV data: cheapest option and total per trip.",
+    )
+    ap.add_argument("input", help="Trips file (CSV with header or NDJSON); '-' for stdin.")
+    ap.add_argument("-o", "--output", default="-", help="Output file (default: stdout).")
+    ap.add_argument("--input-format", choices=["csv", "ndjson"], default="", help="Default: from file extension (csv).")
+    ap.add_argument(
+        "--output-format",
+        choices=["csv", "ndjson"],
+        default="",
+        help="Default: from file extension, else input format. "
+        "The CSV header is the input fields of the first chunk plus the output fields; "
+        "fields that only appear later are dropped (with a warning).",
+    )
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="Directory with providers/vehicles/options TSVs.")
+    ap.add_argument("--pack", default="", help="Map this tariff pack (`carcalc pack`) instead of compiling the TSVs.")
+    ap.add_argument("--chunk-size", type=int, default=10_000, help="Trips priced per chunk (bounds memory).")
+    ap.add_argument("--provider", default="", help="Only consider this provider_id.")
+    ap.add_argument("--workers", type=int, default=1, help="Worker processes (tariffs shared via shared memory).")
+    ap.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines on stderr (0 = off).")
+    add_context_arguments(ap)
+    args = ap.parse_args(argv)
+
+    if args.chunk_size <= 0:
+        print("--chunk-size must be > 0", file=sys.stderr)
+        return 2
+    if args.workers <= 0:
+        print("--workers must be > 0", file=sys.stderr)
+        return 2
+    if args.input != "-" and not Path(args.input).exists():
+        print(f"File not found: {args.input}", file=sys.stderr)
+        return 2
+
+    in_fmt = detect_format(args.input, args.input_format)
+    out_fmt = args.output_format or (detect_format(args.output, "") if args.output != "-" else in_fmt)
+    defaults = context_defaults(args)
+    tariffs = load_tariffs(Path(args.data_dir), Path(args.pack) if args.pack else None, shared=args.workers > 1)
+
+    fin = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    fout = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    progress = Progress(sys.stderr, args.progress_interval)
+    pricer = ProcessPricer(tariffs, args.workers) if args.workers > 1 else None
+    try:
+        writer = RowWriter(fout, out_fmt, sys.stderr)
+        for rows in reprice(
+            read_trips(fin, in_fmt),
+            tariffs,
+            chunk_size=args.chunk_size,
+            provider_filter=args.provider,
+            defaults=defaults,
+            pricer=pricer,
+        ):
+            writer.write(rows)
+            progress.add(rows)
+    finally:
+        if pricer is not None:
+            pricer.close()
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+
+    print(progress.summary(), file=sys.stderr)
+    return 0
@@ -0,0 +1,750 @@
+"""`carcalc serve`: local HTTP pricing service with the tariffs compiled once at startup.
+
+Endpoints (JSON in, JSON out; HTTP/1.1 keep-alive):
+
+- `GET|POST /price` -> `{"results": [...], "errors": [...]}` with the same fields as `computeAll`.
+  Trip fields as in `carcalc reprice` (`start`, `total_min`, `parking_min`, `km`, `airport`),
+  plus optional `provider`, `fuel_price_e95`, `fuel_price_diesel`, `consumption_override`,
+  `discount_*`, `limit` (top N rows) and `breakdown` (`0` = totals only). Ranking runs on the
+  fast totals path; breakdowns are only built for the rows returned.
+- `GET|POST /option/{option_id}/breakdown` -> one `computeAll` result row for that option.
+- `POST /price/batch` -> NDJSON in (one trip object per line), NDJSON out with chunked transfer
+  encoding: one `{"line", ["id",] "results", "errors"}` (or `{"line", "error"}`) per input line,
+  written as each chunk of `BATCH_CHUNK_SIZE` lines is priced, so memory is bounded by the
+  chunk size. Query parameters: `k` (top-k rows per scenario, default 1, 0 = all),
+  `breakdown` (default 0 = totals only), `provider`. Request bodies may themselves be chunked.
+- `GET /live?<trip params>&limit=N&debounce_ms=50` -> Server-Sent Events with top-N rankings;
+  `POST /live/{session_id}` with only the changed fields updates them (see `carcalc.live`).
+- `POST /overlay/{user}` with `{"options": [...], "vehicles": [...]}` (TSV-style rows keyed by
+  `option_id` / `vehicle_id`) merges rows into that user's tariff overlay; `GET` returns it and
+  `DELETE` drops it. Pricing requests with `user=<user>` (query or body) are priced on the shared
+  data with the user's rows applied copy-on-write (see `carcalc.overlay`). Overlays live in memory.
+- `GET /health` -> option count, the live data snapshot (`version`, `loaded_at`) and response
+  cache stats (hits, misses, coalesced requests, hit ratio).
+- `GET /metrics` -> Prometheus text format: per-route latency histograms and response codes,
+  options evaluated, cache counters, snapshot version/age, reload durations, admission queue
+  depth and shed/degraded counts, process RSS/CPU.
+
+With `--max-concurrent N` at most N requests price at once and the rest queue briefly; when the
+queue is full or a request's queue deadline passes it gets `503` with `Retry-After`, and while the
+queue is backed up `/price` answers in a cheaper degraded mode (top-k totals only, `"degraded":
+true`). See `carcalc.admission`.
+
+`/price` and breakdown responses are cached by canonical request and overlay revision (`carcalc.cache`, `--cache-mb`);
+concurrent identical requests are priced once.
+
+With `--reload-interval` (default 1 s) the service watches `web/data/*.tsv` and swaps in a newly
+compiled snapshot after edits (see `carcalc.snapshot`); every request, a batch included, is
+priced entirely on the snapshot that was live when it started.
+
+GET takes query parameters, POST a JSON object body.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from dataclasses import fields, replace
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Iterator
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from carcalc.admission import AdmissionController, Shed
+from carcalc.cache import ResponseCache
+from carcalc.calc import TripContext
+from carcalc.data import DEFAULT_DATA_DIR, load_data
+from carcalc.engine import Tariffs, price_chunk
+from carcalc.live import LiveSession, LiveSessions, stream
+from carcalc.metrics import Counter, Histogram, family, fmt, label_str, metric, process_metrics
+from carcalc.overlay import OverlayStore
+from carcalc.reprice import TRUE_VALUES, ContextDefaults, add_context_arguments, chunked, context_defaults, trip_context
+from carcalc.snapshot import DataWatcher, Snapshot
+
+MAX_BODY_BYTES = 1 << 20
+BATCH_CHUNK_SIZE = 500
+LIVE_LIMIT = 10
+LIVE_DEBOUNCE_MS = 50
+DEFAULT_FIELDS = {f.name for f in fields(ContextDefaults)}
+
+
+class RequestError(Exception):
+    def __init__(self, status: HTTPStatus, message: str, headers: dict[str, str] | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+def parse_flag(v: object, default: bool) -> bool:
+    if v is None or v == "":
+        return default
+    return v is True or str(v).strip().lower() in TRUE_VALUES
+
+
+def encode(payload: dict[str, Any]) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def breakdown_route(path: str) -> str | None:
+    """`option_id` for `/option/{option_id}/breakdown` paths."""
+    parts = path.split("/")
+    if len(parts) == 4 and parts[1] == "option" and parts[3] == "breakdown":
+        return unquote(parts[2])
+    return None
+
+
+ROUTES = ("/price", "/price/batch", "/option/{id}/breakdown", "/live", "/live/{id}", "/overlay/{user}", "/health", "/metrics")
+
+
+def route_name(path: str) -> str:
+    """Metrics label for a request path (bounded set, so unknown paths can't blow up cardinality)."""
+    if path in ROUTES:
+        return path
+    if breakdown_route(path) is not None:
+        return "/option/{id}/breakdown"
+    if path.startswith("/overlay/"):
+        return "/overlay/{user}"
+    return "/live/{id}" if path.startswith("/live/") else "other"
+
+
+class ServiceMetrics:
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.latency = {route: Histogram() for route in (*ROUTES, "other")}
+        self.responses: dict[tuple[str, int], Counter] = {}
+        self.options_evaluated = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, status: int, seconds: float) -> None:
+        self.latency[route].observe(seconds)
+        counter = self.responses.get((route, status))
+        if counter is None:
+            with self._lock:
+                counter = self.responses.setdefault((route, status), Counter())
+        counter.inc()
+
+    def response_counters(self) -> list[tuple[tuple[str, int], Counter]]:
+        with self._lock:
+            return sorted(self.responses.items(), key=lambda item: item[0])
+
+
+class PricingService:
+    """Request handling independent of HTTP (also used by tests)."""
+
+    def __init__(
+        self,
+        tariffs: Tariffs,
+        defaults: ContextDefaults = ContextDefaults(),
+        cache_bytes: int = 64 << 20,
+        admission: AdmissionController | None = None,
+    ) -> None:
+        self.snapshot = Snapshot.build(tariffs)
+        self.defaults = defaults
+        # Keys carry the snapshot version, so entries for replaced data are never hit and age out.
+        self.cache = ResponseCache(cache_bytes)
+        self.metrics = ServiceMetrics()
+        self.watcher: DataWatcher | None = None  # reload metrics, when hot reload is on
+        self.live = LiveSessions()
+        self.overlays = OverlayStore()
+        self.admission = admission  # None: no concurrency limit
+        self._swap_lock = threading.Lock()
+
+    @property
+    def tariffs(self) -> Tariffs:
+        return self.snapshot.tariffs
+
+    def swap(self, tariffs: Tariffs) -> Snapshot:
+        """Make `tariffs` live; requests already running keep the snapshot they started with."""
+        with self._swap_lock:
+            self.snapshot = Snapshot.build(tariffs, self.snapshot.version + 1)
+        self.live.notify_all()
+        return self.snapshot
+
+    def context(self, params: dict[str, Any]) -> TripContext:
+        overrides = {k: float(params[k]) for k in DEFAULT_FIELDS if params.get(k) not in (None, "")}
+        defaults = replace(self.defaults, **overrides) if overrides else self.defaults
+        if params.get("start") in (None, ""):
+            raise ValueError("start is required")
+        return trip_context(params, defaults)
+
+    def price_args(self, params: dict[str, Any]) -> tuple[TripContext, str, int | None, bool]:
+        """Canonical `/price` request: (context, provider filter, limit, with breakdowns)."""
+        try:
+            ctx = self.context(params)
+            limit = int(params["limit"]) if params.get("limit") not in (None, "") else None
+        except (TypeError, ValueError, OverflowError) as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e)) from None
+        if limit is not None and limit < 0:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "limit must be >= 0")
+        return ctx, str(params.get("provider") or ""), limit, parse_flag(params.get("breakdown"), True)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a pricing slot (see `carcalc.admission`); a shed request raises a 503 `RequestError`."""
+        if self.admission is None:
+            yield
+            return
+        try:
+            self.admission.acquire()
+        except Shed as e:
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, str(e), {"Retry-After": str(e.retry_after)}) from None
+        try:
+            yield
+        finally:
+            self.admission.release()
+
+    def admitted(self, compute: Callable[[], bytes]) -> bytes:
+        with self.slot():
+            return compute()
+
+    def degrade(self, args: tuple[TripContext, str, int | None, bool]) -> tuple[TripContext, str, int | None, bool] | None:
+        """Degraded-mode `/price` args (top-k totals only) while admission is saturated, else None."""
+        adm = self.admission
+        if adm is None or not adm.saturated:
+            return None
+        adm.degraded.inc()
+        ctx, provider, limit, _ = args
+        return ctx, provider, adm.degraded_limit if limit is None else min(limit, adm.degraded_limit), False
+
+    def view(self, params: dict[str, Any]) -> Snapshot:
+        """The live snapshot, with the overlay of `params["user"]` applied when there is one."""
+        snap = self.snapshot
+        user = str(params.get("user") or "")
+        if not user:
+            return snap
+        try:
+            return self.overlays.view(snap, user)
+        except ValueError as e:  # rows that no longer compile against reloaded data
+            raise RequestError(HTTPStatus.CONFLICT, f"overlay of {user}: {e}") from None
+
+    def price(self, params: dict[str, Any]) -> dict[str, Any]:
+        return self._price(self.view(params), *self.price_args(params))
+
+    def _price(self, snap: Snapshot, ctx: TripContext, provider: str, limit: int | None, detail: bool) -> dict[str, Any]:
+        results, errors = snap.tariffs.ranked(ctx, provider, limit=limit, detail=detail)
+        self.metrics.options_evaluated.inc(snap.option_count(provider))
+        return {"results": results, "errors": errors}
+
+    def breakdown_args(self, snap: Snapshot, option_id: str, params: dict[str, Any]) -> tuple[int, TripContext]:
+        index = snap.option_index.get(option_id)
+        if index is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"Unknown option_id: {option_id}")
+        try:
+            return index, self.context(params)
+        except (TypeError, ValueError, OverflowError) as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e)) from None
+
+    def breakdown(self, option_id: str, params: dict[str, Any]) -> dict[str, Any]:
+        snap = self.view(params)
+        return self._breakdown(snap, *self.breakdown_args(snap, option_id, params))
+
+    def _breakdown(self, snap: Snapshot, index: int, ctx: TripContext) -> dict[str, Any]:
+        priced = snap.tariffs.breakdown(ctx, index)
+        self.metrics.options_evaluated.inc()
+        if not priced["ok"]:
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, priced["reason"])
+        return snap.tariffs.result_row(index, priced)
+
+    def price_batch(self, lines: Iterable[bytes], params: dict[str, Any], chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[bytes]:
+        """NDJSON output for NDJSON input lines, one encoded block per chunk of `chunk_size` lines."""
+        try:
+            k = int(params.get("k") or 1)
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "k must be an integer") from None
+        if k < 0:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "k must be >= 0")
+        detail = parse_flag(params.get("breakdown"), False)
+        provider_default = str(params.get("provider") or "")
+        return self._batch_chunks(self.view(params), lines, k or None, detail, provider_default, chunk_size)
+
+    def _batch_chunks(
+        self, snap: Snapshot, lines: Iterable[bytes], limit: int | None, detail: bool, provider_default: str, chunk_size: int
+    ) -> Iterator[bytes]:
+        tariffs = snap.tariffs
+        for chunk in chunked(((n, line) for n, line in enumerate(lines, 1) if line.strip()), chunk_size):
+            out: list[dict[str, Any]] = []
+            priced: list[tuple[dict[str, Any], TripContext, str]] = []
+            for n, line in chunk:
+                row: dict[str, Any] = {"line": n}
+                try:
+                    item = json.loads(line)
+                    if not isinstance(item, dict):
+                        raise ValueError("line must be a JSON object")
+                    if "id" in item:
+                        row["id"] = item["id"]
+                    priced.append((row, self.context(item), str(item.get("provider") or provider_default)))
+                except (TypeError, ValueError, OverflowError) as e:
+                    row["error"] = str(e)
+                out.append(row)
+
+            if limit == 1 and not detail:
+                # Cheapest-only is the common nightly case: the pruned engine path, chunk at a time.
+                by_provider: dict[str, list[tuple[dict[str, Any], TripContext, str]]] = {}
+                for p in priced:
+                    by_provider.setdefault(p[2], []).append(p)
+                for provider, group in by_provider.items():
+                    for (row, _, _), quote in zip(group, price_chunk(tariffs, [ctx for _, ctx, _ in group], provider)):
+                        row["results"] = [] if quote is None else [tariffs.result_row(quote.index, {"total_eur": quote.total_eur})]
+                        row["errors"] = []
+            else:
+                for row, ctx, provider in priced:
+                    row["results"], row["errors"] = tariffs.ranked(ctx, provider, limit=limit, detail=detail)
+            self.metrics.options_evaluated.inc(sum(snap.option_count(provider) for _, _, provider in priced))
+
+            yield "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in out).encode("utf-8")
+
+    def open_live(self, params: dict[str, Any]) -> LiveSession:
+        try:
+            debounce_s = float(params.pop("debounce_ms", None) or LIVE_DEBOUNCE_MS) / 1000
+            if not math.isfinite(debounce_s):
+                raise ValueError
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "debounce_ms must be a finite number") from None
+        state = {"limit": LIVE_LIMIT} | params | {"breakdown": 0}
+        self.price_args(state)  # reject bad initial inputs with a 400 instead of an error event
+        session = self.live.open(state, debounce_s)  # clamped to [0, MAX_DEBOUNCE_S]
+        if session is None:
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "too many live sessions")
+        return session
+
+    def live_update(self, session_id: str, delta: dict[str, Any]) -> dict[str, Any]:
+        session = self.live.get(session_id)
+        if session is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"Unknown live session: {session_id}")
+        delta.pop("breakdown", None)
+        session.update(delta)
+        return {"ok": True, "version": session.version}
+
+    def live_rank(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        try:
+            return json.loads(self.respond("GET", "/price", params))["results"]
+        except RequestError as e:
+            raise ValueError(str(e)) from None
+
+    def live_stream(self, session: LiveSession) -> Iterator[bytes]:
+        return stream(session, self.live_rank)
+
+    def close_live(self, session: LiveSession) -> None:
+        self.live.close(session)
+
+    def get_overlay(self, user: str) -> dict[str, Any]:
+        overlay = self.overlays.get(user)
+        if overlay is None:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No overlay for user: {user}")
+        return overlay.to_json()
+
+    def put_overlay(self, user: str, params: dict[str, Any]) -> dict[str, Any]:
+        try:
+            overlay = self.overlays.put(self.snapshot, user, params.get("options"), params.get("vehicles"))
+        except ValueError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e)) from None
+        if overlay is None:
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "too many overlays")
+        self.live.notify_all(user)
+        return {"user": user, "revision": overlay.revision, "options": len(overlay.options), "vehicles": len(overlay.vehicles)}
+
+    def delete_overlay(self, user: str) -> dict[str, Any]:
+        deleted = self.overlays.clear(user)
+        if deleted:
+            self.live.notify_all(user)
+        return {"ok": True, "deleted": deleted}
+
+    def metrics_text(self) -> bytes:
+        m = self.metrics
+        snap = self.snapshot
+        lines = family(
+            "carcalc_http_request_duration_seconds",
+            "histogram",
+            "Request latency by route (batches until the last line is written).",
+            (line for route, h in m.latency.items() for line in h.samples("carcalc_http_request_duration_seconds", label_str({"route": route}))),
+        )
+        lines += family(
+            "carcalc_http_responses_total",
+            "counter",
+            "Responses by route and status code.",
+            (f"carcalc_http_responses_total{{{label_str({'route': r, 'code': str(code)})}}} {c.value:.0f}" for (r, code), c in m.response_counters()),
+        )
+        lines += metric(
+            "carcalc_options_evaluated_total",
+            "counter",
+            "Options priced for requests (rate() = options/s; cache hits price nothing).",
+            m.options_evaluated.value,
+        )
+        stats = self.cache.stats()
+        for key, kind, help in (
+            ("hits", "counter", "Response cache hits."),
+            ("misses", "counter", "Response cache misses (priced)."),
+            ("coalesced", "counter", "Requests that waited for an identical in-flight request."),
+            ("evictions", "counter", "Response cache evictions."),
+            ("entries", "gauge", "Responses in the cache."),
+            ("bytes", "gauge", "Bytes of cached responses."),
+        ):
+            suffix = "_total" if kind == "counter" else ""
+            lines += metric(f"carcalc_cache_{key}{suffix}", kind, help, stats[key])
+        lines += metric("carcalc_snapshot_version", "gauge", "Version of the live data snapshot.", snap.version)
+        lines += metric("carcalc_snapshot_age_seconds", "gauge", "Seconds since the live snapshot was loaded.", time.time() - snap.loaded_at)
+        lines += metric("carcalc_snapshot_options", "gauge", "Options in the live snapshot.", len(snap.tariffs))
+        if self.admission is not None:
+            adm = self.admission
+            lines += metric("carcalc_admission_in_flight", "gauge", "Requests holding a pricing slot.", adm.active)
+            lines += metric("carcalc_admission_queue_depth", "gauge", "Requests waiting for a pricing slot.", len(adm.queue))
+            lines += metric("carcalc_admission_limit", "gauge", "Pricing slots (--max-concurrent).", adm.max_concurrent)
+            lines += family(
+                "carcalc_admission_shed_total",
+                "counter",
+                "Requests answered 503 without pricing, by reason.",
+                (f"carcalc_admission_shed_total{{{label_str({'reason': r})}}} {fmt(c.value)}" for r, c in adm.shed.items()),
+            )
+            lines += metric("carcalc_admission_degraded_total", "counter", "/price requests answered in degraded mode.", adm.degraded.value)
+            lines += family(
+                "carcalc_admission_queue_wait_seconds",
+                "histogram",
+                "Time admitted requests waited for a pricing slot.",
+                adm.queue_wait.samples("carcalc_admission_queue_wait_seconds"),
+            )
+        lines += metric("carcalc_overlay_users", "gauge", "Users with a tariff overlay.", len(self.overlays))
+        lines += metric("carcalc_overlay_rows", "gauge", "Option and vehicle rows across all overlays.", self.overlays.rows())
+        if self.watcher is not None:
+            w = self.watcher
+            lines += family(
+                "carcalc_reload_duration_seconds",
+                "histogram",
+                "Data reload (load + compile + validate) time.",
+                w.reload_seconds.samples("carcalc_reload_duration_seconds"),
+            )
+            lines += metric("carcalc_reloads_total", "counter", "Successful data reloads.", w.reloads)
+            lines += metric("carcalc_reload_failures_total", "counter", "Data reloads rejected (old data kept).", w.failures)
+        lines += process_metrics(m.started)
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def handle(self, method: str, path: str, params: dict[str, Any]) -> dict[str, Any]:
+        if path == "/health":
+            snap = self.snapshot
+            return {
+                "ok": True,
+                "options": len(snap.tariffs),
+                "snapshot": {"version": snap.version, "loaded_at": snap.loaded_at},
+                "cache": self.cache.stats(),
+                "overlays": len(self.overlays),
+                "admission": self.admission.stats() if self.admission is not None else None,
+            }
+        if path == "/price":
+            return self.price(params)
+        option_id = breakdown_route(path)
+        if option_id is not None:
+            return self.breakdown(option_id, params)
+        if method == "POST" and path.startswith("/live/"):
+            return self.live_update(unquote(path[len("/live/") :]), params)
+        if path.startswith("/overlay/") and len(path) > len("/overlay/"):
+            user = unquote(path[len("/overlay/") :])
+            if method == "GET":
+                return self.get_overlay(user)
+            if method == "POST":
+                return self.put_overlay(user, params)
+            if method == "DELETE":
+                return self.delete_overlay(user)
+        raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+
+    def respond(self, method: str, path: str, params: dict[str, Any]) -> bytes:
+        """Serialized `handle`, with /price and breakdown bodies served from the response cache."""
+        if path == "/price":
+            snap = self.view(params)
+            args = self.price_args(params)
+            degraded = self.degrade(args)
+            if degraded is not None:
+                return self.cache.get(
+                    (snap.version, snap.overlay, "degraded", *degraded),
+                    lambda: self.admitted(lambda: encode(self._price(snap, *degraded) | {"degraded": True})),
+                )
+            return self.cache.get((snap.version, snap.overlay, path, *args), lambda: self.admitted(lambda: encode(self._price(snap, *args))))
+        option_id = breakdown_route(path)
+        if option_id is not None:
+            snap = self.view(params)
+            index, ctx = self.breakdown_args(snap, option_id, params)
+            key = (snap.version, snap.overlay, "breakdown", index, ctx)
+            return self.cache.get(key, lambda: self.admitted(lambda: encode(self._breakdown(snap, index, ctx))))
+        return encode(self.handle(method, path, params))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive; every response carries Content-Length
+    server_version = "carcalc"
+    service: PricingService  # set on the subclass built by `make_server`
+    access_log = False
+
+    def setup(self) -> None:
+        super().setup()
+        # Responses are written as header + body; don't let Nagle hold the body back.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    status = 0
+
+    def send_response(self, code: int, message: str | None = None) -> None:
+        self.status = code
+        super().send_response(code, message)
+
+    def do_GET(self) -> None:
+        started = time.perf_counter()
+        self.status = 0
+        url = urlsplit(self.path)
+        try:
+            if url.path == "/metrics":
+                self.send_body(HTTPStatus.OK, self.service.metrics_text(), "text/plain; version=0.0.4; charset=utf-8")
+            elif url.path == "/live":
+                self.live(dict(parse_qsl(url.query)))
+            else:
+                self.respond(url.path, dict(parse_qsl(url.query)))
+        finally:
+            self.service.metrics.observe(route_name(url.path), self.status, time.perf_counter() - started)
+
+    def do_POST(self) -> None:
+        started = time.perf_counter()
+        self.status = 0
+        url = urlsplit(self.path)
+        try:
+            self.post(url.path, url.query)
+        finally:
+            self.service.metrics.observe(route_name(url.path), self.status, time.perf_counter() - started)
+
+    def do_DELETE(self) -> None:
+        started = time.perf_counter()
+        self.status = 0
+        url = urlsplit(self.path)
+        try:
+            self.respond(url.path, dict(parse_qsl(url.query)))
+        finally:
+            self.service.metrics.observe(route_name(url.path), self.status, time.perf_counter() - started)
+
+    def post(self, path: str, query: str) -> None:
+        if path == "/price/batch":
+            self.price_batch(dict(parse_qsl(query)))
+            return
+        try:
+            params = dict(parse_qsl(query)) | self.read_json()
+        except RequestError as e:
+            self.send_json(e.status, {"error": str(e)})
+            return
+        self.respond(path, params)
+
+    def content_length(self) -> int:
+        """The request's Content-Length (0 if absent); 400 and no keep-alive if it isn't a byte count."""
+        value = self.headers.get("Content-Length") or "0"
+        try:
+            length = int(value)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True  # the body can't be delimited
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"invalid Content-Length: {value!r}") from None
+        return length
+
+    def read_json(self) -> dict[str, Any]:
+        length = self.content_length()
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}") from None
+        if not isinstance(body, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "body must be a JSON object")
+        return body
+
+    def body_lines(self) -> Iterator[bytes]:
+        """Request body lines, for both Content-Length and chunked request bodies."""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            blocks = iter_chunked(self.rfile)
+        else:
+            blocks = iter_sized(self.rfile, self.content_length())  # checked before the response starts
+        return split_lines(blocks, MAX_BODY_BYTES)
+
+    def price_batch(self, params: dict[str, Any]) -> None:
+        try:
+            with self.service.slot():  # held until the last line is written
+                self.stream_batch(self.service.price_batch(self.body_lines(), params))
+        except RequestError as e:
+            self.close_connection = True  # the body was not consumed
+            self.send_json(e.status, {"error": str(e)}, e.headers)
+
+    def stream_batch(self, blocks: Iterator[bytes]) -> None:
+        self.start_chunked("application/x-ndjson; charset=utf-8")
+        try:
+            for block in blocks:
+                self.write_chunk(block)
+        except ValueError as e:
+            # Malformed framing or an oversized line: the stream can't be resynchronized.
+            self.close_connection = True
+            self.write_chunk(json.dumps({"error": str(e)}).encode("utf-8") + b"\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def live(self, params: dict[str, Any]) -> None:
+        try:
+            session = self.service.open_live(params)
+        except RequestError as e:
+            self.send_json(e.status, {"error": str(e)})
+            return
+        self.start_chunked("text/event-stream; charset=utf-8", {"Cache-Control": "no-cache"})
+        self.close_connection = True
+        try:
+            for event in self.service.live_stream(session):
+                self.write_chunk(event)
+        except OSError:
+            pass  # client went away (noticed on the next write, at the latest the heartbeat)
+        finally:
+            self.service.close_live(session)
+
+    def start_chunked(self, content_type: str, headers: dict[str, str] | None = None) -> None:
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, block: bytes) -> None:
+        if block:
+            self.wfile.write(b"%X\r\n%s\r\n" % (len(block), block))
+
+    def respond(self, path: str, params: dict[str, Any]) -> None:
+        try:
+            body = self.service.respond(self.command, path, params)
+        except RequestError as e:
+            self.send_json(e.status, {"error": str(e)}, e.headers)
+        except Exception:
+            # A bug must still answer the request instead of dropping the connection.
+            print(f"Unhandled error on {self.command} {path}:", file=sys.stderr)
+            traceback.print_exc()
+            self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"})
+        else:
+            self.send_body(HTTPStatus.OK, body)
+
+    def send_json(self, status: HTTPStatus, payload: dict[str, Any], headers: dict[str, str] | None = None) -> None:
+        self.send_body(status, encode(payload), headers=headers)
+
+    def send_body(
+        self, status: HTTPStatus, body: bytes, content_type: str = "application/json; charset=utf-8", headers: dict[str, str] | None = None
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.access_log:
+            super().log_message(format, *args)
+
+
+def iter_sized(f: IO[bytes], length: int, block_size: int = 1 << 16) -> Iterator[bytes]:
+    while length > 0:
+        block = f.read(min(block_size, length))
+        if not block:
+            raise ValueError("request body ended early")
+        length -= len(block)
+        yield block
+
+
+def iter_chunked(f: IO[bytes]) -> Iterator[bytes]:
+    """Decode a `Transfer-Encoding: chunked` request body."""
+    while True:
+        size_line = f.readline(1024)
+        try:
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise ValueError("malformed chunked body") from None
+        if size == 0:
+            while f.readline(1024) not in (b"\r\n", b"\n", b""):
+                pass  # trailers
+            return
+        block = f.read(size)
+        if len(block) != size:
+            raise ValueError("request body ended early")
+        f.readline(1024)
+        yield block
+
+
+def split_lines(blocks: Iterable[bytes], max_line: int) -> Iterator[bytes]:
+    pending = b""
+    for block in blocks:
+        pending += block
+        *lines, pending = pending.split(b"\n")
+        yield from lines
+        if len(pending) > max_line:
+            raise ValueError("line too long")
+    if pending:
+        yield pending
+
+
+def make_server(service: PricingService, host: str = "127.0.0.1", port: int = 8787, access_log: bool = False) -> ThreadingHTTPServer:
+    handler = type("BoundHandler", (Handler,), {"service": service, "access_log": access_log})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def log_swap(snap: Snapshot) -> None:
+    print(f"Data reloaded: snapshot {snap.version}, {len(snap.tariffs)} options", file=sys.stderr, flush=True)
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc serve",
+        description="Serve /price and /option/{id}/breakdown over HTTP with the TSV data compiled in memory.",
+    )
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    ap.add_argument("--access-log", action="store_true", help="Log every request to stderr.")
+    ap.add_argument("--cache-mb", type=float, default=64, help="Response cache size (0 disables caching).")
+    ap.add_argument(
+        "--reload-interval", type=float, default=1.0, help="Seconds between data/*.tsv change checks (0 disables hot reload)."
+    )
+    ap.add_argument(
+        "--max-concurrent", type=int, default=2 * (os.cpu_count() or 1), help="Requests priced at once (0 = no admission control)."
+    )
+    ap.add_argument("--max-queue", type=int, default=64, help="Requests waiting for a slot before new ones get 503.")
+    ap.add_argument("--queue-timeout-ms", type=float, default=500, help="Longest wait for a slot before a 503.")
+    ap.add_argument("--degrade-at", type=int, default=8, help="Queue depth that switches /price to degraded mode (0 = never).")
+    ap.add_argument("--degraded-limit", type=int, default=10, help="Rows per /price response in degraded mode.")
+    add_context_arguments(ap)
+    args = ap.parse_args(argv)
+
+    data_dir = Path(args.data_dir)
+    tariffs = Tariffs.compile(load_data(data_dir))
+    admission = None
+    if args.max_concurrent > 0:
+        admission = AdmissionController(
+            args.max_concurrent, args.max_queue, args.queue_timeout_ms / 1000, args.degrade_at, args.degraded_limit
+        )
+    service = PricingService(tariffs, context_defaults(args), cache_bytes=int(args.cache_mb * (1 << 20)), admission=admission)
+    server = make_server(service, args.host, args.port, args.access_log)
+    watcher = None
+    if args.reload_interval > 0:
+        watcher = service.watcher = DataWatcher(data_dir, lambda t: log_swap(service.swap(t)), args.reload_interval)
+        watcher.start()
+    print(f"Serving {len(tariffs)} options on http://{args.host}:{server.server_port}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        server.server_close()
+    return 0
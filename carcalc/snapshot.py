@@ -0,0 +1,140 @@
+"""Compiled tariff snapshots and hot reload of `web/data/*.tsv` for long-running processes.
+
+A `Snapshot` is immutable: readers take a reference once per request and keep using it, so a
+swap never affects in-flight work. `DataWatcher` polls the TSV mtimes; once a change has
+settled (unchanged for one more poll, so half-written files are not picked up) it loads,
+compiles and validates a new `Tariffs` off the request path and hands it to a callback that
+swaps it in. A snapshot that fails to load or validate is logged and the old one stays live.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Mapping
+
+from carcalc.calc import create_base_context
+from carcalc.data import load_data
+from carcalc.engine import Tariffs
+from carcalc.metrics import Histogram
+
+Fingerprint = tuple[tuple[str, int, int], ...]
+
+# Validation trip: every real tariff set prices at least one option for it.
+PROBE_CONTEXT = create_base_context(start=datetime(2026, 1, 5, 10, 0), total_min=60, parking_min=0, dist_km=20)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    tariffs: Tariffs
+    loaded_at: float = field(default_factory=time.time)
+    option_index: Mapping[str, int] = field(default_factory=dict, compare=False)
+    provider_options: dict[str, int] = field(default_factory=dict, compare=False)
+    # Base snapshots only: option indexes per vehicle_id, for recompiling a vehicle's options.
+    vehicle_options: dict[str, list[int]] = field(default_factory=dict, compare=False)
+    overlay: str = ""  # "<user>@<revision>" for per-user views (see `carcalc.overlay`)
+
+    @classmethod
+    def build(cls, tariffs: Tariffs, version: int = 1) -> Snapshot:
+        index: dict[str, int] = {}
+        by_vehicle: dict[str, list[int]] = {}
+        for i, option_id in enumerate(tariffs.option_ids):
+            index.setdefault(option_id, i)
+            by_vehicle.setdefault(tariffs.vehicle_ids[i], []).append(i)
+        return cls(
+            version=version,
+            tariffs=tariffs,
+            option_index=index,
+            provider_options=Counter(tariffs.provider_ids),
+            vehicle_options=by_vehicle,
+        )
+
+    def option_count(self, provider_filter: str = "") -> int:
+        """Options a pricing call with this filter looks at."""
+        return self.provider_options.get(provider_filter, 0) if provider_filter else len(self.tariffs)
+
+
+def fingerprint(data_dir: Path) -> Fingerprint:
+    out = []
+    for path in sorted(data_dir.glob("*.tsv")):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue  # replaced between glob and stat; the next poll sees the new file
+        out.append((path.name, st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+def validate(tariffs: Tariffs) -> None:
+    """Raise ValueError if `tariffs` should not replace a working snapshot."""
+    if not len(tariffs):
+        raise ValueError("no options")
+    if all(total is None for total in tariffs.totals(PROBE_CONTEXT)):
+        raise ValueError("no option prices the probe trip")
+
+
+def load_tariffs(data_dir: Path) -> Tariffs:
+    tariffs = Tariffs.compile(load_data(data_dir))
+    validate(tariffs)
+    return tariffs
+
+
+class DataWatcher(threading.Thread):
+    """Background thread calling `on_change(tariffs)` with freshly compiled data after TSV edits."""
+
+    def __init__(self, data_dir: Path, on_change: Callable[[Tariffs], object], interval: float = 1.0) -> None:
+        super().__init__(name="carcalc-data-watcher", daemon=True)
+        self.data_dir = data_dir
+        self.on_change = on_change
+        self.interval = interval
+        self.current = fingerprint(data_dir)
+        self.pending: Fingerprint | None = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_duration_s = 0.0
+        self.reload_seconds = Histogram()
+        self.last_error = ""
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.poll()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def poll(self) -> bool:
+        """One polling step; returns True if a new snapshot was handed to `on_change`."""
+        fp = fingerprint(self.data_dir)
+        if fp == self.current:
+            self.pending = None
+            return False
+        if fp != self.pending:
+            self.pending = fp  # still being written, maybe; wait for it to settle
+            return False
+        self.pending = None
+        self.current = fp
+        return self.reload()
+
+    def reload(self) -> bool:
+        started = time.perf_counter()
+        try:
+            tariffs = load_tariffs(self.data_dir)
+        except Exception as e:  # a bad edit must not take the service down
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"carcalc: keeping the current data, reload failed: {self.last_error}", file=sys.stderr, flush=True)
+            return False
+        finally:
+            self.last_duration_s = time.perf_counter() - started
+            self.reload_seconds.observe(self.last_duration_s)
+        self.on_change(tariffs)
+        self.reloads += 1
+        self.last_error = ""
+        return True
@@ -0,0 +1,235 @@
+"""`carcalc store`: an optional SQLite copy of `web/data/*.tsv` with indexed keys.
+
+The TSVs stay canonical (the web app, the deploy and code review read them). The store holds
+one table per TSV, with every column as TEXT exactly as in the file and `_pos` keeping the file
+order, plus indexes on the provider/vehicle/option keys (`INDEXES`). Queries that would scan a
+TSV (`Store.lookup(options, provider_id=..., vehicle_id=...)`) use an index instead, and
+`Store.load_data()` feeds the engine like `carcalc.data.load_data`.
+
+`sync` works in both directions, per table. `_sync` records the TSV's content hash from the
+last sync, and triggers count writes made to the table since then:
+
+- only the TSV changed: the table is reloaded (one transaction, `executemany`),
+- only the table changed: the TSV is rewritten from it (column order and newline style kept),
+- both changed: a conflict; `prefer="tsv"` or `prefer="db"` decides.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping
+
+from carcalc.data import DEFAULT_DATA_DIR, Data, normalize_data
+from carcalc.tsv import Table
+
+SOURCES = ("providers", "vehicles", "options")
+INDEXES: dict[str, tuple[tuple[str, ...], ...]] = {
+    "providers": (("provider_id",),),
+    "vehicles": (("vehicle_id",), ("provider_id", "vehicle_id")),
+    "options": (("option_id",), ("provider_id", "vehicle_id"), ("vehicle_id",)),
+}
+STORE_SUFFIXES = (".sqlite", ".db")
+DEFAULT_STORE = DEFAULT_DATA_DIR.parents[1] / "build" / "data.sqlite"
+
+
+class SyncConflict(Exception):
+    """Both the TSV and its table changed since the last sync."""
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class Store:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        # Autocommit; `transaction()` groups writes (DDL included, which sqlite3 would not wrap itself).
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS _sync "
+            "(name TEXT PRIMARY KEY, tsv_hash TEXT NOT NULL, newline TEXT NOT NULL, final_newline INTEGER NOT NULL, "
+            "changes INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> Store:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # --- queries ---
+
+    def columns(self, name: str) -> list[str]:
+        return [r["name"] for r in self.conn.execute(f"PRAGMA table_info({_quote(name)})") if r["name"] != "_pos"]
+
+    def lookup(self, name: str, **criteria: str) -> list[dict[str, str]]:
+        """Rows of table `name` equal to all `criteria` (all rows without any), in file order."""
+        columns = self.columns(name)
+        if not columns:
+            raise KeyError(f"no table {name!r} (run `python -m carcalc store sync`)")
+        missing = [c for c in criteria if c not in columns]
+        if missing:
+            raise KeyError(f"no column {missing[0]!r}")
+        where = " AND ".join(f"{_quote(c)} = ?" for c in criteria)
+        sql = f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(name)}{f' WHERE {where}' if where else ''} ORDER BY _pos"
+        return [dict(r) for r in self.conn.execute(sql, tuple(criteria.values()))]
+
+    def table(self, name: str) -> Table:
+        """Table `name` as a `carcalc.tsv.Table` (what `Table.read` of the synced TSV returns)."""
+        state = self._state(name)
+        columns = self.columns(name)
+        rows = self.conn.execute(f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(name)} ORDER BY _pos")
+        return Table(columns, map(tuple, rows), state["newline"] if state else "\n", bool(state["final_newline"]) if state else True)
+
+    def load_data(self) -> Data:
+        """The store's data normalized like `carcalc.data.load_data` (for `Tariffs.compile`)."""
+        return normalize_data(*(self.lookup(name) for name in SOURCES))
+
+    # --- sync ---
+
+    def _state(self, name: str) -> sqlite3.Row | None:
+        row: sqlite3.Row | None = self.conn.execute("SELECT * FROM _sync WHERE name = ?", (name,)).fetchone()
+        return row
+
+    def load(self, tables: Mapping[str, tuple[Table, str]]) -> None:
+        """Replace the given tables with (TSV table, its content hash) in one transaction."""
+        with self.transaction():
+            for name, (table, tsv_hash) in tables.items():
+                q = _quote(name)
+                columns = list(table.header.names)
+                self.conn.execute(f"DROP TABLE IF EXISTS {q}")
+                self.conn.execute(f"CREATE TABLE {q} (_pos INTEGER PRIMARY KEY, {', '.join(f'{_quote(c)} TEXT NOT NULL' for c in columns)})")
+                self.conn.executemany(
+                    f"INSERT INTO {q} VALUES (?, {', '.join('?' * len(columns))})",
+                    ((i, *row) for i, row in enumerate(table.rows)),
+                )
+                for key in INDEXES.get(name, ()):
+                    if all(c in columns for c in key):
+                        self.conn.execute(f"CREATE INDEX {_quote(f'{name}_by_' + '_'.join(key))} ON {q} ({', '.join(map(_quote, key))})")
+                for event in ("INSERT", "UPDATE", "DELETE"):
+                    self.conn.execute(
+                        f"CREATE TRIGGER {_quote(f'{name}_{event.lower()}')} AFTER {event} ON {q} "
+                        f"BEGIN UPDATE _sync SET changes = changes + 1 WHERE name = {_literal(name)}; END"
+                    )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO _sync (name, tsv_hash, newline, final_newline, changes) VALUES (?, ?, ?, ?, 0)",
+                    (name, tsv_hash, table.newline, int(table.final_newline)),
+                )
+
+    def export(self, name: str, path: Path) -> None:
+        """Rewrite the TSV at `path` from table `name` and mark the two in sync."""
+        self.table(name).write(path)
+        self.conn.execute("UPDATE _sync SET tsv_hash = ?, changes = 0 WHERE name = ?", (_file_hash(path), name))
+
+    def sync(self, data_dir: Path = DEFAULT_DATA_DIR, prefer: str = "", names: Iterable[str] = SOURCES) -> dict[str, str]:
+        """Bring each table and its TSV in line; returns what happened per table.
+
+        Raises `SyncConflict` when both sides changed and `prefer` is not "tsv" or "db".
+        """
+        actions: dict[str, str] = {}
+        to_load: dict[str, tuple[Table, str]] = {}
+        to_export: list[str] = []
+        for name in names:
+            path = data_dir / f"{name}.tsv"
+            tsv_hash = _file_hash(path)
+            state = self._state(name)
+            tsv_changed = state is None or state["tsv_hash"] != tsv_hash
+            db_changed = state is not None and state["changes"] > 0
+            if tsv_changed and db_changed:
+                if prefer not in {"tsv", "db"}:
+                    raise SyncConflict(f"{name}: both {path} and the store changed since the last sync; pick a side with --prefer tsv|db")
+                tsv_changed = prefer == "tsv"
+            if tsv_changed:
+                to_load[name] = (Table.read(path), tsv_hash)
+                actions[name] = "loaded"
+            elif db_changed:
+                to_export.append(name)
+                actions[name] = "exported"
+            else:
+                actions[name] = "in sync"
+        if to_load:
+            self.load(to_load)
+        for name in to_export:
+            self.export(name, data_dir / f"{name}.tsv")
+        return actions
+
+
+def read_table(path: Path, name: str) -> Table:
+    """Table `name` from `path`: a TSV, or a store file (`.sqlite`/`.db`) holding that table."""
+    if path.suffix in STORE_SUFFIXES:
+        with Store(path) as store:
+            if not store.columns(name):
+                raise KeyError(f"{path} has no {name!r} table (run `python -m carcalc store sync`)")
+            return store.table(name)
+    return Table.read(path)
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc store",
+        description="Sync an indexed SQLite copy of the TSVs (both ways), or query it.",
+    )
+    ap.add_argument("--db", default=str(DEFAULT_STORE), help="SQLite file (default: %(default)s).")
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    sub = ap.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="Load changed TSVs into the store and write store edits back to the TSVs.")
+    sync.add_argument("--prefer", choices=["tsv", "db"], default="", help="Winner when both sides of a table changed.")
+    query = sub.add_parser("lookup", help="Print matching rows as TSV, e.g. `lookup options provider_id=bolt vehicle_id=bolt_yaris`.")
+    query.add_argument("table", choices=SOURCES)
+    query.add_argument("criteria", nargs="*", metavar="column=value")
+    args = ap.parse_args(argv)
+
+    db = Path(args.db)
+    db.parent.mkdir(parents=True, exist_ok=True)
+    with Store(db) as store:
+        if args.command == "sync":
+            started = time.perf_counter()
+            try:
+                actions = store.sync(Path(args.data_dir), prefer=args.prefer)
+            except SyncConflict as e:
+                print(e, file=sys.stderr)
+                return 1
+            print(f"{', '.join(f'{name}: {action}' for name, action in actions.items())} ({time.perf_counter() - started:.2f}s)")
+            return 0
+
+        criteria = dict(c.partition("=")[::2] for c in args.criteria)
+        try:
+            rows = store.lookup(args.table, **criteria)
+        except KeyError as e:
+            print(e.args[0], file=sys.stderr)
+            return 2
+        table = Table(store.columns(args.table), (tuple(r.values()) for r in rows))
+        sys.stdout.writelines(line for line in table.lines())
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
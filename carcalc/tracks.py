@@ -0,0 +1,340 @@
+"""`carcalc tracks`: derive trip inputs from GPS tracks and price them in bulk.
+
+GPX files are parsed incrementally with `iterparse` (each <trk> is one trip); CSV tracks need
+`track_id,time,lat,lon` rows grouped by track. Only one track's points are held at a time.
+A point that does not parse (or a GPX file that stops being well-formed) fails only its track,
+which is reported as that track's error row.
+
+Per track, distances come from a haversine pass over the whole point arrays, and intervals are
+classified by speed: stops slower than `min_speed_kmh` that last at least `dwell_min` minutes
+count as parking (their GPS jitter is not billed as distance); shorter stops (lights, traffic)
+count as driving. The result is the start/total/parking/km inputs of `create_base_context`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import math
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from operator import sub
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+from zoneinfo import ZoneInfo
+
+from carcalc.calc import TripContext, create_base_context
+from carcalc.data import DEFAULT_DATA_DIR
+from carcalc.engine import Tariffs, price_chunks
+from carcalc.pack import load_tariffs
+from carcalc.parallel import ProcessPricer
+from carcalc.reprice import (
+    OUTPUT_FIELDS,
+    ContextDefaults,
+    add_context_arguments,
+    chunked,
+    context_defaults,
+    quote_fields,
+)
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_TZ = "Europe/Riga"
+
+
+@dataclass
+class Track:
+    track_id: str
+    times: array  # epoch seconds
+    lats: array
+    lons: array
+    error: str = ""  # the first parse error; the track is reported instead of priced
+
+    @classmethod
+    def empty(cls, track_id: str) -> Track:
+        return cls(track_id, array("d"), array("d"), array("d"))
+
+    def append(self, t: float, lat: float, lon: float) -> None:
+        self.times.append(t)
+        self.lats.append(lat)
+        self.lons.append(lon)
+
+    def add_raw(self, t: object, lat: object, lon: object) -> None:
+        """Parse and append one point; the first bad point marks the whole track as failed."""
+        if self.error:
+            return
+        try:
+            if lat is None or lon is None:
+                raise ValueError("missing lat/lon")
+            la, lo = float(str(lat)), float(str(lon))
+            if not (math.isfinite(la) and math.isfinite(lo)):
+                raise ValueError(f"lat/lon must be finite numbers, got {lat!r}/{lon!r}")
+            self.append(parse_time(str(t)), la, lo)
+        except (TypeError, ValueError, OverflowError) as e:
+            self.fail(f"point {len(self.times) + 1}: {e}")
+
+    def fail(self, reason: str) -> None:
+        if not self.error:
+            self.error = f"track {self.track_id!r}: {reason}"
+
+
+@dataclass(frozen=True)
+class TrackSummary:
+    track_id: str
+    start: datetime  # local wall clock
+    total_min: int
+    parking_min: int
+    km: float
+
+
+def haversine_km(lats: array, lons: array) -> list[float]:
+    """Distances between consecutive points, computed column-wise over the whole track."""
+    phi = list(map(math.radians, lats))
+    lam = list(map(math.radians, lons))
+    dphi = map(sub, phi[1:], phi[:-1])
+    dlam = map(sub, lam[1:], lam[:-1])
+    cos_phi = list(map(math.cos, phi))
+    a = [
+        math.sin(dp / 2) ** 2 + c0 * c1 * math.sin(dl / 2) ** 2
+        for dp, dl, c0, c1 in zip(dphi, dlam, cos_phi[:-1], cos_phi[1:])
+    ]
+    return [2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, x))) for x in a]
+
+
+def summarize(track: Track, tz: ZoneInfo, min_speed_kmh: float = 3.0, dwell_min: float = 5.0) -> TrackSummary:
+    """Turn one track into trip inputs; raises ValueError for failed tracks and tracks without a usable time span."""
+    if track.error:
+        raise ValueError(track.error)
+    order = sorted(range(len(track.times)), key=track.times.__getitem__)
+    times = array("d", (track.times[i] for i in order))
+    if len(times) < 2 or times[-1] <= times[0]:
+        raise ValueError(f"track {track.track_id!r}: need at least two timestamped points")
+    dist = haversine_km(array("d", (track.lats[i] for i in order)), array("d", (track.lons[i] for i in order)))
+    dts = list(map(sub, times[1:], times[:-1]))
+
+    parked_s = 0.0
+    km = 0.0
+    stop_s = 0.0
+    stop_km = 0.0
+    for d, dt in zip(dist, dts):
+        if dt > 0 and d / (dt / 3600) >= min_speed_kmh:
+            if stop_s < dwell_min * 60:
+                km += stop_km
+            else:
+                parked_s += stop_s
+            stop_s = stop_km = 0.0
+            km += d
+        else:
+            stop_s += dt
+            stop_km += d
+    if stop_s < dwell_min * 60:
+        km += stop_km
+    else:
+        parked_s += stop_s
+
+    total_min = math.ceil((times[-1] - times[0]) / 60)
+    start = datetime.fromtimestamp(times[0], timezone.utc).astimezone(tz).replace(tzinfo=None)
+    return TrackSummary(track.track_id, start, total_min, min(total_min, round(parked_s / 60)), km)
+
+
+def parse_time(s: str) -> float:
+    dt = datetime.fromisoformat(s.strip())
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def read_gpx(f: IO[bytes] | str | Path, name: str) -> Iterator[Track]:
+    """One Track per <trk> (all its segments), parsed incrementally.
+
+    Malformed XML ends the file: the track being read (or a placeholder) carries the error.
+    """
+    track: Track | None = None
+    n = 0
+    context = ET.iterparse(f, events=("start", "end"))
+    try:
+        for event, elem in context:
+            tag = _local(elem.tag)
+            if event == "start":
+                if tag == "trk":
+                    n += 1
+                    track = Track.empty(f"{name}#{n}")
+                continue
+            if tag == "trkpt" and track is not None:
+                t = next((c.text for c in elem if _local(c.tag) == "time"), None)
+                if t:
+                    track.add_raw(t, elem.get("lat"), elem.get("lon"))
+                elem.clear()
+            elif tag == "trk" and track is not None:
+                yield track
+                track = None
+                elem.clear()
+    except ET.ParseError as e:
+        if track is None:
+            track = Track.empty(f"{name}#{n + 1}")
+        track.fail(f"invalid GPX: {e}")
+        yield track
+
+
+def read_csv_tracks(f: IO[str]) -> Iterator[Track]:
+    """Rows `track_id,time,lat,lon`, consecutive per track_id."""
+    for track_id, rows in itertools.groupby(csv.DictReader(f), key=lambda r: r.get("track_id") or ""):
+        track = Track.empty(track_id)
+        for r in rows:
+            track.add_raw(r.get("time"), r.get("lat"), r.get("lon"))
+        yield track
+
+
+def read_tracks(paths: Iterable[Path]) -> Iterator[Track]:
+    for path in paths:
+        if path.suffix.lower() == ".gpx":
+            yield from read_gpx(path, path.name)
+        else:
+            with path.open("r", encoding="utf-8", newline="") as f:
+                yield from read_csv_tracks(f)
+
+
+def expand_paths(items: Iterable[str]) -> Iterator[Path]:
+    for item in items:
+        p = Path(item)
+        if p.is_dir():
+            yield from sorted(x for x in p.rglob("*") if x.suffix.lower() in {".gpx", ".csv"})
+        else:
+            yield p
+
+
+def track_context(s: TrackSummary, defaults: ContextDefaults) -> TripContext:
+    return create_base_context(
+        start=s.start,
+        total_min=s.total_min,
+        parking_min=s.parking_min,
+        dist_km=math.ceil(s.km),
+        fuel_price_e95=defaults.fuel_price_e95,
+        fuel_price_diesel=defaults.fuel_price_diesel,
+        consumption_override=defaults.consumption_override,
+        consumption_override_enabled=defaults.consumption_override > 0,
+        discount_carguru=defaults.discount_carguru,
+        discount_citybee_percent=defaults.discount_citybee_percent,
+        discount_citybee_minutes=defaults.discount_citybee_minutes,
+        discount_bolt=defaults.discount_bolt,
+    )
+
+
+SUMMARY_FIELDS = ["track_id", "start", "total_min", "parking_min", "km"]
+
+
+def price_tracks(
+    tracks: Iterable[Track],
+    tariffs: Tariffs,
+    *,
+    tz: ZoneInfo,
+    min_speed_kmh: float = 3.0,
+    dwell_min: float = 5.0,
+    chunk_size: int = 1_000,
+    provider_filter: str = "",
+    defaults: ContextDefaults = ContextDefaults(),
+    pricer: ProcessPricer | None = None,
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield output rows (SUMMARY_FIELDS + reprice OUTPUT_FIELDS) chunk by chunk, in input order."""
+    pending: deque[tuple[list[dict[str, Any]], list[dict[str, Any]]]] = deque()
+
+    def contexts() -> Iterator[list[TripContext]]:
+        for chunk in chunked(tracks, chunk_size):
+            ctxs: list[TripContext] = []
+            priced_rows: list[dict[str, Any]] = []
+            out: list[dict[str, Any]] = []
+            for track in chunk:
+                try:
+                    s = summarize(track, tz, min_speed_kmh, dwell_min)
+                    ctx = track_context(s, defaults)
+                except (ValueError, OverflowError) as e:
+                    out.append({"track_id": track.track_id} | {k: "" for k in OUTPUT_FIELDS} | {"error": str(e)})
+                    continue
+                row = {
+                    "track_id": s.track_id,
+                    "start": s.start.isoformat(timespec="seconds"),
+                    "total_min": s.total_min,
+                    "parking_min": s.parking_min,
+                    "km": round(s.km, 3),
+                }
+                ctxs.append(ctx)
+                priced_rows.append(row)
+                out.append(row)
+            pending.append((out, priced_rows))
+            yield ctxs
+
+    if pricer is None:
+        results = price_chunks(tariffs, contexts(), provider_filter)
+    else:
+        results = pricer.price_chunks(contexts(), provider_filter)
+    for quotes in results:
+        out, priced_rows = pending.popleft()
+        for row, quote in zip(priced_rows, quotes):
+            row.update(quote_fields(tariffs, quote))
+        yield out
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc tracks",
+        description="Derive trip parameters from GPX/CSV GPS tracks and price each track's cheapest option.",
+    )
+    ap.add_argument("paths", nargs="+", help="GPX/CSV track files or directories (searched recursively).")
+    ap.add_argument("-o", "--output", default="-", help="Output CSV (default: stdout).")
+    ap.add_argument("--tz", default=DEFAULT_TZ, help=f"Local time zone for night tariffs (default: {DEFAULT_TZ}).")
+    ap.add_argument("--min-speed-kmh", type=float, default=3.0, help="Intervals slower than this count as stopped.")
+    ap.add_argument("--dwell-min", type=float, default=5.0, help="Stops at least this long (minutes) count as parking.")
+    ap.add_argument("--provider", default="", help="Only consider this provider_id.")
+    ap.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    ap.add_argument("--pack", default="", help="Map this tariff pack (`carcalc pack`) instead of compiling the TSVs.")
+    ap.add_argument("--chunk-size", type=int, default=1_000)
+    ap.add_argument("--workers", type=int, default=1)
+    add_context_arguments(ap)
+    args = ap.parse_args(argv)
+
+    if args.chunk_size <= 0 or args.workers <= 0:
+        print("--chunk-size and --workers must be > 0", file=sys.stderr)
+        return 2
+    paths = list(expand_paths(args.paths))
+    missing = next((p for p in paths if not p.exists()), None)
+    if missing is not None:
+        print(f"File not found: {missing}", file=sys.stderr)
+        return 2
+
+    tariffs = load_tariffs(Path(args.data_dir), Path(args.pack) if args.pack else None, shared=args.workers > 1)
+    fout = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    pricer = ProcessPricer(tariffs, args.workers) if args.workers > 1 else None
+    n = errors = 0
+    try:
+        w = csv.DictWriter(fout, fieldnames=SUMMARY_FIELDS + OUTPUT_FIELDS, lineterminator="\n")
+        w.writeheader()
+        for rows in price_tracks(
+            read_tracks(paths),
+            tariffs,
+            tz=ZoneInfo(args.tz),
+            min_speed_kmh=args.min_speed_kmh,
+            dwell_min=args.dwell_min,
+            chunk_size=args.chunk_size,
+            provider_filter=args.provider,
+            defaults=context_defaults(args),
+            pricer=pricer,
+        ):
+            w.writerows(rows)
+            n += len(rows)
+            errors += sum(1 for r in rows if r.get("error"))
+    finally:
+        if pricer is not None:
+            pricer.close()
+        if fout is not sys.stdout:
+            fout.close()
+
+    print(f"Priced {n:,} tracks ({errors:,} errors)", file=sys.stderr)
+    return 0
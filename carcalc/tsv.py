@@ -0,0 +1,505 @@
+"""Streaming, tuple-backed TSV tables for `web/data/*.tsv` (shared by `scripts/` and `carcalc`).
+
+The format is what the web app reads (`web/lib/tsv.js`): a header line, tab-separated fields,
+no quoting. Short rows are padded with "" and blank lines are skipped.
+
+Rows are `Row`s: plain tuples whose class carries the file's `Header` (column name -> position),
+so a row costs one tuple instead of a dict, and `row.get("vehicle_id")`, `row.text(...)` and
+`row.replace(...)` work by name. Equal values within a file share one string object. `stream()`
+reads a file lazily, row by row.
+
+`Table` holds a whole file and builds a hash index per key column (or column tuple) on its first
+lookup, e.g. `options.lookup(provider_id="bolt", vehicle_id="bolt_yaris")`. Mutations drop the
+indexes. `Table.write` keeps the file's column order, newline style and trailing newline, and
+replaces the file atomically (a crash never leaves a truncated TSV).
+
+`merge` folds regenerated rows into a table without reordering it and `diff` reports what a
+rewrite adds, removes and changes by key, so importers can skip writes that change nothing.
+
+`python -m carcalc tsvbench --rows 1000000` compares it with `csv.DictReader` dict rows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import gc
+import io
+import math
+import os
+import random
+import stat
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from operator import itemgetter
+from pathlib import Path
+from typing import IO, Any, Callable, ClassVar, Iterable, Iterator, Mapping, Sequence
+
+
+class Row(tuple):  # type: ignore[type-arg]
+    """One TSV row: a tuple of values (by position), with `get`/`text` by column name."""
+
+    __slots__ = ()
+    header: ClassVar[Header]
+
+    def get(self, name: str, default: str = "") -> str:
+        i = self.header.positions.get(name)
+        return default if i is None else self[i]
+
+    def text(self, name: str) -> str:
+        """Stripped value ("" for missing columns)."""
+        return self.get(name).strip()
+
+    def number(self, name: str) -> float | None:
+        """Value as a finite float, None when blank or not a number."""
+        try:
+            n = float(self.get(name))
+        except ValueError:
+            return None
+        return n if math.isfinite(n) else None
+
+    def replace(self, changes: Mapping[str, object] | None = None, **kw: object) -> Row:
+        """Copy with some columns changed (None becomes ""); unknown columns raise KeyError."""
+        values = list(self)
+        for name, value in {**(changes or {}), **kw}.items():
+            values[self.header.positions[name]] = "" if value is None else str(value)
+        return type(self)(values)
+
+    def as_dict(self) -> dict[str, str]:
+        return dict(zip(self.header.names, self))
+
+
+class Header:
+    """Column names of one file plus the `Row` type bound to them."""
+
+    __slots__ = ("names", "positions", "row_type")
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.names = tuple(names)
+        self.positions: dict[str, int] = {}
+        for i, name in enumerate(self.names):
+            self.positions.setdefault(name, i)
+        self.row_type: type[Row] = type("Row", (Row,), {"__slots__": (), "header": self})
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.positions
+
+    def row(self, values: Sequence[str]) -> Row:
+        """Row from field values, padded with "" or cut to the header width."""
+        n = len(self.names)
+        if len(values) != n:
+            values = [*values[:n], *[""] * (n - len(values))]
+        return self.row_type(values)
+
+    def from_mapping(self, mapping: Mapping[str, object]) -> Row:
+        """Row from a dict-like row (missing columns and None become "", extra keys are dropped)."""
+        return self.row_type("" if (v := mapping.get(name)) is None else str(v) for name in self.names)
+
+    def coerce(self, row: Row | Mapping[str, object] | Sequence[str]) -> Row:
+        """Row of this header from a `Row` (matched by column name), a dict-like row or plain values."""
+        if isinstance(row, Row):
+            return row if row.header is self else self.from_mapping(row.as_dict())
+        if isinstance(row, Mapping):
+            return self.from_mapping(row)
+        return self.row(row)
+
+    def with_columns(self, names: Iterable[str]) -> Header:
+        """This header plus any of `names` it lacks, appended in order."""
+        extra = [name for name in dict.fromkeys(names) if name not in self.positions]
+        return Header([*self.names, *extra]) if extra else self
+
+
+class Reader:
+    """Rows of an open text file (opened with `newline=""`), read lazily; tracks the newline style."""
+
+    def __init__(self, f: IO[str]) -> None:
+        self.f = f
+        first = f.readline()
+        self.header = Header(h.strip() for h in first.rstrip("\r\n").split("\t")) if first.strip() else Header(())
+        self.crlf = int(first.endswith("\r\n"))
+        self.lines = int(first.endswith("\n"))
+        self.final_newline = not first or first.endswith("\n")
+
+    def __iter__(self) -> Iterator[Row]:
+        make = self.header.row
+        # Most fields repeat (provider ids, types, blank rates): keep one string per distinct value.
+        shared: dict[str, str] = {}
+        dedupe = shared.setdefault
+        crlf = lines = 0
+        line = ""
+        for line in self.f:
+            if line.endswith("\n"):
+                lines += 1
+                if line.endswith("\r\n"):
+                    crlf += 1
+            values = line.rstrip("\r\n")
+            if values.strip():
+                parts = values.split("\t")
+                yield make(list(map(dedupe, parts, parts)))
+        self.crlf += crlf
+        self.lines += lines
+        if line:
+            self.final_newline = line.endswith("\n")
+
+    @property
+    def newline(self) -> str:
+        return "\r\n" if self.lines and self.crlf >= self.lines * 0.6 else "\n"
+
+
+def stream(path: Path) -> Iterator[Row]:
+    """Rows of `path`, one at a time (the header is `row.header`)."""
+    with path.open("r", encoding="utf-8", newline="") as f:
+        yield from Reader(f)
+
+
+class Table:
+    def __init__(
+        self,
+        header: Header | Iterable[str],
+        rows: Iterable[Row | Mapping[str, object] | Sequence[str]] = (),
+        newline: str = "\n",
+        final_newline: bool = True,
+    ) -> None:
+        self.header = header if isinstance(header, Header) else Header(header)
+        self.rows: list[Row] = [self.header.coerce(r) for r in rows]
+        self.newline = newline
+        self.final_newline = final_newline
+        self._indexes: dict[tuple[str, ...], dict[Any, list[int]]] = {}
+
+    @classmethod
+    def read(cls, path: Path) -> Table:
+        with path.open("r", encoding="utf-8", newline="") as f:
+            reader = Reader(f)
+            rows = list(reader)
+        table = cls(reader.header, (), reader.newline, reader.final_newline)
+        table.rows = rows
+        return table
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Row]:
+        return iter(self.rows)
+
+    def index(self, *columns: str) -> dict[Any, list[int]]:
+        """Row positions by stripped key value (a tuple of values for several columns), built on first use."""
+        idx = self._indexes.get(columns)
+        if idx is None:
+            missing = [c for c in columns if c not in self.header]
+            if missing:
+                raise KeyError(f"no column {missing[0]!r}")
+            keys: Iterable[Any] = map(str.strip, map(itemgetter(self.header.positions[columns[0]]), self.rows))
+            if len(columns) > 1:
+                keys = zip(keys, *(map(str.strip, map(itemgetter(self.header.positions[c]), self.rows)) for c in columns[1:]))
+            idx = {}
+            for i, key in enumerate(keys):
+                bucket = idx.get(key)
+                if bucket is None:
+                    idx[key] = [i]
+                else:
+                    bucket.append(i)
+            self._indexes[columns] = idx
+        return idx
+
+    def lookup(self, **criteria: str) -> list[Row]:
+        """Rows whose stripped values equal all `criteria`, in file order."""
+        columns = tuple(criteria)
+        key = criteria[columns[0]] if len(columns) == 1 else tuple(criteria.values())
+        return [self.rows[i] for i in self.index(*columns).get(key, ())]
+
+    def first(self, **criteria: str) -> Row | None:
+        rows = self.lookup(**criteria)
+        return rows[0] if rows else None
+
+    def append(self, row: Row | Mapping[str, object] | Sequence[str]) -> Row:
+        self.rows.append(self.header.coerce(row))
+        self._indexes.clear()
+        return self.rows[-1]
+
+    def insert(self, position: int, row: Row | Mapping[str, object] | Sequence[str]) -> Row:
+        self.rows.insert(position, self.header.coerce(row))
+        self._indexes.clear()
+        return self.rows[position]
+
+    def update(self, position: int, changes: Mapping[str, object] | None = None, **kw: object) -> Row:
+        """Replace row `position` with a copy carrying `changes`; returns the new row."""
+        row = self.rows[position] = self.rows[position].replace(changes, **kw)
+        self._indexes.clear()
+        return row
+
+    def with_columns(self, names: Iterable[str]) -> Table:
+        """This table with any missing `names` appended as blank columns (existing order kept)."""
+        header = self.header.with_columns(names)
+        if header is self.header:
+            return self
+        pad = ("",) * (len(header) - len(self.header))
+        table = Table(header, (), self.newline, self.final_newline)
+        table.rows = [header.row_type((*row, *pad)) for row in self.rows]
+        return table
+
+    def format_row(self, row: Row | Mapping[str, object]) -> str:
+        line = "\t".join(self.header.coerce(row))
+        if line.count("\t") != len(self.header) - 1 or "\n" in line or "\r" in line:
+            raise ValueError(f"tab or newline inside a value: {line[:80]!r}")
+        return line
+
+    def lines(self) -> Iterator[str]:
+        """The file content, one line at a time (the last one without a newline unless `final_newline`)."""
+        nl = self.newline
+        yield "\t".join(self.header.names)
+        for row in self.rows:
+            yield nl + self.format_row(row)
+        if self.final_newline:
+            yield nl
+
+    def write(self, path: Path) -> None:
+        write_atomic(path, self.lines())
+
+
+def write_atomic(path: Path, chunks: Iterable[str] | Iterable[bytes], binary: bool = False) -> None:
+    """Replace `path` atomically: write a temp file next to it, fsync, then rename over it.
+
+    `chunks` are UTF-8 text, or bytes with `binary=True`.
+    """
+    mode = stat.S_IMODE(path.stat().st_mode) if path.exists() else 0o644
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with open(fd, "wb") if binary else open(fd, "w", encoding="utf-8", newline="") as f:
+            f.writelines(chunks)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+    if os.name == "posix":  # make the rename itself durable
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _key(row: Row, columns: Sequence[str]) -> Any:
+    return row.text(columns[0]) if len(columns) == 1 else tuple(row.text(c) for c in columns)
+
+
+@dataclass(frozen=True)
+class TableDiff:
+    """What changed between two versions of a table, by key (see `diff`)."""
+
+    added: tuple[Any, ...] = ()
+    removed: tuple[Any, ...] = ()
+    changed: tuple[tuple[Any, tuple[str, ...]], ...] = ()  # (key, changed columns)
+    columns_added: tuple[str, ...] = ()
+    columns_removed: tuple[str, ...] = ()
+    identical: bool = True
+
+    def __bool__(self) -> bool:
+        return not self.identical
+
+    def summary(self) -> str:
+        if self.identical:
+            return "unchanged"
+        parts = [f"{len(self.added)} added", f"{len(self.removed)} removed", f"{len(self.changed)} changed"]
+        if self.columns_added:
+            parts.append(f"new columns: {', '.join(self.columns_added)}")
+        if self.columns_removed:
+            parts.append(f"dropped columns: {', '.join(self.columns_removed)}")
+        if not (self.added or self.removed or self.changed or self.columns_added or self.columns_removed):
+            parts.append("rows reordered or deduplicated")
+        return ", ".join(parts)
+
+    def lines(self, limit: int = 20) -> list[str]:
+        """One line per added (+), removed (-) and changed (~) key, at most `limit` of each."""
+        def show(key: Any) -> str:
+            return "/".join(key) if isinstance(key, tuple) else key
+
+        out = [f"+ {show(k)}" for k in self.added[:limit]]
+        out += [f"- {show(k)}" for k in self.removed[:limit]]
+        out += [f"~ {show(k)}: {', '.join(cols)}" for k, cols in self.changed[:limit]]
+        for sign, items in (("+", self.added), ("-", self.removed), ("~", self.changed)):
+            if len(items) > limit:
+                out.append(f"{sign} ... and {len(items) - limit} more")
+        return out
+
+
+def diff(old: Table, new: Table, key: Sequence[str]) -> TableDiff:
+    """Keyed diff of `old` -> `new`; values are compared by column name (blank = missing)."""
+    if old.header.names == new.header.names and old.rows == new.rows:
+        return TableDiff()
+    before = {_key(r, key): r for r in old.rows}
+    after = {_key(r, key): r for r in new.rows}
+    names = list(dict.fromkeys([*old.header.names, *new.header.names]))
+    changed = []
+    for k, row in after.items():
+        prev = before.get(k)
+        if prev is not None and tuple(prev) != tuple(row):
+            cols = tuple(c for c in names if prev.get(c) != row.get(c))
+            if cols:
+                changed.append((k, cols))
+    return TableDiff(
+        added=tuple(k for k in after if k not in before),
+        removed=tuple(k for k in before if k not in after),
+        changed=tuple(changed),
+        columns_added=tuple(c for c in new.header.names if c not in old.header),
+        columns_removed=tuple(c for c in old.header.names if c not in new.header),
+        identical=False,
+    )
+
+
+def merge(
+    old: Table,
+    rows: Iterable[Row | Mapping[str, object]],
+    key: Sequence[str],
+    near: Sequence[str] = (),
+    drop: Callable[[Row], bool] | None = None,
+) -> Table:
+    """`old` updated with `rows`, keeping its row order so rewrites only touch what changed.
+
+    A row whose key is already in `old` replaces it in place (later duplicates of a key are dropped;
+    rows with a blank key are ignored in `rows` and kept as they are in `old`).
+    Rows of `old` missing from `rows` are kept unless `drop(row)` says they were regenerated. New
+    rows go after the last row sharing their `near` columns (then their shorter prefixes, e.g.
+    provider_id + vehicle_id, then provider_id), or at the end, in the order given.
+    """
+    table = Table(old.header, (), old.newline, old.final_newline)
+    blank = _key(old.header.row(()), key)
+    incoming = {k: r for r in map(old.header.coerce, rows) if (k := _key(r, key)) != blank}
+    out: list[Row] = []
+    seen = set()
+    for row in old.rows:
+        k = _key(row, key)
+        if k != blank:
+            if k in seen:
+                continue
+            seen.add(k)
+        replacement = incoming.pop(k, None)
+        if replacement is not None:
+            out.append(replacement)
+        elif drop is None or not drop(row):
+            out.append(row)
+    after: dict[int, list[Row]] = {}
+    tail: list[Row] = []
+    if incoming and near:
+        last = {}
+        for i, row in enumerate(out):
+            for n in range(1, len(near) + 1):
+                last[tuple(row.text(c) for c in near[:n])] = i
+        for row in incoming.values():
+            for n in range(len(near), 0, -1):
+                i = last.get(tuple(row.text(c) for c in near[:n]))
+                if i is not None:
+                    after.setdefault(i, []).append(row)
+                    break
+            else:
+                tail.append(row)
+    else:
+        tail.extend(incoming.values())
+    for i, row in enumerate(out):
+        table.rows.append(row)
+        table.rows.extend(after.get(i, ()))
+    table.rows.extend(tail)
+    return table
+
+
+# --- benchmark (`python -m carcalc tsvbench`) ---
+
+BENCH_HEADER = ("provider_id", "vehicle_id", "option_id", "option_name", "option_type", *(f"rate_{i}_eur" for i in range(20)), "notes")
+
+
+def bench_file(path: Path, rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        f.write("\t".join(BENCH_HEADER) + "\n")
+        for i in range(rows):
+            provider = ("bolt", "carguru", "citybee", "got2go")[i % 4]
+            vehicle = f"{provider}_{i // 40}"
+            rates = "\t".join("" if rng.random() < 0.3 else f"{rng.random():.2f}" for _ in range(20))
+            f.write(f"{provider}\t{vehicle}\t{vehicle}_{i % 40}\tOption {i % 40}\tPAYG\t{rates}\tseen in-app\n")
+
+
+def _measure(fn: Callable[[], Any]) -> tuple[Any, float, int]:
+    """(result, seconds, bytes still allocated by the result)."""
+    gc.collect()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, held
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m carcalc tsvbench",
+        description="Benchmark carcalc.tsv against csv.DictReader on a generated options-like TSV.",
+    )
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--path", default="", help="Use this TSV instead of a generated one.")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.path) if args.path else Path(tmp) / "bench.tsv"
+        if not args.path:
+            bench_file(path, args.rows)
+        size = os.path.getsize(path)
+
+        def dict_rows() -> list[dict[str, str]]:
+            with path.open("r", encoding="utf-8", newline="") as f:
+                return [{k: (v or "") for k, v in r.items()} for r in csv.DictReader(f, delimiter="\t")]
+
+        def stream_count() -> int:
+            return sum(1 for _ in stream(path))
+
+        report: list[tuple[str, float, int]] = []
+        dicts, t, held = _measure(dict_rows)
+        report.append(("csv.DictReader -> list[dict]", t, held))
+        n = len(dicts)
+        key = dicts[n // 2]["option_id"]
+        started = time.perf_counter()
+        for _ in range(10):
+            next(r for r in dicts if r["option_id"] == key)
+        report.append(("  10 lookups by option_id (scan)", time.perf_counter() - started, 0))
+        del dicts
+
+        _, t, _ = _measure(stream_count)
+        report.append(("tsv.stream (count only)", t, 0))
+        table, t, held = _measure(lambda: Table.read(path))
+        report.append(("Table.read -> tuple rows", t, held))
+        started = time.perf_counter()
+        table.index("option_id")
+        report.append(("  index(option_id), first lookup", time.perf_counter() - started, 0))
+        started = time.perf_counter()
+        for _ in range(10):
+            table.first(option_id=key)
+        report.append(("  10 lookups by option_id (index)", time.perf_counter() - started, 0))
+        started = time.perf_counter()
+        table.lookup(provider_id="bolt", vehicle_id="bolt_0")
+        report.append(("  index(provider_id, vehicle_id)", time.perf_counter() - started, 0))
+        started = time.perf_counter()
+        out = io.StringIO()
+        out.writelines(table.lines())
+        report.append(("Table.lines (serialize)", time.perf_counter() - started, 0))
+
+    print(f"{n:,} rows x {len(table.header)} columns, {size / 1e6:.0f} MB", file=sys.stderr)
+    for label, seconds, nbytes in report:
+        mem = f"  {nbytes / 1e6:8.0f} MB held" if nbytes else ""
+        print(f"{label:<38} {seconds * 1000:10.1f} ms{mem}")
+    return 0
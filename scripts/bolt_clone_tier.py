@@ -1,57 +1,18 @@
 from __future__ import annotations
 
 import argparse
-import csv
 import re
 import sys
-from dataclasses import dataclass
 from pathlib import Path
 
+if __package__ in (None, ""):  # run as `python scripts/<name>.py`: make the repo's `carcalc` importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-DEFAULT_VEHICLES_PATH = Path(__file__).resolve().parents[1] / "web" / "data" / "vehicles.tsv"
-DEFAULT_OPTIONS_PATH = Path(__file__).resolve().parents[1] / "web" / "data" / "options.tsv"
-
-
-def _detect_preferred_newline(path: Path) -> str:
-    b = path.read_bytes()
-    crlf = b.count(b"\r\n")
-    lf = b.count(b"\n")
-    if lf == 0:
-        return "\n"
-    # If most newlines are CRLF, keep CRLF.
-    if crlf >= (lf * 0.6):
-        return "\r\n"
-    return "\n"
-
-
-def _read_text_keep_newlines(path: Path) -> list[str]:
-    with path.open("r", encoding="utf-8", newline="") as f:
-        return f.read().splitlines(True)
-
-
-def _write_text_keep_newlines(path: Path, lines: list[str]) -> None:
-    with path.open("w", encoding="utf-8", newline="") as f:
-        f.write("".join(lines))
+from carcalc.tsv import Table  # noqa: E402
 
 
-@dataclass(frozen=True)
-class Tsv:
-    header: list[str]
-    rows: list[dict[str, str]]
-
-
-def read_tsv(path: Path) -> Tsv:
-    with path.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        header = list(reader.fieldnames or [])
-        rows: list[dict[str, str]] = []
-        for r in reader:
-            rows.append({k: (v or "") for k, v in r.items()})
-    return Tsv(header=header, rows=rows)
-
-
-def format_tsv_row(header: list[str], row: dict[str, str]) -> str:
-    return "\t".join((row.get(c) or "") for c in header)
+DEFAULT_VEHICLES_PATH = Path(__file__).resolve().parents[1] / "web" / "data" / "vehicles.tsv"
+DEFAULT_OPTIONS_PATH = Path(__file__).resolve().parents[1] / "web" / "data" / "options.tsv"
 
 
 def normalize_vehicle_id(s: str) -> str:
@@ -158,8 +119,8 @@ def main(argv: list[str]) -> int:
             return 2
     consumption_source_url = (args.consumption_source_url or "").strip()
 
-    vehicles = read_tsv(vehicles_path)
-    options = read_tsv(options_path)
+    vehicles = Table.read(vehicles_path)
+    options = Table.read(options_path)
 
     for col in (
         "provider_id",
@@ -180,18 +141,11 @@ def main(argv: list[str]) -> int:
             print(f"options.tsv missing expected column: {col}", file=sys.stderr)
             return 2
 
-    existing_vehicle_ids = {
-        ((r.get("provider_id") or "").strip(), (r.get("vehicle_id") or "").strip()) for r in vehicles.rows
-    }
-    if ("bolt", to_vehicle_id) in existing_vehicle_ids:
+    if vehicles.first(provider_id="bolt", vehicle_id=to_vehicle_id) is not None:
         print(f"vehicles.tsv already has bolt/{to_vehicle_id}", file=sys.stderr)
         return 2
 
-    source_rows = [
-        r
-        for r in options.rows
-        if (r.get("provider_id") or "").strip() == "bolt" and (r.get("vehicle_id") or "").strip() == from_vehicle_id
-    ]
+    source_rows = options.lookup(provider_id="bolt", vehicle_id=from_vehicle_id)
     if not source_rows:
         print(f"No Bolt option rows found for --from-vehicle-id={from_vehicle_id!r}", file=sys.stderr)
         return 2
@@ -200,16 +154,16 @@ def main(argv: list[str]) -> int:
     if "" in skip_ids:
         skip_ids.remove("")
 
-    existing_option_ids = set((r.get("option_id") or "").strip() for r in options.rows)
+    existing_option_ids = set(options.index("option_id"))
 
     cloned_rows: list[dict[str, str]] = []
     prefix = f"{from_vehicle_id}_"
     for r in source_rows:
-        option_id = (r.get("option_id") or "").strip()
+        option_id = r.text("option_id")
         if option_id in skip_ids:
             continue
 
-        new = dict(r)
+        new = r.as_dict()
         new["vehicle_id"] = to_vehicle_id
 
         if option_id.startswith(prefix):
@@ -272,8 +226,8 @@ def main(argv: list[str]) -> int:
         }
     )
 
-    vehicle_line = format_tsv_row(vehicles.header, new_vehicle_row)
-    option_lines = [format_tsv_row(options.header, r) for r in cloned_rows]
+    vehicle_line = vehicles.format_row(new_vehicle_row)
+    option_lines = [options.format_row(r) for r in cloned_rows]
 
     if not args.apply:
         print("# Paste into web/data/vehicles.tsv")
@@ -285,35 +239,19 @@ def main(argv: list[str]) -> int:
         return 0
 
     # Apply: insert vehicles row after last bolt row, and option rows after last bolt option row.
-    # Preserve mixed newline style by keeping original newlines and only adding new lines with a preferred newline.
-    vehicles_lines = _read_text_keep_newlines(vehicles_path)
-    vehicles_nl = _detect_preferred_newline(vehicles_path)
-    if not vehicles_lines:
-        print(f"Unexpected empty file: {vehicles_path}", file=sys.stderr)
-        return 2
-    vehicles_insert_at = 1
-    for i in range(1, len(vehicles_lines)):
-        if vehicles_lines[i].startswith("bolt\t"):
-            vehicles_insert_at = i + 1
-    vehicles_lines.insert(vehicles_insert_at, vehicle_line + vehicles_nl)
-    _write_text_keep_newlines(vehicles_path, vehicles_lines)
-
-    options_lines = _read_text_keep_newlines(options_path)
-    options_nl = _detect_preferred_newline(options_path)
-    if not options_lines:
-        print(f"Unexpected empty file: {options_path}", file=sys.stderr)
-        return 2
-    options_insert_at = 1
-    for i in range(1, len(options_lines)):
-        # Find the end of the Bolt block (Bolt rows are contiguous near the top in this repo).
-        if options_lines[i].startswith("bolt\t"):
-            options_insert_at = i + 1
-        elif options_insert_at > 1:
-            break
-
-    for j, line in enumerate(option_lines):
-        options_lines.insert(options_insert_at + j, line + options_nl)
-    _write_text_keep_newlines(options_path, options_lines)
+    # Column order, newline style and the trailing newline of both files are kept.
+    bolt_vehicles = vehicles.index("provider_id").get("bolt", [])
+    vehicles.insert(bolt_vehicles[-1] + 1 if bolt_vehicles else 0, new_vehicle_row)
+    vehicles.write(vehicles_path)
+
+    # Insert at the end of the first Bolt block (Bolt rows are contiguous near the top in this repo).
+    bolt_options = options.index("provider_id").get("bolt", [])
+    options_insert_at = bolt_options[0] if bolt_options else 0
+    while options_insert_at < len(options) and options.rows[options_insert_at].text("provider_id") == "bolt":
+        options_insert_at += 1
+    for j, row in enumerate(cloned_rows):
+        options.insert(options_insert_at + j, row)
+    options.write(options_path)
 
     print(f"Inserted 1 vehicle row into {vehicles_path}")
     print(f"Inserted {len(option_lines)} option rows into {options_path}")
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import argparse
-import csv
 import re
 import sys
 from dataclasses import dataclass
@@ -9,6 +8,11 @@ from pathlib import Path
 from urllib.request import Request, urlopen
 from urllib.parse import urlparse
 
+if __package__ in (None, ""):  # run as `python scripts/<name>.py`: make the repo's `carcalc` importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from carcalc.tsv import Table  # noqa: E402
+
 
 DEFAULT_FALLBACK_L_PER_100KM = 8.0
 UK_MPG_TO_L_PER_100KM = 282.480936  # 100 km / miles-per-gallon (UK/imperial)
@@ -96,32 +100,6 @@ def compute_estimate_from_range(mpg_lo: float, mpg_hi: float) -> float:
     return mpg_to_l_per_100km(mpg_lo)
 
 
-def read_tsv(path: Path) -> tuple[list[str], list[dict[str, str]]]:
-    with path.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        header = list(reader.fieldnames or [])
-        rows: list[dict[str, str]] = []
-        for r in reader:
-            rows.append({k: (v or "") for k, v in r.items()})
-    return header, rows
-
-
-def write_tsv(path: Path, header: list[str], rows: list[dict[str, str]]) -> None:
-    with path.open("w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=header, delimiter="\t", lineterminator="\n")
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k, "") for k in header})
-
-
-def ensure_columns(header: list[str], cols: list[str]) -> list[str]:
-    out = list(header)
-    for c in cols:
-        if c not in out:
-            out.append(c)
-    return out
-
-
 def main(argv: list[str]) -> int:
     ap = argparse.ArgumentParser(
         description=(
@@ -144,9 +122,7 @@ def main(argv: list[str]) -> int:
         print(f"File not found: {path}", file=sys.stderr)
         return 2
 
-    header, rows = read_tsv(path)
-    header = ensure_columns(
-        header,
+    table = Table.read(path).with_columns(
         [
             "fuel_type",
             "consumption_l_per_100km_default",
@@ -157,29 +133,29 @@ def main(argv: list[str]) -> int:
     updates: list[Update] = []
     fetches = 0
 
-    for r in rows:
-        provider_id = (r.get("provider_id") or "").strip()
-        vehicle_id = (r.get("vehicle_id") or "").strip()
-        vehicle_name = (r.get("vehicle_name") or "").strip()
+    for i, r in enumerate(table.rows):
+        provider_id = r.text("provider_id")
+        vehicle_id = r.text("vehicle_id")
+        vehicle_name = r.text("vehicle_name")
         if not provider_id or not vehicle_id:
             continue
 
-        current_fuel = (r.get("fuel_type") or "").strip()
+        current_fuel = r.text("fuel_type")
         if args.overwrite or current_fuel == "":
             inferred = infer_fuel_type(vehicle_name, vehicle_id)
             if inferred != current_fuel:
                 updates.append(Update(provider_id, vehicle_id, "fuel_type", current_fuel, inferred))
-                r["fuel_type"] = inferred
+                r = table.update(i, fuel_type=inferred)
 
-        fuel_type = (r.get("fuel_type") or "").strip().lower() or infer_fuel_type(vehicle_name, vehicle_id)
+        fuel_type = r.text("fuel_type").lower() or infer_fuel_type(vehicle_name, vehicle_id)
         if fuel_type == "ev":
             continue
 
-        current_cons = (r.get("consumption_l_per_100km_default") or "").strip()
+        current_cons = r.text("consumption_l_per_100km_default")
         if not (args.overwrite or current_cons == ""):
             continue
 
-        url = (r.get("consumption_source_url") or "").strip() or (r.get("snowboard_source_url") or "").strip()
+        url = r.text("consumption_source_url") or r.text("snowboard_source_url")
         if not url:
             continue
 
@@ -208,17 +184,17 @@ def main(argv: list[str]) -> int:
 
             if new_cons != current_cons:
                 updates.append(Update(provider_id, vehicle_id, "consumption_l_per_100km_default", current_cons, new_cons))
-                r["consumption_l_per_100km_default"] = new_cons
+                r = table.update(i, consumption_l_per_100km_default=new_cons)
 
-            current_source = (r.get("consumption_source_url") or "").strip()
+            current_source = r.text("consumption_source_url")
             if args.overwrite or current_source == "":
                 if url != current_source:
                     updates.append(Update(provider_id, vehicle_id, "consumption_source_url", current_source, url))
-                    r["consumption_source_url"] = url
+                    table.update(i, consumption_source_url=url)
 
     changed_keys = {(u.provider_id, u.vehicle_id) for u in updates}
     print(f"File: {path}")
-    print(f"Rows: {len(rows)}")
+    print(f"Rows: {len(table)}")
     print(f"Eligible fetches attempted: {fetches}")
     print(f"Vehicles touched: {len(changed_keys)}")
     print(f"Field updates: {len(updates)}")
@@ -234,7 +210,7 @@ def main(argv: list[str]) -> int:
         print("\nDry-run. Re-run with --apply to write changes.")
         return 0
 
-    write_tsv(path, header, rows)
+    table.write(path)
     print("Wrote changes.")
     return 0
 
@@ -368,6 +368,45 @@ def build_ico(images: list[tuple[int, int, bytes]]) -> bytes:
     return bytes(out)
 
 
+# Output files (relative to the output directory) and their square size.
+OUTPUTS = (
+    ("favicon.ico", (16, 32)),
+    ("favicon-32.png", 32),
+    ("apple-touch-icon.png", 180),
+    ("icon-192.png", 192),
+    ("icon-512.png", 512),
+    ("assets/logo.png", 128),
+    ("assets/logo-64.png", 64),
+)
+
+
+def generate(source_png: Path, out_dir: Path) -> list[Path]:
+    """Write every icon in `OUTPUTS` from `source_png`; returns the written paths."""
+    src = read_png_rgba(source_png)
+    src = trim_uniform_border(src, tol=10)
+    src = crop_center_square(src)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "assets").mkdir(parents=True, exist_ok=True)
+
+    sizes: dict[int, list[list[tuple[int, int, int, int]]]] = {}
+
+    def img(size: int) -> list[list[tuple[int, int, int, int]]]:
+        if size not in sizes:
+            sizes[size] = resample_square(src, size)
+        return sizes[size]
+
+    written = []
+    for name, size in OUTPUTS:
+        path = out_dir / name
+        if isinstance(size, tuple):
+            path.write_bytes(build_ico([(s, s, to_ico_bmp(img(s))) for s in size]))
+        else:
+            write_png(path, img(size))
+        written.append(path)
+    return written
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="Generate favicon + PWA/mobile icon assets from a source PNG.")
     ap.add_argument(
@@ -383,37 +422,8 @@ def main() -> None:
     )
     args = ap.parse_args()
 
-    src = read_png_rgba(args.source_png)
-    src = trim_uniform_border(src, tol=10)
-    src = crop_center_square(src)
-
-    out_dir: Path = args.out_dir
-    out_dir.mkdir(parents=True, exist_ok=True)
-    (out_dir / "assets").mkdir(parents=True, exist_ok=True)
-
-    img16 = resample_square(src, 16)
-    img32 = resample_square(src, 32)
-    img64 = resample_square(src, 64)
-    img128 = resample_square(src, 128)
-    img180 = resample_square(src, 180)
-    img192 = resample_square(src, 192)
-    img512 = resample_square(src, 512)
-
-    (out_dir / "favicon.ico").write_bytes(build_ico([(16, 16, to_ico_bmp(img16)), (32, 32, to_ico_bmp(img32))]))
-    write_png(out_dir / "favicon-32.png", img32)
-    write_png(out_dir / "apple-touch-icon.png", img180)
-    write_png(out_dir / "icon-192.png", img192)
-    write_png(out_dir / "icon-512.png", img512)
-    write_png(out_dir / "assets" / "logo.png", img128)
-    write_png(out_dir / "assets" / "logo-64.png", img64)
-
-    print("Wrote:", out_dir / "favicon.ico")
-    print("Wrote:", out_dir / "favicon-32.png")
-    print("Wrote:", out_dir / "apple-touch-icon.png")
-    print("Wrote:", out_dir / "icon-192.png")
-    print("Wrote:", out_dir / "icon-512.png")
-    print("Wrote:", out_dir / "assets" / "logo.png")
-    print("Wrote:", out_dir / "assets" / "logo-64.png")
+    for path in generate(args.source_png, args.out_dir):
+        print("Wrote:", path)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import csv
+import argparse
 import json
 import re
 import sys
@@ -8,8 +8,19 @@ from dataclasses import dataclass
 from pathlib import Path
 from urllib.request import Request, urlopen
 
+if __package__ in (None, ""):  # run as `python scripts/<name>.py`: make the repo's `carcalc` importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-def fetch_text(url: str) -> str:
+from carcalc.archive import DEFAULT_ARCHIVE, Archive  # noqa: E402
+from carcalc.history import History  # noqa: E402
+from carcalc.tsv import Header, Row, Table, diff, merge  # noqa: E402
+
+CITYBEE_PRICES_URL = "https://citybee.lv/lv/cenas/"
+CARGURU_RATE_SHORT_URL = "https://go-rest.carguru.online/public/web/rate/short"
+ARCHIVE_IMPORTER = "options"  # tags this script's runs in the shared fetch archive
+
+
+def fetch_text(url: str, archive: Archive | None = None) -> str:
     req = Request(
         url,
         headers={
@@ -19,10 +30,12 @@ def fetch_text(url: str) -> str:
     )
     with urlopen(req, timeout=30) as resp:
         data = resp.read()
+    if archive is not None:
+        archive.put(url, data)
     return data.decode("utf-8", errors="ignore")
 
 
-def fetch_json(url: str) -> object:
+def fetch_json(url: str, archive: Archive | None = None) -> object:
     req = Request(
         url,
         headers={
@@ -32,6 +45,8 @@ def fetch_json(url: str) -> object:
     )
     with urlopen(req, timeout=30) as resp:
         data = resp.read()
+    if archive is not None:
+        archive.put(url, data)
     return json.loads(data.decode("utf-8", errors="strict"))
 
 
@@ -401,57 +416,55 @@ def parse_carguru_options_from_rate_short(obj: object) -> tuple[list[OptionRow],
     return options, vehicle_ids
 
 
-def read_tsv(path: Path) -> tuple[list[str], list[dict[str, str]]]:
-    with path.open("r", encoding="utf-8") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        header = reader.fieldnames or []
-        rows = [dict(r) for r in reader]
-    return header, rows
-
-
-def write_tsv(path: Path, header: list[str], rows: list[dict[str, str]]) -> None:
-    with path.open("w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=header, delimiter="\t", lineterminator="\n")
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k, "") for k in header})
+def generate_rows(header: Header, citybee_html: str | None, carguru_json: object | None) -> list[Row]:
+    """Option rows parsed from the CityBee prices page and CarGuru `rate/short` JSON (either may be None)."""
+    options: list[OptionRow] = []
+    if citybee_html is not None:
+        options += parse_citybee_options_from_cenas(citybee_html)[0]
+    if carguru_json is not None:
+        options += parse_carguru_options_from_rate_short(carguru_json)[0]
+    rows = [header.from_mapping(o.as_dict()) for o in options]
+    rows.sort(key=lambda r: (r.get("provider_id"), r.get("vehicle_id"), r.get("option_type"), r.get("option_name")))
+    return rows
 
 
 def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description="Refresh web/data/options.tsv from CarGuru and CityBee public prices (other providers' rows are kept).")
+    ap.add_argument("--history", default="", help="Also record changed rows in this price-history store (see `python -m carcalc history`).")
+    ap.add_argument("--archive", default=str(DEFAULT_ARCHIVE), help="Keep the raw fetched payloads in this archive ('' to skip; see scripts/reprocess.py).")
+    args = ap.parse_args(argv)
+    archive = Archive(Path(args.archive), importer=ARCHIVE_IMPORTER) if args.archive else None
+
     root = Path(__file__).resolve().parents[1]
     options_path = root / "web" / "data" / "options.tsv"
     options_path.parent.mkdir(parents=True, exist_ok=True)
 
-    header, existing_rows = read_tsv(options_path)
-    if not header:
+    table = Table.read(options_path)
+    if not len(table.header):
         raise RuntimeError("Options.tsv header missing")
 
-    # Keep all existing rows except those we fully regenerate.
-    keep: list[dict[str, str]] = [
-        r for r in existing_rows if (r.get("provider_id") or "").strip() not in {"carguru", "citybee"}
-    ]
-
-    citybee_html = fetch_text("https://citybee.lv/lv/cenas/")
-    citybee_opts, _ = parse_citybee_options_from_cenas(citybee_html)
-
-    carguru_json = fetch_json("https://go-rest.carguru.online/public/web/rate/short")
-    carguru_opts, _ = parse_carguru_options_from_rate_short(carguru_json)
-
-    generated = [o.as_dict() for o in (citybee_opts + carguru_opts)]
-
-    # De-dup on option_id (last wins).
-    merged: dict[str, dict[str, str]] = {}
-    for r in keep + generated:
-        oid = (r.get("option_id") or "").strip()
-        if not oid:
-            continue
-        merged[oid] = r
-
-    out_rows = list(merged.values())
-    out_rows.sort(key=lambda r: (r.get("provider_id", ""), r.get("vehicle_id", ""), r.get("option_type", ""), r.get("option_name", "")))
-    write_tsv(options_path, header, out_rows)
-
-    print(f"Wrote {options_path} ({len(out_rows)} options; kept {len(keep)} other-provider rows)")
+    citybee_html = fetch_text(CITYBEE_PRICES_URL, archive)
+    carguru_json = fetch_json(CARGURU_RATE_SHORT_URL, archive)
+    generated = generate_rows(table.header, citybee_html, carguru_json)
+
+    # Regenerated providers' rows are replaced in place (or dropped when gone); other rows are kept.
+    out = merge(
+        table,
+        generated,
+        key=("option_id",),
+        near=("provider_id", "vehicle_id"),
+        drop=lambda r: r.text("provider_id") in {"carguru", "citybee"},
+    )
+    changes = diff(table, out, ("option_id",))
+    if changes:
+        out.write(options_path)
+    print(f"{options_path}: {changes.summary()}" + ("" if changes else " (not written)"))
+    for line in changes.lines():
+        print(f"  {line}")
+    if args.history:
+        with History(Path(args.history)) as history:
+            n = history.record({"options": out}, source="import_options.py")
+        print(f"{args.history}: {n} row versions recorded")
     return 0
 
 
@@ -1,12 +1,23 @@
 from __future__ import annotations
 
-import csv
+import argparse
 import re
 import sys
 from dataclasses import dataclass
 from pathlib import Path
 from urllib.request import Request, urlopen
 
+if __package__ in (None, ""):  # run as `python scripts/<name>.py`: make the repo's `carcalc` importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from carcalc.archive import DEFAULT_ARCHIVE, Archive  # noqa: E402
+from carcalc.history import History  # noqa: E402
+from carcalc.tsv import Row, Table, diff, merge  # noqa: E402
+
+
+CITYBEE_PRICES_URL = "https://citybee.lv/lv/cenas/"
+CARGURU_RATE_SHORT_URL = "https://go-rest.carguru.online/public/web/rate/short"
+ARCHIVE_IMPORTER = "vehicles"  # tags this script's runs in the shared fetch archive
 
 DEFAULT_VEHICLES_HEADER = [
     "provider_id",
@@ -37,7 +48,7 @@ class VehicleRow:
         }
 
 
-def fetch_text(url: str) -> str:
+def fetch_text(url: str, archive: Archive | None = None) -> str:
     req = Request(
         url,
         headers={
@@ -47,10 +58,12 @@ def fetch_text(url: str) -> str:
     )
     with urlopen(req, timeout=30) as resp:
         data = resp.read()
+    if archive is not None:
+        archive.put(url, data)
     return data.decode("utf-8", errors="ignore")
 
 
-def fetch_json(url: str) -> object:
+def fetch_json(url: str, archive: Archive | None = None) -> object:
     import json
 
     req = Request(
@@ -62,6 +75,8 @@ def fetch_json(url: str) -> object:
     )
     with urlopen(req, timeout=30) as resp:
         data = resp.read()
+    if archive is not None:
+        archive.put(url, data)
     return json.loads(data.decode("utf-8", errors="strict"))
 
 
@@ -131,64 +146,61 @@ def parse_carguru_vehicles_from_rate_short(obj: object) -> list[VehicleRow]:
     return vehicles
 
 
-def read_existing_vehicles(path: Path) -> tuple[list[str], dict[tuple[str, str], dict[str, str]]]:
+def read_existing_vehicles(path: Path) -> tuple[Table, dict[tuple[str, str], Row]]:
     if not path.exists():
-        return (list(DEFAULT_VEHICLES_HEADER), {})
-
-    with path.open("r", encoding="utf-8") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        header = list(reader.fieldnames or [])
-
-        # Preserve any existing columns, but ensure known columns exist (append-only).
-        for col in DEFAULT_VEHICLES_HEADER:
-            if col not in header:
-                header.append(col)
-
-        data: dict[tuple[str, str], dict[str, str]] = {}
-        for r in reader:
-            provider_id = (r.get("provider_id") or "").strip()
-            vehicle_id = (r.get("vehicle_id") or "").strip()
-            if not provider_id or not vehicle_id:
-                continue
-            data[(provider_id, vehicle_id)] = dict(r)
+        return (Table(DEFAULT_VEHICLES_HEADER), {})
 
-    return (header, data)
-
-
-def write_vehicles(path: Path, header: list[str], vehicles: list[dict[str, str]]) -> None:
-    with path.open("w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=header, delimiter="\t", lineterminator="\n")
-        w.writeheader()
-        for v in vehicles:
-            w.writerow({k: v.get(k, "") for k in header})
+    table = Table.read(path)
+    data = {
+        (r.text("provider_id"), r.text("vehicle_id")): r for r in table if r.text("provider_id") and r.text("vehicle_id")
+    }
+    return (table, data)
 
 
 def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description="Refresh web/data/vehicles.tsv from CarGuru and CityBee public data (existing rows are kept).")
+    ap.add_argument("--history", default="", help="Also record changed rows in this price-history store (see `python -m carcalc history`).")
+    ap.add_argument("--archive", default=str(DEFAULT_ARCHIVE), help="Keep the raw fetched payloads in this archive ('' to skip; see scripts/reprocess.py).")
+    args = ap.parse_args(argv)
+    archive = Archive(Path(args.archive), importer=ARCHIVE_IMPORTER) if args.archive else None
+
     root = Path(__file__).resolve().parents[1]
     vehicles_path = root / "web" / "data" / "vehicles.tsv"
     vehicles_path.parent.mkdir(parents=True, exist_ok=True)
 
-    header, existing = read_existing_vehicles(vehicles_path)
+    table, existing = read_existing_vehicles(vehicles_path)
+    # Preserve any existing columns, but ensure known columns exist (append-only).
+    expanded = table.with_columns(DEFAULT_VEHICLES_HEADER)
+    header = expanded.header
 
-    citybee_html = fetch_text("https://citybee.lv/lv/cenas/")
+    citybee_html = fetch_text(CITYBEE_PRICES_URL, archive)
     citybee_vehicles = parse_citybee_vehicles_from_cenas(citybee_html)
 
-    carguru_json = fetch_json("https://go-rest.carguru.online/public/web/rate/short")
+    carguru_json = fetch_json(CARGURU_RATE_SHORT_URL, archive)
     carguru_vehicles = parse_carguru_vehicles_from_rate_short(carguru_json)
 
-    merged = dict(existing)
+    merged: dict[tuple[str, str], Row] = {}
     for v in citybee_vehicles + carguru_vehicles:
         key = (v.provider_id, v.vehicle_id)
-        prev = merged.get(key, {})
-        merged[key] = {**prev, **v.as_dict()}
-
-    def sort_key(v: dict[str, str]) -> tuple[str, str, str]:
-        return (v.get("provider_id", ""), v.get("vehicle_class", ""), v.get("vehicle_name", ""))
-
-    out = sorted(merged.values(), key=sort_key)
-    write_vehicles(vehicles_path, header, out)
-
-    print(f"Wrote {vehicles_path} ({len(out)} vehicles; preserved extra columns)")
+        prev = merged.get(key) or existing.get(key)
+        merged[key] = header.coerce(prev).replace(v.as_dict()) if prev is not None else header.from_mapping(v.as_dict())
+
+    def sort_key(v: Row) -> tuple[str, str, str]:
+        return (v.get("provider_id"), v.get("vehicle_class"), v.get("vehicle_name"))
+
+    # Vehicles are never dropped (options may still reference them); updates stay in place.
+    key = ("provider_id", "vehicle_id")
+    out = merge(expanded, sorted(merged.values(), key=sort_key), key=key, near=("provider_id", "vehicle_class"))
+    changes = diff(table, out, key)
+    if changes or not vehicles_path.exists():
+        out.write(vehicles_path)
+    print(f"{vehicles_path}: {changes.summary()}" + ("" if changes else " (not written)"))
+    for line in changes.lines():
+        print(f"  {line}")
+    if args.history:
+        with History(Path(args.history)) as history:
+            n = history.record({"vehicles": out}, source="import_vehicles.py")
+        print(f"{args.history}: {n} row versions recorded")
     return 0
 
 
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+if __package__ in (None, ""):  # run as `python scripts/<name>.py`: make the repo's `carcalc` importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from carcalc.archive import DEFAULT_ARCHIVE, Archive, Entry  # noqa: E402
+from carcalc.tsv import Header, Table, diff  # noqa: E402
+from scripts.import_options import ARCHIVE_IMPORTER, CARGURU_RATE_SHORT_URL, CITYBEE_PRICES_URL, generate_rows  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_OUT = ROOT / "build" / "reprocessed"
+DEFAULT_OPTIONS_PATH = ROOT / "web" / "data" / "options.tsv"
+SOURCES = (CITYBEE_PRICES_URL, CARGURU_RATE_SHORT_URL)
+
+
+def payloads(entries: list[Entry]) -> tuple[tuple[str, str], ...]:
+    """(url, hash) of the last fetch of each known source in a run: equal runs parse alike."""
+    last = {e.url: e.sha256 for e in entries if e.url in SOURCES}
+    return tuple(sorted(last.items()))
+
+
+def parse_snapshot(archive_root: Path, columns: list[str], sources: tuple[tuple[str, str], ...]) -> tuple[list[tuple[str, ...]], list[str]]:
+    """Option rows (plain tuples, in `columns` order) and errors for one set of archived payloads."""
+    archive = Archive(archive_root)
+    errors = []
+    citybee_html: str | None = None
+    carguru_json: object | None = None
+    fetched = {url for url, _ in sources}
+    # A run whose fetch failed part-way would otherwise parse as that provider dropping every row.
+    errors.extend(f"{url}: not fetched in this run" for url in SOURCES if url not in fetched)
+    for url, digest in sources:
+        try:
+            data = archive.get(digest)
+            if url == CITYBEE_PRICES_URL:
+                citybee_html = data.decode("utf-8", errors="ignore")
+            else:
+                carguru_json = json.loads(data.decode("utf-8", errors="strict"))
+        except Exception as e:  # noqa: BLE001 - report the payload, keep the rest of the snapshot
+            errors.append(f"{url} ({digest[:12]}): {type(e).__name__}: {e}")
+    try:
+        rows = generate_rows(Header(columns), citybee_html, carguru_json)
+    except Exception as e:  # noqa: BLE001
+        return [], [*errors, f"parse: {type(e).__name__}: {e}"]
+    return [tuple(r) for r in rows], errors
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(
+        description=(
+            "Rerun the current option parsers over every archived fetch (see carcalc.archive) "
+            "and write one options.tsv per options import run."
+        )
+    )
+    ap.add_argument("--archive", default=str(DEFAULT_ARCHIVE), help="Archive directory (default: ./build/archive)")
+    ap.add_argument("--out", default=str(DEFAULT_OUT), help="Output directory; writes <out>/<run>/options.tsv (default: ./build/reprocessed)")
+    ap.add_argument("--options", default=str(DEFAULT_OPTIONS_PATH), help="options.tsv whose header the output uses (default: ./web/data/options.tsv)")
+    ap.add_argument("--run", action="append", default=[], help="Only reprocess this run id (repeatable).")
+    ap.add_argument("-j", "--jobs", type=int, default=0, help="Parser processes (default: CPU count).")
+    args = ap.parse_args(argv)
+
+    archive_root = Path(args.archive)
+    snapshots = Archive(archive_root).snapshots(importer=ARCHIVE_IMPORTER)  # not the vehicles importer's runs
+    if args.run:
+        snapshots = {run: entries for run, entries in snapshots.items() if run in set(args.run)}
+    if not snapshots:
+        print(f"No archived runs in {archive_root}", file=sys.stderr)
+        return 2
+    columns = list(Table.read(Path(args.options)).header.names)
+
+    started = time.perf_counter()
+    by_run = {run: payloads(entries) for run, entries in snapshots.items()}
+    unique = list(dict.fromkeys(by_run.values()))  # runs that fetched identical payloads parse once
+    jobs = min(args.jobs or os.cpu_count() or 1, len(unique))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parsed = dict(zip(unique, pool.map(parse_snapshot, [archive_root] * len(unique), [columns] * len(unique), unique)))
+    else:
+        parsed = {sources: parse_snapshot(archive_root, columns, sources) for sources in unique}
+
+    out = Path(args.out)
+    failed = 0
+    previous: Table | None = None
+    for run, sources in by_run.items():
+        rows, errors = parsed[sources]
+        table = Table(columns, rows)
+        path = out / run / "options.tsv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table.write(path)
+        change = diff(previous, table, ("option_id",)).summary() if previous is not None else "first run"
+        print(f"{run}: {len(sources)} payloads, {len(table)} options ({change})")
+        for error in errors:
+            print(f"  error: {error}", file=sys.stderr)
+        failed += bool(errors)
+        previous = table
+    print(f"{len(by_run)} runs ({len(unique)} distinct) reprocessed in {time.perf_counter() - started:.2f}s -> {out}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import argparse
-import csv
 import re
 import sys
 from dataclasses import dataclass
 from pathlib import Path
 
+if __package__ in (None, ""):  # run as `python scripts/<name>.py`: make the repo's `carcalc` importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from carcalc.store import read_table  # noqa: E402
+
 
 @dataclass(frozen=True)
 class Vehicle:
@@ -37,22 +41,19 @@ class Vehicle:
 
 
 def read_vehicles(path: Path) -> tuple[list[str], list[Vehicle]]:
-    with path.open("r", encoding="utf-8") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        header = list(reader.fieldnames or [])
-        vehicles: list[Vehicle] = []
-        for r in reader:
-            vehicles.append(
-                Vehicle(
-                    provider_id=(r.get("provider_id") or "").strip(),
-                    vehicle_id=(r.get("vehicle_id") or "").strip(),
-                    vehicle_name=(r.get("vehicle_name") or "").strip(),
-                    vehicle_class=(r.get("vehicle_class") or "").strip(),
-                    snowboard_fit_raw=(r.get("snowboard_fit") or "").strip(),
-                    snowboard_source_url=(r.get("snowboard_source_url") or "").strip(),
-                )
-            )
-    return header, vehicles
+    table = read_table(path, "vehicles")
+    vehicles = [
+        Vehicle(
+            provider_id=r.text("provider_id"),
+            vehicle_id=r.text("vehicle_id"),
+            vehicle_name=r.text("vehicle_name"),
+            vehicle_class=r.text("vehicle_class"),
+            snowboard_fit_raw=r.text("snowboard_fit"),
+            snowboard_source_url=r.text("snowboard_source_url"),
+        )
+        for r in table
+    ]
+    return list(table.header), vehicles
 
 
 def norm_spaces(s: str) -> str:
@@ -74,7 +75,7 @@ def main(argv: list[str]) -> int:
     ap.add_argument(
         "--path",
         default=str(Path(__file__).resolve().parents[1] / "web" / "data" / "vehicles.tsv"),
-        help="Path to vehicles.tsv (default: ./web/data/vehicles.tsv)",
+        help="Path to vehicles.tsv, or a `carcalc store` SQLite file (default: ./web/data/vehicles.tsv)",
     )
     args = ap.parse_args(argv)
 
@@ -0,0 +1,69 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { spawnSync } from 'node:child_process';
+import { mkdtempSync, readFileSync, rmSync } from 'node:fs';
+import { tmpdir } from 'node:os';
+import { join } from 'node:path';
+
+import { createBaseContext, computeAll } from '../../web/lib/calc.js';
+import { decodeBundle } from '../../web/lib/bundle.js';
+import { parseTsv } from '../../web/lib/tsv.js';
+import { normalizeData } from '../../web/lib/data.js';
+
+const root = new URL('../../', import.meta.url);
+
+test('decodeBundle exposes column values by name', () => {
+  const bundle = {
+    format: 1,
+    strings: ['bolt', 'PAYG', 'x'],
+    providers: { count: 1, columns: { provider_id: [0] }, numeric: [] },
+    vehicles: { count: 0, columns: {}, numeric: [] },
+    options: { count: 2, columns: { provider_id: [0, 0], option_type: [1, 2], km_rate_eur: [0.29, null] }, numeric: ['km_rate_eur'] },
+  };
+  const { providers, options } = decodeBundle(bundle);
+  assert.equal(providers[0].provider_id, 'bolt');
+  assert.deepEqual(options.map((o) => [o.option_type, o.km_rate_eur]), [['PAYG', 0.29], ['x', null]]);
+  assert.equal(options[1].notes, undefined);
+  assert.throws(() => decodeBundle({ ...bundle, format: 99 }), /format/);
+});
+
+test('bundle built from the TSVs prices exactly like the TSVs', (t) => {
+  const out = mkdtempSync(join(tmpdir(), 'carcalc-bundle-'));
+  t.after(() => rmSync(out, { recursive: true, force: true }));
+  const built = spawnSync(process.env.PYTHON || 'python3', ['-m', 'carcalc', 'bundle', '--out-dir', out], { cwd: root, encoding: 'utf8' });
+  if (built.error) {
+    t.skip(`python not available: ${built.error.message}`);
+    return;
+  }
+  assert.equal(built.status, 0, built.stderr);
+
+  const read = (name) => readFileSync(new URL(`web/data/${name}.tsv`, root), 'utf8');
+  const fromTsv = normalizeData({
+    providers: parseTsv(read('providers')).data,
+    vehicles: parseTsv(read('vehicles')).data,
+    options: parseTsv(read('options')).data,
+  });
+  const fromBundle = normalizeData(decodeBundle(JSON.parse(readFileSync(join(out, 'bundle.json'), 'utf8'))));
+  assert.equal(fromBundle.options.length, fromTsv.options.length);
+  assert.deepEqual([...fromBundle.vehiclesById.values()].map((v) => v.fuel_type), [...fromTsv.vehiclesById.values()].map((v) => v.fuel_type));
+
+  const trips = [
+    { start: '2026-03-01T10:00', totalMin: 90, parkingMin: 10, distKm: 40, airport: false },
+    { start: '2026-03-06T21:30', totalMin: 600, parkingMin: 420, distKm: 15, airport: true },
+    { start: '2026-03-02T08:00', totalMin: 3 * 1440, parkingMin: 2000, distKm: 700, airport: false },
+  ];
+  for (const trip of trips) {
+    const ctx = createBaseContext({
+      ...trip,
+      start: new Date(trip.start),
+      fuelPriceE95: 1.6,
+      fuelPriceDiesel: 1.55,
+      consumptionOverride: 0,
+      consumptionOverrideEnabled: false,
+    });
+    const a = computeAll(fromTsv, ctx, '');
+    const b = computeAll(fromBundle, ctx, '');
+    assert.deepEqual(b.errors, a.errors);
+    assert.deepEqual(b.results, a.results);
+  }
+});
@@ -0,0 +1,58 @@
+import threading
+import time
+import unittest
+
+from carcalc.admission import AdmissionController, Shed
+
+
+def wait_until(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_queue_full_and_deadline_shed_fast(self) -> None:
+        adm = AdmissionController(1, max_queue=1, queue_timeout_s=0.05, degrade_at=0)
+        adm.acquire()
+        queued = threading.Thread(target=lambda: self.assertRaises(Shed, adm.acquire))
+        queued.start()
+        wait_until(lambda: len(adm.queue) == 1)
+        started = time.perf_counter()
+        with self.assertRaises(Shed) as cm:
+            adm.acquire()
+        self.assertLess(time.perf_counter() - started, 0.01)
+        self.assertEqual((cm.exception.reason, cm.exception.retry_after), ("queue_full", 1))
+        queued.join()
+        self.assertEqual(adm.stats()["shed"], {"queue_full": 1, "deadline": 1})
+        self.assertEqual((adm.active, len(adm.queue)), (1, 0))
+        adm.release()
+        self.assertEqual(adm.active, 0)
+
+    def test_slots_are_handed_over_in_arrival_order(self) -> None:
+        adm = AdmissionController(1, max_queue=8, queue_timeout_s=5, degrade_at=2)
+        order: list[int] = []
+        adm.acquire()
+
+        def worker(n: int) -> None:
+            with adm.slot():
+                order.append(n)
+
+        threads = []
+        for n in range(3):
+            threads.append(threading.Thread(target=worker, args=(n,)))
+            threads[-1].start()
+            wait_until(lambda: len(adm.queue) == n + 1)
+        self.assertTrue(adm.saturated)
+        adm.release()
+        for t in threads:
+            t.join()
+        self.assertEqual(order, [0, 1, 2])
+        self.assertFalse(adm.saturated)
+        self.assertEqual((adm.active, adm.stats()["admitted"]), (0, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
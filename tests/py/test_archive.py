@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from carcalc.archive import INDEX_NAME, Archive
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name) / "archive"
+
+    def test_payloads_are_stored_once_and_indexed_per_fetch(self) -> None:
+        first = Archive(self.root, run="r1")
+        digest = first.put("https://example.test/a", b"<html>a</html>" * 100, fetched_at="2026-01-01T00:00:00Z")
+        first.put("https://example.test/b", b"{}", fetched_at="2026-01-01T00:00:01Z")
+        second = Archive(self.root, run="r2")
+        self.assertEqual(second.put("https://example.test/a", b"<html>a</html>" * 100), digest)
+
+        self.assertEqual(len(list((self.root / "objects").rglob("*.gz"))), 2)
+        self.assertLess(first.object_path(digest).stat().st_size, 200)  # compressed
+        self.assertEqual(second.get(digest), b"<html>a</html>" * 100)
+
+        snapshots = Archive(self.root).snapshots()
+        self.assertEqual(list(snapshots), ["r1", "r2"])
+        self.assertEqual([(e.url, e.size) for e in snapshots["r1"]], [("https://example.test/a", 1400), ("https://example.test/b", 2)])
+        self.assertEqual((self.root / INDEX_NAME).read_text().splitlines()[0], "run\tfetched_at\turl\tsha256\tbytes\timporter")
+
+    def test_corrupt_objects_are_detected(self) -> None:
+        archive = Archive(self.root, run="r1")
+        digest = archive.put("https://example.test/a", b"payload")
+        other = archive.put("https://example.test/b", b"other payload")
+        archive.object_path(digest).write_bytes(archive.object_path(other).read_bytes())
+        with self.assertRaisesRegex(ValueError, "corrupt"):
+            archive.get(digest)
+
+    def test_runs_are_tagged_by_importer_and_old_indexes_upgraded(self) -> None:
+        self.root.mkdir()
+        (self.root / INDEX_NAME).write_text("run\tfetched_at\turl\tsha256\tbytes\nr0\t2026-01-01T00:00:00Z\thttps://example.test/a\tabc\t3\n")
+        Archive(self.root, run="r1", importer="options").put("https://example.test/a", b"a")
+        Archive(self.root, run="r2", importer="vehicles").put("https://example.test/a", b"a")
+        archive = Archive(self.root)
+        self.assertEqual([(e.run, e.importer) for e in archive.entries()], [("r0", ""), ("r1", "options"), ("r2", "vehicles")])
+        self.assertEqual(list(archive.snapshots(importer="options")), ["r1"])
+        self.assertEqual(list(archive.snapshots()), ["r0", "r1", "r2"])
+
+    def test_missing_index_means_no_entries(self) -> None:
+        self.assertEqual(Archive(self.root).entries(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from carcalc import build
+from scripts.generate_favicon import OUTPUTS
+
+
+def _copy_upper(root: Path) -> None:
+    (root / "out").mkdir(exist_ok=True)
+    (root / "out" / "upper.txt").write_text((root / "in.txt").read_text().upper())
+
+
+def _copy_tool(root: Path) -> None:
+    (root / "out").mkdir(exist_ok=True)
+    (root / "out" / "tool.txt").write_text((root / "tool.py").read_text())
+
+
+def _count_lines(root: Path) -> None:
+    (root / "out" / "lines.txt").write_text(str(len((root / "out" / "upper.txt").read_text().splitlines())))
+
+
+def _fail(root: Path) -> None:
+    raise RuntimeError("boom")
+
+
+UPPER = build.Target("upper", inputs=("in.txt",), outputs=("out/upper.txt",), tools=("tool.py",), run=_copy_upper)
+LINES = build.Target("lines", inputs=("out/upper.txt",), outputs=("out/lines.txt",), tools=(), run=_count_lines, deps=("upper",))
+
+
+class TestBuild(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        (self.root / "in.txt").write_text("a\nb\n")
+        (self.root / "tool.py").write_text("v1")
+
+    def run_build(self, targets=(UPPER, LINES), **kw) -> dict[str, str]:
+        return {r.name: r.status for r in build.build(targets, root=self.root, **kw)}
+
+    def test_rebuilds_only_what_changed(self) -> None:
+        self.assertEqual(self.run_build(), {"upper": "built", "lines": "built"})
+        self.assertEqual((self.root / "out" / "lines.txt").read_text(), "2")
+        self.assertEqual(self.run_build(), {"upper": "up to date", "lines": "up to date"})
+
+        (self.root / "in.txt").write_text("a\nb\n")  # same content: still up to date
+        self.assertEqual(self.run_build(), {"upper": "up to date", "lines": "up to date"})
+
+        (self.root / "in.txt").write_text("x\n")
+        self.assertEqual(self.run_build(), {"upper": "built", "lines": "built"})  # lines' input changed too
+        self.assertEqual((self.root / "out" / "lines.txt").read_text(), "1")
+
+        (self.root / "tool.py").write_text("v2")
+        self.assertEqual(self.run_build(), {"upper": "built", "lines": "up to date"})  # same output
+
+        (self.root / "out" / "lines.txt").write_text("edited")
+        results = build.build([UPPER, LINES], root=self.root, dry_run=True)
+        self.assertEqual([(r.name, r.status, r.detail) for r in results][1], ("lines", "stale", "output modified: out/lines.txt"))
+        self.assertEqual(self.run_build(), {"upper": "up to date", "lines": "built"})
+
+        manifest = json.loads((self.root / build.MANIFEST_NAME).read_text())["targets"]
+        self.assertEqual(set(manifest["upper"]["inputs"]), {"in.txt"})
+
+    def test_failures_skip_dependents_and_are_not_recorded(self) -> None:
+        broken = build.Target("upper", inputs=("in.txt",), outputs=("out/upper.txt",), tools=(), run=_fail)
+        self.assertEqual(self.run_build((broken, LINES)), {"upper": "failed", "lines": "skipped"})
+        self.assertEqual(self.run_build(), {"upper": "built", "lines": "built"})
+        missing = build.Target("missing", inputs=("nope.txt",), outputs=(), tools=(), run=_fail)
+        self.assertEqual(self.run_build((missing,)), {"missing": "failed"})
+
+    def test_independent_targets_build_in_parallel_workers(self) -> None:
+        other = build.Target("other", inputs=("tool.py",), outputs=("out/tool.txt",), tools=(), run=_copy_tool)
+        self.assertEqual(self.run_build((UPPER, other), jobs=2), {"upper": "built", "other": "built"})
+        self.assertEqual((self.root / "out" / "upper.txt").read_text(), "A\nB\n")
+        self.assertEqual((self.root / "out" / "tool.txt").read_text(), "v1")
+
+    def test_cycles_are_rejected(self) -> None:
+        a = build.Target("a", (), (), (), _fail, deps=("b",))
+        b = build.Target("b", (), (), (), _fail, deps=("a",))
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            build.order([a, b])
+
+    def test_icon_target_lists_every_generated_icon(self) -> None:
+        icons = next(t for t in build.TARGETS if t.name == "icons")
+        self.assertEqual(icons.outputs, tuple(f"web/{name}" for name, _ in OUTPUTS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from carcalc import bundle
+from carcalc.calc import to_number_maybe
+from carcalc.data import DEFAULT_DATA_DIR, load_data
+
+
+class TestBundle(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.bundle, cls.notes = bundle.build()
+        cls.data = load_data()
+
+    def test_rows_match_the_normalized_tsvs(self) -> None:
+        options = bundle.decode(self.bundle, "options")
+        self.assertEqual(len(options), len(self.data.options))
+        for got, raw in zip(options, self.data.options):
+            for column, value in got.items():
+                if bundle.is_numeric_option_column(column):
+                    self.assertEqual(value, to_number_maybe(raw[column]), column)
+                else:
+                    self.assertEqual(value, raw[column], column)
+            self.assertNotIn("notes", got)
+        vehicles = bundle.decode(self.bundle, "vehicles")
+        expected = [{k: v for k, v in veh.items() if k not in bundle.VEHICLE_NOTES} for veh in self.data.vehicles_by_id.values()]
+        self.assertEqual(vehicles, expected)
+        self.assertEqual(bundle.decode(self.bundle, "providers"), self.data.providers)
+
+    def test_notes_move_to_the_side_file(self) -> None:
+        with_notes = [o for o in self.data.options if o.get("notes")]
+        self.assertTrue(with_notes)
+        self.assertEqual(self.notes["options"][with_notes[0]["option_id"]]["notes"], with_notes[0]["notes"])
+        self.assertEqual(self.notes["version"], self.bundle["version"])
+        self.assertNotIn(with_notes[0]["notes"], self.bundle["strings"])
+
+    def test_write_check_and_version(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_dir = Path(tmp)
+            for name in bundle.SOURCES:
+                shutil.copy(DEFAULT_DATA_DIR / f"{name}.tsv", data_dir)
+            self.assertFalse(bundle.is_current(data_dir, data_dir))
+            out = io.StringIO()
+            with redirect_stdout(out):
+                self.assertEqual(bundle.main(["--data-dir", tmp, "--out-dir", tmp]), 0)
+            self.assertIn(f"bundle {self.bundle['version']}", out.getvalue())
+            self.assertTrue(bundle.is_current(data_dir, data_dir))
+            self.assertEqual(json.loads((data_dir / bundle.BUNDLE_NAME).read_text())["version"], self.bundle["version"])
+            self.assertEqual(bundle.write(data_dir, *bundle.build(data_dir)), [])  # unchanged: nothing rewritten
+
+            with (data_dir / "options.tsv").open("a", encoding="utf-8") as f:
+                f.write("bolt\tbolt_x\tbolt_x_payg\tPAYG\tPAYG\n")
+            self.assertFalse(bundle.is_current(data_dir, data_dir))
+            with redirect_stderr(io.StringIO()):
+                self.assertEqual(bundle.main(["--data-dir", tmp, "--out-dir", tmp, "--check"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import threading
+import unittest
+
+from carcalc.cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_lru_bounded_by_bytes(self) -> None:
+        cache = ResponseCache(max_bytes=10)
+        self.assertEqual(cache.get("a", lambda: b"aaaa"), b"aaaa")
+        cache.get("b", lambda: b"bbbb")
+        self.assertEqual(cache.get("a", lambda: b"new!"), b"aaaa")  # hit, and now most recent
+        cache.get("c", lambda: b"cccc")  # evicts b
+        self.assertEqual(cache.get("b", lambda: b"BBBB"), b"BBBB")
+        cache.get("huge", lambda: b"x" * 11)  # never stored
+        self.assertEqual(cache.nbytes, 8)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (1, 5, 2))
+
+    def test_concurrent_misses_are_coalesced(self) -> None:
+        cache = ResponseCache()
+        release = threading.Event()
+        calls = []
+
+        def compute() -> bytes:
+            calls.append(1)
+            release.wait(5)
+            return b"body"
+
+        results: list[bytes] = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("k", compute))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        while cache.coalesced < 3:
+            threading.Event().wait(0.001)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual((len(calls), results), (1, [b"body"] * 4))
+
+    def test_errors_are_shared_but_not_cached(self) -> None:
+        cache = ResponseCache()
+
+        def fail() -> bytes:
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            cache.get("k", fail)
+        self.assertEqual(cache.get("k", lambda: b"ok"), b"ok")
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
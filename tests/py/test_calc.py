@@ -0,0 +1,117 @@
+import unittest
+from dataclasses import replace
+from datetime import datetime
+
+from carcalc.calc import (
+    compute_night_minutes,
+    compute_option_price,
+    create_base_context,
+    round_to_cents,
+    to_fixed,
+    to_number_maybe,
+)
+from carcalc.data import load_data, normalize_data, parse_tsv
+from carcalc.engine import Tariffs
+
+
+def ctx_with_split(drive_day: int, **kwargs):
+    return replace(create_base_context(start=datetime(2026, 1, 24, 12, 0), **kwargs), drive_day_min=drive_day)
+
+
+class TestCalc(unittest.TestCase):
+    def test_to_number_maybe_eu_formats(self) -> None:
+        self.assertEqual(to_number_maybe("1.041"), 1041)
+        self.assertEqual(to_number_maybe("1 041,50"), 1041.5)
+        self.assertEqual(to_number_maybe("0.280"), 0.28)
+        self.assertEqual(to_number_maybe("€ 2,55"), 2.55)
+        self.assertIsNone(to_number_maybe(""))
+
+    def test_js_rounding_helpers(self) -> None:
+        self.assertEqual(round_to_cents(1.005), 1.01)
+        self.assertEqual(to_fixed(0.125, 2), "0.13")
+        self.assertEqual(to_fixed(-0.0, 2), "0.00")
+
+    def test_night_minutes_cross_midnight(self) -> None:
+        start = datetime(2026, 1, 24, 21, 0)
+        self.assertEqual(compute_night_minutes(start, datetime(2026, 1, 25, 7, 0), "22:00", "06:00"), 480)
+        self.assertEqual(compute_night_minutes(start, datetime(2026, 1, 25, 7, 0), "bad", "06:00"), 0)
+
+    def test_payg_caps_time_only(self) -> None:
+        option = {
+            "provider_id": "bolt",
+            "option_type": "PAYG",
+            "min_total_eur": "2.55",
+            "cap_24h_eur": "20.90",
+            "drive_day_min_rate_eur": "0.13",
+            "park_day_min_rate_eur": "0.13",
+            "km_rate_eur": "0.29",
+            "fuel_included": "TRUE",
+        }
+        ctx = create_base_context(start=datetime(2026, 1, 24, 12, 0), total_min=390, parking_min=150, dist_km=140)
+        ctx = replace(ctx, drive_day_min=240, park_day_min=150)
+        priced = compute_option_price(ctx, option)
+        self.assertEqual(priced["breakdown"]["time_eur"], 20.9)
+        self.assertEqual(priced["breakdown"]["km_eur"], 40.6)
+        self.assertEqual(priced["total_eur"], 61.5)
+        self.assertEqual(priced["breakdown"]["labels"]["time"], "Time (capped)")
+
+    def test_carguru_default_service_fee(self) -> None:
+        option = {"provider_id": "carguru", "option_type": "PAYG", "fixed_fee_eur": "0", "drive_day_min_rate_eur": "0.13"}
+        priced = compute_option_price(ctx_with_split(1, total_min=1, parking_min=0, dist_km=0), option)
+        self.assertEqual(priced["breakdown"]["fees_eur"], 0.99)
+        self.assertIn("Service fee: €0.99", priced["breakdown"]["tooltips"]["fees"])
+
+    def test_unknown_option_type(self) -> None:
+        priced = compute_option_price(ctx_with_split(1, total_min=1, parking_min=0, dist_km=0), {"option_type": "HOURLY"})
+        self.assertEqual(priced, {"ok": False, "reason": "Unknown option_type: HOURLY"})
+
+
+class TestEngine(unittest.TestCase):
+    def setUp(self) -> None:
+        _, providers = parse_tsv("provider_id\tprovider_name\tnight_start\tnight_end\nbolt\tBolt\t22:00\t06:00\n")
+        _, vehicles = parse_tsv("provider_id\tvehicle_id\tvehicle_name\nbolt\tbolt_yaris\tYaris\n")
+        _, options = parse_tsv(
+            "provider_id\tvehicle_id\toption_id\toption_name\toption_type\tdrive_day_min_rate_eur\tpackage_price_eur\tincluded_min\n"
+            "bolt\tbolt_yaris\ta\tA\tPAYG\t1\t\t\n"
+            "bolt\tbolt_yaris\tb\tB\tPAYG\t0\t\t\n"
+            "bolt\tbolt_yaris\tc\tC\tPACKAGE\t0\t50\t60\n"
+            "bolt\tbolt_yaris\td\tD\tHOURLY\t0\t\t\n"
+        )
+        self.tariffs = Tariffs.compile(normalize_data(providers, vehicles, options))
+        self.ctx = create_base_context(start=datetime(2026, 1, 24, 12, 0), total_min=10, parking_min=0, dist_km=0)
+
+    def test_compute_all_ranks_and_reports_errors(self) -> None:
+        results, errors = self.tariffs.compute_all(self.ctx)
+        self.assertEqual([r["option_id"] for r in results], ["b", "a", "c"])
+        self.assertEqual(results[1]["total_eur"], 10)
+        self.assertEqual(errors, ["bolt/bolt_yaris/d: Unknown option_type: HOURLY"])
+
+    def test_ranked_matches_compute_all(self) -> None:
+        self.assertEqual(self.tariffs.ranked(self.ctx), self.tariffs.compute_all(self.ctx))
+        top, errors = self.tariffs.ranked(self.ctx, limit=2, detail=False)
+        self.assertEqual([(r["option_id"], r["total_eur"]) for r in top], [("b", 0), ("a", 10)])
+        self.assertNotIn("breakdown", top[0])
+        self.assertEqual(len(errors), 1)
+
+    def test_cheapest_matches_compute_all(self) -> None:
+        quote = self.tariffs.cheapest(self.ctx)
+        self.assertEqual((self.tariffs.option_ids[quote.index], quote.total_eur), ("b", 0))
+        self.assertEqual(self.tariffs.totals(self.ctx), [10, 0, 50, None])
+        self.assertIsNone(self.tariffs.cheapest(self.ctx, provider_filter="citybee"))
+
+    def test_cheapest_matches_totals_with_negative_discounts(self) -> None:
+        tariffs = Tariffs.compile(load_data())
+        for pct in (-10, -50, -90, 150):
+            for total_min, dist_km in ((5, 1), (30, 10), (90, 40), (600, 120), (2000, 300)):
+                ctx = create_base_context(
+                    start=datetime(2026, 1, 24, 12, 0),
+                    total_min=total_min,
+                    parking_min=0,
+                    dist_km=dist_km,
+                    discount_carguru=pct,
+                    discount_citybee_percent=pct,
+                    discount_bolt=pct,
+                )
+                totals = [t for t in tariffs.totals(ctx) if t is not None]
+                with self.subTest(pct=pct, total_min=total_min, dist_km=dist_km):
+                    self.assertEqual(tariffs.cheapest(ctx).total_eur, min(totals))
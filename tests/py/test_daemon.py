@@ -0,0 +1,89 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from dataclasses import fields
+from pathlib import Path
+from unittest import mock
+
+from carcalc import daemon
+from carcalc.data import DEFAULT_DATA_DIR
+from carcalc.reprice import ContextDefaults
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.sock = Path(tmp.name) / "price.sock"
+
+    def test_client_constants_match_engine(self) -> None:
+        self.assertEqual(daemon.DEFAULT_DATA_DIR, DEFAULT_DATA_DIR)
+        self.assertEqual(set(daemon.CONTEXT_FIELDS), {f.name for f in fields(ContextDefaults)})
+
+    def test_requests_and_idle_exit(self) -> None:
+        thread = threading.Thread(target=daemon.run_daemon, args=(self.sock, DEFAULT_DATA_DIR, 0.3, 0))
+        thread.start()
+        self.assertTrue(self.wait_for_socket())
+        client = daemon.Client.connect(self.sock)
+        try:
+            ok = client.request("/price", {"start": "2026-03-01T10:00", "total_min": 90, "km": 30, "limit": 2, "breakdown": 0})
+            self.assertEqual((ok["status"], len(ok["body"]["results"])), (200, 2))
+            self.assertEqual(client.request("/option/nope/breakdown", {"start": "2026-03-01"})["status"], 404)
+            self.assertEqual(client.request("/price", {"total_min": 5})["status"], 400)
+            self.assertEqual(client.request("/price", {"start": "2026-03-01T10:00", "total_min": 90, "km": "inf"})["status"], 400)
+            self.assertEqual(client.request("/price", {"start": "2026-03-01T10:00", "total_min": 1e400})["status"], 400)
+            time.sleep(0.5)  # an open connection keeps the daemon alive
+            self.assertTrue(thread.is_alive())
+        finally:
+            client.close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(self.sock.exists())
+
+    def test_private_open_refuses_symlinks(self) -> None:
+        target = self.sock.with_name("target")
+        link = self.sock.with_suffix(".log")
+        link.symlink_to(target)
+        with self.assertRaises(OSError):
+            daemon.private_open(link, os.O_WRONLY | os.O_APPEND)
+        self.assertFalse(target.exists())
+        os.close(daemon.private_open(self.sock.with_suffix(".lock"), os.O_WRONLY))
+        self.assertEqual(self.sock.with_suffix(".lock").stat().st_mode & 0o777, 0o600)
+
+    def test_cli_starts_and_stops_daemon(self) -> None:
+        out = io.StringIO()
+        args = ["--socket", str(self.sock), "--start", "2026-03-01T10:00", "--total-min", "1:30", "--km", "30", "-n", "3"]
+        with redirect_stdout(out):
+            self.assertEqual(daemon.main(args), 0)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+        self.assertEqual(daemon.main(["--socket", str(self.sock), "--stop"]), 0)
+        self.assertFalse(self.sock.exists())
+
+    def test_stdin_reports_bad_lines(self) -> None:
+        out = io.StringIO()
+        lines = '{"start": "2026-03-01T10:00", "total_min": 60}\nnot json\n\n[1, 2]\n{"total_min": 30, "start": "2026-03-01"}\n'
+        with redirect_stdout(out), mock.patch("sys.stdin", io.StringIO(lines)):
+            self.assertEqual(daemon.main(["--socket", str(self.sock), "--stdin", "-n", "1"]), 1)
+        self.addCleanup(daemon.main, ["--socket", str(self.sock), "--stop"])
+        rows = [json.loads(r) for r in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual((len(rows[0]["results"]), len(rows[3]["results"])), (1, 1))
+        self.assertIn("Expecting value", rows[1]["error"])
+        self.assertEqual(rows[2], {"error": "line must be a JSON object"})
+
+    def wait_for_socket(self) -> bool:
+        deadline = time.monotonic() + 10
+        while not self.sock.exists():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+if __name__ == "__main__":
+    unittest.main()
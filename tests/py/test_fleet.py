@@ -0,0 +1,46 @@
+import unittest
+from datetime import datetime
+
+from carcalc.calc import create_base_context
+from carcalc.data import load_data
+from carcalc.engine import Tariffs
+from carcalc.fleet import FleetAggregate, FleetTrip, aggregate, fleet_trips
+from carcalc.parallel import ProcessPricer
+from carcalc.reprice import ContextDefaults
+
+
+class TestFleet(unittest.TestCase):
+    def test_merge_and_rollup(self) -> None:
+        a = FleetAggregate()
+        a.add(("ann", "2026-01", "bolt"), 1.10, 10, 3)
+        b = FleetAggregate(errors=1)
+        b.add(("ann", "2026-01", "bolt"), 2.20, 20, 4)
+        b.add(("ann", "2026-01", "citybee"), 5.00, 30, 5)
+        a.merge(b)
+        self.assertEqual(a.groups[("ann", "2026-01", "bolt")].total_cents, 330)
+        self.assertEqual(a.errors, 1)
+        by_month = a.rollup(("user", "month"))
+        self.assertEqual(by_month[("ann", "2026-01")].trips, 3)
+        self.assertEqual(by_month[("ann", "2026-01")].total_eur, 8.30)
+
+    def test_fleet_trips_skips_bad_rows(self) -> None:
+        rows = [
+            {"user": "ann", "start": "2026-02-03T10:00", "total_min": "30", "parking_min": "0", "km": "5"},
+            {"user": "bob", "start": "nope", "total_min": "30", "parking_min": "0", "km": "5"},
+        ]
+        got = list(fleet_trips(rows, "user", ContextDefaults()))
+        self.assertEqual((got[0].user, got[0].month), ("ann", "2026-02"))
+        self.assertIsNone(got[1])
+
+    def test_parallel_matches_serial(self) -> None:
+        tariffs = Tariffs.compile(load_data())
+        trips = [
+            FleetTrip(user, "2026-03", create_base_context(datetime(2026, 3, d, 9), 30 + 20 * d, 0, 3 * d, fuel_price_e95=1.7))
+            for d in range(1, 8)
+            for user in ("ann", "bob")
+        ]
+        serial = aggregate(trips, tariffs, chunk_size=3)
+        with ProcessPricer(tariffs, workers=2) as pricer:
+            parallel = aggregate(trips, tariffs, chunk_size=3, pricer=pricer)
+        self.assertEqual(serial.groups, parallel.groups)
+        self.assertEqual(sum(t.trips for t in serial.groups.values()), len(trips))
@@ -0,0 +1,83 @@
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from carcalc import history
+from carcalc.data import DEFAULT_DATA_DIR, load_data
+from carcalc.tsv import Table
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.history = history.History(self.dir / "history.sqlite")
+        self.addCleanup(self.history.close)
+        self.tables = {name: Table.read(DEFAULT_DATA_DIR / f"{name}.tsv") for name in history.KEYS}
+        self.options = self.tables["options"]
+        self.assertEqual(self.history.record(self.tables, "2026-01-10T08:00:00Z"), sum(len(t) for t in self.tables.values()))
+
+    def count(self, table: str) -> int:
+        return self.history.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_as_of_rebuilds_each_snapshot(self) -> None:
+        first = self.options.rows[0].text("option_id")
+        last = self.options.rows[-1].text("option_id")
+        changed = Table(self.options.header, self.options.rows)
+        changed.update(0, km_rate_eur="9.99")
+        self.assertEqual(self.history.record({"options": changed}, "2026-03-01T12:00:00+02:00"), 1)
+
+        removed = Table(changed.header, changed.rows[:-1])
+        removed.append({**changed.rows[1].as_dict(), "option_id": "new_option"})
+        self.assertEqual(self.history.record({"options": removed}, "2026-04-01"), 2)
+
+        before = self.history.as_of("2026-03-01T09:59:59Z")["options"]
+        self.assertEqual(before.rows, self.options.rows)
+        march = self.history.as_of("2026-03-31")["options"]
+        self.assertEqual(march.first(option_id=first).text("km_rate_eur"), "9.99")
+        self.assertEqual(len(march), len(self.options))
+        april = self.history.as_of("2026-04-02")
+        self.assertIsNone(april["options"].first(option_id=last))
+        self.assertEqual(april["options"].rows[-1].text("option_id"), "new_option")
+        self.assertEqual(len(april["vehicles"]), len(self.tables["vehicles"]))  # untouched tables carry over
+        self.assertEqual([t for t in self.history.as_of("2025-12-31").values() if len(t)], [])
+
+        self.assertEqual([(when, row is not None) for when, row in self.history.log(last)], [
+            ("2026-01-10T08:00:00Z", True),
+            ("2026-04-01T23:59:59Z", False),
+        ])
+        self.assertEqual(self.history.load_data("2026-02-01"), load_data(DEFAULT_DATA_DIR))
+
+    def test_unchanged_rows_are_not_stored_again(self) -> None:
+        rows = self.count("rows")
+        self.assertEqual(self.history.record(self.tables, "2026-02-01"), 0)
+        self.assertEqual(self.count("imports"), 1)
+
+        changed = Table(self.options.header, self.options.rows)
+        changed.update(0, km_rate_eur="9.99")
+        self.history.record({"options": changed}, "2026-03-01")
+        self.history.record({"options": self.options}, "2026-04-01")  # reverted: same hash as before
+        self.assertEqual(self.count("rows"), rows + 1)
+        self.assertEqual(self.count("versions"), sum(len(t) for t in self.tables.values()) + 2)
+
+        with self.assertRaisesRegex(ValueError, "append-only"):
+            self.history.record(self.tables, "2026-03-15")
+
+    def test_repeated_keys_and_checkout(self) -> None:
+        keyed = history.keyed_rows("options", Table(self.options.header, [self.options.rows[0]] * 3))
+        base = self.options.rows[0].text("option_id")
+        self.assertEqual(list(keyed), [base, f"{base}#2", f"{base}#3"])
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            code = history.main(["--db", str(self.history.path), "checkout", "--as-of", "2026-01-10", "--out", str(self.dir / "co")])
+        self.assertEqual(code, 0)
+        self.assertIn(f"{len(self.options)} options", out.getvalue())
+        self.assertEqual(load_data(self.dir / "co"), load_data(DEFAULT_DATA_DIR))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import random
+import tempfile
+import threading
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+from carcalc import calc, instrument
+from carcalc.data import load_data
+from carcalc.engine import Tariffs
+from carcalc.parallel import random_contexts
+
+
+class TestInstrument(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tariffs = Tariffs.compile(load_data())
+        cls.contexts = random_contexts(20, seed=3)
+
+    def test_profiled_results_match(self) -> None:
+        plain = [(self.tariffs.cheapest(c), self.tariffs.totals(c), self.tariffs.compute_all(c, "citybee")) for c in self.contexts]
+        with instrument.profile() as stats:
+            profiled = [(self.tariffs.cheapest(c), self.tariffs.totals(c), self.tariffs.compute_all(c, "citybee")) for c in self.contexts]
+        self.assertEqual(plain, profiled)
+        self.assertIs(calc.apply_discount, instrument._apply_discount)
+        self.assertIsNone(instrument.active)
+        self.assertEqual(stats.counters["contexts"], 3 * len(self.contexts))
+
+    def test_profiled_paths_match_plain_paths(self) -> None:
+        # The profiled loops are copies of the plain ones; this is what keeps them from drifting.
+        rng = random.Random(5)
+        contexts = [
+            replace(c, discount_carguru=pct, discount_citybee_percent=pct, discount_bolt=pct, discount_citybee_minutes=rng.choice([0, 0, 15]))
+            for c in random_contexts(100, seed=11)
+            for pct in [rng.choice([0, 0, 10, -20, 150])]
+        ]
+        providers = ["", "nope"] + [p.provider_id for p in self.tariffs.providers]
+
+        def run(ctx, provider):
+            return (
+                self.tariffs.allocations(ctx),
+                self.tariffs.totals(ctx, provider),
+                self.tariffs.cheapest(ctx, provider),
+                self.tariffs.compute_all(ctx, provider),
+                self.tariffs.ranked(ctx, provider, limit=5),
+            )
+
+        cases = [(c, rng.choice(providers)) for c in contexts]
+        plain = [run(c, p) for c, p in cases]
+        with instrument.profile():
+            profiled = [run(c, p) for c, p in cases]
+        for (ctx, provider), a, b in zip(cases, plain, profiled):
+            self.assertEqual(a, b, (ctx, provider))
+
+    def test_stages_and_counters(self) -> None:
+        with instrument.profile() as stats:
+            for c in self.contexts:
+                self.tariffs.cheapest(c)
+            self.tariffs.compute_all(self.contexts[0])
+        n = len(self.contexts) * len(self.tariffs)
+        c = stats.counters
+        self.assertEqual(c["options_evaluated"] + c["options_pruned"], n + len(self.tariffs))
+        self.assertEqual(c["allocation_cache_misses"] + c["allocation_cache_hits"], (len(self.contexts) + 1) * len(self.tariffs.providers))
+        for path in ("cheapest;allocations;night_minutes", "cheapest;lower_bound", "cheapest;evaluate;discount", "compute_all;sort"):
+            self.assertIn(path, stats.timers)
+        self.assertEqual(stats.timers["compute_all;evaluate"][1], len(self.tariffs))
+
+    def test_threads_record_separately_and_merge(self) -> None:
+        def work() -> None:
+            for c in self.contexts:
+                self.tariffs.cheapest(c)
+
+        with instrument.profile() as stats:
+            threads = [threading.Thread(target=work) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(stats.counters["contexts"], 4 * len(self.contexts))
+        self.assertEqual(stats.timers["cheapest"][1], 4 * len(self.contexts))
+        self.assertTrue(all(path.startswith("cheapest") for path in stats.timers))
+        self.assertEqual(stats.timers["cheapest;evaluate;discount"][1], stats.counters["options_evaluated"])
+
+    def test_exports(self) -> None:
+        with instrument.profile() as stats:
+            self.tariffs.cheapest(self.contexts[0])
+        with tempfile.TemporaryDirectory() as d:
+            stats.write(Path(d) / "prof")
+            doc = json.loads((Path(d) / "prof.json").read_text(encoding="utf-8"))
+            folded = (Path(d) / "prof.folded").read_text(encoding="utf-8").splitlines()
+        self.assertIn("cheapest;evaluate", doc["stages"])
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in folded))
+        self.assertIn("cheapest", {line.split(" ")[0] for line in folded})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import threading
+import unittest
+
+from carcalc.live import MAX_DEBOUNCE_S, LiveSession, LiveSessions, diff_rows, sse, stream
+
+
+def events(chunks: list[bytes]) -> list[tuple[str, dict]]:
+    out = []
+    for chunk in chunks:
+        fields = dict(line.split(": ", 1) for line in chunk.decode().splitlines() if line and not line.startswith(":"))
+        if fields:
+            out.append((fields["event"], json.loads(fields["data"])))
+    return out
+
+
+class TestLive(unittest.TestCase):
+    def test_diff_rows(self) -> None:
+        a, b, c = {"id": "a"}, {"id": "b"}, {"id": "c"}
+        self.assertEqual(diff_rows([a, b, c], [a, c, b]), [(1, c), (2, b)])
+        self.assertEqual(diff_rows([a], [a, b]), [(1, b)])
+        self.assertEqual(diff_rows([a, b], [a]), [])
+        self.assertEqual(sse("x", {"n": 1}, 2), b'id: 2\nevent: x\ndata: {"n":1}\n\n')
+
+    def test_rapid_deltas_are_coalesced(self) -> None:
+        session = LiveSession("s", {"km": 1}, debounce_s=0.05)
+        for km in range(2, 12):
+            session.update({"km": km})
+        self.assertEqual(session.wait(0, 1), (10, {"km": 11}))
+        self.assertIsNone(session.wait(10, 0.01))
+
+    def test_debounce_is_clamped(self) -> None:
+        self.assertEqual([LiveSession("s", {}, d).debounce_s for d in (-1, 1e15, float("inf"))], [0, MAX_DEBOUNCE_S, MAX_DEBOUNCE_S])
+        session = LiveSession("s", {}, 1e15)
+        session.update({"km": 1})
+        session.close()
+        self.assertEqual(session.wait(0, 1), (1, {"km": 1}))  # no OverflowError from cond.wait
+
+    def test_stream_sends_only_changed_rows(self) -> None:
+        sessions = LiveSessions(max_sessions=1)
+        session = sessions.open({"km": 1}, debounce_s=0.01)
+        self.assertIsNone(sessions.open({}, 0))
+        assert session is not None
+        ranked = []
+
+        def rank(params: dict) -> list[dict]:
+            ranked.append(params["km"])
+            if params["km"] < 0:
+                raise ValueError("bad km")
+            return [{"id": "a", "total": 1}, {"id": "b", "total": params["km"]}]
+
+        gen = stream(session, rank, heartbeat_s=0.01)
+        got = [next(gen), next(gen)]
+        session.update({"km": 5})
+        got.append(next(gen))
+        session.update({"km": 5})  # same result: nothing sent, next is a heartbeat
+        self.assertEqual(next(gen), b": ping\n\n")
+        session.update({"km": -1})
+        got.append(next(gen))
+        threading.Timer(0.05, sessions.close, (session,)).start()
+        got.extend(gen)
+        self.assertEqual(
+            events(got),
+            [
+                ("session", {"id": session.id}),
+                ("ranking", {"seq": 1, "size": 2, "changed": [[0, {"id": "a", "total": 1}], [1, {"id": "b", "total": 1}]]}),
+                ("ranking", {"seq": 2, "size": 2, "changed": [[1, {"id": "b", "total": 5}]]}),
+                ("error", {"version": 3, "error": "bad km"}),
+            ],
+        )
+        self.assertEqual(ranked, [1, 5, 5, -1])
+        self.assertEqual(len(sessions), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+import itertools
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from carcalc.data import load_data
+from carcalc.engine import Tariffs
+from carcalc.loadtest import LoadTest, percentile, read_replay, scenario_mix
+from carcalc.server import PricingService, make_server
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_percentile_nearest_rank(self) -> None:
+        values = [float(v) for v in range(1, 1001)]
+        self.assertEqual([percentile(values, q) for q in (50, 99, 99.9, 100)], [500, 990, 999, 1000])
+        self.assertEqual(percentile([7.0], 99.9), 7.0)
+        self.assertIsNone(percentile([], 50))
+
+    def test_report_without_successes_is_valid_json(self) -> None:
+        test = LoadTest("http://127.0.0.1:9", iter([]), concurrency=1, duration=0, total=0)
+        test.statuses["error"] += 3
+        report = test.report(1.0)
+        self.assertEqual(set(report["latency_ms"].values()), {None})
+        self.assertIn('"p99": null', json.dumps(report, allow_nan=False))
+
+    def test_replay_and_mix(self) -> None:
+        with tempfile.TemporaryDirectory() as d:
+            path = Path(d) / "replay.ndjson"
+            path.write_text('{"path": "/health"}\n\n{"start": "2026-03-01T10:00", "total_min": 30}\n', encoding="utf-8")
+            health, price = read_replay(path)
+        self.assertEqual((health.method, health.path, health.body), ("GET", "/health", b""))
+        self.assertEqual((price.method, price.path, json.loads(price.body)["total_min"]), ("POST", "/price", 30))
+        mix = list(itertools.islice(scenario_mix(1, 5, 0.5), 200))
+        self.assertTrue(all(json.loads(r.body)["limit"] == 5 for r in mix))
+        self.assertLess(len(set(mix)), 150)  # defaults repeat
+
+    def test_against_server(self) -> None:
+        server = make_server(PricingService(Tariffs.compile(load_data())), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            test = LoadTest(f"http://127.0.0.1:{server.server_port}", scenario_mix(0, 3, 0.3), concurrency=3, duration=0, total=40)
+            report = test.report(asyncio.run(test.run()))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual((report["requests"], report["errors"], report["statuses"]), (40, 0, {"200": 40}))
+        lat = report["latency_ms"]
+        self.assertLessEqual(lat["p50"], lat["p99.9"])
+        self.assertLessEqual(lat["p99.9"], lat["max"])
+
+
+if __name__ == "__main__":
+    unittest.main()
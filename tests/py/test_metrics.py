@@ -0,0 +1,46 @@
+import threading
+import unittest
+
+from carcalc.metrics import Counter, Histogram, label_str, metric, rss_bytes
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_sums_thread_shards(self) -> None:
+        counter = Counter()
+
+        def work() -> None:
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        counter.inc(0.5)
+        self.assertEqual(counter.value, 4000.5)
+
+    def test_histogram_samples_are_cumulative(self) -> None:
+        h = Histogram(buckets=(0.01, 0.1))
+        for v in (0.005, 0.01, 0.05, 3):
+            h.observe(v)
+        self.assertEqual(
+            h.samples("lat", 'route="/price"'),
+            [
+                'lat_bucket{route="/price",le="0.01"} 2',
+                'lat_bucket{route="/price",le="0.1"} 3',
+                'lat_bucket{route="/price",le="+Inf"} 4',
+                'lat_sum{route="/price"} 3.065',
+                'lat_count{route="/price"} 4',
+            ],
+        )
+
+    def test_text_format(self) -> None:
+        self.assertEqual(label_str({"path": 'a"b\\c'}), 'path="a\\"b\\\\c"')
+        self.assertEqual(metric("x_total", "counter", "Things.", 3.0), ["# HELP x_total Things.", "# TYPE x_total counter", "x_total 3"])
+        rss = rss_bytes()
+        self.assertTrue(rss is None or rss > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from datetime import datetime
+
+from carcalc.calc import create_base_context
+from carcalc.data import load_data
+from carcalc.engine import Tariffs
+from carcalc.models import ModelIndex, canonical_model, cheapest_per_model, load_overrides
+
+
+class TestModels(unittest.TestCase):
+    def test_canonical_model(self) -> None:
+        self.assertEqual(canonical_model("VW Golf (Diesel)"), "volkswagen golf")
+        self.assertEqual(canonical_model("Volkswagen T-Cross"), canonical_model("VW T-Cross"))
+        self.assertEqual(canonical_model("Toyota Corolla Touring"), "toyota corolla")
+        self.assertEqual(canonical_model("Toyota Corolla Cross"), "toyota corolla cross")
+        self.assertEqual(canonical_model("Mercedes-Benz Citan"), "mercedes citan")
+        self.assertEqual(canonical_model("Škoda Fabia"), "skoda fabia")
+
+    def test_index_uses_overrides(self) -> None:
+        index = ModelIndex.build(load_data(), load_overrides())
+        self.assertEqual(index.by_vehicle["carguru_35"], "nissan qashqai")
+        self.assertIn("citybee_10245", index.vehicles["nissan qashqai"])
+        self.assertEqual(index.find("golf"), ["volkswagen golf"])
+
+    def test_cheapest_per_model_matches_full_sort(self) -> None:
+        data = load_data()
+        tariffs = Tariffs.compile(data)
+        index = ModelIndex.build(data, load_overrides())
+        ctx = create_base_context(datetime(2026, 3, 1, 21, 30), 180, 30, 60, fuel_price_e95=1.7, fuel_price_diesel=1.6)
+        best = cheapest_per_model(tariffs, index, ctx, per_provider=True, k=3)
+
+        totals = tariffs.totals(ctx)
+        groups = index.groups(tariffs, per_provider=True)
+        for key, quotes in best.items():
+            ranked = sorted((t, i) for i, t in enumerate(totals) if t is not None and groups[i] == key)[:3]
+            self.assertEqual([(q.total_eur, q.index) for q in quotes], ranked)
+        self.assertIn(("toyota c hr", "citybee"), best)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import tracemalloc
+import unittest
+
+from carcalc.data import load_data
+from carcalc.engine import Tariffs
+from carcalc.overlay import Overlay, OverlayStore, PatchedList, apply_overlay
+from carcalc.snapshot import PROBE_CONTEXT, Snapshot
+
+
+class TestPatchedList(unittest.TestCase):
+    def test_index_iterate_and_slice(self) -> None:
+        base = list(range(10))
+        view = PatchedList(base, {0: 100, 4: 104, 9: 109}, [10, 11])
+        expected = [100, 1, 2, 3, 104, 5, 6, 7, 8, 109, 10, 11]
+        self.assertEqual(list(view), expected)
+        self.assertEqual([view[i] for i in range(len(view))], expected)
+        self.assertEqual((view[-1], view[-3], view[2:5]), (11, 109, [2, 3, 104]))
+        self.assertEqual(list(enumerate(view))[4], (4, 104))
+        with self.assertRaises(IndexError):
+            view[12]
+        self.assertEqual(base, list(range(10)))
+
+
+class TestOverlay(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.snap = Snapshot.build(Tariffs.compile(load_data()))
+
+    def test_changed_option_reprices_only_for_the_view(self) -> None:
+        t = self.snap.tariffs
+        option_id = t.option_ids[3]
+        before = t.totals(PROBE_CONTEXT)
+        view = apply_overlay(self.snap, Overlay("u").merged([{"option_id": option_id, "unlock_fee_eur": 50}]))
+        after = view.tariffs.totals(PROBE_CONTEXT)
+        self.assertEqual(view.overlay, "u@1")
+        self.assertEqual(len(view.tariffs), len(t))
+        if before[3] is not None:
+            self.assertAlmostEqual(after[3], before[3] + 50, places=2)
+        self.assertEqual(after[:3] + after[4:], before[:3] + before[4:])
+        self.assertEqual(t.totals(PROBE_CONTEXT), before)  # the shared snapshot is untouched
+        self.assertIs(view.tariffs.vehicle_ids, t.vehicle_ids)  # untouched columns are shared
+
+    def test_added_option_and_provider(self) -> None:
+        t = self.snap.tariffs
+        row = {"option_id": "mine", "provider_id": "myco", "vehicle_id": t.vehicle_ids[0], "option_type": "PAYG", "drive_day_min_rate_eur": "0.001"}
+        view = apply_overlay(self.snap, Overlay("u").merged([row]))
+        index = view.option_index["mine"]
+        self.assertEqual(index, len(t))
+        self.assertEqual(view.tariffs.option_ids[index], "mine")
+        self.assertEqual((view.option_count("myco"), view.option_count()), (1, len(t) + 1))
+        results, _ = view.tariffs.ranked(PROBE_CONTEXT, limit=1, detail=False)
+        self.assertEqual(results[0]["option_id"], "mine")
+        self.assertNotIn("mine", self.snap.option_index)
+        with self.assertRaisesRegex(ValueError, "provider_id and vehicle_id"):
+            apply_overlay(self.snap, Overlay("u").merged([{"option_id": "orphan"}]))
+
+    def test_changed_vehicle_recompiles_its_options(self) -> None:
+        t = self.snap.tariffs
+        vehicle_id = t.vehicle_ids[0]
+        overlay = Overlay("u").merged(vehicles=[{"vehicle_id": vehicle_id, "vehicle_name": "My car", "snowboard_fit": 2}])
+        view = apply_overlay(self.snap, overlay).tariffs
+        for i in self.snap.vehicle_options[vehicle_id]:
+            self.assertEqual((view.vehicle_names[i], view.snowboard_fits[i]), ("My car", 2))
+        other = next(i for i, v in enumerate(t.vehicle_ids) if v != vehicle_id)
+        self.assertEqual(view.vehicle_names[other], t.vehicle_names[other])
+
+    def test_store_views_follow_revisions_and_swaps(self) -> None:
+        store = OverlayStore(max_users=1, max_rows=2)
+        option_id = self.snap.tariffs.option_ids[0]
+        self.assertIs(store.view(self.snap, "u"), self.snap)
+        store.put(self.snap, "u", [{"option_id": option_id, "unlock_fee_eur": 1}])
+        first = store.view(self.snap, "u")
+        self.assertIs(store.view(self.snap, "u"), first)
+        store.put(self.snap, "u", [{"option_id": option_id, "km_rate_eur": 1}])
+        self.assertEqual(store.get("u").options[option_id], {"option_id": option_id, "unlock_fee_eur": "1", "km_rate_eur": "1"})
+        self.assertEqual(store.view(self.snap, "u").overlay, "u@2")
+        swapped = Snapshot.build(self.snap.tariffs, version=2)
+        self.assertEqual(store.view(swapped, "u").version, 2)
+        self.assertIsNone(store.put(self.snap, "v", []))  # full
+        with self.assertRaisesRegex(ValueError, "too large"):
+            store.put(self.snap, "u", [{"option_id": "a", "provider_id": "p", "vehicle_id": "v"}, {"option_id": "b"}])
+        self.assertEqual(store.get("u").revision, 2)
+        self.assertTrue(store.clear("u"))
+        self.assertIs(store.view(self.snap, "u"), self.snap)
+
+    def test_recreated_overlay_gets_a_new_label(self) -> None:
+        store = OverlayStore()
+        vehicle_id = self.snap.tariffs.vehicle_ids[0]
+
+        def row(option_id: str) -> dict[str, str]:
+            return {"option_id": option_id, "provider_id": "bolt", "vehicle_id": vehicle_id, "option_type": "PAYG"}
+
+        store.put(self.snap, "u", [row("new1")])
+        deleted = store.view(self.snap, "u").overlay
+        self.assertTrue(store.clear("u"))
+        store.put(self.snap, "u", [row("new2")])
+        view = store.view(self.snap, "u")
+        self.assertNotEqual(view.overlay, deleted)
+        self.assertIn("new2", view.option_index)
+        self.assertNotIn("new1", view.option_index)
+
+    def test_small_overlays_cost_about_their_diff(self) -> None:
+        t = self.snap.tariffs
+        store = OverlayStore()
+        users = 500
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for u in range(users):
+                rows = [{"option_id": t.option_ids[(7 * u + k) % len(t)], "km_rate_eur": 0.1 + k / 100} for k in range(3)]
+                store.put(self.snap, f"user{u}", rows)
+            per_user = (tracemalloc.get_traced_memory()[0] - before) / users
+        finally:
+            tracemalloc.stop()
+        self.assertLess(per_user, 16_000)  # ~4.5 KB measured; a copied column alone is len(t) * 8 bytes
+        self.assertLess(per_user, len(t) * 8 * 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
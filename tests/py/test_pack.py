@@ -0,0 +1,107 @@
+import io
+import shutil
+import struct
+import tempfile
+import unittest
+from array import array
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from carcalc import pack
+from carcalc.data import DEFAULT_DATA_DIR, load_data
+from carcalc.engine import Tariffs, price_chunk
+from carcalc.parallel import ProcessPricer, random_contexts
+
+
+class TestPack(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tariffs = Tariffs.compile(load_data())
+        cls.contexts = random_contexts(60, seed=5)
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        for name in pack.SOURCES:
+            shutil.copy(DEFAULT_DATA_DIR / f"{name}.tsv", self.dir)
+        self.path = self.dir / "tariffs.pack"
+
+    def open(self) -> pack.Pack:
+        p = pack.Pack(self.path)
+        self.addCleanup(p.close)
+        return p
+
+    def test_mapped_tariffs_match_compiled_ones(self) -> None:
+        self.assertTrue(pack.write(self.path, self.dir))
+        self.assertFalse(pack.write(self.path, self.dir))  # identical: not rewritten
+        mapped = self.open().tariffs
+        self.assertEqual(len(mapped), len(self.tariffs))
+        # Bytes, not floats: rows hold NaN for unset fields.
+        self.assertEqual(
+            [array("d", r).tobytes() for r in mapped.rows],
+            [array("d", r).tobytes() for r in self.tariffs.rows],
+        )
+        for column in pack.COLUMNS:
+            self.assertEqual(list(getattr(mapped, column)), list(getattr(self.tariffs, column)), column)
+        self.assertEqual(mapped.option_ids[2:4], list(self.tariffs.option_ids[2:4]))
+        self.assertEqual(mapped.providers, self.tariffs.providers)
+        self.assertEqual(price_chunk(mapped, self.contexts), price_chunk(self.tariffs, self.contexts))
+
+    def test_corrupt_truncated_and_foreign_files_are_rejected(self) -> None:
+        pack.write(self.path, self.dir)
+        blob = bytearray(self.path.read_bytes())
+
+        blob[-100] ^= 0xFF
+        self.path.write_bytes(blob)
+        with self.assertRaisesRegex(ValueError, "checksum"):
+            pack.Pack(self.path)
+        pack.Pack(self.path, verify=False).close()
+
+        self.path.write_bytes(blob[:-1])
+        with self.assertRaisesRegex(ValueError, "truncated"):
+            pack.Pack(self.path)
+
+        struct.pack_into("<H", blob, 8, pack.FORMAT + 1)
+        self.path.write_bytes(blob)
+        with self.assertRaisesRegex(ValueError, "format"):
+            pack.Pack(self.path)
+
+        for junk in (b"", b"CCTARIFF", b"x" * 200):
+            self.path.write_bytes(junk)
+            with self.assertRaisesRegex(ValueError, "not a tariff pack"):
+                pack.Pack(self.path)
+
+    def test_stale_pack_falls_back_to_compiling(self) -> None:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(pack.main(["--data-dir", str(self.dir), "--out", str(self.path)]), 0)
+        self.assertIn(f"{len(self.tariffs)} options", out.getvalue())
+        self.assertIsNotNone(pack.mapped_pack(pack.load_tariffs(self.dir, self.path)))
+        local = pack.load_tariffs(self.dir, self.path, shared=False)
+        self.assertIsInstance(local.rows[0], tuple)
+        self.assertEqual(price_chunk(local, self.contexts), price_chunk(self.tariffs, self.contexts))
+
+        with (self.dir / "options.tsv").open("a", encoding="utf-8") as f:
+            f.write("bolt\tbolt_x\tbolt_x_payg\tPAYG\tPAYG\n")
+        self.assertFalse(pack.is_current(self.path, self.dir))
+        err = io.StringIO()
+        with redirect_stderr(err):
+            tariffs = pack.load_tariffs(self.dir, self.path)
+            self.assertEqual(pack.main(["--data-dir", str(self.dir), "--out", str(self.path), "--check"]), 1)
+        self.assertIn("stale", err.getvalue())
+        self.assertIsNone(pack.mapped_pack(tariffs))
+        self.assertEqual(len(tariffs), len(self.tariffs) + 1)
+
+    def test_process_pricer_workers_map_the_pack(self) -> None:
+        pack.write(self.path, self.dir)
+        mapped = self.open().tariffs
+        chunks = [self.contexts[i : i + 9] for i in range(0, len(self.contexts), 9)]
+        with ProcessPricer(mapped, workers=2) as pricer:
+            self.assertIsNone(pricer.shared)
+            got = list(pricer.price_chunks(chunks))
+        self.assertEqual(got, [price_chunk(self.tariffs, c) for c in chunks])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from carcalc.data import load_data
+from carcalc.engine import Tariffs, price_chunk
+from carcalc.parallel import AttachedTariffs, ProcessPricer, SharedTariffs, random_contexts
+
+
+class TestParallel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tariffs = Tariffs.compile(load_data())
+        cls.contexts = random_contexts(40, seed=3)
+
+    def test_attached_rows_price_like_local_rows(self) -> None:
+        with SharedTariffs(self.tariffs) as shared:
+            attached = AttachedTariffs(shared.spec)
+            try:
+                got = price_chunk(attached.tariffs, self.contexts, "citybee")
+            finally:
+                attached.close()
+        self.assertEqual(got, price_chunk(self.tariffs, self.contexts, "citybee"))
+
+    def test_process_pricer_keeps_input_order(self) -> None:
+        chunks = [self.contexts[i : i + 7] for i in range(0, len(self.contexts), 7)]
+        with ProcessPricer(self.tariffs, workers=2, prefetch=1) as pricer:
+            got = list(pricer.price_chunks(chunks))
+        self.assertEqual(got, [price_chunk(self.tariffs, c) for c in chunks])
@@ -0,0 +1,47 @@
+import math
+import shutil
+import unittest
+from unittest import mock
+
+from carcalc import calc, engine
+from carcalc.parity import diff, run
+
+
+class TestDiff(unittest.TestCase):
+    def test_diff(self) -> None:
+        self.assertEqual(diff({"a": 1.0, "b": {"c": "x"}}, {"a": 1, "b": {"c": "x"}}), [])
+        self.assertEqual(diff({"a": float("nan")}, {"a": None}), [])
+        self.assertEqual(diff({"a": True}, {"a": 1}), ["a: py=True js=1"])
+        self.assertEqual(diff({"b": {"c": "x"}}, {"b": {"c": "y"}}), ["b.c: py='x' js='y'"])
+        self.assertEqual(diff({"a": 1}, {}), ["a: missing in JS"])
+        self.assertEqual(diff({"r": [{"a": 1}, {"a": 2}]}, {"r": [{"a": 1}, {"a": 3}]}), ["r[1].a: py=2 js=3"])
+        self.assertEqual(diff([1], [1, 2]), [": 1 items in Python, 2 in JS"])
+
+
+@unittest.skipUnless(shutil.which("node"), "node not installed")
+class TestParity(unittest.TestCase):
+    def test_random_cases_match_calc_js(self) -> None:
+        r = run(500, seed=7, batch_size=100, rank_cases=0)
+        self.assertEqual((r.cases, r.mismatches, r.rank_cases), (500, 0, 0))
+
+    def test_rank_cases_match_compute_all(self) -> None:
+        r = run(1, seed=3, batch_size=6, rank_cases=12)
+        self.assertEqual((r.cases, r.mismatches, r.rank_cases, r.rank_mismatches), (1, 0, 12, 0))
+
+    def test_detects_pruning_mismatch(self) -> None:
+        # An over-tight bound prunes the real winner: only the rank cases can see it.
+        with mock.patch.object(engine, "lower_bound", lambda r, ctx: math.inf):
+            r = run(1, seed=3, rank_cases=6)
+        self.assertEqual(r.rank_cases, 6)
+        self.assertGreater(r.rank_mismatches, 0)
+
+    def test_detects_mismatch(self) -> None:
+        real = calc.apply_discount
+        with mock.patch.object(calc, "apply_discount", lambda *a: real(*a) + 0.01):
+            r = run(200, seed=7, rank_cases=0)
+        self.assertEqual(r.cases, 200)
+        self.assertGreater(r.mismatches, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
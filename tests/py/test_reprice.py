@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from datetime import datetime
+from pathlib import Path
+
+from carcalc.reprice import ContextDefaults, chunked, main, trip_context
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "web" / "data"
+
+
+class TestReprice(unittest.TestCase):
+    def test_trip_context(self) -> None:
+        ctx = trip_context({"start": "2026-01-24T12:00", "total_min": "1:30", "parking_min": "30", "km": "9.2", "airport": "yes"})
+        self.assertEqual(ctx.start, datetime(2026, 1, 24, 12, 0))
+        self.assertEqual((ctx.total_min, ctx.parking_min, ctx.dist_km, ctx.airport), (90, 30, 10, True))
+        self.assertEqual(ctx.fuel_price_e95, ContextDefaults().fuel_price_e95)
+        with self.assertRaises(ValueError):
+            trip_context({"start": "2026-01-24T12:00", "total_min": "10", "parking_min": "20", "km": "0"})
+
+    def test_trip_context_rejects_out_of_range_input(self) -> None:
+        base = {"start": "2026-01-24T12:00", "total_min": "60", "parking_min": "0", "km": "10"}
+        for bad in ({"km": "inf"}, {"km": "nan"}, {"total_min": "1e400"}, {"total_min": "1e9"}, {"start": "9999-12-31T23:00"}):
+            with self.subTest(bad=bad), self.assertRaises(ValueError):
+                trip_context(base | bad)
+        with self.assertRaises(ValueError):
+            trip_context(base, ContextDefaults(discount_bolt=float("inf")))
+        with self.assertRaises(ValueError):
+            trip_context([1, 2])
+
+    def test_main_ndjson_reports_bad_lines_per_row(self) -> None:
+        with tempfile.TemporaryDirectory() as d:
+            src = Path(d) / "trips.ndjson"
+            dst = Path(d) / "out.ndjson"
+            src.write_text(
+                '{"start": "2026-01-24T12:00", "total_min": 60, "parking_min": 0, "km": 1e999}\n'
+                "[1, 2]\n"
+                "{not json\n"
+                '{"start": "2026-01-24T12:00", "total_min": 60, "parking_min": 0, "km": 10}\n',
+                encoding="utf-8",
+            )
+            with redirect_stderr(io.StringIO()):
+                rc = main([str(src), "-o", str(dst), "--data-dir", str(DATA_DIR)])
+            self.assertEqual(rc, 0)
+            rows = [json.loads(line) for line in dst.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]["error"], "km must be a finite number")
+        self.assertEqual(rows[1]["error"], "trip must be a JSON object")
+        self.assertTrue(rows[2]["error"].startswith("invalid JSON"))
+        self.assertEqual(rows[3]["error"], "")
+
+    def test_chunked(self) -> None:
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_ndjson_to_csv_header_covers_the_first_chunk(self) -> None:
+        trips = [
+            {"start": "2026-01-24T12:00", "total_min": 60, "km": 10},
+            {"trip_id": "b", "start": "2026-01-24T12:00", "total_min": 60, "km": 10, "note": "x"},
+            {"trip_id": "c", "start": "2026-01-24T12:00", "total_min": 60, "km": 10, "late": 1},
+        ]
+        with tempfile.TemporaryDirectory() as d:
+            src = Path(d) / "trips.ndjson"
+            dst = Path(d) / "out.csv"
+            src.write_text("".join(json.dumps(t) + "\n" for t in trips), encoding="utf-8")
+            err = io.StringIO()
+            with redirect_stderr(err):
+                rc = main([str(src), "-o", str(dst), "--data-dir", str(DATA_DIR), "--chunk-size", "2", "--progress-interval", "0"])
+            self.assertEqual(rc, 0)
+            with dst.open(encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                rows = list(reader)
+        self.assertEqual(reader.fieldnames[:5], ["start", "total_min", "km", "trip_id", "note"])
+        self.assertEqual([(r["trip_id"], r["note"]) for r in rows], [("", ""), ("b", "x"), ("c", "")])
+        self.assertNotIn("late", reader.fieldnames)
+        self.assertIn("dropping fields not in the header: late", err.getvalue())
+
+    def test_main_csv_roundtrip(self) -> None:
+        with tempfile.TemporaryDirectory() as d:
+            src = Path(d) / "trips.csv"
+            dst = Path(d) / "out.csv"
+            src.write_text(
+                "trip_id,start,total_min,parking_min,km,airport\n"
+                "t1,2026-01-24T12:00,60,0,10,0\n"
+                "t2,2026-01-24T12:00,10,20,10,0\n"
+                "t3,2026-01-24T23:00,600,300,120,1\n",
+                encoding="utf-8",
+            )
+            with redirect_stderr(io.StringIO()):
+                rc = main([str(src), "-o", str(dst), "--data-dir", str(DATA_DIR), "--chunk-size", "2"])
+            self.assertEqual(rc, 0)
+            with dst.open(encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual([r["trip_id"] for r in rows], ["t1", "t2", "t3"])
+        self.assertTrue(rows[0]["option_id"])
+        self.assertGreater(float(rows[0]["total_eur"]), 0)
+        self.assertEqual(rows[1]["total_eur"], "")
+        self.assertIn("parking_min", rows[1]["error"])
+        self.assertTrue(rows[2]["option_id"])
@@ -0,0 +1,98 @@
+import io
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from carcalc.archive import Archive
+from carcalc.tsv import Table
+from scripts.import_options import CARGURU_RATE_SHORT_URL, CITYBEE_PRICES_URL, generate_rows
+from scripts.reprocess import DEFAULT_OPTIONS_PATH, main
+
+CITYBEE_HTML = """
+<select class="js-car-chooser">
+  <option value="123" data-category="A" data-km="0,28" data-min="{rate}" data-hour="5" data-day="25"
+    data-min-fee="2" data-trip-fee="1">VW Polo</option>
+</select>
+"""
+CARGURU_JSON = {
+    "result": [
+        {
+            "id": 7,
+            "title": "VW Polo",
+            "rates": [
+                {
+                    "title": "Standard",
+                    "costDayDrivingMovement": "0,20",
+                    "costNightDrivingMovement": "0,30",
+                    "costDayParking": "0,10",
+                    "costNightParking": "0,15",
+                    "costDayAdditionalMileage": "0,25",
+                    "fixedFreeMileage": "100",
+                    "costService": "1",
+                    "costReservation": "0",
+                    "costStart": "2",
+                    "costDayMin": "2",
+                    "costNightMin": "3",
+                    "period": [{"time": "1h", "cost": "5"}],
+                }
+            ],
+        }
+    ]
+}
+
+
+class TestReprocess(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        for run, rate in (("r1", "0,15"), ("r2", "0,19"), ("r3", "0,19")):
+            archive = Archive(self.dir / "archive", run=run, importer="options")
+            archive.put(CITYBEE_PRICES_URL, CITYBEE_HTML.format(rate=rate).encode())
+            archive.put(CARGURU_RATE_SHORT_URL, json.dumps(CARGURU_JSON).encode())
+            archive.put("https://example.test/unrelated", b"ignored")
+        # The vehicles importer fetches the same pages into the same archive.
+        vehicles = Archive(self.dir / "archive", run="v1", importer="vehicles")
+        vehicles.put(CITYBEE_PRICES_URL, CITYBEE_HTML.format(rate="0,99").encode())
+
+    def run_main(self, *extra: str) -> tuple[int, str, str]:
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            code = main(["--archive", str(self.dir / "archive"), "--out", str(self.dir / "out"), *extra])
+        return code, out.getvalue(), err.getvalue()
+
+    def test_each_run_gets_the_current_parsers_output(self) -> None:
+        code, out, _ = self.run_main("-j", "2")
+        self.assertEqual(code, 0, out)
+        self.assertIn("3 runs (2 distinct)", out)
+        self.assertFalse((self.dir / "out" / "v1").exists())
+        header = Table.read(DEFAULT_OPTIONS_PATH).header
+        for run, rate in (("r1", "0,15"), ("r2", "0,19"), ("r3", "0,19")):
+            got = Table.read(self.dir / "out" / run / "options.tsv")
+            expected = generate_rows(header, CITYBEE_HTML.format(rate=rate), CARGURU_JSON)
+            self.assertEqual(got.rows, expected, run)
+        payg = Table.read(self.dir / "out" / "r2" / "options.tsv").first(option_id="citybee_123_payg")
+        self.assertEqual(payg.text("drive_day_min_rate_eur"), "0.19")
+
+    def test_unreadable_payloads_are_reported(self) -> None:
+        archive = Archive(self.dir / "archive")
+        entry = next(e for e in archive.snapshots()["r1"] if e.url == CARGURU_RATE_SHORT_URL)
+        archive.object_path(entry.sha256).write_bytes(b"not gzip")
+        code, out, err = self.run_main("--run", "r1", "-j", "1")
+        self.assertEqual(code, 1)
+        self.assertIn("r1: 2 payloads", out)
+        self.assertIn(CARGURU_RATE_SHORT_URL, err)
+        self.assertTrue(Table.read(self.dir / "out" / "r1" / "options.tsv").first(option_id="citybee_123_payg"))
+
+    def test_runs_missing_a_source_are_reported(self) -> None:
+        Archive(self.dir / "archive", run="r4", importer="options").put(CITYBEE_PRICES_URL, CITYBEE_HTML.format(rate="0,19").encode())
+        code, out, err = self.run_main("--run", "r4", "-j", "1")
+        self.assertEqual(code, 1)
+        self.assertIn("r4: 1 payloads", out)
+        self.assertIn(f"{CARGURU_RATE_SHORT_URL}: not fetched in this run", err)
+
+
+if __name__ == "__main__":
+    unittest.main()
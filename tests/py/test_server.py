@@ -0,0 +1,286 @@
+import http.client
+import io
+import json
+import threading
+import time
+import unittest
+from contextlib import redirect_stderr
+from datetime import datetime
+from unittest.mock import patch
+
+from carcalc.admission import AdmissionController
+from carcalc.calc import create_base_context
+from carcalc.data import load_data
+from carcalc.engine import Tariffs
+from carcalc.live import MAX_DEBOUNCE_S
+from carcalc.reprice import ContextDefaults, trip_context
+from carcalc.server import PricingService, make_server, split_lines
+
+TRIP = {"start": "2026-03-01T21:30", "total_min": 180, "parking_min": 30, "km": 60}
+
+
+def wait_until(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+class TestServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tariffs = Tariffs.compile(load_data())
+        cls.server = make_server(PricingService(cls.tariffs), port=0)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        self.conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+
+    def request(self, method: str, path: str, body: object = None) -> tuple[int, dict]:
+        payload = body if body is None or isinstance(body, bytes) else json.dumps(body)
+        self.conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        resp = self.conn.getresponse()
+        return resp.status, json.loads(resp.read())
+
+    def test_price_matches_compute_all(self) -> None:
+        status, body = self.request("POST", "/price", TRIP | {"fuel_price_e95": 1.5})
+        self.assertEqual(status, 200)
+        ctx = create_base_context(datetime(2026, 3, 1, 21, 30), 180, 30, 60, fuel_price_e95=1.5, fuel_price_diesel=1.7)
+        results, errors = self.tariffs.compute_all(ctx)
+        self.assertEqual(body, json.loads(json.dumps({"results": results, "errors": errors})))
+
+    def test_limit_totals_only_and_keep_alive(self) -> None:
+        status, full = self.request("GET", "/price?start=2026-03-01T21:30&total_min=180&parking_min=30&km=60&breakdown=0")
+        sock = self.conn.sock
+        status, top = self.request("POST", "/price", TRIP | {"limit": 3, "provider": "citybee"})
+        self.assertIs(self.conn.sock, sock)  # same connection reused
+        self.assertEqual(status, 200)
+        self.assertNotIn("breakdown", full["results"][0])
+        self.assertEqual(len(top["results"]), 3)
+        self.assertEqual({r["provider_id"] for r in top["results"]}, {"citybee"})
+
+    def test_option_breakdown(self) -> None:
+        option_id = self.tariffs.option_ids[5]
+        status, body = self.request("GET", f"/option/{option_id}/breakdown?start=2026-03-01T21:30&total_min=180&km=60")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["option_id"], option_id)
+        self.assertIn("tooltips", body["breakdown"])
+
+    def test_errors(self) -> None:
+        self.assertEqual(self.request("GET", "/option/nope/breakdown?start=2026-03-01")[0], 404)
+        self.assertEqual(self.request("GET", "/nowhere")[0], 404)
+        self.assertEqual(self.request("POST", "/price", {"total_min": 10})[0], 400)
+        self.assertEqual(self.request("POST", "/price", TRIP | {"parking_min": 999})[0], 400)
+        self.assertEqual(self.request("POST", "/price", b"{nope")[0], 400)
+        self.assertEqual(self.request("GET", "/price?start=2026-03-01T21:30&total_min=60&km=inf")[0], 400)
+        self.assertEqual(self.request("GET", "/price?start=2026-03-01T21:30&total_min=1e400")[0], 400)
+        self.assertEqual(self.request("GET", "/price?start=2026-03-01T21:30&total_min=60&discount_bolt=inf")[0], 400)
+        self.assertEqual(self.request("GET", "/health")[1]["options"], len(self.tariffs))
+
+    def test_unhandled_error_is_a_500(self) -> None:
+        with patch.object(PricingService, "respond", side_effect=RuntimeError("boom")), redirect_stderr(io.StringIO()):
+            status, body = self.request("GET", "/health")
+        self.assertEqual((status, body), (500, {"error": "internal error"}))
+        self.assertEqual(self.request("GET", "/health")[0], 200)
+
+    def test_metrics(self) -> None:
+        self.request("POST", "/price", TRIP | {"limit": 1, "km": 61})
+        self.request("GET", "/option/nope/breakdown?start=2026-03-01")
+        self.conn.request("GET", "/metrics")
+        resp = self.conn.getresponse()
+        self.assertTrue(resp.getheader("Content-Type").startswith("text/plain; version=0.0.4"))
+        text = resp.read().decode()
+        self.assertIn('carcalc_http_responses_total{route="/option/{id}/breakdown",code="404"}', text)
+        self.assertIn('carcalc_http_request_duration_seconds_bucket{route="/price",le="+Inf"}', text)
+        self.assertIn(f"carcalc_snapshot_options {len(self.tariffs)}\n", text)
+        evaluated = next(line for line in text.splitlines() if line.startswith("carcalc_options_evaluated_total "))
+        self.assertGreaterEqual(float(evaluated.split()[1]), len(self.tariffs))
+
+    def test_live_rankings(self) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+        conn.request("GET", "/live?start=2026-03-01T10:00&total_min=60&km=10&limit=3&debounce_ms=5")
+        resp = conn.getresponse()
+        self.assertEqual(resp.getheader("Content-Type"), "text/event-stream; charset=utf-8")
+
+        def next_event() -> tuple[str, dict]:
+            fields = {}
+            while (line := resp.readline().decode().rstrip("\n")) or not fields:
+                if line and not line.startswith(":"):
+                    name, _, value = line.partition(": ")
+                    fields[name] = value
+            return fields["event"], json.loads(fields["data"])
+
+        try:
+            event, session = next_event()
+            self.assertEqual(event, "session")
+            event, first = next_event()
+            self.assertEqual((event, first["seq"], first["size"], len(first["changed"])), ("ranking", 1, 3, 3))
+            status, body = self.request("POST", f"/live/{session['id']}", {"km": 300, "total_min": 1440})
+            self.assertEqual((status, body["ok"]), (200, True))
+            event, second = next_event()
+            self.assertEqual((event, second["seq"]), ("ranking", 2))
+            self.assertEqual(self.request("POST", "/live/nope", {"km": 1})[0], 404)
+            self.assertEqual(self.request("GET", "/live?total_min=60")[0], 400)
+        finally:
+            conn.close()
+
+    def test_cache_canonical_context_and_snapshot_version(self) -> None:
+        service = PricingService(self.tariffs)
+        a = service.respond("GET", "/price", {"start": "2026-03-01T21:30", "total_min": "180", "km": "59.2", "limit": "3"})
+        b = service.respond("POST", "/price", {"start": "2026-03-01 21:30:00", "total_min": 180, "km": 60, "limit": 3})
+        self.assertIs(a, b)
+        self.assertEqual(json.loads(a), service.price({"start": "2026-03-01T21:30", "total_min": 180, "km": 60, "limit": 3}))
+        self.assertEqual(service.cache.stats()["hits"], 1)
+        service.swap(self.tariffs)
+        self.assertIsNot(service.respond("GET", "/price", {"start": "2026-03-01T21:30", "total_min": "180", "km": "60", "limit": "3"}), a)
+
+    def test_user_overlay(self) -> None:
+        option_id = self.tariffs.option_ids[0]
+        path = f"/overlay/{option_id[:3]}%20me"
+        status, body = self.request("POST", path, {"options": [{"option_id": "mine", "provider_id": "myco", "vehicle_id": self.tariffs.vehicle_ids[0], "option_type": "PAYG"}]})
+        self.assertEqual((status, body["revision"], body["options"]), (200, 1, 1))
+        status, mine = self.request("POST", "/price", TRIP | {"user": f"{option_id[:3]} me", "provider": "myco", "breakdown": 0})
+        self.assertEqual([r["option_id"] for r in mine["results"]], ["mine"])
+        status, shared = self.request("POST", "/price", TRIP | {"provider": "myco"})
+        self.assertEqual(shared["results"], [])
+        status, body = self.request("GET", f"/option/mine/breakdown?start=2026-03-01T21:30&total_min=60&user={option_id[:3]}+me")
+        self.assertEqual((status, body["option_id"]), (200, "mine"))
+        self.assertEqual(self.request("GET", path)[1]["options"][0]["option_id"], "mine")
+        self.assertEqual(self.request("POST", path, {"options": [{"option_id": "x"}]})[0], 400)
+        self.assertEqual(self.request("DELETE", path), (200, {"ok": True, "deleted": True}))
+        self.assertEqual(self.request("GET", path)[0], 404)
+        # Recreated after the delete: the cached answers for the deleted overlay must not come back.
+        self.request("POST", path, {"options": [{"option_id": "mine2", "provider_id": "myco", "vehicle_id": self.tariffs.vehicle_ids[0], "option_type": "PAYG"}]})
+        status, mine = self.request("POST", "/price", TRIP | {"user": f"{option_id[:3]} me", "provider": "myco", "breakdown": 0})
+        self.assertEqual([r["option_id"] for r in mine["results"]], ["mine2"])
+
+    def test_admission_sheds_and_degrades(self) -> None:
+        adm = AdmissionController(1, max_queue=2, queue_timeout_s=5, degrade_at=1, degraded_limit=2)
+        service = PricingService(self.tariffs, admission=adm)
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        results: dict[str, dict] = {}
+
+        def price(name: str, trip: dict) -> None:
+            results[name] = json.loads(service.respond("POST", "/price", trip))
+
+        adm.acquire()  # the service is busy
+        full = threading.Thread(target=price, args=("full", TRIP | {"limit": 5}))
+        full.start()
+        wait_until(lambda: len(adm.queue) == 1)
+        degraded = threading.Thread(target=price, args=("degraded", TRIP | {"km": 61}))
+        degraded.start()
+        wait_until(lambda: len(adm.queue) == 2)
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+        conn.request("POST", "/price", body=json.dumps(TRIP | {"km": 62}))
+        resp = conn.getresponse()
+        self.assertEqual((resp.status, resp.getheader("Retry-After")), (503, "5"))
+        self.assertIn("overloaded", json.loads(resp.read())["error"])
+        conn.request("GET", "/health")
+        self.assertEqual(json.loads(conn.getresponse().read())["admission"]["queued"], 2)  # never queued itself
+        conn.close()
+        adm.release()
+        full.join()
+        degraded.join()
+        self.assertEqual(len(results["full"]["results"]), 5)
+        self.assertNotIn("degraded", results["full"])
+        self.assertTrue(results["degraded"]["degraded"])
+        self.assertEqual(len(results["degraded"]["results"]), 2)
+        self.assertNotIn("breakdown", results["degraded"]["results"][0])
+        self.assertEqual(adm.stats()["shed"]["queue_full"], 1)
+        self.assertIn('carcalc_admission_shed_total{reason="queue_full"} 1', service.metrics_text().decode())
+
+    def test_swap_keeps_in_flight_batch_on_old_snapshot(self) -> None:
+        service = PricingService(self.tariffs)
+        lines = [json.dumps(TRIP | {"id": i}).encode() for i in range(3)]
+        blocks = service.price_batch(iter(lines), {}, chunk_size=1)
+        first = next(blocks)
+        t = self.tariffs
+        columns = (t.provider_ids, t.vehicle_ids, t.option_ids, t.option_names, t.option_types, t.vehicle_names, t.snowboard_fits)
+        fewer = Tariffs(t.providers, t.rows[:1], *(c[:1] for c in columns))
+        self.assertEqual(service.swap(fewer).version, 2)
+        rest = list(blocks)
+        self.assertEqual(len({b[b.index(b'"results"'):] for b in [first, *rest]}), 1)
+        self.assertEqual(service.handle("GET", "/health", {})["options"], 1)
+
+    def batch(self, query: str, lines: list[bytes], chunked: bool = False) -> list[dict]:
+        body = b"\n".join(lines) + b"\n"
+        if chunked:
+            # Two request chunks, the split falling inside a line.
+            body = b"".join(b"%X\r\n%s\r\n" % (len(part), part) for part in (body[:7], body[7:])) + b"0\r\n\r\n"
+            headers = {"Transfer-Encoding": "chunked"}
+        else:
+            headers = {"Content-Length": str(len(body))}
+        self.conn.request("POST", f"/price/batch{query}", body=body, headers=headers)
+        resp = self.conn.getresponse()
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.getheader("Transfer-Encoding"), "chunked")
+        return [json.loads(line) for line in resp.read().splitlines()]
+
+    def test_live_debounce_bounds(self) -> None:
+        for value in ("inf", "nan", "1e400"):
+            status, body = self.request("GET", f"/live?start=2026-03-01T10:00&debounce_ms={value}")
+            self.assertEqual((status, body), (400, {"error": "debounce_ms must be a finite number"}))
+        service = PricingService(self.tariffs)
+        session = service.open_live({"start": "2026-03-01T10:00", "debounce_ms": "1e15"})
+        self.assertEqual(session.debounce_s, MAX_DEBOUNCE_S)
+        service.close_live(session)
+
+    def test_batch_cheapest_and_top_k(self) -> None:
+        trips = [TRIP, TRIP | {"id": "b", "km": 5, "provider": "bolt"}, TRIP | {"total_min": 20, "parking_min": 0}]
+        lines = [json.dumps(t).encode() for t in trips]
+        for chunked in (False, True):
+            rows = self.batch("", lines[:1] + [b"", b"[1]"] + lines[1:], chunked)
+            self.assertEqual([r["line"] for r in rows], [1, 3, 4, 5])
+            self.assertEqual(rows[1], {"line": 3, "error": "line must be a JSON object"})
+            self.assertEqual(rows[2]["id"], "b")
+            for row, trip in zip([rows[0]] + rows[2:], trips):
+                expected, _ = self.tariffs.ranked(trip_context(trip, ContextDefaults()), trip.get("provider", ""), limit=1, detail=False)
+                self.assertEqual(row["results"], json.loads(json.dumps(expected)))
+
+        rows = self.batch("?k=3&breakdown=1", lines)
+        self.assertEqual([len(r["results"]) for r in rows], [3, 3, 3])
+        self.assertIn("breakdown", rows[0]["results"][0])
+        rows = self.batch("", [lines[0], b'{"start": "2026-03-01T21:30", "total_min": 60, "km": 1e999}', lines[1]], True)
+        self.assertEqual(rows[1], {"line": 2, "error": "km must be a finite number"})
+        self.assertEqual([len(r["results"]) for r in (rows[0], rows[2])], [1, 1])
+        self.assertEqual(self.request("POST", "/price/batch?k=-1", b"")[0], 400)
+
+    def test_bad_content_length(self) -> None:
+        for path in ("/price", "/price/batch"):
+            for value in ("abc", "-5"):
+                conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+                try:
+                    conn.putrequest("POST", path)
+                    conn.putheader("Content-Length", value)
+                    conn.endheaders()
+                    resp = conn.getresponse()
+                    body = json.loads(resp.read())
+                    self.assertEqual((resp.status, resp.getheader("Connection")), (400, "close"))
+                    self.assertEqual(body, {"error": f"invalid Content-Length: {value!r}"})
+                finally:
+                    conn.close()
+
+    def test_batch_chunks_and_line_splitting(self) -> None:
+        service = PricingService(self.tariffs)
+        lines = [json.dumps(TRIP | {"id": i}).encode() for i in range(5)]
+        blocks = list(service.price_batch(iter(lines), {"k": "0"}, chunk_size=2))
+        self.assertEqual([block.count(b"\n") for block in blocks], [2, 2, 1])
+        self.assertEqual(list(split_lines([b"a\nb", b"c\n", b"d"], 10)), [b"a", b"bc", b"d"])
+        with self.assertRaises(ValueError):
+            list(split_lines([b"x" * 11], 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
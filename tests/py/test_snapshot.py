@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from carcalc.data import DEFAULT_DATA_DIR
+from carcalc.engine import Tariffs
+from carcalc.snapshot import DataWatcher, Snapshot, load_tariffs
+
+
+class TestDataWatcher(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir)
+        for name in ("providers", "vehicles", "options"):
+            shutil.copy(DEFAULT_DATA_DIR / f"{name}.tsv", self.dir)
+        self.swapped: list[Tariffs] = []
+        self.watcher = DataWatcher(self.dir, self.swapped.append, interval=0)
+
+    def rewrite_options(self, text: str) -> None:
+        path = self.dir / "options.tsv"
+        mtime = path.stat().st_mtime_ns
+        path.write_text(text, encoding="utf-8")
+        os.utime(path, ns=(mtime + 10**9, mtime + 10**9))  # coarse mtime filesystems
+
+    def test_reload_after_change_settles(self) -> None:
+        self.assertFalse(self.watcher.poll())
+        lines = (self.dir / "options.tsv").read_text(encoding="utf-8").splitlines(keepends=True)
+        self.rewrite_options("".join(lines[:-1]))
+        self.assertFalse(self.watcher.poll())  # first sighting: wait one more poll
+        self.assertTrue(self.watcher.poll())
+        self.assertFalse(self.watcher.poll())
+        self.assertEqual(len(self.swapped), 1)
+        self.assertEqual(len(self.swapped[0]), len(load_tariffs(DEFAULT_DATA_DIR)) - 1)
+        self.assertEqual(self.watcher.reloads, 1)
+
+    def test_invalid_data_keeps_current_snapshot(self) -> None:
+        header = (self.dir / "options.tsv").read_text(encoding="utf-8").split("\n", 1)[0]
+        self.rewrite_options(header + "\n")
+        self.assertFalse(self.watcher.poll())
+        self.assertFalse(self.watcher.poll())
+        self.assertEqual(self.swapped, [])
+        self.assertEqual((self.watcher.failures, self.watcher.last_error), (1, "ValueError: no options"))
+
+    def test_snapshot_index(self) -> None:
+        tariffs = load_tariffs(self.dir)
+        snap = Snapshot.build(tariffs, version=3)
+        option_id = tariffs.option_ids[7]
+        self.assertEqual(tariffs.option_ids[snap.option_index[option_id]], option_id)
+        self.assertEqual(snap.version, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from carcalc import store
+from carcalc.data import DEFAULT_DATA_DIR, load_data
+from carcalc.tsv import Table
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        for name in store.SOURCES:
+            shutil.copy(DEFAULT_DATA_DIR / f"{name}.tsv", self.dir)
+        self.store = store.Store(self.dir / "data.sqlite")
+        self.addCleanup(self.store.close)
+        self.assertEqual(set(self.store.sync(self.dir).values()), {"loaded"})
+
+    def test_queries_use_the_key_indexes(self) -> None:
+        tsv = Table.read(self.dir / "options.tsv")
+        some = tsv.rows[len(tsv) // 2]
+        criteria = {"provider_id": some.text("provider_id"), "vehicle_id": some.text("vehicle_id")}
+        got = self.store.lookup("options", **criteria)
+        self.assertEqual(got, [r.as_dict() for r in tsv.lookup(**criteria)])
+        plan = self.store.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM options WHERE provider_id = ? AND vehicle_id = ?", tuple(criteria.values())
+        ).fetchall()
+        self.assertIn("USING INDEX options_by_provider_id_vehicle_id", str([tuple(r) for r in plan]))
+        with self.assertRaisesRegex(KeyError, "no column"):
+            self.store.lookup("options", nope="x")
+
+    def test_engine_data_and_tables_match_the_tsvs(self) -> None:
+        self.assertEqual(self.store.load_data(), load_data(self.dir))
+        for name in store.SOURCES:
+            self.assertEqual(store.read_table(self.store.path, name).rows, Table.read(self.dir / f"{name}.tsv").rows)
+
+    def test_sync_goes_both_ways(self) -> None:
+        options = self.dir / "options.tsv"
+        original = options.read_bytes()
+        self.assertEqual(set(self.store.sync(self.dir).values()), {"in sync"})
+
+        # A no-op write still exports, and the export reproduces the file byte for byte.
+        self.store.conn.execute("UPDATE options SET notes = notes")
+        self.assertEqual(self.store.sync(self.dir)["options"], "exported")
+        self.assertEqual(options.read_bytes(), original)
+
+        option_id = self.store.lookup("options")[0]["option_id"]
+        self.store.conn.execute("UPDATE options SET km_rate_eur = '9.99' WHERE option_id = ?", (option_id,))
+        self.assertEqual(self.store.sync(self.dir), {"providers": "in sync", "vehicles": "in sync", "options": "exported"})
+        self.assertEqual(Table.read(options).first(option_id=option_id).text("km_rate_eur"), "9.99")
+
+        table = Table.read(options)
+        table.update(0, km_rate_eur="1.11")
+        table.write(options)
+        self.assertEqual(self.store.sync(self.dir)["options"], "loaded")
+        self.assertEqual(self.store.lookup("options", option_id=table.rows[0].text("option_id"))[0]["km_rate_eur"], "1.11")
+
+    def test_conflicts_need_a_side(self) -> None:
+        options = self.dir / "options.tsv"
+        with options.open("a", encoding="utf-8") as f:
+            f.write("bolt\tbolt_x\tbolt_x_payg\tPAYG\tPAYG\n")
+        self.store.conn.execute("DELETE FROM options WHERE _pos = 0")
+        with self.assertRaises(store.SyncConflict):
+            self.store.sync(self.dir)
+        self.assertEqual(self.store.sync(self.dir, prefer="db")["options"], "exported")
+        self.assertNotIn("bolt_x_payg", options.read_text(encoding="utf-8"))
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            code = store.main(["--db", str(self.store.path), "--data-dir", str(self.dir), "lookup", "providers", "provider_id=bolt"])
+        self.assertEqual(code, 0)
+        self.assertEqual(out.getvalue().splitlines()[1].split("\t")[0], "bolt")
+
+
+if __name__ == "__main__":
+    unittest.main()
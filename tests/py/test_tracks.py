@@ -0,0 +1,110 @@
+import io
+import unittest
+from array import array
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from carcalc.data import load_data
+from carcalc.engine import Tariffs
+from carcalc.tracks import Track, haversine_km, price_tracks, read_csv_tracks, read_gpx, summarize
+
+RIGA = ZoneInfo("Europe/Riga")
+T0 = datetime(2026, 1, 15, 8, 0, tzinfo=ZoneInfo("UTC")).timestamp()
+
+
+def synthetic_track() -> Track:
+    """10 min driving east at ~36 km/h, 20 min parked (with jitter), 10 min driving back."""
+    track = Track.empty("t1")
+    lat, lon = 56.95, 24.10
+    step = 0.6 / (111.32 * 0.5446)  # ~0.6 km of longitude at this latitude per minute
+    for m in range(10):
+        track.append(T0 + m * 60, lat, lon + m * step)
+    for m in range(10, 30):
+        track.append(T0 + m * 60, lat + (m % 2) * 1e-5, lon + 10 * step)
+    for m in range(30, 41):
+        track.append(T0 + m * 60, lat, lon + (40 - m) * step)
+    return track
+
+
+class TestTracks(unittest.TestCase):
+    def test_haversine(self) -> None:
+        # Riga -> Tallinn, ~279 km great-circle.
+        (d,) = haversine_km(array("d", [56.9496, 59.4370]), array("d", [24.1052, 24.7536]))
+        self.assertAlmostEqual(d, 279.3, delta=1.0)
+
+    def test_summarize_splits_drive_and_parking(self) -> None:
+        s = summarize(synthetic_track(), RIGA)
+        self.assertEqual(s.start, datetime(2026, 1, 15, 10, 0))  # UTC+2 wall clock
+        self.assertEqual(s.total_min, 40)
+        self.assertEqual(s.parking_min, 20)
+        self.assertAlmostEqual(s.km, 12.0, delta=0.2)  # parking jitter is not counted
+
+    def test_short_stops_count_as_driving(self) -> None:
+        s = summarize(synthetic_track(), RIGA, dwell_min=30)
+        self.assertEqual(s.parking_min, 0)
+
+    def test_too_short_track(self) -> None:
+        track = Track.empty("x")
+        track.append(T0, 56.9, 24.1)
+        with self.assertRaises(ValueError):
+            summarize(track, RIGA)
+
+    def test_read_gpx_and_csv(self) -> None:
+        gpx = b"""<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">
+  <trk><trkseg>
+    <trkpt lat="56.95" lon="24.10"><time>2026-01-15T08:00:00Z</time></trkpt>
+    <trkpt lat="56.96" lon="24.10"><time>2026-01-15T08:02:00Z</time></trkpt>
+  </trkseg></trk>
+  <trk><trkseg>
+    <trkpt lat="56.95" lon="24.10"><time>2026-01-15T09:00:00Z</time></trkpt>
+  </trkseg></trk>
+</gpx>"""
+        tracks = list(read_gpx(io.BytesIO(gpx), "a.gpx"))
+        self.assertEqual([t.track_id for t in tracks], ["a.gpx#1", "a.gpx#2"])
+        self.assertEqual(len(tracks[0].times), 2)
+
+        csv_text = "track_id,time,lat,lon\na,2026-01-15T08:00:00Z,56.95,24.1\na,2026-01-15T08:05:00Z,56.96,24.1\nb,2026-01-15T09:00:00Z,56.95,24.1\n"
+        tracks = list(read_csv_tracks(io.StringIO(csv_text)))
+        self.assertEqual([(t.track_id, len(t.times)) for t in tracks], [("a", 2), ("b", 1)])
+
+    def test_bad_points_fail_only_their_track(self) -> None:
+        csv_text = (
+            "track_id,time,lat,lon\n"
+            "a,2026-01-15T08:00:00Z,56.95,24.1\na,yesterday,56.96,24.1\n"
+            "b,2026-01-15T09:00:00Z,56.95,x\n"
+            "c,2026-01-15T08:00:00Z,56.95,24.1\nc,2026-01-15T08:05:00Z,56.96,24.1\n"
+        )
+        tracks = list(read_csv_tracks(io.StringIO(csv_text)))
+        self.assertEqual([t.track_id for t in tracks], ["a", "b", "c"])
+        self.assertIn("point 2", tracks[0].error)
+        self.assertTrue(tracks[1].error)
+        self.assertEqual(tracks[2].error, "")
+
+        gpx = b"""<gpx><trk><trkseg>
+    <trkpt lat="56.95"><time>2026-01-15T08:00:00Z</time></trkpt>
+  </trkseg></trk>
+  <trk><trkseg>
+    <trkpt lat="56.95" lon="24.10"><time>2026-01-15T09:00:00Z</time></trkpt>
+    <trkpt lat="56.95" lon="24.10"><time>"""
+        tracks = list(read_gpx(io.BytesIO(gpx), "a.gpx"))
+        self.assertEqual([t.track_id for t in tracks], ["a.gpx#1", "a.gpx#2"])
+        self.assertIn("missing lat/lon", tracks[0].error)
+        self.assertIn("invalid GPX", tracks[1].error)
+
+        tariffs = Tariffs.compile(load_data())
+        rows = [r for chunk in price_tracks(tracks, tariffs, tz=RIGA) for r in chunk]
+        self.assertEqual([r["error"] for r in rows], [tracks[0].error, tracks[1].error])
+
+    def test_price_tracks(self) -> None:
+        tariffs = Tariffs.compile(load_data())
+        bad = Track.empty("bad")
+        rows = [r for chunk in price_tracks([synthetic_track(), bad], tariffs, tz=RIGA, chunk_size=1) for r in chunk]
+        self.assertEqual([r["track_id"] for r in rows], ["t1", "bad"])
+        self.assertEqual(rows[0]["error"], "")
+        self.assertGreater(rows[0]["total_eur"], 0)
+        self.assertTrue(rows[1]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
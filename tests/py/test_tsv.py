@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from carcalc.tsv import Header, Row, Table, diff, merge, stream
+
+
+class TestTsv(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dir = Path(self.tmp.name)
+
+    def write(self, name: str, text: str) -> Path:
+        path = self.dir / name
+        path.write_bytes(text.encode())
+        return path
+
+    def test_round_trip_keeps_newlines_and_final_newline(self) -> None:
+        for text in ("a\tb\r\n1\t2\r\n3\t4\r\n", "a\tb\n1\t2\n3\t4", "a\tb\n"):
+            path = self.write("t.tsv", text)
+            table = Table.read(path)
+            table.write(path)
+            self.assertEqual(path.read_bytes().decode(), text)
+
+    def test_rows_are_padded_cut_and_blank_lines_skipped(self) -> None:
+        path = self.write("t.tsv", " a \tb\tc\n1\n\n1\t2\t3\t4\n")
+        rows = list(stream(path))
+        self.assertEqual([tuple(r) for r in rows], [("1", "", ""), ("1", "2", "3")])
+        self.assertEqual(rows[0].header.names, ("a", "b", "c"))
+        self.assertEqual((rows[1].get("a"), rows[1].get("x", "-"), rows[1].number("c")), ("1", "-", 3.0))
+        self.assertEqual(rows[0].as_dict(), {"a": "1", "b": "", "c": ""})
+
+    def test_equal_values_share_one_string(self) -> None:
+        path = self.write("t.tsv", "a\tb\n" + "".join(f"bolt\t{i}x\n" for i in range(3)))
+        rows = Table.read(path).rows
+        self.assertIs(rows[0][0], rows[2][0])
+
+    def test_indexes_and_lookups(self) -> None:
+        table = Table(["provider_id", "vehicle_id", "option_id"], [("bolt", "car", "a"), ("bolt", " car ", "b"), ("citybee", "car", "c")])
+        self.assertEqual([r.text("option_id") for r in table.lookup(provider_id="bolt", vehicle_id="car")], ["a", "b"])
+        self.assertEqual(table.index("provider_id"), {"bolt": [0, 1], "citybee": [2]})
+        self.assertIsNone(table.first(option_id="z"))
+        table.append({"provider_id": "bolt", "vehicle_id": "car", "option_id": "d"})
+        self.assertEqual(len(table.lookup(provider_id="bolt", vehicle_id="car")), 3)
+        table.update(0, provider_id="citybee")
+        self.assertEqual(table.index("provider_id")["citybee"], [0, 2])
+        with self.assertRaises(KeyError):
+            table.index("nope")
+
+    def test_with_columns_and_format_row(self) -> None:
+        table = Table(["b", "a"], [("1", "2")]).with_columns(["a", "c", "d"])
+        self.assertEqual(table.header.names, ("b", "a", "c", "d"))
+        self.assertEqual(table.rows[0].replace(d=4, c=None), ("1", "2", "", "4"))
+        self.assertEqual(table.format_row({"a": "x", "zz": "dropped"}), "\tx\t\t")
+        with self.assertRaises(ValueError):
+            table.format_row({"a": "x\ty"})
+        with self.assertRaises(ValueError):
+            table.format_row({"a": "x\ny"})
+        header = Header(["a"])
+        self.assertIs(header.with_columns(["a"]), header)
+
+    def test_write_is_atomic(self) -> None:
+        path = self.write("t.tsv", "a\tb\n1\t2\n")
+        os.chmod(path, 0o640)
+        table = Table.read(path)
+        table.append({"a": "bad\tvalue"})
+        with self.assertRaises(ValueError):
+            table.write(path)
+        self.assertEqual(path.read_text(), "a\tb\n1\t2\n")  # failed writes leave the file alone
+        table.rows.pop()
+        table.update(0, b="3")
+        table.write(path)
+        self.assertEqual((path.read_text(), os.stat(path).st_mode & 0o777), ("a\tb\n1\t3\n", 0o640))
+        self.assertEqual(os.listdir(self.dir), ["t.tsv"])
+
+    def test_merge_keeps_order_and_diff_reports_changes(self) -> None:
+        old = Table(
+            ["provider_id", "vehicle_id", "option_id", "rate"],
+            [("bolt", "x", "b1", "1"), ("carguru", "c1", "g1", "1"), ("carguru", "c1", "g2", "1"), ("bolt", "y", "b2", "1"), ("carguru", "c2", "g3", "1")],
+        )
+        regenerated = [("carguru", "c1", "g1", "2"), ("carguru", "c1", "g4", "1"), ("carguru", "c2", "g3", "1"), ("carguru", "c9", "g5", "1")]
+
+        def drop(row: Row) -> bool:
+            return row.text("provider_id") == "carguru"
+
+        new = merge(old, regenerated, ("option_id",), near=("provider_id", "vehicle_id"), drop=drop)
+        self.assertEqual([r.text("option_id") for r in new], ["b1", "g1", "g4", "b2", "g3", "g5"])
+        changes = diff(old, new, ("option_id",))
+        self.assertEqual((changes.added, changes.removed, changes.changed), (("g4", "g5"), ("g2",), (("g1", ("rate",)),)))
+        self.assertEqual(changes.summary(), "2 added, 1 removed, 1 changed")
+        self.assertEqual(changes.lines(limit=1), ["+ g4", "- g2", "~ g1: rate", "+ ... and 1 more"])
+
+        same = merge(old, [r for r in old if drop(r)], ("option_id",), drop=drop)
+        self.assertFalse(diff(old, same, ("option_id",)))
+        self.assertEqual(diff(old, same, ("option_id",)).summary(), "unchanged")
+        wider = old.with_columns(["notes"])
+        self.assertEqual(diff(old, wider, ("provider_id", "option_id")).summary(), "0 added, 0 removed, 0 changed, new columns: notes")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import { ceilInt, createBaseContext, parseDurationToMinutes, computeAll } from './lib/calc.js';
 import { parseTsv } from './lib/tsv.js';
+import { decodeBundle } from './lib/bundle.js';
 import { normalizeData } from './lib/data.js';
 import { initI18n, setLang, getLang, t } from './lib/i18n.js';
 
@@ -212,6 +213,12 @@ async function fetchText(url) {
   return await res.text();
 }
 
+async function fetchJson(url) {
+  const res = await fetch(url, { cache: 'no-store' });
+  if (!res.ok) throw new Error(`Failed to load ${url}: ${res.status}`);
+  return await res.json();
+}
+
 function buildContextFromInputs(data) {
   const startVal = $('start').value;
   if (!startVal) throw new Error(t('err_start_required'));
@@ -268,16 +275,37 @@ function buildProviderOptions(providerId, options) {
   return options.filter(o => (o.provider_id || '').toLowerCase() === providerId);
 }
 
-async function loadDefaultData() {
+async function fetchDefaultTsv() {
   const [providersTsv, vehiclesTsv, optionsTsv] = await Promise.all([
     fetchText('./data/providers.tsv'),
     fetchText('./data/vehicles.tsv'),
     fetchText('./data/options.tsv'),
   ]);
-  const providers = parseTsv(providersTsv).data;
-  const vehicles = parseTsv(vehiclesTsv).data;
-  const options = parseTsv(optionsTsv).data;
-  return { providers, vehicles, options, providersTsv, vehiclesTsv, optionsTsv };
+  return { providersTsv, vehiclesTsv, optionsTsv };
+}
+
+// Default data comes from data/bundle.json (pre-parsed; only the deployed site has one, so a
+// local `npx serve web` always reads the TSVs); the raw TSVs are otherwise only fetched when
+// the Advanced dialog needs their text.
+async function loadDefaultData() {
+  let tsvPromise = null;
+  const tsv = () => (tsvPromise ??= fetchDefaultTsv().catch((e) => {
+    tsvPromise = null;
+    throw e;
+  }));
+  try {
+    const { providers, vehicles, options } = decodeBundle(await fetchJson('./data/bundle.json'));
+    return { providers, vehicles, options, tsv };
+  } catch (e) {
+    console.warn(`Data bundle unavailable, parsing TSVs: ${e.message || e}`);
+  }
+  const texts = await tsv();
+  return {
+    providers: parseTsv(texts.providersTsv).data,
+    vehicles: parseTsv(texts.vehiclesTsv).data,
+    options: parseTsv(texts.optionsTsv).data,
+    tsv,
+  };
 }
 
 function loadSavedData() {
@@ -304,12 +332,9 @@ function getEffectiveData(defaults) {
   const saved = loadSavedData();
   if (!saved) return defaults;
   return {
-    providers: parseTsv(saved.providersTsv || defaults.providersTsv).data,
-    vehicles: parseTsv(saved.vehiclesTsv || defaults.vehiclesTsv).data,
-    options: parseTsv(saved.optionsTsv || defaults.optionsTsv).data,
-    providersTsv: saved.providersTsv || defaults.providersTsv,
-    vehiclesTsv: saved.vehiclesTsv || defaults.vehiclesTsv,
-    optionsTsv: saved.optionsTsv || defaults.optionsTsv,
+    providers: saved.providersTsv ? parseTsv(saved.providersTsv).data : defaults.providers,
+    vehicles: saved.vehiclesTsv ? parseTsv(saved.vehiclesTsv).data : defaults.vehicles,
+    options: saved.optionsTsv ? parseTsv(saved.optionsTsv).data : defaults.options,
   };
 }
 
@@ -709,26 +734,34 @@ function wireDataDialog(defaults) {
   }
   for (const t of tabs) t.addEventListener('click', () => setTab(t.dataset.tab));
 
-  btnData.addEventListener('click', () => {
-    const eff = getEffectiveData(defaults);
-    providersTA.value = eff.providersTsv;
-    vehiclesTA.value = eff.vehiclesTsv;
-    optionsTA.value = eff.optionsTsv;
+  async function showDefaults() {
+    const tsv = await defaults.tsv();
+    providersTA.value = tsv.providersTsv;
+    vehiclesTA.value = tsv.vehiclesTsv;
+    optionsTA.value = tsv.optionsTsv;
+  }
+
+  btnData.addEventListener('click', async () => {
+    let tsv;
+    try {
+      tsv = await defaults.tsv();
+    } catch (e) {
+      showErrors([e.message || String(e)]);
+      return;
+    }
+    const saved = loadSavedData() || {};
+    providersTA.value = saved.providersTsv || tsv.providersTsv;
+    vehiclesTA.value = saved.vehiclesTsv || tsv.vehiclesTsv;
+    optionsTA.value = saved.optionsTsv || tsv.optionsTsv;
     setTab('providers');
     dlg.showModal();
   });
 
-  btnLoadDefaults.addEventListener('click', () => {
-    providersTA.value = defaults.providersTsv;
-    vehiclesTA.value = defaults.vehiclesTsv;
-    optionsTA.value = defaults.optionsTsv;
-  });
+  btnLoadDefaults.addEventListener('click', showDefaults);
 
   btnResetData.addEventListener('click', () => {
     clearSavedData();
-    providersTA.value = defaults.providersTsv;
-    vehiclesTA.value = defaults.vehiclesTsv;
-    optionsTA.value = defaults.optionsTsv;
+    showDefaults();
   });
 
   btnSave.addEventListener('click', () => {
@@ -0,0 +1,43 @@
+// Decoder for `data/bundle.json` (built by `python -m carcalc build bundle` from the TSVs).
+//
+// Rows read like `parseTsv` rows after normalization (numeric option columns are already
+// numbers or null; vehicles carry a resolved fuel_type / snowboard_fit), but they are
+// read-only views over the bundle's columns: a row is one object holding its index, and
+// each column is a getter on a per-table prototype. Building them costs one allocation per
+// row instead of one property store per cell, which is most of the first-render parse time.
+export const BUNDLE_FORMAT = 1;
+
+const INDEX = Symbol('row');
+
+function decodeTable(table, strings) {
+  const numeric = new Set(table.numeric || []);
+  class Row {
+    constructor(i) {
+      this[INDEX] = i;
+    }
+  }
+  for (const name of Object.keys(table.columns)) {
+    const column = table.columns[name];
+    const values = numeric.has(name) ? column : column.map((k) => strings[k]);
+    Object.defineProperty(Row.prototype, name, {
+      get() { return values[this[INDEX]]; },
+      enumerable: true,
+    });
+  }
+  const rows = new Array(table.count);
+  for (let i = 0; i < table.count; i++) rows[i] = new Row(i);
+  return rows;
+}
+
+export function decodeBundle(bundle) {
+  if (!bundle || bundle.format !== BUNDLE_FORMAT) {
+    throw new Error(`Unsupported data bundle format: ${bundle && bundle.format}`);
+  }
+  const { strings } = bundle;
+  return {
+    version: bundle.version,
+    providers: decodeTable(bundle.providers, strings),
+    vehicles: decodeTable(bundle.vehicles, strings),
+    options: decodeTable(bundle.options, strings),
+  };
+}
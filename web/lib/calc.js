@@ -17,6 +17,7 @@ export function roundToCents(x) {
 
 export function toNumberMaybe(v) {
   if (v == null) return null;
+  if (typeof v === 'number') return Number.isFinite(v) ? v : null; // pre-parsed (data bundle)
   const s = String(v).trim();
   if (!s) return null;
   let cleaned = s.replace(/\u00a0/g, ' ').replace(/€/g, '').replace(/EUR/gi, '').trim();